@@ -6,51 +6,162 @@ Azure best practices implementation for monitoring and logging
 import logging
 import time
 import functools
-from typing import Callable, Any
+import heapq
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Any, Iterable, Optional
+from urllib.parse import urlsplit
 from fastapi import Request, HTTPException
+import gzip
 import json
+import zstandard
+from utils.stage_metrics import DURATION_BUCKETS, HistogramFamily, pipeline_metrics
 
 # Azure best practice: Configure structured logging
 logger = logging.getLogger(__name__)
 
 class APIMetrics:
-    """Azure best practice: Simple metrics tracking for monitoring"""
+    """
+    Azure best practice: Simple metrics tracking for monitoring
+    Updated from the event loop and from pool threads, every counter is guarded by a lock
+    """
     
-    def __init__(self):
+    # Number of most expensive generations kept for /metrics
+    TOP_GENERATIONS = 10
+
+    def __init__(self, pipeline=None):
+        self._lock = threading.Lock()
         self.request_count = 0
         self.error_count = 0
         self.generation_count = 0
         self.total_response_time = 0.0
         self.start_time = time.time()
+        self.request_seconds = HistogramFamily(
+            "gitrot_request_duration_seconds", "Time to answer an API request, by endpoint.",
+            "endpoint", DURATION_BUCKETS
+        )
+        self.pipeline = pipeline or pipeline_metrics
+
+        # LLM usage aggregated over all generations
+        self._usage_lock = threading.Lock()
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_cost = 0.0
+        self.stage_usage = {}
+        self._top_generations = []  # min-heap of (cost, tokens, repo, model)
+        self.cost_alert_threshold = float(os.getenv("GITROT_GENERATION_COST_ALERT", "1.0"))
     
     def increment_requests(self):
-        self.request_count += 1
+        with self._lock:
+            self.request_count += 1
     
     def increment_errors(self):
-        self.error_count += 1
+        with self._lock:
+            self.error_count += 1
     
     def increment_generations(self):
-        self.generation_count += 1
+        with self._lock:
+            self.generation_count += 1
     
-    def add_response_time(self, response_time: float):
-        self.total_response_time += response_time
+    def add_response_time(self, response_time: float, endpoint: Optional[str] = None):
+        with self._lock:
+            self.total_response_time += response_time
+        if endpoint:
+            self.request_seconds.observe(endpoint, response_time)
+
+    def record_generation_usage(self, repo_name: str, model_name: str, usage: dict):
+        """Aggregate the token usage and cost of one generation"""
+        cost = usage.get("estimated_cost", 0.0)
+        total_tokens = usage.get("total_tokens", 0)
+        self.pipeline.observe_count("llm_calls", usage.get("llm_calls", 0))
+        with self._usage_lock:
+            self.llm_calls += usage.get("llm_calls", 0)
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+            self.estimated_cost += cost
+            for stage, stage_usage in usage.get("stages", {}).items():
+                totals = self.stage_usage.setdefault(
+                    stage, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "estimated_cost": 0.0}
+                )
+                for key in totals:
+                    totals[key] += stage_usage.get(key, 0)
+
+            entry = (cost, total_tokens, repo_name, model_name)
+            if len(self._top_generations) < self.TOP_GENERATIONS:
+                heapq.heappush(self._top_generations, entry)
+            else:
+                heapq.heappushpop(self._top_generations, entry)
+
+        if cost >= self.cost_alert_threshold:
+            logger.warning(f"Generation for {repo_name} cost ~${cost:.2f} ({total_tokens} tokens, {model_name})")
+
+    def get_usage_metrics(self) -> dict:
+        with self._lock:
+            generation_count = self.generation_count
+        with self._usage_lock:
+            return {
+                "llm_calls": self.llm_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "estimated_cost": round(self.estimated_cost, 6),
+                "average_cost_per_generation": (
+                    round(self.estimated_cost / generation_count, 6) if generation_count > 0 else 0
+                ),
+                "stages": {stage: dict(totals) for stage, totals in self.stage_usage.items()},
+                "most_expensive_generations": [
+                    {"repo": repo, "model": model, "estimated_cost": round(cost, 6), "total_tokens": tokens}
+                    for cost, tokens, repo, model in sorted(self._top_generations, reverse=True)
+                ],
+            }
     
     def get_metrics(self) -> dict:
         uptime = time.time() - self.start_time
-        avg_response_time = (
-            self.total_response_time / self.request_count 
-            if self.request_count > 0 else 0
-        )
+        with self._lock:
+            request_count, error_count = self.request_count, self.error_count
+            generation_count, total_response_time = self.generation_count, self.total_response_time
+        avg_response_time = total_response_time / request_count if request_count > 0 else 0
         
         return {
             "uptime_seconds": uptime,
-            "total_requests": self.request_count,
-            "total_errors": self.error_count,
-            "total_generations": self.generation_count,
+            "total_requests": request_count,
+            "total_errors": error_count,
+            "total_generations": generation_count,
             "average_response_time": avg_response_time,
-            "error_rate": self.error_count / self.request_count if self.request_count > 0 else 0
+            "error_rate": error_count / request_count if request_count > 0 else 0,
+            "usage": self.get_usage_metrics(),
+            "latency": {"endpoints": self.request_seconds.summary(), **self.pipeline.summary()}
         }
 
+    def prometheus_text(self) -> str:
+        """Counters and latency histograms in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = [
+                ("gitrot_requests_total", "API requests handled.", self.request_count),
+                ("gitrot_request_errors_total", "API requests that raised an error.", self.error_count),
+                ("gitrot_generations_total", "README generations finished, successful or not.", self.generation_count),
+            ]
+        with self._usage_lock:
+            counters += [
+                ("gitrot_llm_calls_total", "LLM calls made by generations.", self.llm_calls),
+                ("gitrot_prompt_tokens_total", "Prompt tokens sent to LLMs.", self.prompt_tokens),
+                ("gitrot_completion_tokens_total", "Completion tokens received from LLMs.", self.completion_tokens),
+                ("gitrot_estimated_cost_dollars_total", "Estimated LLM cost in dollars.", round(self.estimated_cost, 6)),
+            ]
+
+        lines = [
+            "# HELP gitrot_uptime_seconds Seconds since the process started.",
+            "# TYPE gitrot_uptime_seconds gauge",
+            f"gitrot_uptime_seconds {time.time() - self.start_time:.3f}",
+        ]
+        for name, description, value in counters:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} counter", f"{name} {value}"]
+        lines += self.request_seconds.prometheus_lines()
+        lines += self.pipeline.prometheus_lines()
+        return "\n".join(lines) + "\n"
+
 # Global metrics instance
 metrics = APIMetrics()
 
@@ -66,7 +177,7 @@ def log_request_metrics(func: Callable) -> Callable:
         try:
             result = await func(*args, **kwargs)
             response_time = time.time() - start_time
-            metrics.add_response_time(response_time)
+            metrics.add_response_time(response_time, func.__name__)
             
             logger.info(f"Request completed: {func.__name__} - {response_time:.3f}s")
             return result
@@ -74,42 +185,43 @@ def log_request_metrics(func: Callable) -> Callable:
         except Exception as e:
             metrics.increment_errors()
             response_time = time.time() - start_time
-            metrics.add_response_time(response_time)
+            metrics.add_response_time(response_time, func.__name__)
             
             logger.error(f"Request failed: {func.__name__} - {response_time:.3f}s - {str(e)}")
             raise
     
     return wrapper
 
+# GitHub owner and repository names: letters, digits, '-', '_' and '.', never a leading '-' or '.'
+GITHUB_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]{0,99}$")
+
+
 def validate_github_url(url: str) -> bool:
     """
     Validate GitHub repository URL format
     Azure best practice: Input validation
+    Only https://github.com/<owner>/<repo> (optionally ending in .git or /) is accepted: the
+    URL is handed to git, which must never see an option, another host or another protocol
     """
     if not url:
         return False
-    
-    # Basic GitHub URL validation
-    valid_patterns = [
-        "https://github.com/",
-        "http://github.com/",
-        "github.com/"
-    ]
-    
-    url_lower = url.lower().strip()
-    if not any(pattern in url_lower for pattern in valid_patterns):
-        return False
-    
-    # Check for proper format: github.com/user/repo
+
     try:
-        if "github.com/" in url_lower:
-            path_part = url_lower.split("github.com/")[-1]
-            path_segments = path_part.strip("/").split("/")
-            return len(path_segments) >= 2 and all(segment for segment in path_segments[:2])
+        parsed = urlsplit(url.strip())
+    except ValueError:
         return False
-    except Exception:
+    if (parsed.scheme != "https" or parsed.netloc.lower() != "github.com"
+            or parsed.query or parsed.fragment):
         return False
 
+    path_segments = parsed.path.strip("/").split("/")
+    if len(path_segments) != 2:
+        return False
+    owner, repo = path_segments
+    if repo.endswith(".git"):
+        repo = repo[:-4]
+    return all(GITHUB_NAME_PATTERN.match(segment) for segment in (owner, repo))
+
 def sanitize_repo_name(repo_url: str) -> str:
     """
     Extract and sanitize repository name from URL
@@ -147,6 +259,12 @@ def format_error_response(error: Exception, request_id: str = None) -> dict:
     
     return error_response
 
+def format_sse_event(event: str, data: Any) -> str:
+    """
+    Format one server-sent event, data is sent as a single JSON line
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
 def log_generation_attempt(repo_url: str, method: str, user_agent: str = None):
     """
     Azure best practice: Log generation attempts for monitoring
@@ -172,63 +290,157 @@ def get_client_info(request: Request) -> dict:
     """
     return {
         "user_agent": request.headers.get("user-agent", "unknown")[:100],
-        "client_host": request.client.host if request.client else "unknown",
+        "client_host": get_client_address(request),
         "content_type": request.headers.get("content-type", "unknown"),
         "timestamp": time.time()
     }
 
+class RateLimitDecision:
+    """Outcome of a rate limit check, retry_after_seconds is 0 when allowed"""
+
+    __slots__ = ("allowed", "retry_after_seconds")
+
+    def __init__(self, allowed: bool, retry_after_seconds: float = 0.0):
+        self.allowed = allowed
+        self.retry_after_seconds = retry_after_seconds
+
+
+class MemoryRateLimitStore:
+    """
+    In-process GCRA state: each key's theoretical arrival time (TAT), in an OrderedDict
+    ordered by last update. A key is useless once its TAT has passed, and a key updated
+    earlier can only expire earlier or within one window of the rest, so expired keys
+    are dropped from the front - amortized O(1) per check, no full scans.
+    """
+
+    def __init__(self):
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, key: str, emission_interval: float, tolerance: float) -> RateLimitDecision:
+        with self._lock:
+            now = time.time()
+            while self._tats:
+                oldest_key, oldest_tat = next(iter(self._tats.items()))
+                if oldest_tat > now:
+                    break
+                del self._tats[oldest_key]
+
+            tat = max(self._tats.get(key, now), now)
+            if tat - now > tolerance:
+                return RateLimitDecision(False, tat - now - tolerance)
+            self._tats[key] = tat + emission_interval
+            self._tats.move_to_end(key)
+            return RateLimitDecision(True)
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+class RedisRateLimitStore:
+    """
+    GCRA state shared by all workers in Redis. The check runs as one Lua script on the
+    Redis clock, so concurrent workers can't both take the last request of a burst.
+    Requires the optional redis package.
+    """
+
+    _SCRIPT = """
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local interval = tonumber(ARGV[1])
+    local tolerance = tonumber(ARGV[2])
+    local tat = tonumber(redis.call('GET', KEYS[1])) or now
+    if tat < now then tat = now end
+    if tat - now > tolerance then
+        return {0, tostring(tat - now - tolerance)}
+    end
+    local new_tat = tat + interval
+    redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+    return {1, '0'}
+    """
+
+    def __init__(self, url: str, prefix: str = "gitrot:ratelimit:"):
+        import redis  # Optional dependency, only needed for shared rate limits
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self._SCRIPT)
+
+    def check(self, key: str, emission_interval: float, tolerance: float) -> RateLimitDecision:
+        allowed, retry_after = self._script(keys=[self.prefix + key], args=[emission_interval, tolerance])
+        return RateLimitDecision(bool(int(allowed)), float(retry_after))
+
+
 class RateLimiter:
     """
-    Simple in-memory rate limiter for Azure App Service
+    Rate limiter using the generic cell rate algorithm (GCRA), a sliding-window equivalent
+    of a token bucket: bursts of up to max_requests, refilled at one request per
+    window / max_requests, so sustained traffic is held to max_requests per window.
+    Thread-safe, O(1) per check, one timestamp of state per client.
     Azure best practice: Basic rate limiting for protection
     """
-    
-    def __init__(self, max_requests: int = 100, window_minutes: int = 60):
+
+    def __init__(self, max_requests: int = 100, window_minutes: float = 60, store=None):
         self.max_requests = max_requests
         self.window_seconds = window_minutes * 60
-        self.requests = {}
-    
+        self.emission_interval = self.window_seconds / max_requests
+        self.tolerance = self.window_seconds - self.emission_interval
+        self.store = store if store is not None else MemoryRateLimitStore()
+
+    def check(self, client_id: str) -> RateLimitDecision:
+        try:
+            return self.store.check(client_id, self.emission_interval, self.tolerance)
+        except Exception as e:
+            # A shared store outage shouldn't take the API down with it
+            logger.warning(f"Rate limit store unavailable, allowing request: {str(e)}")
+            return RateLimitDecision(True)
+
     def is_allowed(self, client_id: str) -> bool:
-        current_time = time.time()
-        
-        # Clean old entries
-        self.requests = {
-            k: v for k, v in self.requests.items()
-            if current_time - v['first_request'] < self.window_seconds
-        }
-        
-        if client_id not in self.requests:
-            self.requests[client_id] = {
-                'count': 1,
-                'first_request': current_time
-            }
-            return True
-        
-        client_data = self.requests[client_id]
-        if current_time - client_data['first_request'] >= self.window_seconds:
-            # Reset window
-            self.requests[client_id] = {
-                'count': 1,
-                'first_request': current_time
-            }
-            return True
-        
-        if client_data['count'] >= self.max_requests:
-            return False
-        
-        client_data['count'] += 1
-        return True
+        return self.check(client_id).allowed
+
+
+def create_rate_limit_store():
+    """Rate limit store from GITROT_RATE_LIMIT_STORE: "memory" (per process) or "redis" (shared)"""
+    store_name = os.getenv("GITROT_RATE_LIMIT_STORE", "memory").lower()
+    if store_name == "redis":
+        try:
+            return RedisRateLimitStore(os.getenv("GITROT_RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0"))
+        except ImportError:
+            logger.warning("GITROT_RATE_LIMIT_STORE=redis needs the redis package, using in-memory rate limits")
+    return MemoryRateLimitStore()
+
 
 # Global rate limiter instance
-rate_limiter = RateLimiter(max_requests=50, window_minutes=60)
+rate_limiter = RateLimiter(
+    max_requests=int(os.getenv("GITROT_RATE_LIMIT_MAX_REQUESTS", "50")),
+    window_minutes=float(os.getenv("GITROT_RATE_LIMIT_WINDOW_MINUTES", "60")),
+    store=create_rate_limit_store()
+)
+
+# Reverse proxies in front of the app that append to X-Forwarded-For (e.g. 1 on Azure App Service).
+# Only their entries are trusted, anything further left could be sent by the client.
+TRUSTED_PROXY_HOPS = int(os.getenv("GITROT_TRUSTED_PROXY_HOPS", "0"))
 
-def check_rate_limit(request: Request) -> bool:
+def get_client_address(request: Request) -> str:
     """
-    Check if request should be rate limited
+    Client IP as seen by the outermost trusted proxy, or the peer address without proxies
+    """
+    if TRUSTED_PROXY_HOPS > 0:
+        forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if forwarded:
+            return forwarded[-min(TRUSTED_PROXY_HOPS, len(forwarded))]
+    return request.client.host if request.client else "unknown"
+
+def check_rate_limit(request: Request, client_key: Optional[str] = None,
+                     user_key: Optional[str] = None) -> RateLimitDecision:
+    """
+    Check if request should be rate limited: always by client (IP) and, for an authenticated
+    user, by user on top, so more accounts from one address don't buy more requests
     Azure best practice: Protect against abuse
     """
-    client_id = request.client.host if request.client else "unknown"
-    return rate_limiter.is_allowed(client_id)
+    decision = rate_limiter.check(client_key or f"ip:{get_client_address(request)}")
+    if decision.allowed and user_key is not None:
+        decision = rate_limiter.check(user_key)
+    return decision
 
 def create_download_filename(repo_url: str) -> str:
     """
@@ -238,3 +450,60 @@ def create_download_filename(repo_url: str) -> str:
     repo_name = sanitize_repo_name(repo_url)
     timestamp = int(time.time())
     return f"README_{repo_name}_{timestamp}.md"
+
+
+# Content codings responses can be sent with, preferred first when the client accepts several
+RESPONSE_ENCODINGS = ("zstd", "gzip")
+# Smaller bodies gain too little from compression to be worth it
+MIN_COMPRESSED_BODY_BYTES = 512
+
+def strong_etag(content_sha256: str, encoding: Optional[str] = None) -> str:
+    """
+    Strong ETag for a representation from its content hash.
+    Each content coding is a different representation, so it gets its own tag
+    """
+    return f'"{content_sha256}-{encoding}"' if encoding else f'"{content_sha256}"'
+
+def etag_matches(if_none_match: Optional[str], content_sha256: str) -> bool:
+    """
+    Whether an If-None-Match header matches the content, in any of its encodings.
+    If-None-Match uses the weak comparison, so W/ tags match too
+    """
+    if not if_none_match:
+        return False
+    tags = {strong_etag(content_sha256)} | {strong_etag(content_sha256, encoding) for encoding in RESPONSE_ENCODINGS}
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") in tags:
+            return True
+    return False
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str] = RESPONSE_ENCODINGS) -> Optional[str]:
+    """The available content coding the client prefers (Accept-Encoding q-values), None for identity"""
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+def encode_body(body: bytes, encoding: Optional[str]) -> bytes:
+    """Compress a response body with a content coding from RESPONSE_ENCODINGS, None leaves it as is"""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
@@ -3,10 +3,31 @@ from helpers import Helper
 from models import ReadmeRequest, CustomCredentials
 from generators import Generators
 from config.model_credential_factory import model_credential_factory
+from config.model_routing import ModelRoutingPolicy, PipelineStage, is_tiered_routing_enabled
+from scheduling.fair_share import Requester, acting_for, current_requester
+from utils import ProgressReporter, ProgressCallback, CancellationToken
+from utils.chunking import CODE_CHUNK_SIZE, CODE_CHUNK_OVERLAP
+from utils.time_budget import TimeBudget
+from utils.stage_metrics import pipeline_metrics
+from utils import tracing
+from typing import Callable, List, Optional, Tuple
+import asyncio
 import os
 
 class ReadmeGeneratorApp:
-    def __init__(self, request: ReadmeRequest):
+    def __init__(self, request: ReadmeRequest, progress_callback: Optional[ProgressCallback] = None,
+                 token_callback: Optional[Callable[[str], None]] = None, requester: Optional[Requester] = None,
+                 cancellation: Optional[CancellationToken] = None, time_budget: Optional[TimeBudget] = None,
+                 trace_parent: Optional[tracing.Span] = None):
+        # LLM calls are queued under this requester's fair share, the caller's by default
+        self.requester = requester if requester is not None else current_requester.get()
+        # Span the generation's spans are recorded under when the request is traced, the caller's by default
+        self.trace_parent = trace_parent if trace_parent is not None else tracing.current_span()
+        # Cancelled by the API when the client goes away: the clone is killed and no more LLM calls go out
+        self.cancellation = cancellation or CancellationToken()
+        # Deadline of the generation, started by the API when the request arrived
+        self.time_budget = time_budget or TimeBudget.for_request(request.time_budget_seconds)
+
         # Initialize brain with custom credentials if provided
         if not request.use_hosted_service and request.custom_credentials:
             self.brain = GitrotBrain(request.model_name, custom_credentials=request.custom_credentials)
@@ -14,23 +35,112 @@ class ReadmeGeneratorApp:
             self.brain = GitrotBrain(request.model_name)
         
         self.helper = Helper()
-        self.generator = Generators(request.model_name)
+        # Commit the README was generated from, known once the repository is cloned
+        self.commit_sha: Optional[str] = None
+        self.progress = ProgressReporter(progress_callback)
         self.llm = self.brain.get_llm()
+        self.routing_policy, self.map_llm = self._route_models(request)
+        self.generator = Generators(request.model_name, routing_policy=self.routing_policy, progress=self.progress,
+                                    on_token=token_callback, cancellation=self.cancellation,
+                                    time_budget=self.time_budget)
         self.embeddings = self.brain.getEmbeddingModel() if request.use_hosted_service else None
 
-    def generate_readme_from_repo_url(self, request: ReadmeRequest):
-        github_url = request.repo_url
-        generator_method = request.generation_method
-        repo_name = request.repo_url.rstrip('/').split('/')[-1]
-        local_path = self.helper.clone_repo(github_url, repo_name)
-        code_text = self.helper.extract_code_from_repo(local_path)
-        summary = self.generator.summarize_code(self.llm, code_text)
+    def _route_models(self, request: ReadmeRequest):
+        """Pick the model for map/re-reduce calls, keeping the requested model for the final README"""
+        routing_policy = ModelRoutingPolicy.for_model(
+            request.model_name,
+            map_model=request.map_model_name,
+            enabled=request.use_tiered_routing and request.use_hosted_service and is_tiered_routing_enabled()
+        )
+        if not routing_policy.is_tiered:
+            return routing_policy, self.llm
+
+        map_llm = self.brain.get_llm_for_model(routing_policy.map_model)
+        if map_llm is None:
+            print(f"⚠️ Fast tier model {routing_policy.map_model} is not configured, using {request.model_name} for all stages")
+            return ModelRoutingPolicy.single_model(request.model_name), self.llm
+        return routing_policy, map_llm
+
+    def get_usage_summary(self) -> dict:
+        """Token usage and estimated cost of the LLM calls made so far, by stage"""
+        return self.generator.usage_tracker.summary()
+
+    def get_degradations(self) -> List[dict]:
+        """Shortcuts taken to finish within the time budget, empty when the full pipeline ran"""
+        return self.time_budget.degradations
+
+    def _code_char_budget(self, concurrent_map: bool) -> int:
+        """Characters of code the map calls that fit the time budget can summarize, at least one chunk"""
+        concurrency = self.generator.MAP_CONCURRENCY if concurrent_map else 1
+        affordable = self.generator.affordable_calls(PipelineStage.MAP, concurrency)
+        return max(affordable, 1) * (CODE_CHUNK_SIZE - CODE_CHUNK_OVERLAP)
+
+    def ingest(self, request: ReadmeRequest, concurrent_map: bool = False) -> Tuple[str, str]:
+        """
+        Clone the repository and extract its code, returns (local_path, code_text).
+        Only the highest priority files the time budget can summarize are read,
+        concurrent_map when the map calls will run MAP_CONCURRENCY at a time.
+        """
+        with tracing.within(self.trace_parent), tracing.span("ingest", repo_url=request.repo_url):
+            repo_name = request.repo_url.rstrip('/').split('/')[-1]
+            self.progress.report("cloning")
+            with pipeline_metrics.timed_stage("clone"):
+                local_path = self.helper.clone_repo(request.repo_url, repo_name, cancellation=self.cancellation)
+            self.progress.report("cloned")
+            self.commit_sha = self.helper.head_commit(local_path)
+            try:
+                with pipeline_metrics.timed_stage("extract"):
+                    code_text = self.helper.extract_code_from_repo(local_path, cancellation=self.cancellation,
+                                                                   max_chars=self._code_char_budget(concurrent_map))
+            except Exception:
+                self.helper.delete_cloned_repo(local_path)
+                raise
+            if self.helper.skipped_file_count:
+                total_files = self.helper.extracted_file_count + self.helper.skipped_file_count
+                print(f"⏱️ Time budget: reading {self.helper.extracted_file_count} of {total_files} files")
+                self.time_budget.degrade("reduced_file_coverage",
+                                         f"read {self.helper.extracted_file_count} of {total_files} files")
+            pipeline_metrics.observe_count("files", self.helper.extracted_file_count)
+            self.progress.report("extracted", files=self.helper.extracted_file_count)
+            return local_path, code_text
+
+    def generate_from_summary(self, request: ReadmeRequest, summary: str) -> str:
         ## For readme without examples.
-        if generator_method == "Standard README":
-            readme_content = self.generator.generate_readme(self.llm, summary)
-        elif generator_method == "README with Examples":
-            readme_content = self.generator.generate_readme_with_examples_vectorstore(self.llm, self.embeddings, summary)
+        if request.generation_method == "Standard README":
+            return self.generator.generate_readme(self.llm, summary)
+        elif request.generation_method == "README with Examples":
+            return self.generator.generate_readme_with_examples_vectorstore(self.llm, self.embeddings, summary)
+        raise ValueError(f"Unknown generation method: {request.generation_method}")
 
+    async def agenerate(self, request: ReadmeRequest, prompts: List[str], prompt_token_counts: List[int]) -> str:
+        """LLM stage of the staged pipeline: map-reduce and the final README on the event loop"""
+        # Cancelling the token also cancels the task, which aborts LLM calls already in flight
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(self._agenerate(request, prompts, prompt_token_counts))
+        unregister = self.cancellation.on_cancel(lambda: loop.call_soon_threadsafe(task.cancel))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if not self.cancellation.is_cancelled:
+                raise
+            self.cancellation.raise_if_cancelled()
+        finally:
+            unregister()
+
+    async def _agenerate(self, request: ReadmeRequest, prompts: List[str], prompt_token_counts: List[int]) -> str:
+        with acting_for(self.requester), tracing.within(self.trace_parent):
+            with tracing.span("summarize", chunks=len(prompts)):
+                summary = await self.generator.asummarize_prepared(self.map_llm, prompts, prompt_token_counts)
+            with tracing.span("generate", method=request.generation_method):
+                if request.generation_method == "README with Examples":
+                    # Example retrieval is sync (FAISS + embeddings), keep it off the event loop
+                    return await asyncio.to_thread(self.generate_from_summary, request, summary)
+                if request.generation_method != "Standard README":
+                    raise ValueError(f"Unknown generation method: {request.generation_method}")
+                return await self.generator.agenerate_readme(self.llm, summary)
+
+    def finish(self, local_path: str, readme_content: str) -> str:
+        """Write the README next to the clone, log usage and clean up"""
         with open(os.path.join(local_path, "GENERATED_README.md"), "w", encoding="utf-8") as f:
             f.write(readme_content)
 
@@ -38,12 +148,36 @@ class ReadmeGeneratorApp:
         print("🔍 Preview:")
         print("-" * 60)
         print(readme_content[:1000])  # Show first 1000 characters
+
+        self.generator.log_usage_summary()
         
+        with tracing.within(self.trace_parent):
+            self.cleanup(local_path)
+
+        self.progress.report("completed")
+        return readme_content
+
+    def cleanup(self, local_path: str):
         # Cleanup: Delete the cloned repository folder
-        cleanup_success = self.helper.delete_cloned_repo(local_path)
+        with pipeline_metrics.timed_stage("cleanup"):
+            cleanup_success = self.helper.delete_cloned_repo(local_path)
         if cleanup_success:
             print("🧹 Cleanup completed successfully")
         else:
             print("⚠️ Warning: Could not clean up temporary files")
-        
-        return readme_content
\ No newline at end of file
+
+    def generate_readme_from_repo_url(self, request: ReadmeRequest):
+        # A profile, when the trace asked for one, covers the whole generation in this thread
+        with tracing.within(self.trace_parent), tracing.profiled():
+            local_path, code_text = self.ingest(request)
+            try:
+                with acting_for(self.requester):
+                    with tracing.span("summarize"):
+                        summary = self.generator.summarize_code(self.map_llm, code_text)
+                    with tracing.span("generate", method=request.generation_method):
+                        readme_content = self.generate_from_summary(request, summary)
+            except Exception:
+                # Cancelled or failed, the workspace is removed either way
+                self.cleanup(local_path)
+                raise
+            return self.finish(local_path, readme_content)
@@ -0,0 +1 @@
+"""Benchmarks package - offline performance harnesses (stub LLMs and synthetic repositories)"""
@@ -0,0 +1,142 @@
+"""
+Event loop latency under concurrent logins, sync Session against AsyncSession, offline.
+
+Both modes run the same register-or-login workload (new users, returning users with a
+changed profile) against a fresh SQLite file while a probe coroutine measures how late
+the event loop wakes it up. "sync" is the old endpoint: UserService calls on a sync
+Session inside the handler. "async" is the aiosqlite AsyncSession path. Reports logins
+per second and event loop lag percentiles.
+
+Usage (from backend/):
+    python -m benchmarks.bench_auth_event_loop [--logins 400] [--concurrency 32] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_staged_pipeline import percentile
+from database.config import Base
+from models.user_model import UserAuthRequest
+from services.user_service import UserService
+
+PROBE_INTERVAL_SECONDS = 0.005
+
+
+def build_logins(count: int) -> List[List[UserAuthRequest]]:
+    """
+    Registrations, then a second login per user with a new name so the profile is written again.
+    Two phases, so the second login of a user always finds the registered account.
+    """
+    users = max(count // 2, 1)
+    first = [UserAuthRequest(email=f"user{index}@example.com", name=f"User {index}", provider_id=f"id-{index}")
+             for index in range(users)]
+    returning = [login.model_copy(update={"name": f"{login.name} (renamed)"}) for login in first]
+    return [first, returning[:count - users]]
+
+
+async def probe_event_loop(stop: asyncio.Event, lags: List[float]):
+    """How much later than requested the loop resumes a sleeping coroutine"""
+    while not stop.is_set():
+        start_time = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+        lags.append(time.perf_counter() - start_time - PROBE_INTERVAL_SECONDS)
+
+
+async def run_logins(login: Callable, phases: List[List[UserAuthRequest]], concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    lags: List[float] = []
+
+    async def limited(auth_data: UserAuthRequest):
+        async with semaphore:
+            await login(auth_data)
+
+    probe = asyncio.ensure_future(probe_event_loop(stop, lags))
+    await asyncio.sleep(PROBE_INTERVAL_SECONDS * 2)
+    start_time = time.perf_counter()
+    for logins in phases:
+        await asyncio.gather(*[limited(auth_data) for auth_data in logins])
+    wall_seconds = time.perf_counter() - start_time
+    stop.set()
+    await probe
+
+    total = sum(len(logins) for logins in phases)
+    return {
+        "logins": total,
+        "wall_seconds": round(wall_seconds, 3),
+        "logins_per_second": round(total / wall_seconds, 1),
+        "loop_lag_p50_ms": round(percentile(lags, 0.5) * 1000, 2),
+        "loop_lag_p99_ms": round(percentile(lags, 0.99) * 1000, 2),
+        "loop_lag_max_ms": round(max(lags) * 1000, 2),
+    }
+
+
+async def run_sync_mode(database_path: str, phases: List[List[UserAuthRequest]], concurrency: int) -> dict:
+    engine = create_engine(f"sqlite:///{database_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    async def login(auth_data: UserAuthRequest):
+        # The handler is async but every query blocks the loop until the database answers
+        with Session() as db:
+            UserService.register_or_login(db, auth_data)
+
+    try:
+        return await run_logins(login, phases, concurrency)
+    finally:
+        engine.dispose()
+
+
+async def run_async_mode(database_path: str, phases: List[List[UserAuthRequest]], concurrency: int) -> dict:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    Session = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def login(auth_data: UserAuthRequest):
+        async with Session() as db:
+            await UserService.aregister_or_login(db, auth_data)
+
+    try:
+        return await run_logins(login, phases, concurrency)
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=400, help="register-or-login calls per mode")
+    parser.add_argument("--concurrency", type=int, default=32, help="logins in flight at once")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    # UserService logs every created user
+    logging.getLogger("services.user_service").setLevel(logging.WARNING)
+    phases = build_logins(args.logins)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="gitrot-bench-") as workdir:
+        for mode, run_mode in (("sync", run_sync_mode), ("async", run_async_mode)):
+            database_path = os.path.join(workdir, f"{mode}.db")
+            results[mode] = asyncio.run(run_mode(database_path, phases, args.concurrency))
+
+    for mode, result in results.items():
+        print(f"{mode:>6}: {result['logins_per_second']:7.1f} logins/s, event loop lag "
+              f"p50 {result['loop_lag_p50_ms']:.2f}ms, p99 {result['loop_lag_p99_ms']:.2f}ms, "
+              f"max {result['loop_lag_max_ms']:.2f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Microbenchmarks of the CPU hot paths of a generation on large repositories, offline.
+
+    extract             Helper.extract_code_from_repo over a synthetic repository (warm page cache)
+    split               the map step's splitter (utils.chunking.make_code_splitter) on the extracted code
+    count_token         TokenCalculator.count_token on joined chunk summaries, as the reduce step counts them
+    count_tokens_batch  TokenCalculator.count_tokens_batch on the chunks, as prepare_map_prompts counts them
+
+Corpora are generated from fixed seeds, so every run measures the same input at every size.
+For each path and size: throughput in MB/s (median of the repeats), peak and retained Python
+allocations under tracemalloc (in a separate pass, tracing slows the code down; tiktoken's
+native allocations are not seen), and how time scales with input size (the exponent of a
+power law fit, 1.0 is linear).
+
+Best times are also expressed in units of a fixed pure-Python calibration workload, run
+before every timed call, so a baseline recorded on one machine stays usable on another and
+a host that slows down for a while slows both alike; best rather than median times, they
+are the least disturbed by a busy machine.
+--check compares those normalized times and the peak allocations against a baseline and
+exits with status 1 when a path got slower, or allocates more, by more than --threshold.
+
+Usage (from backend/):
+    python -m benchmarks.bench_hot_paths [--sizes 0.25,1,4] [--json out.json]
+    python -m benchmarks.bench_hot_paths --check [--baseline benchmarks/baselines/hot_paths.json] [--threshold 0.25]
+    python -m benchmarks.bench_hot_paths --update-baseline
+"""
+import argparse
+import gc
+import hashlib
+import json
+import logging
+import math
+import os
+import platform
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.bench_staged_pipeline import percentile
+from benchmarks.stubs import make_synthetic_repo
+from helpers import Helper
+from utils.chunking import make_code_splitter
+from utils.token_utils import TokenCalculator
+
+MB = 1024 * 1024
+DEFAULT_SIZES = (0.25, 1.0, 4.0)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "hot_paths.json")
+HOT_PATHS = ("extract", "split", "count_token", "count_tokens_batch")
+
+CORPUS_LANGUAGES = {"python": 3, "javascript": 2, "go": 1, "markdown": 1}
+CORPUS_LINES_PER_FILE = 160
+CORPUS_SEED = 50
+# Model whose tokenizer is measured, cl100k_base like most of the configured models
+TOKENIZER_MODEL = "gpt-4"
+
+# Allocation growth below this is noise, whatever the ratio
+ALLOCATION_NOISE_MB = 0.5
+
+
+def calibration_workload() -> Callable:
+    """A fixed pure-Python workload of a few milliseconds (dict counting, sorting and joining strings), the unit of normalized times"""
+    rng = random.Random(0)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(8)) for _ in range(4000)]
+
+    def workload():
+        prefixes: Dict[str, int] = {}
+        for word in words:
+            prefixes[word[:3]] = prefixes.get(word[:3], 0) + 1
+        return len(" ".join(sorted(words))) + len(prefixes)
+
+    return workload
+
+
+@contextmanager
+def working_directory(path: str):
+    """Relative paths in the "File:" headers keep the extracted corpus the same wherever it is built"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def build_repository(size_mb: float) -> Tuple[str, str]:
+    """Synthetic repository of about size_mb under the current directory, returns (path, content digest)"""
+    path = f"corpus-{size_mb:g}mb"
+    # Files are generated in order from the seed, so a sample's average size predicts the rest
+    sample = make_synthetic_repo(f"{path}-sample", files=16, lines_per_file=CORPUS_LINES_PER_FILE,
+                                 seed=CORPUS_SEED, languages=CORPUS_LANGUAGES)
+    average_bytes = repository_files_bytes(sample) / 16
+    files = max(1, round(size_mb * MB / average_bytes))
+    make_synthetic_repo(path, files=files, lines_per_file=CORPUS_LINES_PER_FILE, seed=CORPUS_SEED,
+                        languages=CORPUS_LANGUAGES)
+    return path, repository_digest(path)
+
+
+def repository_files_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def repository_digest(path: str) -> str:
+    """Digest of the files and their contents, independent of the order os.walk lists them in"""
+    digest = hashlib.sha256()
+    files = sorted(os.path.relpath(os.path.join(root, name), path)
+                   for root, _, names in os.walk(path) for name in names)
+    for relative_path in files:
+        digest.update(relative_path.replace(os.sep, "/").encode("utf-8"))
+        with open(os.path.join(path, relative_path), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def build_summaries(size_mb: float) -> str:
+    """Chunk summaries like the map step returns, joined the way the reduce step joins them"""
+    rng = random.Random(CORPUS_SEED)
+    topics = ["request handling", "retries with backoff", "batching", "caching", "configuration loading",
+              "the CLI entry point", "database access", "serialization", "authentication", "logging"]
+    summaries, total = [], 0
+    while total < size_mb * MB:
+        module = f"pkg{rng.randint(0, 7)}/module_{rng.randint(0, 999)}"
+        sentences = [
+            f"The `{module}` module implements {rng.choice(topics)} for the service.",
+            f"`handler_{rng.randint(0, 99)}` takes a request and retries up to {rng.randint(1, 5)} times, "
+            f"reducing the value modulo {rng.randint(1000, 9999)}.",
+            f"It depends on `os` and reads `item_{rng.randint(0, 999)}` with a default of {rng.randint(0, 100)}.",
+            f"Notable: {rng.choice(topics)} is shared with `pkg{rng.randint(0, 7)}`.",
+        ]
+        summary = " ".join(rng.sample(sentences, len(sentences)))
+        summaries.append(summary)
+        total += len(summary) + 2
+    return "\n\n".join(summaries)
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def prepare_cases(size_mb: float, calculator: Optional[TokenCalculator]) -> Dict[str, Tuple[Callable, int, str]]:
+    """Per hot path: the call to measure, its input size in bytes and a digest of the input corpus"""
+    repository, repository_hash = build_repository(size_mb)
+    code_text = Helper().extract_code_from_repo(repository)
+    splitter = make_code_splitter()
+    chunks = splitter.split_text(code_text)
+    summaries = build_summaries(size_mb)
+
+    cases = {
+        "extract": (lambda: Helper().extract_code_from_repo(repository), len(code_text), repository_hash),
+        "split": (lambda: splitter.split_text(code_text), len(code_text), repository_hash),
+    }
+    if calculator is not None:
+        cases["count_token"] = (lambda: calculator.count_token(summaries), len(summaries), text_digest(summaries))
+        cases["count_tokens_batch"] = (lambda: calculator.count_tokens_batch(chunks),
+                                       sum(len(chunk) for chunk in chunks), repository_hash)
+    return cases
+
+
+def timed(call: Callable) -> float:
+    start_time = time.perf_counter()
+    call()
+    return time.perf_counter() - start_time
+
+
+def time_call(call: Callable, reference: Callable, min_repeats: int, min_seconds: float,
+              max_repeats: int = 50) -> Tuple[List[float], List[float]]:
+    """
+    Times of the call and of the reference workload run before each of them: the machine's
+    speed drifts on shared hosts, the reference is measured through the same drift
+    """
+    # Warm up: page cache, the splitter's regexes and the tokenizer's caches
+    call()
+    reference()
+    times: List[float] = []
+    reference_times: List[float] = []
+    start_time = time.perf_counter()
+    while len(times) < min_repeats or (time.perf_counter() - start_time < min_seconds and len(times) < max_repeats):
+        reference_times.append(timed(reference))
+        times.append(timed(call))
+    return times, reference_times
+
+
+def measure_allocations(call: Callable) -> Tuple[int, int]:
+    """(peak, retained) bytes the call allocates through Python's allocator, its result counts as retained"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = call()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak - before, retained - before
+
+
+def scaling_exponent(sizes: List[float], seconds: List[float]) -> Optional[float]:
+    """Slope of log(time) over log(size): 1.0 grows linearly with the input, 2.0 quadratically"""
+    points = [(math.log(size), math.log(value)) for size, value in zip(sizes, seconds) if size > 0 and value > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def run_suite(sizes: List[float], min_repeats: int = 3, min_seconds: float = 0.5,
+              paths: Optional[List[str]] = None) -> dict:
+    """Every hot path at every size"""
+    calculator = TokenCalculator(model_name=TOKENIZER_MODEL)
+    if calculator.tokenizer is None:
+        print(f"⚠️ No tokenizer for {TOKENIZER_MODEL} (BPE files not cached?), skipping token counting")
+        calculator = None
+    reference = calibration_workload()
+    measurements: Dict[str, List[dict]] = {}
+
+    with tempfile.TemporaryDirectory(prefix="gitrot-hot-paths-") as workdir, working_directory(workdir):
+        for size_mb in sorted(sizes):
+            for path, (call, input_bytes, corpus) in prepare_cases(size_mb, calculator).items():
+                if paths and path not in paths:
+                    continue
+                times, reference_times = time_call(call, reference, min_repeats, min_seconds)
+                median = percentile(times, 0.5)
+                peak, retained = measure_allocations(call)
+                measurements.setdefault(path, []).append({
+                    "size_mb": size_mb,
+                    "input_mb": round(input_bytes / MB, 4),
+                    "corpus": corpus,
+                    "repeats": len(times),
+                    "median_seconds": round(median, 6),
+                    "best_seconds": round(min(times), 6),
+                    "mb_per_second": round(input_bytes / MB / median, 2),
+                    "calibration_seconds": round(min(reference_times), 6),
+                    "normalized": round(min(times) / min(reference_times), 4),
+                    "peak_alloc_mb": round(peak / MB, 3),
+                    "retained_mb": round(retained / MB, 3),
+                })
+
+    results = {}
+    for path, entries in measurements.items():
+        exponent = scaling_exponent([entry["input_mb"] for entry in entries],
+                                    [entry["median_seconds"] for entry in entries])
+        results[path] = {"sizes": entries, "scaling_exponent": round(exponent, 3) if exponent is not None else None}
+    return {
+        "benchmark": "hot_paths",
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "machine": platform.machine()},
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> Tuple[List[Tuple[str, float, str]], List[str]]:
+    """
+    (regressions, notes) of current against baseline: normalized time or peak allocations
+    grown by more than threshold at any size measured on the same corpus in both, each
+    regression as (path, size in MB, description)
+    """
+    regressions, notes = [], []
+    for path, result in current["results"].items():
+        previous_result = baseline.get("results", {}).get(path)
+        if previous_result is None:
+            notes.append(f"{path}: not in the baseline")
+            continue
+        previous_sizes = {entry["size_mb"]: entry for entry in previous_result["sizes"]}
+        for entry in result["sizes"]:
+            previous = previous_sizes.get(entry["size_mb"])
+            label = f"{path} @ {entry['size_mb']:g} MB"
+            if previous is None:
+                notes.append(f"{label}: not in the baseline")
+                continue
+            if previous["corpus"] != entry["corpus"]:
+                notes.append(f"{label}: the corpus changed, not compared")
+                continue
+            slowdown = entry["normalized"] / previous["normalized"] - 1
+            line = (f"{label}: {slowdown:+.1%} normalized time "
+                    f"({previous['best_seconds'] * 1000:.2f} → {entry['best_seconds'] * 1000:.2f}ms best)")
+            if slowdown > threshold:
+                regressions.append((path, entry["size_mb"], line))
+            else:
+                notes.append(line)
+            growth_mb = entry["peak_alloc_mb"] - previous["peak_alloc_mb"]
+            if growth_mb > ALLOCATION_NOISE_MB and growth_mb > previous["peak_alloc_mb"] * threshold:
+                regressions.append((path, entry["size_mb"], f"{label}: peak allocations "
+                                    f"{previous['peak_alloc_mb']} → {entry['peak_alloc_mb']} MB"))
+    return regressions, notes
+
+
+def keep_fastest(suite: dict, rerun: dict):
+    """Replace the measurements of suite that rerun measured faster"""
+    for path, result in rerun["results"].items():
+        entries = suite["results"][path]["sizes"]
+        for entry in result["sizes"]:
+            for index, previous in enumerate(entries):
+                if previous["size_mb"] == entry["size_mb"] and entry["normalized"] < previous["normalized"]:
+                    entries[index] = entry
+
+
+def print_results(suite: dict):
+    for path, result in suite["results"].items():
+        exponent = result["scaling_exponent"]
+        print(f"{path} (time ~ size^{exponent if exponent is not None else '?'})")
+        for entry in result["sizes"]:
+            print(f"    {entry['input_mb']:8.3f} MB: {entry['mb_per_second']:8.2f} MB/s, "
+                  f"median {entry['median_seconds'] * 1000:8.2f}ms over {entry['repeats']} runs, "
+                  f"{entry['normalized']:g}x calibration at best, "
+                  f"peak alloc {entry['peak_alloc_mb']:.2f} MB, retained {entry['retained_mb']:.2f} MB")
+
+
+def parse_sizes(value: str) -> List[float]:
+    try:
+        sizes = [float(size) for size in value.split(",") if size.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma separated sizes in MB, got {value!r}")
+    if not sizes or min(sizes) <= 0:
+        raise argparse.ArgumentTypeError("sizes must be positive")
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=parse_sizes, default=list(DEFAULT_SIZES),
+                        help="comma separated corpus sizes in MB")
+    parser.add_argument("--paths", type=lambda value: value.split(","), default=None,
+                        help=f"comma separated hot paths out of {', '.join(HOT_PATHS)}, all by default")
+    parser.add_argument("--min-repeats", type=int, default=3, help="timed runs per path and size, at least")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="keep repeating until this much time is spent")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file for --check and --update-baseline")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 on regressions against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="tolerated growth of normalized time and peak allocations, 0.25 is 25%%")
+    parser.add_argument("--confirm", type=int, default=2,
+                        help="times a regression is measured again before it fails the check")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    # The extraction logs a line per run
+    logging.disable(logging.INFO)
+    suite = run_suite(args.sizes, args.min_repeats, args.min_seconds, args.paths)
+    print_results(suite)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(suite, f, indent=2)
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(suite, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+    if args.check:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions, notes = compare(baseline, suite, args.threshold)
+        # A slowdown has to show again to count, a busy host easily costs one measurement 25%
+        for _ in range(args.confirm):
+            if not regressions:
+                break
+            for path, size_mb in sorted({(path, size_mb) for path, size_mb, _ in regressions}):
+                print(f"Measuring {path} @ {size_mb:g} MB again")
+                keep_fastest(suite, run_suite([size_mb], args.min_repeats, args.min_seconds, [path]))
+            regressions, notes = compare(baseline, suite, args.threshold)
+        for line in notes:
+            print(f"  {line}")
+        for _, _, line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+HTTP load test of the FastAPI service at rising numbers of concurrent clients, offline.
+
+The app runs under uvicorn in a child process with the stub chat model, synthetic
+repositories cloned from file:// git repositories and a fresh SQLite database. At every
+level of --clients, that many virtual clients, each with its own address, send a mix of
+/generate-readme, /auth/register-or-login and /health requests for --duration seconds
+through an async HTTP client, while a probe on the server's event loop measures how late
+it wakes up. Reports throughput, latency percentiles per endpoint, the rates of errors,
+429s and 503s, and event loop lag for every level.
+
+Server settings (pool sizes, admission queue, rate limits, ...) are passed with
+--env KEY=VALUE, so settings can be compared under the same load.
+
+Usage (from backend/):
+    python -m benchmarks.bench_http_load [--clients 10,100,1000] [--duration 10]
+        [--mix generate=1,auth=3,health=6] [--env GITROT_WORKER_POOL_SIZE=8] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.bench_auth_event_loop import probe_event_loop
+from benchmarks.bench_staged_pipeline import percentile
+from benchmarks.stubs import StubChatModel, init_git_repo, make_synthetic_repo
+from scheduling.fair_share import parse_weights
+
+# Method and path of every endpoint in the traffic mix
+ENDPOINTS = {
+    "generate": ("POST", "/generate-readme"),
+    "auth": ("POST", "/auth/register-or-login"),
+    "health": ("GET", "/health"),
+}
+
+# Server settings the harness needs, --env adds to and overrides them
+SERVER_ENV = {
+    # Sizing a repository asks GitHub with git ls-remote
+    "GITROT_SIZE_ESTIMATE_SOURCE": "none",
+    # Virtual clients are told apart by X-Forwarded-For, as behind the Azure proxy
+    "GITROT_TRUSTED_PROXY_HOPS": "1",
+}
+
+SERVER_START_TIMEOUT_SECONDS = 120
+
+
+def raise_open_file_limit(wanted: int = 65536):
+    """Every client holds a socket on both ends, more than the usual soft limit of 1024 at 1000 clients"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+    if soft != resource.RLIM_INFINITY and soft < target:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+async def run_server(app, connection):
+    """Serve app on a free port until told to stop, answering event loop lag queries meanwhile"""
+    import uvicorn
+
+    loop = asyncio.get_running_loop()
+    # Bound by uvicorn like in production (a socket made here would miss TCP_NODELAY), on a free port,
+    # with a backlog for every client connecting at once
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", access_log=False,
+                                           backlog=4096))
+    lags: List[float] = []
+    stop_probe = asyncio.Event()
+    probe = asyncio.ensure_future(probe_event_loop(stop_probe, lags))
+
+    async def take_lags() -> List[float]:
+        taken = list(lags)
+        lags.clear()
+        return taken
+
+    def control():
+        while True:
+            command = connection.recv()
+            if command == "lag":
+                connection.send(asyncio.run_coroutine_threadsafe(take_lags(), loop).result())
+            elif command == "stop":
+                loop.call_soon_threadsafe(setattr, server, "should_exit", True)
+                return
+
+    async def announce_when_started():
+        while not server.started:
+            await asyncio.sleep(0.01)
+        connection.send(("ready", server.servers[0].sockets[0].getsockname()[1]))
+        threading.Thread(target=control, name="load-test-control", daemon=True).start()
+
+    announcer = asyncio.ensure_future(announce_when_started())
+    try:
+        await server.serve()
+    finally:
+        announcer.cancel()
+        stop_probe.set()
+        await probe
+
+
+def serve(connection, workdir: str, repositories: Dict[str, str], llm_options: dict, limiter_delay: float,
+          verbose: bool):
+    """Child process: the app with the stubs patched in, clones and database under workdir"""
+    os.chdir(workdir)
+    raise_open_file_limit()
+    if not verbose:
+        logging.disable(logging.WARNING)
+        sys.stdout = open(os.devnull, "w", encoding="utf-8")
+
+    from benchmarks.stubs import LocalGitHelper, offline_pipeline
+
+    llm = StubChatModel(**llm_options)
+    with offline_pipeline(llm, repositories, limiter_base_delay=limiter_delay, helper_class=LocalGitHelper):
+        import fastapi_app
+        asyncio.run(run_server(fastapi_app.app, connection))
+
+
+class ServerProcess:
+    """The app under load in a child process, so the load generator doesn't share its GIL"""
+
+    def __init__(self, workdir: str, repositories: Dict[str, str], llm_options: dict, limiter_delay: float,
+                 env: Dict[str, str], verbose: bool = False):
+        context = multiprocessing.get_context("spawn")
+        self._connection, child_connection = context.Pipe()
+        self._process = context.Process(
+            target=serve, name="gitrot-load-test-server", daemon=True,
+            args=(child_connection, workdir, repositories, llm_options, limiter_delay, verbose),
+        )
+        self.env = env
+        self.base_url: Optional[str] = None
+
+    def start(self) -> str:
+        # Settings are read as the app's modules are imported, and the child imports some of them
+        # before it runs anything, so they go into the environment it is spawned with
+        previous = {key: os.environ.get(key) for key in self.env}
+        os.environ.update(self.env)
+        try:
+            self._process.start()
+        finally:
+            for key, value in previous.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+        port = None
+        while port is None and self._process.is_alive() and time.monotonic() < deadline:
+            if self._connection.poll(0.1):
+                try:
+                    _, port = self._connection.recv()
+                except EOFError:
+                    break
+        if port is None:
+            self._process.kill()
+            raise RuntimeError("The app didn't start, rerun with --verbose to see its log")
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    def event_loop_lags(self) -> List[float]:
+        """Lags measured since the last call"""
+        self._connection.send("lag")
+        return self._connection.recv()
+
+    def stop(self):
+        if self._process.is_alive():
+            self._connection.send("stop")
+            self._process.join(timeout=60)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+
+
+def build_repositories(workdir: str, count: int, files: int) -> Dict[str, str]:
+    return {
+        f"https://github.com/loadtest/repo-{index}": init_git_repo(make_synthetic_repo(
+            os.path.join(workdir, "repositories", f"repo-{index}"), files=files, seed=index,
+            languages={"python": 3, "javascript": 1, "markdown": 1}
+        ))
+        for index in range(count)
+    }
+
+
+def request_for(endpoint: str, client_index: int, rng: random.Random, repo_urls: List[str], model: str) -> Optional[dict]:
+    """JSON body of the endpoint's request, logins are new users first and returning ones after"""
+    if endpoint == "generate":
+        return {"repo_url": rng.choice(repo_urls), "model_name": model}
+    if endpoint == "auth":
+        return {"email": f"load{client_index}@example.com", "name": f"Load client {client_index}",
+                "provider_id": f"load-{client_index}"}
+    return None
+
+
+async def drive_level(base_url: str, clients: int, first_client: int, args, repo_urls: List[str]) -> Tuple[list, float]:
+    """clients virtual clients sending requests back to back for args.duration, returns samples and wall time"""
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    samples: List[Tuple[str, object, float]] = []
+    # Built once, every client would load the CA bundle again otherwise (unused over http://)
+    ssl_context = ssl.create_default_context()
+
+    async def virtual_client(index: int):
+        rng = random.Random(args.seed * 1_000_003 + index)
+        headers = {"X-Forwarded-For": f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"}
+        # A connection of its own, like a browser. One pool for all clients would be the bottleneck,
+        # httpcore scans every connection of a pool for each request
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, verify=ssl_context,
+                                     limits=httpx.Limits(max_connections=1)) as client:
+            while time.perf_counter() < deadline:
+                endpoint = rng.choices(names, weights)[0]
+                method, path = ENDPOINTS[endpoint]
+                body = request_for(endpoint, index, rng, repo_urls, args.model)
+                start_time = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body, headers=headers)
+                    status = response.status_code
+                except httpx.TimeoutException:
+                    status = "timeout"
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                samples.append((endpoint, status, time.perf_counter() - start_time))
+                if args.think_time:
+                    await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+    start_time = time.perf_counter()
+    deadline = start_time + args.duration
+    # Requests started before the deadline are waited for
+    await asyncio.gather(*[virtual_client(first_client + index) for index in range(clients)])
+    return samples, time.perf_counter() - start_time
+
+
+def status_class(status) -> str:
+    if status in (429, 503):
+        return str(status)
+    if isinstance(status, int) and status < 400:
+        return "ok"
+    return "error"
+
+
+def summarize_level(clients: int, samples: list, wall_seconds: float, lags: List[float]) -> dict:
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        latencies = [latency for name, _, latency in samples if name == endpoint]
+        if not latencies:
+            continue
+        statuses = Counter(str(status) for name, status, _ in samples if name == endpoint)
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+            "latency_p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "statuses": dict(statuses.most_common()),
+        }
+    classes = Counter(status_class(status) for _, status, _ in samples)
+    total = max(len(samples), 1)
+    return {
+        "clients": clients,
+        "requests": len(samples),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_second": round(len(samples) / wall_seconds, 1),
+        "ok_per_second": round(classes["ok"] / wall_seconds, 1),
+        "error_rate": round(classes["error"] / total, 4),
+        "rate_429": round(classes["429"] / total, 4),
+        "rate_503": round(classes["503"] / total, 4),
+        "loop_lag_p50_ms": round(percentile(lags, 0.5) * 1000, 2) if lags else None,
+        "loop_lag_p99_ms": round(percentile(lags, 0.99) * 1000, 2) if lags else None,
+        "loop_lag_max_ms": round(max(lags) * 1000, 2) if lags else None,
+        "endpoints": endpoints,
+    }
+
+
+def run_load_test(args) -> List[dict]:
+    raise_open_file_limit()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="gitrot-load-") as workdir:
+        repositories = build_repositories(workdir, args.repos, args.repo_files)
+        env = {**SERVER_ENV, "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'load.db')}", **args.env}
+        llm_options = {"mean_latency": args.llm_latency, "latency_jitter": args.llm_latency / 2,
+                       "latency_distribution": "lognormal", "rate_limit_probability": args.rate_limit_rate,
+                       "seed": args.seed}
+        server = ServerProcess(workdir, repositories, llm_options, args.limiter_delay, env, verbose=args.verbose)
+        base_url = server.start()
+        try:
+            first_client = 0
+            for clients in args.clients:
+                server.event_loop_lags()
+                samples, wall_seconds = asyncio.run(drive_level(base_url, clients, first_client, args,
+                                                                list(repositories)))
+                results.append(summarize_level(clients, samples, wall_seconds, server.event_loop_lags()))
+                # New addresses and users per level, so rate limits and logins start over
+                first_client += clients
+        finally:
+            server.stop()
+    return results
+
+
+def parse_clients(value: str) -> List[int]:
+    try:
+        levels = [int(level) for level in value.split(",") if level.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma separated client counts, got {value!r}")
+    if not levels or min(levels) < 1:
+        raise argparse.ArgumentTypeError("client counts must be at least 1")
+    return levels
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = parse_weights(value)
+    unknown = set(mix) - set(ENDPOINTS)
+    if unknown or not mix:
+        raise argparse.ArgumentTypeError(f"expected endpoint=weight pairs out of {', '.join(ENDPOINTS)}")
+    return mix
+
+
+def parse_env(values: List[str]) -> Dict[str, str]:
+    env = {}
+    for value in values:
+        key, separator, setting = value.partition("=")
+        if not separator or not key:
+            raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {value!r}")
+        env[key] = setting
+    return env
+
+
+def print_result(result: dict):
+    lag = (f"loop lag p50 {result['loop_lag_p50_ms']}ms, p99 {result['loop_lag_p99_ms']}ms, "
+           f"max {result['loop_lag_max_ms']}ms")
+    print(f"{result['clients']:>5} clients: {result['throughput_per_second']:7.1f} req/s "
+          f"({result['ok_per_second']:.1f} ok/s), errors {result['error_rate']:.1%}, "
+          f"429 {result['rate_429']:.1%}, 503 {result['rate_503']:.1%}, {lag}")
+    for endpoint, numbers in result["endpoints"].items():
+        print(f"{'':>15}{endpoint:<9}{numbers['requests']:>7} requests, p50 {numbers['latency_p50_ms']:.1f}ms, "
+              f"p95 {numbers['latency_p95_ms']:.1f}ms, p99 {numbers['latency_p99_ms']:.1f}ms, {numbers['statuses']}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=parse_clients, default=[10, 100, 1000],
+                        help="comma separated numbers of concurrent clients, one level each")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of traffic per level")
+    parser.add_argument("--mix", type=parse_mix, default={"generate": 1, "auth": 3, "health": 6},
+                        help=f"endpoint=weight share of requests out of {', '.join(ENDPOINTS)}")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="mean pause of a client between its requests in seconds, 0 sends back to back")
+    parser.add_argument("--timeout", type=float, default=120, help="client timeout per request in seconds")
+    parser.add_argument("--repos", type=int, default=8, help="synthetic repositories to generate READMEs for")
+    parser.add_argument("--repo-files", type=int, default=6, help="files per synthetic repository")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="mean stub LLM latency in seconds")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="fraction of stub LLM calls answered with a 429")
+    parser.add_argument("--limiter-delay", type=float, default=0.01, help="rate limiter spacing between LLM calls")
+    parser.add_argument("--model", default="gpt-4", help="model name used for token counting")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="server setting, e.g. GITROT_WORKER_POOL_SIZE=8, repeatable")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the traffic and the stub model")
+    parser.add_argument("--verbose", action="store_true", help="show the server's log")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+    try:
+        args.env = parse_env(args.env)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    return args
+
+
+def main():
+    args = parse_args()
+    # Every request the load generator sends is logged at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = run_load_test(args)
+    for result in results:
+        print_result(result)
+
+    if args.json:
+        config = {key: value for key, value in vars(args).items() if key not in ("json", "verbose")}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "http_load", "config": config, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+End-to-end cost of README generation by repository size, offline.
+
+Synthetic repositories of each size, in a configurable language mix, are committed as
+local git repositories and run through ReadmeGeneratorApp against a stub chat model with
+a configurable latency distribution, completion length and rate of injected 429s: the
+real clone, extract, chunking, map-reduce, final call and cleanup run, only the provider
+is simulated. Reports wall time, LLM calls, tokens, peak RSS and the seconds spent per
+pipeline stage for every size.
+
+--json stores the results for regression comparison, --compare prints the change of
+every size's headline numbers against such a file.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pipeline [--sizes small,medium,large] [--languages python=3,javascript=1,markdown=1]
+        [--runs 3] [--llm-latency 0.05] [--latency-distribution lognormal] [--rate-limit-rate 0.05]
+        [--json out.json] [--compare baseline.json]
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.bench_staged_pipeline import percentile
+from benchmarks.stubs import (
+    SYNTHETIC_LANGUAGES, LocalGitHelper, StubChatModel, init_git_repo, make_synthetic_repo, offline_pipeline
+)
+from models.request_models import ReadmeRequest
+from utils.stage_metrics import pipeline_metrics
+from utils.time_budget import MAX_TIME_BUDGET_SECONDS, call_latency
+
+# Files and lines per file of each repository size
+REPO_SIZES = {
+    "small": (8, 80),
+    "medium": (60, 120),
+    "large": (250, 160),
+}
+
+# Headline numbers printed by --compare, lower is better for all of them
+COMPARED_METRICS = ("wall_seconds", "latency_p50", "llm_calls", "total_tokens", "peak_rss_mb")
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process right now, from /proc on Linux, None elsewhere"""
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+
+def lifetime_peak_rss_bytes() -> Optional[int]:
+    """Highest resident set size the process has had, None where resource is unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRssSampler:
+    """
+    Samples the process' RSS in a background thread while the block runs, so each size
+    gets its own peak. Without /proc it falls back to the lifetime peak of the process.
+    """
+
+    def __init__(self, interval_seconds: float = 0.02):
+        self.interval_seconds = interval_seconds
+        self.start_bytes: Optional[int] = None
+        self.peak_bytes: Optional[int] = None
+        self.source = "sampled"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.peak_bytes = max(self.peak_bytes or 0, current_rss_bytes() or 0)
+
+    def __enter__(self) -> "PeakRssSampler":
+        self.start_bytes = current_rss_bytes()
+        if self.start_bytes is None:
+            self.source = "lifetime_peak"
+            self.start_bytes = lifetime_peak_rss_bytes()
+        else:
+            self.peak_bytes = self.start_bytes
+            self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak_bytes = max(self.peak_bytes or 0, current_rss_bytes() or 0)
+        else:
+            self.peak_bytes = lifetime_peak_rss_bytes()
+
+
+def to_mb(value: Optional[int]) -> Optional[float]:
+    return round(value / (1024 * 1024), 1) if value is not None else None
+
+
+def parse_languages(value: str) -> Dict[str, float]:
+    """"python=3,javascript=1" to weights per language, a bare name weighs 1"""
+    languages = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in SYNTHETIC_LANGUAGES:
+            raise argparse.ArgumentTypeError(
+                f"unknown language {name!r}, choose from {', '.join(SYNTHETIC_LANGUAGES)}"
+            )
+        languages[name] = float(weight) if weight else 1.0
+    return languages
+
+
+def parse_sizes(value: str) -> List[str]:
+    sizes = [size.strip() for size in value.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in REPO_SIZES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown size {unknown[0]!r}, choose from {', '.join(REPO_SIZES)}")
+    return sizes
+
+
+def repository_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, dirs, names in os.walk(path) if ".git" not in root.split(os.sep) for name in names
+    )
+
+
+def stage_breakdown(before: Dict[str, Tuple[int, float]], after: Dict[str, Tuple[int, float]]) -> dict:
+    """Observations and seconds per pipeline stage between two snapshots of the stage histograms"""
+    breakdown = {}
+    for stage, (count, total) in after.items():
+        previous_count, previous_total = before.get(stage, (0, 0.0))
+        if count > previous_count:
+            seconds = total - previous_total
+            breakdown[stage] = {
+                "count": count - previous_count,
+                "seconds": round(seconds, 4),
+                "mean_seconds": round(seconds / (count - previous_count), 4),
+            }
+    return breakdown
+
+
+def run_generations(requests: List[ReadmeRequest], concurrency: int) -> List[dict]:
+    from app import ReadmeGeneratorApp
+
+    def generate(request: ReadmeRequest) -> dict:
+        start_time = time.perf_counter()
+        app = ReadmeGeneratorApp(request)
+        app.generate_readme_from_repo_url(request)
+        return {
+            "seconds": time.perf_counter() - start_time,
+            "usage": app.get_usage_summary(),
+            "degraded": bool(app.get_degradations()),
+        }
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(generate, requests))
+
+
+def benchmark_size(size: str, workdir: str, args) -> dict:
+    files, lines_per_file = REPO_SIZES[size]
+    repositories = {}
+    for index in range(args.runs):
+        path = make_synthetic_repo(os.path.join(workdir, f"{size}-{index}"), files=files,
+                                   lines_per_file=lines_per_file, seed=args.seed + index, languages=args.languages)
+        repositories[f"https://github.com/bench/{size}-{index}"] = init_git_repo(path)
+    requests = [ReadmeRequest(repo_url=url, model_name=args.model, time_budget_seconds=args.time_budget)
+                for url in repositories]
+
+    llm = StubChatModel(mean_latency=args.llm_latency, latency_jitter=args.llm_latency * args.latency_cv,
+                        rate_limit_probability=args.rate_limit_rate, completion_words=args.output_words,
+                        seed=args.seed, latency_distribution=args.latency_distribution)
+    stages_before = pipeline_metrics.stage_seconds.totals()
+    with offline_pipeline(llm, repositories, limiter_base_delay=args.limiter_delay, helper_class=LocalGitHelper), \
+         contextlib.redirect_stdout(io.StringIO()), PeakRssSampler() as rss:
+        start_time = time.perf_counter()
+        runs = run_generations(requests, args.concurrency)
+        wall_seconds = time.perf_counter() - start_time
+
+    latencies = [run["seconds"] for run in runs]
+    usage = [run["usage"] for run in runs]
+    llm_stats = llm.stats()
+    return {
+        "size": size,
+        "files": files,
+        "repo_bytes": repository_bytes(next(iter(repositories.values()))),
+        "runs": len(runs),
+        "wall_seconds": round(wall_seconds, 3),
+        "latency_p50": round(percentile(latencies, 0.5), 3),
+        "latency_p95": round(percentile(latencies, 0.95), 3),
+        "latency_mean": round(statistics.mean(latencies), 3),
+        # Pipeline calls, and provider requests including the ones answered with a 429
+        "llm_calls": sum(item["llm_calls"] for item in usage),
+        "provider_requests": llm_stats["calls"],
+        "rate_limited_calls": llm_stats["rate_limited_calls"],
+        "prompt_tokens": sum(item["prompt_tokens"] for item in usage),
+        "completion_tokens": sum(item["completion_tokens"] for item in usage),
+        "total_tokens": sum(item["total_tokens"] for item in usage),
+        "degraded_runs": sum(run["degraded"] for run in runs),
+        "start_rss_mb": to_mb(rss.start_bytes),
+        "peak_rss_mb": to_mb(rss.peak_bytes),
+        "rss_source": rss.source,
+        "stages": stage_breakdown(stages_before, pipeline_metrics.stage_seconds.totals()),
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "commit": commit}
+
+
+def print_result(result: dict):
+    print(f"{result['size']:>8}: {result['files']} files, {result['repo_bytes'] / 1024:.0f} KiB, "
+          f"{result['runs']} runs in {result['wall_seconds']:.2f}s "
+          f"(p50 {result['latency_p50']:.2f}s, p95 {result['latency_p95']:.2f}s), "
+          f"{result['llm_calls']} LLM calls ({result['rate_limited_calls']} 429s), "
+          f"{result['total_tokens']} tokens, peak RSS {result['peak_rss_mb']} MB")
+    for stage, numbers in result["stages"].items():
+        print(f"{'':>10}{stage:<14}{numbers['count']:>6} x {numbers['mean_seconds']:.4f}s = {numbers['seconds']:.3f}s")
+
+
+def print_comparison(baseline: dict, config: dict, results: List[dict]):
+    baseline_results = {result["size"]: result for result in baseline.get("results", [])}
+    # Through JSON, as the baseline's configuration was
+    if baseline.get("config") != json.loads(json.dumps(config)):
+        print("⚠️ The baseline was run with a different configuration, differences may not be regressions")
+    print(f"Against {baseline.get('environment', {}).get('commit') or 'baseline'}:")
+    for result in results:
+        previous = baseline_results.get(result["size"])
+        if previous is None:
+            continue
+        changes = []
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            changes.append(f"{metric} {before} → {after} ({(after - before) / before * 100:+.1f}%)")
+        print(f"{result['size']:>8}: " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=parse_sizes, default=list(REPO_SIZES),
+                        help=f"comma separated repository sizes out of {', '.join(REPO_SIZES)}")
+    parser.add_argument("--languages", type=parse_languages, default={"python": 3, "javascript": 1, "markdown": 1},
+                        help=f"language=weight mix of files out of {', '.join(SYNTHETIC_LANGUAGES)}")
+    parser.add_argument("--runs", type=int, default=3, help="generations per size, each on its own repository")
+    parser.add_argument("--concurrency", type=int, default=1, help="generations running at once")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="mean stub LLM latency in seconds")
+    parser.add_argument("--latency-distribution", choices=StubChatModel.LATENCY_DISTRIBUTIONS, default="lognormal",
+                        help="distribution of stub LLM latencies")
+    parser.add_argument("--latency-cv", type=float, default=0.5,
+                        help="standard deviation of the latency as a fraction of the mean")
+    parser.add_argument("--output-words", type=int, default=120, help="words per stub completion")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of calls answered with a 429")
+    parser.add_argument("--limiter-delay", type=float, default=0.01, help="rate limiter spacing between calls")
+    parser.add_argument("--time-budget", type=float, default=MAX_TIME_BUDGET_SECONDS,
+                        help="time budget of each generation in seconds")
+    parser.add_argument("--model", default="gpt-4", help="model name used for token counting")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the repositories and the stub model")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="print the change against results written earlier with --json")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's log, e.g. every injected 429")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    # Plan the time budget with the stub's latency, as a warm server would with the provider's
+    for stage in ("map", "re_reduce", "final"):
+        call_latency.observe(stage, args.llm_latency)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="gitrot-bench-") as workdir:
+        for size in args.sizes:
+            result = benchmark_size(size, workdir, args)
+            results.append(result)
+            print_result(result)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("json", "compare", "verbose")}
+    output = {"benchmark": "pipeline", "config": config, "environment": environment(), "results": results}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print_comparison(baseline, config, results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Concurrent SQLite access: the old single shared connection against WAL with a connection pool, offline.
+
+Worker threads run read/write mixes on a users table in a fresh SQLite file: reads load a
+user by id, writes rename one (UserService.update_user). "static_pool" is the previous
+configuration, one connection shared by all threads with the default rollback journal;
+sessions take turns on a lock there, unsynchronized threads on the shared connection
+crash the interpreter. "wal_pool" is database.config.create_database_engine. Reports
+operations per second, per-operation latency percentiles and failed operations.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sqlite_pool [--threads 8] [--ops 300] [--json out.json]
+"""
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.bench_staged_pipeline import percentile
+from database.config import Base, create_database_engine
+from models.user_model import UserCreate, UserUpdate
+from services.user_service import UserService
+
+# Share of writes per mix
+MIXES = {"read_heavy": 0.1, "balanced": 0.5, "write_heavy": 0.9}
+
+
+def static_pool_engine(url: str) -> Engine:
+    return create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+def serialized_sessions(Session, serialize: bool):
+    """Session factory, one session at a time process-wide when serialize"""
+    if not serialize:
+        return Session
+    lock = threading.Lock()
+
+    @contextmanager
+    def session():
+        with lock, Session() as db:
+            yield db
+    return session
+
+
+def seed_users(Session, count: int) -> List[str]:
+    with Session() as db:
+        return [UserService.create_user(db, UserCreate(email=f"user{index}@example.com", name=f"User {index}",
+                                                        provider_id=f"id-{index}")).id
+                for index in range(count)]
+
+
+def run_mix(Session, user_ids: List[str], write_share: float, threads: int, ops_per_thread: int) -> dict:
+    def worker(seed: int):
+        rng = random.Random(seed)
+        latencies, failures = [], 0
+        for index in range(ops_per_thread):
+            user_id = rng.choice(user_ids)
+            start_time = time.perf_counter()
+            try:
+                with Session() as db:
+                    if rng.random() < write_share:
+                        UserService.update_user(db, user_id, UserUpdate(name=f"User {seed}-{index}"))
+                    else:
+                        UserService.get_user_by_id(db, user_id)
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - start_time)
+        return latencies, failures
+
+    start_time = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(worker, range(threads)))
+    wall_seconds = time.perf_counter() - start_time
+
+    latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+    return {
+        "operations": len(latencies),
+        "failed": sum(failures for _, failures in results),
+        "ops_per_second": round(len(latencies) / wall_seconds, 1),
+        "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def run_mode(make_engine: Callable[[str], Engine], workdir: str, mode: str, args) -> Dict[str, dict]:
+    results = {}
+    for mix, write_share in MIXES.items():
+        engine = make_engine(f"sqlite:///{os.path.join(workdir, f'{mode}-{mix}.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = serialized_sessions(sessionmaker(autocommit=False, autoflush=False, bind=engine),
+                                      serialize=isinstance(engine.pool, StaticPool))
+        try:
+            user_ids = seed_users(Session, args.users)
+            results[mix] = run_mix(Session, user_ids, write_share, args.threads, args.ops)
+        finally:
+            engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent worker threads")
+    parser.add_argument("--ops", type=int, default=300, help="operations per thread and mix")
+    parser.add_argument("--users", type=int, default=200, help="users in the table")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    logging.getLogger("services.user_service").setLevel(logging.WARNING)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="gitrot-bench-") as workdir:
+        for mode, make_engine in (("static_pool", static_pool_engine), ("wal_pool", create_database_engine)):
+            results[mode] = run_mode(make_engine, workdir, mode, args)
+
+    for mode, mixes in results.items():
+        for mix, result in mixes.items():
+            print(f"{mode:>12} {mix:>12}: {result['ops_per_second']:8.1f} ops/s, "
+                  f"p50 {result['latency_p50_ms']:.2f}ms, p99 {result['latency_p99_ms']:.2f}ms, "
+                  f"{result['failed']} failed")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Throughput of the staged pipeline against one-thread-per-request, offline.
+
+A mixed workload of small and large synthetic repositories runs through both modes
+with the same stub LLM latency. Reports wall time, throughput and per-request latency
+percentiles.
+
+Usage (from backend/):
+    python -m benchmarks.bench_staged_pipeline [--small 12] [--large 3] [--llm-latency 0.2] [--json out.json]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks.stubs import StubChatModel, make_synthetic_repo, offline_pipeline
+from models.request_models import ReadmeRequest
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(mode: str, wall_seconds: float, latencies: List[float], llm: StubChatModel) -> dict:
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_minute": round(len(latencies) / wall_seconds * 60, 2),
+        "latency_p50": round(percentile(latencies, 0.5), 3),
+        "latency_p95": round(percentile(latencies, 0.95), 3),
+        "latency_mean": round(statistics.mean(latencies), 3),
+        "llm": llm.stats(),
+    }
+
+
+def build_workload(workdir: str, small: int, large: int) -> Dict[str, str]:
+    repositories = {}
+    for index in range(small):
+        repositories[f"https://github.com/bench/small-{index}"] = make_synthetic_repo(
+            os.path.join(workdir, f"small-{index}"), files=6, seed=index
+        )
+    for index in range(large):
+        repositories[f"https://github.com/bench/large-{index}"] = make_synthetic_repo(
+            os.path.join(workdir, f"large-{index}"), files=90, seed=1000 + index
+        )
+    return repositories
+
+
+def ordered_requests(repositories: Dict[str, str], model_name: str) -> List[ReadmeRequest]:
+    # Large repositories first, the worst case for one-thread-per-request
+    urls = sorted(repositories, key=lambda url: "small" in url)
+    return [ReadmeRequest(repo_url=url, model_name=model_name) for url in urls]
+
+
+def run_thread_per_request(requests: List[ReadmeRequest], workers: int) -> List[float]:
+    from app import ReadmeGeneratorApp
+
+    def generate(request: ReadmeRequest) -> float:
+        start_time = time.perf_counter()
+        ReadmeGeneratorApp(request).generate_readme_from_repo_url(request)
+        return time.perf_counter() - start_time
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(generate, requests))
+
+
+async def run_staged(requests: List[ReadmeRequest], io_workers: int, cpu_workers: int,
+                     llm_concurrency: int, queue_depth: int) -> List[float]:
+    from app import ReadmeGeneratorApp
+    from scheduling import StagedPipeline
+
+    pipeline = StagedPipeline(io_workers=io_workers, cpu_workers=cpu_workers,
+                              llm_concurrency=llm_concurrency, queue_depth=queue_depth)
+    await pipeline.start()
+
+    async def generate(request: ReadmeRequest) -> float:
+        start_time = time.perf_counter()
+        await pipeline.run(request, lambda: ReadmeGeneratorApp(request))
+        return time.perf_counter() - start_time
+
+    try:
+        return list(await asyncio.gather(*[generate(request) for request in requests]))
+    finally:
+        await pipeline.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--small", type=int, default=12, help="number of small repositories")
+    parser.add_argument("--large", type=int, default=3, help="number of large repositories")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="mean stub LLM latency in seconds")
+    parser.add_argument("--limiter-delay", type=float, default=0.01, help="rate limiter spacing between calls")
+    parser.add_argument("--workers", type=int, default=5, help="pool size of the thread-per-request mode")
+    parser.add_argument("--cpu-workers", type=int, default=2, help="prepare stage processes")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="concurrent jobs in the LLM stage")
+    parser.add_argument("--model", default="gpt-4", help="model name used for token counting")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="gitrot-bench-") as workdir:
+        repositories = build_workload(workdir, args.small, args.large)
+        requests = ordered_requests(repositories, args.model)
+
+        for mode in ("thread_per_request", "staged"):
+            llm = StubChatModel(mean_latency=args.llm_latency, latency_jitter=args.llm_latency / 4)
+            with offline_pipeline(llm, repositories, limiter_base_delay=args.limiter_delay), \
+                 contextlib.redirect_stdout(io.StringIO()):
+                start_time = time.perf_counter()
+                if mode == "staged":
+                    latencies = asyncio.run(run_staged(requests, io_workers=4, cpu_workers=args.cpu_workers,
+                                                       llm_concurrency=args.llm_concurrency, queue_depth=4))
+                else:
+                    latencies = run_thread_per_request(requests, args.workers)
+                wall_seconds = time.perf_counter() - start_time
+            results.append(summarize(mode, wall_seconds, latencies, llm))
+
+    for result in results:
+        print(f"{result['mode']:>20}: {result['wall_seconds']:7.2f}s wall, "
+              f"{result['throughput_per_minute']:6.1f} req/min, "
+              f"p50 {result['latency_p50']:.2f}s, p95 {result['latency_p95']:.2f}s, "
+              f"{result['llm']['calls']} LLM calls")
+    speedup = results[0]["wall_seconds"] / results[1]["wall_seconds"]
+    print(f"Staged pipeline speedup: {speedup:.2f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "speedup": round(speedup, 3)}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
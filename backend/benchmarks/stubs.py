@@ -0,0 +1,305 @@
+"""
+Stand-ins for the network-bound parts of the pipeline, so benchmarks run offline:
+a chat model with configurable latency, synthetic repositories and helpers that
+"clone" them with simulated transfer time or with git from a local path.
+"""
+import asyncio
+import math
+import os
+import pathlib
+import random
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Type
+from unittest.mock import patch
+from langchain_core.messages import AIMessage, AIMessageChunk
+from helpers import Helper
+
+
+class StubChatModel:
+    """
+    Chat model with LangChain's invoke/ainvoke/stream/astream surface.
+
+    Latency is drawn from latency_distribution with mean mean_latency: "normal" (standard
+    deviation latency_jitter), "lognormal" (a provider's long tail, latency_jitter is the
+    standard deviation too), "exponential" or "fixed". A fraction of calls can fail with a
+    429 to exercise the rate limiter's backoff.
+    """
+
+    LATENCY_DISTRIBUTIONS = ("normal", "lognormal", "exponential", "fixed")
+
+    def __init__(self,
+                 mean_latency: float = 0.2,
+                 latency_jitter: float = 0.05,
+                 rate_limit_probability: float = 0.0,
+                 completion_words: int = 120,
+                 seed: Optional[int] = 7,
+                 latency_distribution: str = "normal"):
+        if latency_distribution not in self.LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.mean_latency = mean_latency
+        self.latency_jitter = latency_jitter
+        self.latency_distribution = latency_distribution
+        self.rate_limit_probability = rate_limit_probability
+        self.completion_words = completion_words
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def _next_call(self, prompt: str):
+        with self._lock:
+            self.calls += 1
+            latency = self._draw_latency()
+            rate_limited = self._random.random() < self.rate_limit_probability
+            if rate_limited:
+                self.rate_limited_calls += 1
+        return latency, rate_limited
+
+    def _draw_latency(self) -> float:
+        if self.mean_latency <= 0 or self.latency_distribution == "fixed":
+            return max(0.0, self.mean_latency)
+        if self.latency_distribution == "exponential":
+            return self._random.expovariate(1 / self.mean_latency)
+        if self.latency_distribution == "lognormal":
+            # Parameters of the underlying normal that give this mean and standard deviation
+            sigma = math.sqrt(math.log(1 + (self.latency_jitter / self.mean_latency) ** 2))
+            return self._random.lognormvariate(math.log(self.mean_latency) - sigma ** 2 / 2, sigma)
+        return max(0.0, self._random.gauss(self.mean_latency, self.latency_jitter))
+
+    def _response(self, prompt: str) -> AIMessage:
+        content = " ".join(["summary"] * self.completion_words)
+        prompt_tokens = len(str(prompt)) // 4
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += self.completion_words
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": self.completion_words,
+            "total_tokens": prompt_tokens + self.completion_words,
+        })
+
+    def invoke(self, prompt, **kwargs) -> AIMessage:
+        latency, rate_limited = self._next_call(prompt)
+        time.sleep(latency)
+        if rate_limited:
+            raise RuntimeError("Error code: 429 - Too Many Requests")
+        return self._response(prompt)
+
+    async def ainvoke(self, prompt, **kwargs) -> AIMessage:
+        latency, rate_limited = self._next_call(prompt)
+        await asyncio.sleep(latency)
+        if rate_limited:
+            raise RuntimeError("Error code: 429 - Too Many Requests")
+        return self._response(prompt)
+
+    def stream(self, prompt, **kwargs):
+        message = self.invoke(prompt)
+        for word in message.content.split(" "):
+            yield AIMessageChunk(content=word + " ")
+
+    async def astream(self, prompt, **kwargs):
+        message = await self.ainvoke(prompt)
+        for word in message.content.split(" "):
+            yield AIMessageChunk(content=word + " ")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "rate_limited_calls": self.rate_limited_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+
+class StubBrain:
+    """GitrotBrain replacement handing out one shared stub model for every stage."""
+
+    def __init__(self, llm: StubChatModel):
+        self.llm = llm
+
+    def get_llm(self):
+        return self.llm
+
+    def get_llm_for_model(self, model_name: str):
+        return self.llm
+
+    def getEmbeddingModel(self):
+        return None
+
+
+def _python_module(rng: random.Random, file_index: int, functions: int) -> list:
+    lines = [f'"""Module {file_index} of a synthetic benchmark repository."""', "import os", ""]
+    for function_index in range(functions):
+        name = f"handler_{file_index}_{function_index}"
+        lines += [
+            f"def {name}(request, retries={rng.randint(1, 5)}):",
+            f"    \"\"\"Process request {function_index} with {rng.choice(['caching', 'batching', 'retries'])}\"\"\"",
+            f"    value = request.get('item_{rng.randint(0, 999)}', {rng.randint(0, 100)})",
+            "    for attempt in range(retries):",
+            f"        value = (value * {rng.randint(2, 9)}) % {rng.randint(1000, 9999)}",
+            "    return value",
+            "",
+            "",
+        ]
+    return lines
+
+
+def _javascript_module(rng: random.Random, file_index: int, functions: int) -> list:
+    lines = [f"// Module {file_index} of a synthetic benchmark repository.", "'use strict';", ""]
+    for function_index in range(functions):
+        lines += [
+            f"export function handler{file_index}_{function_index}(request, retries = {rng.randint(1, 5)}) {{",
+            f"  let value = request['item_{rng.randint(0, 999)}'] ?? {rng.randint(0, 100)};",
+            "  for (let attempt = 0; attempt < retries; attempt++) {",
+            f"    value = (value * {rng.randint(2, 9)}) % {rng.randint(1000, 9999)};",
+            "  }",
+            "  return value;",
+            "}",
+            "",
+        ]
+    return lines
+
+
+def _go_module(rng: random.Random, file_index: int, functions: int) -> list:
+    lines = [f"// Package pkg{file_index % 8} is part of a synthetic benchmark repository.",
+             f"package pkg{file_index % 8}", ""]
+    for function_index in range(functions):
+        lines += [
+            f"func Handler{file_index}_{function_index}(request map[string]int, retries int) int {{",
+            f"\tvalue := request[\"item_{rng.randint(0, 999)}\"] + {rng.randint(0, 100)}",
+            "\tfor attempt := 0; attempt < retries; attempt++ {",
+            f"\t\tvalue = (value * {rng.randint(2, 9)}) % {rng.randint(1000, 9999)}",
+            "\t}",
+            "\treturn value",
+            "}",
+            "",
+        ]
+    return lines
+
+
+def _markdown_document(rng: random.Random, file_index: int, functions: int) -> list:
+    lines = [f"# Design note {file_index}", ""]
+    for section_index in range(functions):
+        topic = rng.choice(["caching", "batching", "retries", "deployment", "configuration"])
+        lines += [
+            f"## {topic.title()} {section_index}",
+            "",
+            f"Requests for item {rng.randint(0, 999)} are handled with {topic}, up to {rng.randint(1, 5)} attempts.",
+            f"The default limit is {rng.randint(1000, 9999)} and can be changed in the settings file.",
+            "",
+            "",
+            "",
+            "",
+        ]
+    return lines
+
+
+# Languages a synthetic repository can mix: file name pattern and a renderer of ~8 lines per function
+SYNTHETIC_LANGUAGES = {
+    "python": ("module_{index}.py", _python_module),
+    "javascript": ("module_{index}.js", _javascript_module),
+    "go": ("module_{index}.go", _go_module),
+    "markdown": ("NOTES_{index}.md", _markdown_document),
+}
+
+
+def make_synthetic_repo(path: str, files: int, lines_per_file: int = 80, seed: int = 0,
+                        languages: Optional[Dict[str, float]] = None) -> str:
+    """
+    Write a repository of plausible source files, returns path.
+    languages weights the share of files per SYNTHETIC_LANGUAGES entry, Python only by default.
+    """
+    rng = random.Random(seed)
+    languages = languages or {"python": 1.0}
+    unknown = set(languages) - set(SYNTHETIC_LANGUAGES)
+    if unknown:
+        raise ValueError(f"Unknown synthetic languages: {', '.join(sorted(unknown))}")
+    names = sorted(languages)
+    weights = [languages[name] for name in names]
+    os.makedirs(path, exist_ok=True)
+    for file_index in range(files):
+        package = os.path.join(path, f"pkg{file_index % 8}")
+        os.makedirs(package, exist_ok=True)
+        language = names[0] if len(names) == 1 else rng.choices(names, weights)[0]
+        pattern, render = SYNTHETIC_LANGUAGES[language]
+        lines = render(rng, file_index, lines_per_file // 8)
+        with open(os.path.join(package, pattern.format(index=file_index)), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+    return path
+
+
+def init_git_repo(path: str) -> str:
+    """Commit everything under path into a new git repository, returns path"""
+    def git(*args):
+        subprocess.run(["git", "-C", path, *args], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    git("init", "--quiet")
+    git("add", "--all")
+    git("-c", "user.name=gitrot-bench", "-c", "user.email=bench@gitrot.invalid", "-c", "commit.gpgsign=false",
+        "commit", "--quiet", "-m", "Synthetic benchmark repository")
+    return path
+
+
+class StubHelper(Helper):
+    """
+    Helper whose clone_repo copies a prepared synthetic repository instead of cloning,
+    sleeping clone_seconds_per_mb to stand in for the network transfer.
+    """
+
+    repositories: Dict[str, str] = {}
+    clone_seconds_per_mb: float = 0.5
+    clone_base_seconds: float = 0.05
+
+    def clone_repo(self, github_url: str, folder_name: str = "cloned_repo", cancellation=None) -> str:
+        if cancellation is not None:
+            cancellation.raise_if_cancelled()
+        source = self.repositories[github_url]
+        size_mb = sum(
+            os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(source) for name in names
+        ) / (1024 * 1024)
+        time.sleep(self.clone_base_seconds + size_mb * self.clone_seconds_per_mb)
+        os.makedirs("projects", exist_ok=True)
+        target = os.path.join("projects", f"{folder_name}_{time.time_ns()}_{threading.get_ident()}")
+        shutil.copytree(source, target)
+        return target
+
+
+class LocalGitHelper(Helper):
+    """
+    Helper that clones repositories made with init_git_repo from file:// URLs, so the real
+    git clone (packing and transfer included), checkout and cleanup run without the network.
+    """
+
+    repositories: Dict[str, str] = {}
+
+    def clone_repo(self, github_url: str, folder_name: str = "cloned_repo", cancellation=None) -> str:
+        file_url = pathlib.Path(self.repositories[github_url]).resolve().as_uri()
+        return super().clone_repo(file_url, folder_name, cancellation)
+
+
+@contextmanager
+def offline_pipeline(llm: StubChatModel, repositories: Dict[str, str], limiter_base_delay: float = 0.0,
+                     helper_class: Type[Helper] = StubHelper):
+    """
+    Patch ReadmeGeneratorApp to use the stub model and synthetic repositories, fetched by
+    helper_class (StubHelper copies them, LocalGitHelper clones them with git).
+    The shared rate limiter's spacing is set to limiter_base_delay for the duration.
+    """
+    from wrappers.rate_limitter import llm_rate_limiter
+
+    helper_class.repositories = repositories
+    previous = (llm_rate_limiter.base_delay, llm_rate_limiter._current_delay)
+    llm_rate_limiter.base_delay = llm_rate_limiter._current_delay = limiter_base_delay
+    try:
+        with patch("app.GitrotBrain", lambda *args, **kwargs: StubBrain(llm)), \
+             patch("app.Helper", helper_class):
+            yield
+    finally:
+        llm_rate_limiter.base_delay, llm_rate_limiter._current_delay = previous
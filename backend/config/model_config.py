@@ -136,6 +136,17 @@ MODEL_REGISTRY: Dict[ModelType, ModelConfig] = {
     ),
 }
 
+# Embedding models are priced on input tokens only
+EMBEDDING_COST_PER_1K: Dict[str, float] = {
+    "text-embedding-ada-002": 0.0001,
+}
+
+# Cheapest capable model per provider, used for high-volume pipeline stages
+FAST_TIER_MODELS: Dict[ModelProvider, ModelType] = {
+    ModelProvider.AZURE_OPENAI: ModelType.GPT_4O_MINI,
+    ModelProvider.GOOGLE: ModelType.GEMINI_15_FLASH,
+}
+
 def get_model_config(model_name: str) -> Optional[ModelConfig]:
     """Get model configuration by name."""
     for model_type, config in MODEL_REGISTRY.items():
@@ -150,6 +161,20 @@ def get_available_models(provider: Optional[ModelProvider] = None) -> Dict[str,
                 if config.provider == provider}
     return {config.name: config for config in MODEL_REGISTRY.values()}
 
+def get_fast_tier_model(model_name: str) -> str:
+    """
+    Get the fast/cheap model of the same provider for a requested model.
+    Falls back to the requested model if it is unknown or already the cheaper one.
+    """
+    config = get_model_config(model_name)
+    if not config or config.provider not in FAST_TIER_MODELS:
+        return model_name
+
+    fast_config = MODEL_REGISTRY[FAST_TIER_MODELS[config.provider]]
+    if fast_config.cost_per_1k_input >= config.cost_per_1k_input:
+        return model_name
+    return fast_config.name
+
 def get_recommended_models_by_use_case():
     """Get recommended models for different use cases."""
     return {
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+import os
+from .model_config import get_fast_tier_model, get_model_config
+
+class PipelineStage(Enum):
+    """Stages of the README generation pipeline that issue LLM calls."""
+    MAP = "map"
+    RE_REDUCE = "re_reduce"
+    FINAL = "final"
+    EMBEDDINGS = "embeddings"
+
+def is_tiered_routing_enabled() -> bool:
+    """Server-wide switch for tiered routing (GITROT_TIERED_ROUTING, on by default)."""
+    return os.getenv("GITROT_TIERED_ROUTING", "true").lower() == "true"
+
+@dataclass
+class ModelRoutingPolicy:
+    """
+    Decides which model serves each pipeline stage.
+
+    Chunk summaries (map) and re-reduce rounds go to a fast tier model, while the
+    requested model is reserved for the final README.
+    """
+    final_model: str
+    map_model: str
+    reduce_model: str
+
+    @classmethod
+    def single_model(cls, model_name: str) -> 'ModelRoutingPolicy':
+        """Route every stage to the same model."""
+        return cls(final_model=model_name, map_model=model_name, reduce_model=model_name)
+
+    @classmethod
+    def for_model(cls, model_name: str, map_model: Optional[str] = None, enabled: bool = True) -> 'ModelRoutingPolicy':
+        """
+        Build the routing policy for a requested model.
+
+        Args:
+            model_name: Model requested by the user, used for the final README
+            map_model: Explicit model for map/re-reduce stages (overrides the fast tier)
+            enabled: False keeps every stage on the requested model
+        """
+        if not enabled:
+            return cls.single_model(model_name)
+
+        fast_model = map_model or get_fast_tier_model(model_name)
+        final_config = get_model_config(model_name)
+        fast_config = get_model_config(fast_model)
+        # Never route across providers, the request only carries one set of credentials
+        if not final_config or not fast_config or fast_config.provider != final_config.provider:
+            return cls.single_model(model_name)
+
+        return cls(final_model=model_name, map_model=fast_model, reduce_model=fast_model)
+
+    @property
+    def is_tiered(self) -> bool:
+        return self.map_model != self.final_model or self.reduce_model != self.final_model
+
+    def model_for(self, stage: PipelineStage) -> str:
+        if stage == PipelineStage.MAP:
+            return self.map_model
+        if stage == PipelineStage.RE_REDUCE:
+            return self.reduce_model
+        return self.final_model
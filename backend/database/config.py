@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from sqlalchemy.pool import StaticPool
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
 import os
 
 class Base(DeclarativeBase):
@@ -11,30 +14,128 @@ def get_database_url():
     """Get the database URL based on environment"""
     return os.getenv("DATABASE_URL", "sqlite:///./gitrot_dev.db")
 
-    
+# Async drivers for the same database, used by request handlers on the event loop
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def get_async_database_url(url: Optional[str] = None) -> str:
+    """ASYNC_DATABASE_URL, or DATABASE_URL with its driver swapped for the async one (aiosqlite, asyncpg)"""
+    override = os.getenv("ASYNC_DATABASE_URL")
+    if override and url is None:
+        return override
+    parsed = make_url(url or get_database_url())
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or parsed.drivername in ASYNC_DRIVERS.values():
+        return parsed.render_as_string(hide_password=False)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+# Connection pool per engine and process: pooled connections, extra ones under load,
+# seconds to wait for a free one, seconds before a connection is replaced
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+# How long a SQLite connection waits for another one's write lock before "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+def is_memory_sqlite(url: str) -> bool:
+    """In-memory SQLite databases live on a single connection"""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and (
+        parsed.database in (None, "", ":memory:") or parsed.query.get("mode") == "memory"
+    )
+
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """
+    WAL lets readers run next to the writer, synchronous=NORMAL only syncs at checkpoints
+    (safe with WAL, a crash can lose the last commits but not corrupt the file), and the
+    busy timeout makes writers queue for the lock instead of failing.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    finally:
+        cursor.close()
+
+def engine_options(url: str) -> dict:
+    """Pool and driver options for an engine on url, sync or async"""
+    if is_memory_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool}
+    pool_options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+    }
+    if make_url(url).get_backend_name() == "sqlite":
+        # Connections are handed between threads by the pool, one thread uses a connection at a time
+        return {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+                **pool_options}
+    return {**pool_options, "pool_recycle": DB_POOL_RECYCLE_SECONDS, "pool_pre_ping": True}
+
+def configure_engine(sync_engine: Engine, url: str):
+    if make_url(url).get_backend_name() == "sqlite" and not is_memory_sqlite(url):
+        event.listen(sync_engine, "connect", configure_sqlite_connection)
+
+def create_database_engine(url: str) -> Engine:
+    """Sync engine for url: pooled, with WAL and busy timeouts for SQLite files"""
+    engine = create_engine(url, echo=False, future=True, **engine_options(url))
+    configure_engine(engine, url)
+    return engine
+
+
 DATABASE_URL = get_database_url()
 IS_SQLITE = DATABASE_URL.startswith("sqlite")
 
-# SQLite-specific configuration
-if IS_SQLITE:
-    engine = create_engine(
-        DATABASE_URL,
-        echo=False,
-        future=True,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-else:
-    engine = create_engine(
-        DATABASE_URL,
-        echo=False,
-        future=True,
-        pool_size=10,
-        max_overflow=20,
-    )
+engine = create_database_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Created on first use, so the sync-only tools don't need the async drivers installed
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+
+def get_async_engine() -> AsyncEngine:
+    """Async engine for the configured database"""
+    global _async_engine
+    if _async_engine is None:
+        async_url = get_async_database_url()
+        _async_engine = create_async_engine(async_url, echo=False, **engine_options(async_url))
+        configure_engine(_async_engine.sync_engine, async_url)
+    return _async_engine
+
+def get_async_session_factory() -> async_sessionmaker:
+    global _async_session_factory
+    if _async_session_factory is None:
+        # Attributes stay loaded after commit, handlers build responses from them without another query
+        _async_session_factory = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_session_factory
+
+async def get_async_db():
+    """Get an async database session, for endpoints that run on the event loop"""
+    async with get_async_session_factory()() as db:
+        yield db
+
+@asynccontextmanager
+async def async_session_scope():
+    async with get_async_session_factory()() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+async def dispose_async_engine():
+    """Close the async engine's pooled connections on shutdown"""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine, _async_session_factory = None, None
+
 def get_db():
     """Get database session"""
     db = SessionLocal()
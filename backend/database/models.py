@@ -1,6 +1,7 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, func, Index
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, Float, Text, JSON, LargeBinary, ForeignKey, func, Index
 from database.config import Base
 import uuid
+from datetime import datetime, timezone
 
 class User(Base):
     __tablename__ = "users"
@@ -16,4 +17,116 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     def __repr__(self):
-        return f"User id:{self.id}, email: {self.email}"
\ No newline at end of file
+        return f"User id:{self.id}, email: {self.email}"
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    stage = Column(String, nullable=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    repo_url = Column(String, nullable=False)
+    generation_method = Column(String, nullable=False)
+    model_name = Column(String, nullable=False)
+    # Request without custom credentials, None when the job can't be resumed after a restart
+    request_payload = Column(JSON, nullable=True)
+    readme_content = Column(Text, nullable=True)
+    usage = Column(JSON, nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
+    # Process running the job, which renews the lease while it does; expired leases are taken over
+    owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    # Who the job runs for and its admission lane, so a resumed job is charged and queued as submitted
+    requester_key = Column(String, nullable=True)
+    requester_tier = Column(String, nullable=True)
+    user_id = Column(String, nullable=True)
+    lane = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_generation_jobs_status", "status"),
+        Index("ix_generation_jobs_expires_at", "expires_at"),
+    )
+
+    def __repr__(self):
+        return f"GenerationJob id:{self.id}, status: {self.status}"
+
+class GenerationHistory(Base):
+    """A README generated for a registered user, kept so it can be fetched again without regenerating"""
+    __tablename__ = "generation_history"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    repo_url = Column(String, nullable=False)
+    commit_sha = Column(String(40), nullable=True)
+    model_name = Column(String, nullable=False)
+    generation_method = Column(String, nullable=False)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    latency_seconds = Column(Float, nullable=False, default=0.0)
+    # README bytes compressed with content_encoding, readme_size is the uncompressed size
+    content_encoding = Column(String(16), nullable=False, default="zstd")
+    readme_compressed = Column(LargeBinary, nullable=False)
+    readme_size = Column(Integer, nullable=False)
+    # SHA-256 of the uncompressed README, the ETag it is served with
+    content_sha256 = Column(String(64), nullable=True)
+    # Set by the application so keyset cursors carry the exact stored value
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Serves the per-user listing newest first, id breaks ties within a timestamp
+        Index("ix_generation_history_user_created", "user_id", "created_at", "id"),
+    )
+
+    def __repr__(self):
+        return f"GenerationHistory id:{self.id}, user: {self.user_id}, repo: {self.repo_url}"
+
+class UsageEvent(Base):
+    """What one finished generation cost its requester, written in batches by the usage ledger"""
+    __tablename__ = "usage_events"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # "user:<id>" or "ip:<hash>", see scheduling.fair_share.Requester
+    requester_key = Column(String, nullable=False)
+    user_id = Column(String, nullable=True)
+    tier = Column(String, nullable=False)
+    repo_url = Column(String, nullable=False)
+    model_name = Column(String, nullable=False)
+    generation_method = Column(String, nullable=False)
+    succeeded = Column(Boolean, nullable=False)
+    llm_calls = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    estimated_cost = Column(Float, nullable=False, default=0.0)
+    latency_seconds = Column(Float, nullable=False, default=0.0)
+    # When the generation finished, not when the batch was written
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_usage_events_requester_created", "requester_key", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"UsageEvent id:{self.id}, requester: {self.requester_key}, tokens: {self.total_tokens}"
+
+class UsageTotal(Base):
+    """A requester's usage per UTC day, kept current by the usage ledger for quota checks"""
+    __tablename__ = "usage_totals"
+
+    requester_key = Column(String, primary_key=True)
+    period = Column(String(10), primary_key=True)  # YYYY-MM-DD
+    requests = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    estimated_cost = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"UsageTotal requester:{self.requester_key}, period: {self.period}, tokens: {self.total_tokens}"
@@ -3,31 +3,67 @@ FastAPI GitRot Application
 Azure-optimized README generator with native HTML and AdSense integration
 """
 
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 import time
 import datetime
 import os
 import asyncio
 import concurrent.futures
+import contextvars
+import math
+import queue
 from contextlib import asynccontextmanager
-from models.request_models import ReadmeRequest, ReadmeResponse
+from dataclasses import replace
+from typing import Callable, Optional
+from models.request_models import ReadmeRequest, ReadmeResponse, UsageSummary, PeriodUsage
+from models.job_models import JobSubmitResponse, JobStatusResponse
+from models.history_models import HistoryEntry, HistoryEntryDetail, HistoryPage
 from models.user_model import UserAuthResponse, UserAuthRequest
 from services.user_service import UserService
-from database.config import get_db, create_tables
+from services.job_runner import JobRunner
+from services.history_service import HistoryService
+from services.usage_ledger import UsageLedger, usage_period
+from services.auth_tokens import access_tokens
+from scheduling import (
+    AdmissionController,
+    AdmissionRejected,
+    StagedPipeline,
+    SizeAwareScheduler,
+    FairShareScheduler,
+    Requester,
+    JobSchedule,
+    LARGE_LANE,
+    current_requester,
+)
+from cachetools import TTLCache
+from utils import ProgressCallback, CancellationToken, OperationCancelled
+from wrappers.rate_limitter import llm_rate_limiter
+from database.config import create_tables, get_async_db, async_session_scope, dispose_async_engine, session_scope
 from app import ReadmeGeneratorApp
+from utils.example_index import example_index
+from utils.time_budget import TimeBudget
+from utils import tracing
 from api_helper import (
     log_request_metrics, 
     validate_github_url, 
     sanitize_repo_name,
     format_error_response,
+    format_sse_event,
     log_generation_attempt,
     get_client_info,
+    get_client_address,
     check_rate_limit,
-    metrics
+    metrics,
+    create_download_filename,
+    strong_etag,
+    etag_matches,
+    negotiate_encoding,
+    encode_body,
+    MIN_COMPRESSED_BODY_BYTES
 )
 
 # Azure best practice: Configure structured logging
@@ -38,17 +74,107 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 thread_pool = None
+job_pool = None
+job_runner = None
+main_loop = None
+
+WORKER_POOL_SIZE = int(os.getenv("GITROT_WORKER_POOL_SIZE", "5"))
+
+# Opt-in: run generations as ingest/prepare/llm stages instead of one pool thread per request
+staged_pipeline = StagedPipeline.from_env() if os.getenv("GITROT_STAGED_PIPELINE", "false").lower() == "true" else None
+
+# One admission slot per pool worker (or per pipeline slot), so executors never queue generations invisibly
+ADMISSION_SLOTS = staged_pipeline.capacity if staged_pipeline else WORKER_POOL_SIZE
+
+# Opt-in shortest-job-first: repositories are sized before cloning (network I/O on the request path),
+# large ones get a capped share of the slots
+size_scheduler = (
+    SizeAwareScheduler.from_env() if os.getenv("GITROT_SIZE_AWARE_SCHEDULING", "false").lower() == "true" else None
+)
+LARGE_JOB_SLOTS = int(os.getenv("GITROT_LARGE_JOB_SLOTS", str(max(1, ADMISSION_SLOTS // 2))))
+
+# Weighted fair queueing by user (or client IP), for admission and for LLM calls
+FAIR_SHARE_ENABLED = os.getenv("GITROT_FAIR_SHARE", "true").lower() == "true"
+fair_share = FairShareScheduler.from_env() if FAIR_SHARE_ENABLED else None
+# Every job advances its requester's clock by at least this much, on top of its size
+FAIR_SHARE_JOB_COST_SECONDS = float(os.getenv("GITROT_FAIR_SHARE_JOB_COST_SECONDS", "5"))
+if FAIR_SHARE_ENABLED:
+    llm_rate_limiter.fair_share = FairShareScheduler.from_env()
+
+# User ids seen in requests, and whether they belong to an active account
+verified_users = TTLCache(maxsize=4096, ttl=300)
+
+# Keep registered users' READMEs, listed at /users/{user_id}/history
+GENERATION_HISTORY_ENABLED = os.getenv("GITROT_GENERATION_HISTORY", "true").lower() == "true"
+
+# Per-requester usage for quotas and billing, buffered and written in batches off the request path
+usage_ledger = UsageLedger.from_env() if os.getenv("GITROT_USAGE_LEDGER", "true").lower() == "true" else None
+
+admission = AdmissionController.from_env(
+    ADMISSION_SLOTS,
+    lane_limits={LARGE_LANE: LARGE_JOB_SLOTS},
+    wait_listener=fair_share.record_wait if fair_share else None
+)
+
+# Comment lines sent on idle streams so proxies don't close them
+SSE_KEEPALIVE_SECONDS = float(os.getenv("GITROT_SSE_KEEPALIVE_SECONDS", "15"))
+
+# How often a waiting request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = float(os.getenv("GITROT_DISCONNECT_POLL_SECONDS", "1"))
+
+def prebuild_example_index():
+    """Build the persisted example index up front so the first request doesn't pay for it"""
+    from gitrot_brain import GitrotBrain
+    try:
+        embeddings = GitrotBrain(os.getenv("GITROT_EXAMPLE_INDEX_MODEL", "gpt-4o")).getEmbeddingModel()
+        if embeddings is not None:
+            index_hash = example_index.build(embeddings)
+            logger.info(f"Example index ready: {index_hash}")
+    except Exception as e:
+        logger.warning(f"Example index prebuild failed, it will be built on first use: {str(e)}")
+
+def create_job_executor() -> concurrent.futures.Executor:
+    """
+    Executor background jobs run on. With the staged pipeline a job's thread only relays progress
+    while the pipeline does the work, so there is one per admission slot: every admitted job runs
+    right away instead of queueing inside the executor where admission can't see it
+    """
+    if staged_pipeline is None:
+        return thread_pool
+    return concurrent.futures.ThreadPoolExecutor(max_workers=ADMISSION_SLOTS, thread_name_prefix="job")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global thread_pool
+    global thread_pool, job_pool, job_runner, main_loop
     create_tables()
-    thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=5)
-    logger.info("Thread pool initiated with 5 workers")
+    if usage_ledger:
+        usage_ledger.start()
+    main_loop = asyncio.get_running_loop()
+    thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=WORKER_POOL_SIZE)
+    logger.info(f"Thread pool initiated with {WORKER_POOL_SIZE} workers")
+    if staged_pipeline:
+        await staged_pipeline.start()
+    job_pool = create_job_executor()
+    job_runner = JobRunner(job_pool, run_readme_generation_for_job, admission=admission, reschedule=apply_fair_share)
+    job_runner.start()
+    if os.getenv("GITROT_BUILD_EXAMPLE_INDEX_ON_STARTUP", "false").lower() == "true":
+        # Through admission like any job, so the build takes a worker slot instead of starving generations of one
+        admission.submit(thread_pool, prebuild_example_index)
     yield
+    if job_pool is not thread_pool:
+        # Off the loop, the jobs finish on the pipeline which runs on it
+        await asyncio.to_thread(job_pool.shutdown, True)
+    if staged_pipeline:
+        await staged_pipeline.stop()
     if thread_pool:
         thread_pool.shutdown(wait=True)
         logger.info("Thread pool shutdown completed")
+    if job_runner:
+        await asyncio.to_thread(job_runner.stop)
+    if usage_ledger:
+        # After the pool, so generations that were still running are written too
+        await asyncio.to_thread(usage_ledger.stop)
+    await dispose_async_engine()
 
 # Azure best practice: Initialize FastAPI with proper metadata
 app = FastAPI(
@@ -76,22 +202,30 @@ app.add_middleware(
 @app.post("/auth/register-or-login", response_model=UserAuthResponse)
 async def register_or_login(
     auth_data: UserAuthRequest,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Register or login a user via OAuth
     Creates a new user if they dont exist, otherwise returns existing user
+    The login server (X-GitRot-Client-Secret) also gets an access token for the user,
+    sent back as "Authorization: Bearer <token>" on the user's requests
     """
     try:
-        user, is_new = UserService.register_or_login(db, auth_data)
+        user, is_new = await UserService.aregister_or_login(db, auth_data)
 
         print(f"User {user}: {is_new}")
+        access_token, expires_at = None, None
+        if access_tokens.is_trusted_client(http_request.headers.get("x-gitrot-client-secret")):
+            access_token, expires_at = access_tokens.issue(user.id)
         return UserAuthResponse(
             user_id=user.id,
             is_new=is_new,
             email=user.email,
             name=user.name,
-            image = user.image
+            image = user.image,
+            access_token=access_token,
+            access_token_expires_at=expires_at
         )
     
     except ValueError as e:
@@ -108,18 +242,240 @@ async def register_or_login(
         )
     
 
-@app.post("/generate-readme", response_model=ReadmeResponse)
-@log_request_metrics
-async def generate_readme(request: ReadmeRequest, http_request: Request):
+def record_usage(request: ReadmeRequest,
+                 generator_app: Optional[ReadmeGeneratorApp],
+                 succeeded: bool = True) -> Optional[UsageSummary]:
+    """Aggregate a generation's token usage into /metrics and the usage ledger, and return it for the response"""
+    if generator_app is None:
+        return None
+    usage = generator_app.get_usage_summary()
+    metrics.record_generation_usage(sanitize_repo_name(request.repo_url), request.model_name, usage)
+    if usage_ledger is not None and generator_app.requester is not None:
+        usage_ledger.record(generator_app.requester, request, usage, succeeded=succeeded,
+                            latency_seconds=generator_app.time_budget.elapsed())
+    return UsageSummary(**usage)
+
+def build_readme_response(request: ReadmeRequest,
+                          generator_app: Optional[ReadmeGeneratorApp],
+                          readme_content: Optional[str] = None,
+                          error: Optional[Exception] = None) -> ReadmeResponse:
+    """Response for a finished generation, tokens spent before a failure are still billed"""
+    if isinstance(error, OperationCancelled):
+        logger.info(f"README generation for {sanitize_repo_name(request.repo_url)} stopped: {str(error)}")
+    elif error is not None:
+        logger.error(f"Error generating README: {str(error)}")
+    if error is not None:
+        return ReadmeResponse(
+            success=False,
+            error_message=str(error),
+            generation_timestamp=datetime.datetime.now().isoformat(),
+            repo_url=request.repo_url,
+            generation_method=request.generation_method,
+            usage=record_usage(request, generator_app, succeeded=False),
+            degradations=generator_app.get_degradations() if generator_app is not None else []
+        )
+
+    logger.info(f"Successfully generated README for {sanitize_repo_name(request.repo_url)}")
+    return ReadmeResponse(
+        success=True,
+        readme_content=readme_content,
+        generation_timestamp=datetime.datetime.now().isoformat(),
+        repo_url=request.repo_url,
+        generation_method=request.generation_method,
+        usage=record_usage(request, generator_app),
+        degradations=generator_app.get_degradations() if generator_app is not None else []
+    )
+
+def record_generation_history(request: ReadmeRequest, generator_app: ReadmeGeneratorApp, readme_content: str):
+    """Keep a registered user's README, a failure here is logged and doesn't fail the generation"""
+    user_id = generator_app.requester.user_id if generator_app.requester else None
+    if not GENERATION_HISTORY_ENABLED or user_id is None:
+        return
+    try:
+        with session_scope() as db:
+            HistoryService.record(
+                db,
+                user_id,
+                request,
+                readme_content,
+                usage=generator_app.get_usage_summary(),
+                latency_seconds=generator_app.time_budget.elapsed(),
+                commit_sha=generator_app.commit_sha
+            )
+    except Exception as e:
+        logger.warning(f"Could not store generation history: {str(e)}")
+
+def run_readme_generation(request: ReadmeRequest,
+                          progress_callback: Optional[ProgressCallback] = None,
+                          token_callback: Optional[Callable[[str], None]] = None,
+                          requester: Optional[Requester] = None,
+                          cancellation: Optional[CancellationToken] = None,
+                          time_budget: Optional[TimeBudget] = None) -> ReadmeResponse:
+    """Run one README generation in a worker thread, failures are returned as unsuccessful responses"""
+    generator_app = None
+    try:
+        logger.info(f"Generating README for repository: {sanitize_repo_name(request.repo_url)}")
+        generator_app = ReadmeGeneratorApp(request, progress_callback=progress_callback, token_callback=token_callback,
+                                           requester=requester, cancellation=cancellation, time_budget=time_budget)
+        readme_content = generator_app.generate_readme_from_repo_url(request)
+        record_generation_history(request, generator_app, readme_content)
+        return build_readme_response(request, generator_app, readme_content)
+    except Exception as e:
+        return build_readme_response(request, generator_app, error=e)
+
+async def arun_readme_generation(request: ReadmeRequest,
+                                 progress_callback: Optional[ProgressCallback] = None,
+                                 token_callback: Optional[Callable[[str], None]] = None,
+                                 requester: Optional[Requester] = None,
+                                 cancellation: Optional[CancellationToken] = None,
+                                 time_budget: Optional[TimeBudget] = None) -> ReadmeResponse:
+    """Run one README generation from the event loop, on the staged pipeline when it is enabled"""
+    loop = asyncio.get_event_loop()
+    if staged_pipeline is None:
+        # In a copy of this context, so a request's trace continues in the worker thread
+        return await loop.run_in_executor(thread_pool, contextvars.copy_context().run, run_readme_generation, request,
+                                          progress_callback, token_callback, requester, cancellation, time_budget)
+
+    created = []
+    trace_parent = tracing.current_span()
+
+    def create_app():
+        created.append(ReadmeGeneratorApp(request, progress_callback=progress_callback, token_callback=token_callback,
+                                          requester=requester, cancellation=cancellation, time_budget=time_budget,
+                                          trace_parent=trace_parent))
+        return created[0]
+
+    try:
+        logger.info(f"Generating README for repository: {sanitize_repo_name(request.repo_url)}")
+        readme_content = await staged_pipeline.run(request, create_app)
+        await asyncio.to_thread(record_generation_history, request, created[0], readme_content)
+        return build_readme_response(request, created[0], readme_content)
+    except Exception as e:
+        return build_readme_response(request, created[0] if created else None, error=e)
+
+def run_readme_generation_for_job(request: ReadmeRequest,
+                                  progress_callback: Optional[ProgressCallback] = None) -> ReadmeResponse:
     """
-    Generate README using Azure OpenAI
-    Azure best practice: Implement proper error handling and retry logic
+    Run a background job's generation from a worker thread. With the staged pipeline the work
+    runs on the event loop, progress is handed back so listeners still run in this thread.
+    """
+    if staged_pipeline is None:
+        return run_readme_generation(request, progress_callback)
+
+    # The job runner sets the requester in this thread's context, hand it over to the loop explicitly
+    events = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(
+        arun_readme_generation(request, lambda stage, details: events.put((stage, details)),
+                               requester=current_requester.get()),
+        main_loop
+    )
+    future.add_done_callback(lambda _: events.put(None))
+    while True:
+        event = events.get()
+        if event is None:
+            break
+        if progress_callback:
+            progress_callback(*event)
+    return future.result()
+
+async def arun_traced_generation(trace: Optional[tracing.Trace], request: ReadmeRequest, *args) -> ReadmeResponse:
+    """arun_readme_generation under the request's trace (if it is traced), exported once the generation ends"""
+    with tracing.recording(trace) as root:
+        response = await arun_readme_generation(request, *args)
+        if root is not None:
+            root.set(success=response.success, total_tokens=response.usage.total_tokens if response.usage else 0)
+        return response
+
+def trace_request(request: ReadmeRequest, http_request: Request, name: str) -> Optional[tracing.Trace]:
+    """A trace for the generation when the X-GitRot-Trace header or the sample rates ask for one"""
+    return tracing.trace_for_request(http_request.headers.get(tracing.TRACE_HEADER), name,
+                                     repo_url=request.repo_url, model=request.model_name,
+                                     method=request.generation_method)
+
+async def await_unless_disconnected(generation: asyncio.Future, http_request: Request,
+                                    cancellation: CancellationToken):
+    """
+    Wait for a generation, cancelling it if the client disconnects in the meantime.
+    Still waits for the worker to wind down, so the admission slot is held until it is free.
+    """
+    try:
+        while True:
+            done, _ = await asyncio.wait({generation}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return generation.result()
+            if not cancellation.is_cancelled and await http_request.is_disconnected():
+                logger.info("Client disconnected, cancelling README generation")
+                cancellation.cancel("client disconnected")
+    except asyncio.CancelledError:
+        cancellation.cancel("request cancelled")
+        raise
+
+async def is_active_user(user_id: str) -> bool:
+    """Whether user_id belongs to an active account, cached so polling clients don't hit the database"""
+    known = verified_users.get(user_id)
+    if known is None:
+        try:
+            async with async_session_scope() as db:
+                user = await UserService.aget_user_by_id(db, user_id)
+                known = bool(user and user.is_active)
+        except Exception as e:
+            logger.warning(f"Could not verify user for fair scheduling: {str(e)}")
+            return False
+        verified_users[user_id] = known
+    return known
+
+def authenticated_user_id(http_request: Request) -> Optional[str]:
+    """The user of a valid "Authorization: Bearer <access token>" header, None for anonymous requests"""
+    scheme, _, token = (http_request.headers.get("authorization") or "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    return access_tokens.verify(token.strip())
+
+async def identify_requester(request: ReadmeRequest, http_request: Request) -> Requester:
     """
+    Who a generation is for: the user of the request's access token, otherwise the client address.
+    Inactive users are treated as anonymous.
+    """
+    user_id = authenticated_user_id(http_request)
+    if user_id and await is_active_user(user_id):
+        return Requester.for_user(user_id, fair_share.tier_for_user(user_id) if fair_share else "user")
+    return Requester.for_client(get_client_address(http_request))
+
+async def schedule_generation(request: ReadmeRequest, requester: Optional[Requester] = None) -> JobSchedule:
+    """
+    Admission priority and lane for a request, from its estimated repository size
+    and, with fair share on, its requester's share of the capacity.
+    Raises AdmissionRejected before any sizing when the server has no room for the request.
+    """
+    admission.raise_if_full()
+    if size_scheduler is None:
+        schedule = JobSchedule.fifo()
+    else:
+        loop = asyncio.get_event_loop()
+        schedule = await loop.run_in_executor(None, size_scheduler.schedule, request.repo_url)
+        if schedule.estimate:
+            logger.info(f"Estimated {sanitize_repo_name(request.repo_url)} at ~{schedule.estimate.estimated_tokens} "
+                        f"tokens ({schedule.estimate.text_files} files), lane {schedule.lane}")
+    return apply_fair_share(replace(schedule, requester=requester))
+
+def apply_fair_share(schedule: JobSchedule) -> JobSchedule:
+    """Tag the schedule with its requester's fair share of the capacity, when fair share is on"""
+    if fair_share is not None and schedule.requester is not None:
+        return fair_share.apply(schedule, schedule.requester, base_cost=FAIR_SHARE_JOB_COST_SECONDS)
+    return schedule
+
+def validate_generation_request(request: ReadmeRequest, http_request: Request,
+                                requester: Optional[Requester] = None):
+    """Rate limit (per client IP, plus per user when authenticated) and validate a README request, then log the attempt"""
     # Rate limiting check
-    if not check_rate_limit(http_request):
+    client = Requester.for_client(get_client_address(http_request))
+    decision = check_rate_limit(http_request, client.key,
+                                requester.key if requester is not None and requester.user_id else None)
+    if not decision.allowed:
         raise HTTPException(
             status_code=429, 
-            detail="Too many requests. Please try again later."
+            detail="Too many requests. Please try again later.",
+            headers={"Retry-After": str(max(1, math.ceil(decision.retry_after_seconds)))}
         )
     
     # Input validation
@@ -136,42 +492,237 @@ async def generate_readme(request: ReadmeRequest, http_request: Request):
         request.generation_method,
         client_info.get("user_agent")
     )
-    
-    try:
-        logger.info(f"Generating README for repository: {sanitize_repo_name(request.repo_url)}")
-        
-        loop = asyncio.get_event_loop()
-        readme_content = await loop.run_in_executor(
-            thread_pool,
-            lambda: ReadmeGeneratorApp(request).generate_readme_from_repo_url(request)
-        )
-        
-        response = ReadmeResponse(
-            success=True,
-            readme_content=readme_content,
-            generation_timestamp=datetime.datetime.now().isoformat(),
-            repo_url=request.repo_url,
-            generation_method=request.generation_method
-        )
-        
-        logger.info(f"Successfully generated README for {sanitize_repo_name(request.repo_url)}")
-        return response
-        
-    except Exception as e:
-        logger.error(f"Error generating README: {str(e)}")
-        return ReadmeResponse(
-            success=False,
-            error_message=str(e),
-            generation_timestamp=datetime.datetime.now().isoformat(),
-            repo_url=request.repo_url,
-            generation_method=request.generation_method
+
+@app.post("/generate-readme", response_model=ReadmeResponse)
+@log_request_metrics
+async def generate_readme(request: ReadmeRequest, http_request: Request, response: Response):
+    """
+    Generate README using Azure OpenAI
+    Azure best practice: Implement proper error handling and retry logic
+    Send X-GitRot-Trace: 1 (or "profile") to trace the generation, the trace id is returned in X-GitRot-Trace-Id
+    """
+    # The deadline runs from arrival, time spent queued for admission counts against it
+    time_budget = TimeBudget.for_request(request.time_budget_seconds)
+    trace = trace_request(request, http_request, "generate_readme")
+    requester = await identify_requester(request, http_request)
+    validate_generation_request(request, http_request, requester)
+
+    schedule = await schedule_generation(request, requester)
+    cancellation = CancellationToken()
+    async with admission.slot(schedule.priority, schedule.lane, owner=requester):
+        generation = asyncio.ensure_future(
+            arun_traced_generation(trace, request, None, None, requester, cancellation, time_budget)
         )
+        if trace is not None:
+            response.headers["X-GitRot-Trace-Id"] = trace.trace_id
+        return await await_unless_disconnected(generation, http_request, cancellation)
+
+@app.post("/generate-readme/stream")
+@log_request_metrics
+async def generate_readme_stream(request: ReadmeRequest, http_request: Request):
+    """
+    Generate README and stream it as server-sent events:
+    "progress" events per pipeline stage, "token" events with the final README as the LLM writes it,
+    then one "result" event carrying the full ReadmeResponse
+    """
+    time_budget = TimeBudget.for_request(request.time_budget_seconds)
+    trace = trace_request(request, http_request, "generate_readme_stream")
+    requester = await identify_requester(request, http_request)
+    validate_generation_request(request, http_request, requester)
+
+    loop = asyncio.get_event_loop()
+    events = asyncio.Queue()
+    cancellation = CancellationToken()
+
+    def emit(event: Optional[str], data=None):
+        # Called from worker threads, hand the event over to the event loop
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    def on_progress(stage: str, details: dict):
+        emit("progress", {"stage": stage, **details})
+
+    def on_token(text: str):
+        emit("token", {"text": text})
+
+    async def run_generation():
+        start_time = time.monotonic()
+        try:
+            response = await arun_traced_generation(trace, request, on_progress, on_token, requester, cancellation,
+                                                    time_budget)
+            emit("result", response.model_dump())
+        finally:
+            admission.release(time.monotonic() - start_time, schedule.lane)
+            emit(None)
+
+    # Admit before the response starts so rejections are still plain 503s,
+    # and start the work right away so the slot is released even if the stream is never read
+    schedule = await schedule_generation(request, requester)
+    await admission.acquire(schedule.priority, schedule.lane, owner=requester)
+    generation = asyncio.ensure_future(run_generation())
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(events.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield format_sse_event(event, data)
+        finally:
+            if not generation.done():
+                # The client went away, stop the clone and any further LLM calls
+                logger.info("Stream closed before the README generation finished, cancelling it")
+                cancellation.cancel("client disconnected")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                 **({"X-GitRot-Trace-Id": trace.trace_id} if trace is not None else {})}
+    )
+
+@app.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+@log_request_metrics
+async def submit_generation_job(request: ReadmeRequest, http_request: Request):
+    """
+    Queue a README generation and return immediately with a job id.
+    Poll GET /jobs/{job_id} for progress and the result.
+    """
+    requester = await identify_requester(request, http_request)
+    validate_generation_request(request, http_request, requester)
+
+    schedule = await schedule_generation(request, requester)
+    loop = asyncio.get_event_loop()
+    job = await loop.run_in_executor(None, job_runner.submit, request, schedule)
+    return JobSubmitResponse(
+        job_id=job.job_id,
+        status=job.status,
+        status_url=f"/jobs/{job.job_id}"
+    )
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+@log_request_metrics
+async def get_generation_job(job_id: str, http_request: Request):
+    """
+    Status, progress and (once finished) the result of a generation job.
+    A registered user's job is only served with that user's access token
+    """
+    loop = asyncio.get_event_loop()
+    job = await loop.run_in_executor(None, job_runner.get_status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if job.user_id is not None:
+        require_account_owner(job.user_id, http_request)
+    return job
     
+def require_account_owner(user_id: str, http_request: Request):
+    """A user's history and usage are only served to requests carrying that user's access token"""
+    authenticated = authenticated_user_id(http_request)
+    if authenticated is None:
+        raise HTTPException(status_code=401, detail="A valid access token is required",
+                            headers={"WWW-Authenticate": "Bearer"})
+    if authenticated != user_id:
+        raise HTTPException(status_code=403, detail="Only available to the account owner")
+
+@app.get("/users/{user_id}/history", response_model=HistoryPage)
+@log_request_metrics
+async def list_generation_history(user_id: str,
+                                  http_request: Request,
+                                  limit: int = Query(20, ge=1, le=HistoryService.MAX_PAGE_SIZE),
+                                  cursor: Optional[str] = None,
+                                  db: AsyncSession = Depends(get_async_db)):
+    """A user's generated READMEs, newest first. Pass next_cursor back as ?cursor= for the next page"""
+    require_account_owner(user_id, http_request)
+    try:
+        entries, next_cursor = await HistoryService.alist_for_user(db, user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return HistoryPage(items=[HistoryEntry.model_validate(entry) for entry in entries], next_cursor=next_cursor)
+
+# Stored READMEs never change, clients may keep them but revalidate with If-None-Match
+README_CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Accept-Encoding, Authorization"}
+
+async def get_history_entry_for_revalidation(user_id: str, entry_id: str, http_request: Request,
+                                             db: AsyncSession):
+    """
+    The owner's history entry without its README, its content hash, and the response's content coding.
+    Chosen from the README size, so a 304 carries the same ETag as the full response would
+    """
+    require_account_owner(user_id, http_request)
+    entry = await HistoryService.aget_entry(db, user_id, entry_id, with_readme=False)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="History entry not found")
+    if entry.content_sha256 is None:
+        await HistoryService.aload_readme(db, entry)
+    encoding = None
+    if entry.readme_size >= MIN_COMPRESSED_BODY_BYTES:
+        encoding = negotiate_encoding(http_request.headers.get("accept-encoding"))
+    return entry, HistoryService.content_sha256(entry), encoding
+
+def readme_response(content: Optional[bytes], content_sha256: str, encoding: Optional[str], media_type: str,
+                    headers: Optional[dict] = None) -> Response:
+    """content, already in encoding, with its strong ETag; None is a 304 Not Modified"""
+    headers = {**(headers or {}), **README_CACHE_HEADERS, "ETag": strong_etag(content_sha256, encoding)}
+    if content is None:
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type=media_type, headers=headers)
+
+@app.get("/users/{user_id}/history/{entry_id}", response_model=HistoryEntryDetail)
+@log_request_metrics
+async def get_generation_history_entry(user_id: str, entry_id: str, http_request: Request,
+                                       db: AsyncSession = Depends(get_async_db)):
+    """
+    A README from the user's history, without regenerating it.
+    Send the ETag back as If-None-Match to get a 304 instead of the README again
+    """
+    entry, content_sha256, encoding = await get_history_entry_for_revalidation(user_id, entry_id, http_request, db)
+    if etag_matches(http_request.headers.get("if-none-match"), content_sha256):
+        return readme_response(None, content_sha256, encoding, "application/json")
+    await HistoryService.aload_readme(db, entry)
+    detail = HistoryEntryDetail(**HistoryEntry.model_validate(entry).model_dump(),
+                                readme_content=HistoryService.readme_content(entry))
+    return readme_response(encode_body(detail.model_dump_json().encode("utf-8"), encoding),
+                           content_sha256, encoding, "application/json")
+
+@app.get("/users/{user_id}/history/{entry_id}/readme")
+@log_request_metrics
+async def download_generation_history_readme(user_id: str, entry_id: str, http_request: Request,
+                                             db: AsyncSession = Depends(get_async_db)):
+    """A README from the user's history as a markdown file, zstd clients get the stored bytes as they are"""
+    entry, content_sha256, encoding = await get_history_entry_for_revalidation(user_id, entry_id, http_request, db)
+    if etag_matches(http_request.headers.get("if-none-match"), content_sha256):
+        return readme_response(None, content_sha256, encoding, "text/markdown; charset=utf-8")
+    await HistoryService.aload_readme(db, entry)
+    if encoding == "zstd" and entry.content_encoding == "zstd":
+        content = entry.readme_compressed
+    else:
+        content = encode_body(HistoryService.readme_content(entry).encode("utf-8"), encoding)
+    disposition = f'attachment; filename="{create_download_filename(entry.repo_url)}"'
+    return readme_response(content, content_sha256, encoding, "text/markdown; charset=utf-8",
+                           headers={"Content-Disposition": disposition})
+
+@app.get("/users/{user_id}/usage", response_model=PeriodUsage)
+@log_request_metrics
+async def get_user_usage(user_id: str, http_request: Request):
+    """The user's generations, tokens and estimated cost today (UTC), including ones not written yet"""
+    require_account_owner(user_id, http_request)
+    if usage_ledger is None:
+        raise HTTPException(status_code=404, detail="Usage accounting is disabled")
+    period = usage_period()
+    # Memory only after the first call for a user and day
+    usage = await asyncio.to_thread(usage_ledger.usage_for, Requester.for_user(user_id).key, period)
+    return PeriodUsage(period=period, **usage)
+
 @app.get("/health")
 @log_request_metrics
 async def health_check():
     """Azure best practice: Implement health check endpoint"""
-    app_metrics = metrics.get_metrics()
+    app_metrics = {**metrics.get_metrics(), "admission": admission.stats()}
     return {
         "status": "healthy",
         "timestamp": datetime.datetime.now().isoformat(),
@@ -180,11 +731,30 @@ async def health_check():
         "metrics": app_metrics
     }
 
+def wants_prometheus_format(http_request: Request, format: Optional[str]) -> bool:
+    """?format=prometheus, or a scraper asking for the text exposition format instead of JSON"""
+    if format:
+        return format == "prometheus"
+    accept = http_request.headers.get("accept", "")
+    return "application/openmetrics-text" in accept or "text/plain" in accept
+
 @app.get("/metrics")
 @log_request_metrics
-async def get_metrics():
-    """Azure best practice: Expose application metrics"""
-    return metrics.get_metrics()
+async def get_metrics(http_request: Request, format: Optional[str] = None):
+    """
+    Azure best practice: Expose application metrics
+    JSON by default, the Prometheus text format for scrapers (Accept: text/plain) or ?format=prometheus
+    """
+    if wants_prometheus_format(http_request, format):
+        return Response(content=metrics.prometheus_text(), media_type="text/plain; version=0.0.4; charset=utf-8")
+    app_metrics = {**metrics.get_metrics(), "admission": admission.stats()}
+    if staged_pipeline:
+        app_metrics["pipeline"] = staged_pipeline.stats()
+    if usage_ledger:
+        app_metrics["usage_ledger"] = usage_ledger.stats()
+    if fair_share:
+        app_metrics["fair_share"] = {"jobs": fair_share.stats(), "llm_calls": llm_rate_limiter.fair_share_stats()}
+    return app_metrics
 
 @app.get("/ads.txt")
 async def ads_txt():
@@ -202,7 +772,17 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     logger.error(f"HTTP {exc.status_code}: {exc.detail}")
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None)
+    )
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    logger.warning(f"Generation rejected: {exc.reason}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after_seconds)}
     )
 
 @app.exception_handler(Exception)
@@ -1,28 +1,56 @@
+import asyncio
 import os
-from langchain_openai import AzureOpenAIEmbeddings
+import time
+from typing import Callable, List, Optional
 from langchain_core.documents import Document
-from langchain.chains.summarize import load_summarize_chain
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_core.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from utils import TokenCalculator
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from utils import TokenCalculator, UsageTracker, UsageCallbackHandler, extract_token_usage, ProgressReporter
+from utils.cancellation import CancellationToken, OperationCancelled
+from utils.chunking import make_code_splitter, build_map_prompts
+from utils.time_budget import TimeBudget, call_latency
+from utils.stage_metrics import pipeline_metrics
+from utils import tracing
+from utils.example_index import example_index
 from wrappers.rate_limitter import llm_rate_limiter
 from config.model_config import get_model_config
+from config.model_routing import ModelRoutingPolicy, PipelineStage
 
 
 #TODO: Add a normalizer to create the right tags etc to the readme.
 class Generators:
 
-    def __init__(self, model_name: str):
+    # Histogram each LLM call is timed in, by the stage it belongs to
+    CALL_METRIC_STAGES = {
+        PipelineStage.MAP: "map_call",
+        PipelineStage.RE_REDUCE: "reduce_call",
+        PipelineStage.FINAL: "final",
+    }
+
+    #TODO: Write better prompts, ensuring that the hardcoded words are not used
+    MAP_PROMPT = "Summarize the code chunk in 200 words: \n\n{text}"
+    REDUCE_PROMPT = "Combine the summaries into one approximately of 1500 tokens keeping all the main component and essense of the summaries: {text}"
+    CONDENSE_MAP_PROMPT = "This part of summary is more than expected size, condense it even further while keeping the essense and important concepts intact: {text}"
+    CONDENSE_REDUCE_PROMPT = "Take these part of condensed summaries, and make them better while maintaining the overall summary size {text}"
+
+    # Concurrent map calls per request on the async path, the shared rate limiter still spaces them
+    MAP_CONCURRENCY = int(os.getenv("GITROT_MAP_CONCURRENCY", "4"))
+
+    def __init__(self, model_name: str, routing_policy: Optional[ModelRoutingPolicy] = None,
+                 progress: Optional[ProgressReporter] = None, on_token: Optional[Callable[[str], None]] = None,
+                 cancellation: Optional[CancellationToken] = None, time_budget: Optional[TimeBudget] = None):
         # TODO: Use this model to use variable instead of hardcoded values
         self.request_model_config = get_model_config(model_name=model_name)
         self.tokenizer = TokenCalculator(model_name=model_name)
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=3000,
-            chunk_overlap=200,
-            separators=["\nFile:", "\n\n", "\n", " ", ""] 
-        )
+        self.routing_policy = routing_policy or ModelRoutingPolicy.single_model(model_name)
+        self.usage_tracker = UsageTracker()
+        self.progress = progress or ProgressReporter()
+        # Final README tokens are streamed to this callback when the model supports streaming
+        self.on_token = on_token
+        self.text_splitter = make_code_splitter()
+        # Checked before every LLM call, a cancelled generation stops sending requests
+        self.cancellation = cancellation or CancellationToken()
+        # Deadline of the generation, map calls and reduce rounds are trimmed to leave time for the final call
+        self.time_budget = time_budget
 
     def _to_text(self, raw):
         if raw is None:
@@ -36,24 +64,243 @@ class Generators:
                     return v
         return str(raw)
 
-    def recursive_map_reduce(self, llm, documents: list[Document], map_prompt: str, reduce_prompt: str) -> str:
-        """Recursively splitting the text into chunks to process into a summary"""
+    def _invoke_with_usage(self, llm, prompt: str, stage: PipelineStage,
+                           prompt_tokens: Optional[int] = None, model: Optional[str] = None) -> tuple[str, int]:
+        """
+        Invoke the LLM through the shared rate limiter and record usage for the stage.
+        Token counts come from provider usage metadata, with TokenCalculator as fallback.
+        model is what llm runs, when it isn't the one the routing policy picks for the stage.
+
+        Returns:
+            The response text and its token count
+        """
+        self.cancellation.raise_if_cancelled()
+        start_time = time.time()
+        model = model or self.routing_policy.model_for(stage)
+        with tracing.span(f"llm.{stage.value}", model=model):
+            if stage == PipelineStage.FINAL and self._should_stream():
+                raw = llm_rate_limiter.invoke(llm, prompt, max_attempts=None, invoke_fn=self._stream_to_callback,
+                                              cancellation=self.cancellation)
+            else:
+                raw = llm_rate_limiter.invoke(llm, prompt, max_attempts=None, cancellation=self.cancellation)
+            return self._record_call(raw, prompt, stage, prompt_tokens, start_time, model)
+
+    async def _ainvoke_with_usage(self, llm, prompt: str, stage: PipelineStage,
+                                  prompt_tokens: Optional[int] = None, model: Optional[str] = None) -> tuple[str, int]:
+        """Async counterpart of _invoke_with_usage, waits on the rate limiter without holding a thread"""
+        self.cancellation.raise_if_cancelled()
+        start_time = time.time()
+        model = model or self.routing_policy.model_for(stage)
+        with tracing.span(f"llm.{stage.value}", model=model):
+            if stage == PipelineStage.FINAL and self._should_stream():
+                raw = await llm_rate_limiter.ainvoke(llm, prompt, max_attempts=None,
+                                                     ainvoke_fn=self._astream_to_callback, cancellation=self.cancellation)
+            else:
+                raw = await llm_rate_limiter.ainvoke(llm, prompt, max_attempts=None, cancellation=self.cancellation)
+            return self._record_call(raw, prompt, stage, prompt_tokens, start_time, model)
+
+    def _record_call(self, raw, prompt: str, stage: PipelineStage, prompt_tokens: Optional[int],
+                     start_time: float, model: str) -> tuple[str, int]:
+        text = self._to_text(raw)
+        provider_usage = extract_token_usage(raw)
+        if provider_usage:
+            prompt_tokens, completion_tokens = provider_usage
+        else:
+            if prompt_tokens is None:
+                prompt_tokens = self.tokenizer.count_token(prompt)
+            completion_tokens = self.tokenizer.count_token(text)
+        latency_seconds = time.time() - start_time
+        self.usage_tracker.record(
+            stage.value,
+            model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency_seconds=latency_seconds,
+            from_provider=provider_usage is not None
+        )
+        # Includes the wait for the rate limiter, which is part of what the next call will cost too
+        call_latency.observe(stage.value, latency_seconds)
+        pipeline_metrics.observe_stage(self.CALL_METRIC_STAGES.get(stage, stage.value), latency_seconds)
+        call_span = tracing.current_span()
+        if call_span is not None:
+            call_span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                          usage_from_provider=provider_usage is not None)
+        return text, completion_tokens
+
+    def _should_stream(self) -> bool:
+        model_config = get_model_config(self.routing_policy.model_for(PipelineStage.FINAL))
+        return self.on_token is not None and (model_config is None or model_config.supports_streaming)
+
+    def _stream_to_callback(self, llm, prompt: str):
+        """
+        Stream the response through on_token and return the aggregated message,
+        so usage metadata is read the same way as for a plain invoke.
+        """
+        aggregated = None
+        streamed = False
+        try:
+            for chunk in llm.stream(prompt):
+                # Leaving the loop closes the stream, so the provider stops generating
+                self.cancellation.raise_if_cancelled()
+                text = self._to_text(chunk)
+                if text:
+                    self.on_token(text)
+                    streamed = True
+                aggregated = chunk if aggregated is None else aggregated + chunk
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            if not streamed:
+                raise  # Nothing was sent yet, the rate limiter may safely retry
+            # Retrying now would send duplicate tokens to the listener
+            raise RuntimeError(f"README stream was interrupted: {type(e).__name__}") from e
+        return aggregated
+
+    async def _astream_to_callback(self, llm, prompt: str):
+        aggregated = None
+        streamed = False
+        try:
+            async for chunk in llm.astream(prompt):
+                self.cancellation.raise_if_cancelled()
+                text = self._to_text(chunk)
+                if text:
+                    self.on_token(text)
+                    streamed = True
+                aggregated = chunk if aggregated is None else aggregated + chunk
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            if not streamed:
+                raise
+            raise RuntimeError(f"README stream was interrupted: {type(e).__name__}") from e
+        return aggregated
+
+    def affordable_calls(self, stage: PipelineStage, concurrency: int = 1) -> Optional[int]:
+        """LLM calls of the stage that fit the time budget before the final call, None without a budget"""
+        if self.time_budget is None:
+            return None
+        seconds_per_call = self.time_budget.seconds_per_call(stage.value, concurrency, llm_rate_limiter.current_delay)
+        return self.time_budget.affordable_calls(seconds_per_call)
+
+    def _record_capped_calls(self, stage: PipelineStage, made: int, planned: int):
+        kind = "map_calls_capped" if stage == PipelineStage.MAP else "reduce_calls_capped"
+        print(f"⏱️ Time budget: {made} of {planned} {stage.value} calls")
+        self.time_budget.degrade(kind, f"summarized {made} of {planned} chunks")
+
+    def _skip_reduce_round(self, combined_summaries: str) -> str:
+        """Cut the summaries to the README input size instead of spending another reduce round"""
+        max_tokens = self.tokenizer.get_max_input_tokens_for_readme() - 1
+        print(f"⏱️ Time budget: skipping reduce round, truncating summaries to {max_tokens} tokens")
+        self.time_budget.degrade("skipped_reduce_rounds",
+                                 f"truncated summaries to {max_tokens} tokens instead of another reduce round")
+        return self.tokenizer.truncate_to_tokens(combined_summaries, max_tokens)
+
+    def _can_afford_reduce_round(self, calls: int, concurrency: int = 1) -> bool:
+        affordable = self.affordable_calls(PipelineStage.RE_REDUCE, concurrency)
+        return affordable is None or affordable >= calls
+
+    def _invoke(self, llm, prompt: str, stage: PipelineStage) -> str:
+        return self._invoke_with_usage(llm, prompt, stage)[0]
+
+    def log_usage_summary(self):
+        """Print the per-stage call count, latency and estimated cost of this generation"""
+        usage = self.usage_tracker.summary()
+        print(f"💰 LLM usage: {usage['llm_calls']} calls, ~${usage['estimated_cost']:.4f}")
+        for stage, stage_usage in usage["stages"].items():
+            print(f"   {stage}: {stage_usage['calls']} calls, {stage_usage['latency_seconds']}s, "
+                  f"~${stage_usage['estimated_cost']:.4f} ({', '.join(stage_usage['models'])})")
+
+    def recursive_map_reduce(self, llm, documents: list[Document], map_prompt: str, reduce_prompt: str,
+                             stage: PipelineStage = PipelineStage.MAP, model: Optional[str] = None) -> str:
+        """Recursively splitting the text into chunks to process into a summary, calls are priced as model if given"""
+        round_start = time.perf_counter()
+        prompts = build_map_prompts(documents, map_prompt)
+        prompt_token_counts = self.tokenizer.count_tokens_batch(prompts)
 
         summaries = []
-        for document in documents:
-            curr_prompt = map_prompt.replace('{text}', str(document))
-            summaries.append(self._to_text(llm_rate_limiter.invoke(llm, curr_prompt, max_attempts=None)))
+        summary_token_counts = []
+        progress_stage = "summarizing" if stage == PipelineStage.MAP else "reducing"
+        with tracing.span(f"{stage.value}.round", chunks=len(prompts)):
+            for curr_prompt, prompt_tokens in zip(prompts, prompt_token_counts):
+                self.cancellation.raise_if_cancelled()
+                # Chunks come in priority order, keep what has been summarized once the budget runs out
+                if summaries and self.affordable_calls(stage) == 0:
+                    self._record_capped_calls(stage, len(summaries), len(prompts))
+                    break
+                summary, summary_tokens = self._invoke_with_usage(llm, curr_prompt, stage, prompt_tokens=prompt_tokens,
+                                                                  model=model)
+                summaries.append(summary)
+                summary_token_counts.append(summary_tokens)
+                self.progress.report(progress_stage, done=len(summaries), total=len(prompts))
         
         combined_summaries = '\n\n'.join(summaries)
-
-        if not self.tokenizer.is_summary_within_size(combined_summaries):
-            combined_summary_chunks = self.text_splitter.split_text(combined_summaries)
-            combined_summary_to_docs = [Document(page_content=chunk) for chunk in combined_summary_chunks]
-            reduced_summary = self.recursive_map_reduce(llm, combined_summary_to_docs, map_prompt, reduce_prompt)
+        if stage == PipelineStage.RE_REDUCE:
+            pipeline_metrics.observe_stage("reduce_round", time.perf_counter() - round_start)
+
+        re_reduce_documents = self._re_reduce_documents(combined_summaries, summary_token_counts)
+        if re_reduce_documents and not self._can_afford_reduce_round(len(re_reduce_documents)):
+            return self._skip_reduce_round(combined_summaries)
+        if re_reduce_documents:
+            reduced_summary = self.recursive_map_reduce(llm, re_reduce_documents, map_prompt, reduce_prompt,
+                                                        stage=PipelineStage.RE_REDUCE, model=model)
             return reduced_summary
 
         return combined_summaries
-            
+
+    async def amap_reduce_prompts(self, llm, prompts: List[str], prompt_token_counts: List[int], map_prompt: str,
+                                  reduce_prompt: str, stage: PipelineStage = PipelineStage.MAP,
+                                  model: Optional[str] = None) -> str:
+        """
+        Async counterpart of recursive_map_reduce over already built prompts.
+        Up to MAP_CONCURRENCY map calls are in flight at once, summaries keep the chunk order.
+        """
+        round_start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.MAP_CONCURRENCY)
+        progress_stage = "summarizing" if stage == PipelineStage.MAP else "reducing"
+        done = 0
+
+        affordable = self.affordable_calls(stage, self.MAP_CONCURRENCY)
+        if affordable is not None and affordable < len(prompts):
+            # Chunks come in priority order, the first ones that fit the budget are summarized
+            made = max(affordable, 1)
+            self._record_capped_calls(stage, made, len(prompts))
+            prompts, prompt_token_counts = prompts[:made], prompt_token_counts[:made]
+
+        async def summarize(curr_prompt: str, prompt_tokens: int):
+            nonlocal done
+            async with semaphore:
+                result = await self._ainvoke_with_usage(llm, curr_prompt, stage, prompt_tokens=prompt_tokens,
+                                                        model=model)
+            done += 1
+            self.progress.report(progress_stage, done=done, total=len(prompts))
+            return result
+
+        with tracing.span(f"{stage.value}.round", chunks=len(prompts)):
+            results = await asyncio.gather(*[
+                summarize(curr_prompt, prompt_tokens) for curr_prompt, prompt_tokens in zip(prompts, prompt_token_counts)
+            ])
+        combined_summaries = '\n\n'.join(summary for summary, _ in results)
+        if stage == PipelineStage.RE_REDUCE:
+            pipeline_metrics.observe_stage("reduce_round", time.perf_counter() - round_start)
+
+        re_reduce_documents = self._re_reduce_documents(combined_summaries, [tokens for _, tokens in results])
+        if re_reduce_documents and not self._can_afford_reduce_round(len(re_reduce_documents), self.MAP_CONCURRENCY):
+            return self._skip_reduce_round(combined_summaries)
+        if re_reduce_documents:
+            re_reduce_prompts = build_map_prompts(re_reduce_documents, map_prompt)
+            return await self.amap_reduce_prompts(llm, re_reduce_prompts,
+                                                  self.tokenizer.count_tokens_batch(re_reduce_prompts),
+                                                  map_prompt, reduce_prompt, stage=PipelineStage.RE_REDUCE, model=model)
+        return combined_summaries
+
+    def _re_reduce_documents(self, combined_summaries: str, summary_token_counts: List[int]) -> List[Document]:
+        """Chunks for another reduce round if the combined summaries are over budget, empty otherwise"""
+        # Sum of per-summary counts instead of re-encoding the joined text at every level
+        combined_tokens = self.tokenizer.count_joined_tokens(summary_token_counts, '\n\n')
+        if self.tokenizer.is_token_count_within_size(combined_tokens):
+            return []
+        combined_summary_chunks = self.text_splitter.split_text(combined_summaries)
+        return [Document(page_content=chunk) for chunk in combined_summary_chunks]
 
     def summarize_code(self, llm, code_text) -> str:
         """
@@ -67,41 +314,30 @@ class Generators:
         """  
         # Split the code text into chunks
 
-        chunks = self.text_splitter.split_text(code_text)
+        with pipeline_metrics.timed_stage("split"), tracing.span("split", chars=len(code_text)) as split_span:
+            chunks = self.text_splitter.split_text(code_text)
+            if split_span:
+                split_span.set(chunks=len(chunks))
+        pipeline_metrics.observe_count("chunks", len(chunks))
         documents = [Document(page_content=chunk) for chunk in chunks]
 
-        #TODO: Write better prompts, ensuring that the hardcoded words are not used
-        map_prompt = "Summarize the code chunk in 200 words: \n\n{text}"
-        reduce_prompt = "Combine the summaries into one approximately of 1500 tokens keeping all the main component and essense of the summaries: {text}"
-        short_summary = self.recursive_map_reduce(llm, documents, map_prompt=map_prompt, reduce_prompt=reduce_prompt)
+        short_summary = self.recursive_map_reduce(llm, documents, map_prompt=self.MAP_PROMPT, reduce_prompt=self.REDUCE_PROMPT)
         return short_summary
-    
-    def generate_readme(self, llm, summary: str) -> str:
 
+    async def asummarize_prepared(self, llm, prompts: List[str], prompt_token_counts: List[int]) -> str:
+        """Summarize code from map prompts built by utils.chunking.prepare_map_prompts"""
+        return await self.amap_reduce_prompts(llm, prompts, prompt_token_counts,
+                                              map_prompt=self.MAP_PROMPT, reduce_prompt=self.REDUCE_PROMPT)
+
+    def _ensure_summary_text(self, summary) -> str:
         # Ensure summary is a string
         if not isinstance(summary, str):
             print(f"Warning: summary is not a string, but {type(summary)}. Converting to string.")
             summary = str(summary)
+        return summary
 
-        # This check is not required as we are ensuring this condition in summarize method,
-        # but still keeping it here just in case
-        if not self.tokenizer.is_summary_within_size(summary):
-            docs = [Document(page_content=summary)]
-
-            split_docs = self.text_splitter.split_documents(docs)
-
-            map_prompt = "This part of summary is more than expected size, condense it even further while keeping the essense and important concepts intact: {text}"
-
-            reduce_prompt = "Take these part of condensed summaries, and make them better while maintaining the overall summary size {text}"
-
-            # Get condensed summary
-            condensed_result = self.recursive_map_reduce(llm, docs, map_prompt, reduce_prompt)
-            condensed_summary = condensed_result if isinstance(condensed_result, str) else condensed_result.get('output_text', '')
-            summary = condensed_summary
-        else:
-            condensed_summary = summary
-
-        prompt = f"""
+    def _readme_prompt(self, condensed_summary: str) -> str:
+        return f"""
         You are a professional technical writer. Based on the following codebase summary, generate a complete README.md file. 
         Include: 
         - Project Title: Clear and descriptive
@@ -122,7 +358,49 @@ class Generators:
         {condensed_summary}
         """
 
-        return self._to_text(llm_rate_limiter.invoke(llm, prompt, max_attempts=None))
+    def generate_readme(self, llm, summary: str) -> str:
+
+        summary = self._ensure_summary_text(summary)
+
+        # This check is not required as we are ensuring this condition in summarize method,
+        # but still keeping it here just in case
+        within_size = self.tokenizer.is_summary_within_size(summary)
+        if not within_size and not self._can_afford_reduce_round(1):
+            condensed_summary = self._skip_reduce_round(summary)
+        elif not within_size:
+            docs = [Document(page_content=summary)]
+
+            # Get condensed summary, with the final model that llm runs
+            condensed_summary = self.recursive_map_reduce(llm, docs, self.CONDENSE_MAP_PROMPT,
+                                                          self.CONDENSE_REDUCE_PROMPT, stage=PipelineStage.RE_REDUCE,
+                                                          model=self.routing_policy.model_for(PipelineStage.FINAL))
+        else:
+            condensed_summary = summary
+
+        prompt = self._readme_prompt(condensed_summary)
+
+        self.progress.report("generating")
+        return self._invoke(llm, prompt, PipelineStage.FINAL)
+
+    async def agenerate_readme(self, llm, summary: str) -> str:
+        """Async counterpart of generate_readme"""
+        summary = self._ensure_summary_text(summary)
+
+        within_size = self.tokenizer.is_summary_within_size(summary)
+        if not within_size and not self._can_afford_reduce_round(1):
+            condensed_summary = self._skip_reduce_round(summary)
+        elif not within_size:
+            prompts = build_map_prompts([Document(page_content=summary)], self.CONDENSE_MAP_PROMPT)
+            condensed_summary = await self.amap_reduce_prompts(llm, prompts, self.tokenizer.count_tokens_batch(prompts),
+                                                               self.CONDENSE_MAP_PROMPT, self.CONDENSE_REDUCE_PROMPT,
+                                                               stage=PipelineStage.RE_REDUCE,
+                                                               model=self.routing_policy.model_for(PipelineStage.FINAL))
+        else:
+            condensed_summary = summary
+
+        self.progress.report("generating")
+        text, _ = await self._ainvoke_with_usage(llm, self._readme_prompt(condensed_summary), PipelineStage.FINAL)
+        return text
 
     # TODO: This method needs to be fixed after the basic one is robust. 
     def generate_readme_with_examples_vectorstore(self, llm, embeddings, summary: str) -> str:
@@ -132,30 +410,15 @@ class Generators:
             print(f"Warning: summary is not a string, but {type(summary)}. Converting to string.")
             summary = str(summary)
 
-        # Collect example files
-        example_docs = []
-        for root, dirs, files in os.walk("examples"):
-            for file in files:
-                if file.endswith(('.md')):
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            example_docs.append(Document(
-                                page_content=content,
-                                metadata={"source": file_path, "type": "example"}
-                            ))
-                    except Exception as e:
-                        print(f"Error reading example file {file}: {e}")
-
-        if not example_docs:
+        if embeddings is None or not example_index.has_examples():
             print("No example files found. Using standard README generation.")
             return self.generate_readme(llm, summary)
 
-        # Create vector store from examples
-        vectorstore = FAISS.from_documents(example_docs, embeddings)
         # Systematically condense summary if too large
         if len(summary) > 800:
+            from langchain.chains.summarize import load_summarize_chain
+            from langchain_core.prompts import PromptTemplate
+
             text_splitter = RecursiveCharacterTextSplitter(
                 chunk_size=600,
                 chunk_overlap=100,
@@ -184,14 +447,29 @@ class Generators:
                 )
             )
             
-            condensed_result = chain.invoke({"input_documents": split_docs})
+            usage_callback = UsageCallbackHandler(
+                self.usage_tracker,
+                PipelineStage.RE_REDUCE.value,
+                self.routing_policy.model_for(PipelineStage.FINAL),
+                estimate_tokens=self.tokenizer.count_token
+            )
+            self.cancellation.raise_if_cancelled()
+            condensed_result = chain.invoke({"input_documents": split_docs}, config={"callbacks": [usage_callback]})
             summary_for_search = condensed_result['output_text'] if isinstance(condensed_result, dict) else str(condensed_result)
         else:
             summary_for_search = summary
 
         print("summary for searchy", summary_for_search)
         # Retrieve most relevant examples for this summary
-        relevant_examples = vectorstore.similarity_search(summary_for_search, k=2)
+        embedding_start = time.time()
+        relevant_examples = example_index.similarity_search(embeddings, summary_for_search, k=2)
+        self.usage_tracker.record(
+            PipelineStage.EMBEDDINGS.value,
+            getattr(embeddings, "deployment", None) or "text-embedding-ada-002",
+            prompt_tokens=self.tokenizer.count_token(summary_for_search),
+            completion_tokens=0,
+            latency_seconds=time.time() - embedding_start
+        )
         # Systematically process example content
         processed_examples = []
         for doc in relevant_examples:
@@ -233,4 +511,5 @@ class Generators:
 
     Generate a complete, well-structured README.md following the sections above. If any section is not applicable based on the summary, you may omit it. Focus on technical accuracy and clarity.
     """
-        return llm.invoke(prompt)
\ No newline at end of file
+        self.progress.report("generating")
+        return self._invoke(llm, prompt, PipelineStage.FINAL)
\ No newline at end of file
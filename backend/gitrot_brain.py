@@ -1,8 +1,4 @@
 from dotenv import load_dotenv
-from langchain_openai import OpenAI as LangchainOpenAI
-from langchain_openai import AzureChatOpenAI
-from langchain_openai import AzureOpenAIEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI
 from config.model_config import get_model_config, ModelProvider
 from config.model_credential_factory import model_credential_factory
 from models.request_models import CustomCredentials
@@ -45,21 +41,48 @@ class GitrotBrain:
         else:
             raise ValueError("No valid custom credentials provided")
         
-    def get_llm(self):
-        if self.model_config.provider == ModelProvider.AZURE_OPENAI:
+    def _build_llm(self, model_config, model_credentials: dict):
+        # Provider SDKs are imported on first use to keep process start-up fast
+        if model_config.provider == ModelProvider.AZURE_OPENAI:
+            from langchain_openai import AzureChatOpenAI
             return AzureChatOpenAI(
-                max_tokens=self.model_config.max_output_tokens,
-                **self.model_credentials  # Unpack credentials dictionary
+                max_tokens=model_config.max_output_tokens,
+                **model_credentials  # Unpack credentials dictionary
             )
 
-        elif self.model_config.provider == ModelProvider.GOOGLE:
+        elif model_config.provider == ModelProvider.GOOGLE:
+            from langchain_google_genai import ChatGoogleGenerativeAI
             return ChatGoogleGenerativeAI(
-                model=self.model_config.name,  # Use actual model name
-                max_output_tokens=self.model_config.max_output_tokens,
+                model=model_config.name,  # Use actual model name
+                max_output_tokens=model_config.max_output_tokens,
                 convert_system_message_to_human=True,
-                **self.model_credentials  # Unpack credentials dictionary
+                **model_credentials  # Unpack credentials dictionary
             )
 
+    def get_llm(self):
+        return self._build_llm(self.model_config, self.model_credentials)
+
+    def get_llm_for_model(self, model_name: str):
+        """
+        Get an LLM for another hosted model, used for tiered routing of pipeline stages.
+        Returns None if the model is unknown or its hosted credentials are not configured.
+        """
+        if model_name == self.model_name:
+            return self.get_llm()
+        if self.custom_credentials:
+            return None  # Custom credentials only cover the requested model
+
+        model_config = get_model_config(model_name=model_name)
+        if not model_config:
+            return None
+        try:
+            model_credentials = model_credential_factory.get_model_credentials(model_name=model_name)
+        except ValueError:
+            return None
+        if not (model_credentials.get('api_key') or model_credentials.get('google_api_key')):
+            return None
+        return self._build_llm(model_config, model_credentials)
+
     def getEmbeddingModel(self):
         """Only works with hosted service for now"""
         if self.custom_credentials:
@@ -75,7 +98,8 @@ class GitrotBrain:
                 embedding_credentials['azure_deployment'] = 'text-embedding-ada-002'
             else:
                 return None
-                
+
+        from langchain_openai import AzureOpenAIEmbeddings
         return AzureOpenAIEmbeddings(
             **embedding_credentials
         )
\ No newline at end of file
@@ -1,10 +1,13 @@
 import os
 import shutil
-from git import Repo
 import subprocess
 import logging
+import functools
 import uuid
 import time
+from typing import Optional
+from utils.cancellation import CancellationToken
+from utils import tracing
 
 # Azure best practice: Configure logging for deployment monitoring
 logging.basicConfig(
@@ -12,23 +15,32 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+
+# Files with these extensions are read into the code text for summarization
+TEXT_EXTENSIONS = {'.py', '.md', '.txt', '.json', '.yaml', '.yml', '.csv', '.ini', '.cfg', '.xml', '.html', '.js', '.css', '.java', '.c', '.cpp', '.ts', '.go', '.rs', '.rb', '.php', '.sh', '.bat'}
+
+@functools.lru_cache(maxsize=1)
 def configure_git_for_azure():
-    """Configure Git for Azure App Service deployment."""
+    """
+    Configure Git for Azure App Service deployment.
+
+    The probe runs once per process on first use (not at import) and the result is cached.
+    """
     try:
         # Azure best practice: Set Git environment variables
         os.environ['GIT_PYTHON_REFRESH'] = 'quiet'
         
         # Check if git is available
-        try:
-            git_path = subprocess.check_output(['which', 'git'], text=True).strip()
+        git_path = shutil.which('git')
+        if git_path:
             os.environ['GIT_PYTHON_GIT_EXECUTABLE'] = git_path
             logger.info(f"✅ Azure: Git found at {git_path}")
             
             # Verify git version
-            git_version = subprocess.check_output(['git', '--version'], text=True).strip()
+            git_version = subprocess.check_output([git_path, '--version'], text=True).strip()
             logger.info(f"✅ Azure: {git_version}")
             
-        except subprocess.CalledProcessError:
+        else:
             logger.warning("⚠️ Azure: Git not found in PATH")
             
             # Azure fallback: Try common Git paths
@@ -53,30 +65,102 @@ def configure_git_for_azure():
         logger.error(f"❌ Azure Git configuration error: {str(e)}")
         return False
 
-# Azure deployment: Configure Git before imports
-git_configured = configure_git_for_azure()
+
+# Files that describe a project best come first when only part of a repository can be read
+PRIORITY_FILE_NAMES = {'readme.md', 'readme.txt', 'readme', 'package.json', 'pyproject.toml', 'setup.py', 'setup.cfg',
+                       'requirements.txt', 'cargo.toml', 'go.mod', 'pom.xml', 'composer.json', 'gemfile'}
+ENTRY_POINT_STEMS = {'main', 'app', 'index', 'server', 'cli', '__main__', 'manage', 'wsgi', 'asgi'}
+LOW_PRIORITY_PARTS = {'test', 'tests', 'spec', 'specs', 'examples', 'example', 'docs', 'fixtures', 'vendor',
+                      'third_party', 'node_modules', 'dist', 'build', 'migrations'}
+
+def file_priority(relative_path: str) -> tuple:
+    """
+    Sort key for reading files under a budget, lower first:
+    manifests and READMEs, then entry points, then source by depth; tests, docs and vendored code last.
+    """
+    parts = relative_path.replace('\\', '/').lower().split('/')
+    name = parts[-1]
+    stem = os.path.splitext(name)[0]
+    depth = len(parts) - 1
+    if any(part in LOW_PRIORITY_PARTS for part in parts[:-1]) or stem.startswith('test_') or stem.endswith('_test'):
+        rank = 3
+    elif name in PRIORITY_FILE_NAMES and depth == 0:
+        rank = 0
+    elif stem in ENTRY_POINT_STEMS:
+        rank = 1
+    else:
+        rank = 2
+    return rank, depth, relative_path
 
 
 class Helper:
-    def extract_code_from_repo(self, folder_name: str)-> str:
-        code_text = ""
-        for root, dirs, files in os.walk(folder_name):
-            for file in files:
-                try:
-                    file_path = os.path.join(root, file)
+
+    # A clone still running after this long is killed, so a huge or stalled repository can't hold a worker
+    CLONE_TIMEOUT_SECONDS = float(os.getenv("GITROT_CLONE_TIMEOUT_SECONDS", "600"))
+
+    def __init__(self):
+        self.extracted_file_count = 0
+        self.skipped_file_count = 0
+
+    def extract_code_from_repo(self, folder_name: str, cancellation: Optional[CancellationToken] = None,
+                               max_chars: Optional[int] = None)-> str:
+        """
+        Read the text files of a repository into one string, one "File:" section per file.
+        With max_chars, files are read in priority order (see file_priority) until the budget
+        is spent and the rest are counted in skipped_file_count.
+        """
+        self.extracted_file_count = 0
+        self.skipped_file_count = 0
+        with tracing.span("repo.walk") as walk_span:
+            file_paths = []
+            for root, dirs, files in os.walk(folder_name):
+                for file in files:
                     # Check if the file has a typical text file extension
-                    text_extensions = {'.py', '.md', '.txt', '.json', '.yaml', '.yml', '.csv', '.ini', '.cfg', '.xml', '.html', '.js', '.css', '.java', '.c', '.cpp', '.ts', '.go', '.rs', '.rb', '.php', '.sh', '.bat'}
                     _, ext = os.path.splitext(file)
-                    if ext.lower() not in text_extensions:
-                        continue
+                    if ext.lower() in TEXT_EXTENSIONS:
+                        file_paths.append(os.path.join(root, file))
+            if max_chars is not None:
+                file_paths.sort(key=lambda path: file_priority(os.path.relpath(path, folder_name)))
+            if walk_span:
+                walk_span.set(text_files=len(file_paths))
+
+        with tracing.span("repo.read", max_chars=max_chars) as read_span:
+            sections = []
+            total_chars = 0
+            for index, file_path in enumerate(file_paths):
+                if cancellation is not None:
+                    cancellation.raise_if_cancelled()
+                # Once the budget is spent the remaining files are counted, never opened
+                if max_chars is not None and sections and total_chars + self._file_size(file_path) > max_chars:
+                    self.skipped_file_count += len(file_paths) - index
+                    break
+                try:
                     with open(file_path, 'r', encoding='utf-8') as f:
                         content = f.read()
-                        code_text += f"File: {file_path}\n{content}\n\n"
                 except Exception as e:
-                    print(f"Error reading file {file}: {e}")
-        return code_text
+                    print(f"Error reading file {os.path.basename(file_path)}: {e}")
+                    continue
+                section = f"File: {file_path}\n{content}\n\n"
+                if max_chars is not None and sections and total_chars + len(section) > max_chars:
+                    self.skipped_file_count += len(file_paths) - index
+                    break
+                sections.append(section)
+                total_chars += len(section)
+                self.extracted_file_count += 1
+            if read_span:
+                read_span.set(files=self.extracted_file_count, skipped_files=self.skipped_file_count, chars=total_chars)
+        return "".join(sections)
     
-    def clone_repo(self, github_url: str, folder_name: str="cloned_repo")-> str:
+    @staticmethod
+    def _file_size(file_path: str) -> int:
+        """Size in bytes, an upper bound on the characters of a UTF-8 file. 0 if unknown, reading reports the error"""
+        try:
+            return os.path.getsize(file_path)
+        except OSError:
+            return 0
+
+    def clone_repo(self, github_url: str, folder_name: str="cloned_repo",
+                   cancellation: Optional[CancellationToken] = None)-> str:
         # Create projects directory if it doesn't exist
         projects_dir = "projects"
         if not os.path.exists(projects_dir):
@@ -98,9 +182,13 @@ class Helper:
             unique_folder_name = f"{folder_name}_{timestamp}_{retry_count}_{unique_suffix}"
             full_path = os.path.join(projects_dir, unique_folder_name)
         
+        # Azure deployment: Locate the git executable
+        configure_git_for_azure()
+
         try:
             print(f"🔄 Cloning {github_url} into '{full_path}'...")
-            Repo.clone_from(github_url, full_path)
+            with tracing.span("git.clone", repo_url=github_url):
+                self._run_git_clone(github_url, full_path, cancellation)
             print(f"✅ Repository cloned successfully into '{full_path}'")
             return full_path
             
@@ -117,6 +205,65 @@ class Helper:
             
             raise
     
+    def _run_git_clone(self, github_url: str, full_path: str, cancellation: Optional[CancellationToken] = None):
+        """
+        Clone in a git subprocess, which is killed as soon as the cancellation token is cancelled
+        or after CLONE_TIMEOUT_SECONDS
+        """
+        if cancellation is not None:
+            cancellation.raise_if_cancelled()
+        git_path = os.environ.get('GIT_PYTHON_GIT_EXECUTABLE') or shutil.which('git')
+        if git_path is None:
+            raise RuntimeError("git executable not found")
+
+        # "--" keeps the URL from being read as an option, and the ext:: transport runs arbitrary commands
+        process = subprocess.Popen(
+            [git_path, "-c", "protocol.ext.allow=never", "clone", "--quiet", "--", github_url, full_path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+        )
+        unregister = cancellation.on_cancel(process.kill) if cancellation is not None else None
+        try:
+            _, stderr = process.communicate(timeout=self.CLONE_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise RuntimeError(f"git clone timed out after {self.CLONE_TIMEOUT_SECONDS:g}s")
+        finally:
+            if unregister is not None:
+                unregister()
+
+        if cancellation is not None:
+            cancellation.raise_if_cancelled()
+        if process.returncode != 0:
+            raise RuntimeError(f"git clone failed with exit code {process.returncode}: {stderr.strip()[-500:]}")
+
+    def head_commit(self, repo_path: str) -> Optional[str]:
+        """
+        Commit SHA checked out in a clone, read from .git without starting git. None if unknown
+        """
+        git_dir = os.path.join(repo_path, '.git')
+        try:
+            with open(os.path.join(git_dir, 'HEAD'), 'r', encoding='utf-8') as f:
+                head = f.read().strip()
+            if not head.startswith('ref: '):
+                return head or None
+            ref = head[len('ref: '):]
+            ref_path = os.path.join(git_dir, *ref.split('/'))
+            if os.path.exists(ref_path):
+                with open(ref_path, 'r', encoding='utf-8') as f:
+                    return f.read().strip() or None
+            with open(os.path.join(git_dir, 'packed-refs'), 'r', encoding='utf-8') as f:
+                for line in f:
+                    sha, _, name = line.strip().partition(' ')
+                    if name == ref:
+                        return sha
+        except OSError as e:
+            logger.warning(f"Could not read HEAD commit of {repo_path}: {e}")
+        return None
+
     def delete_cloned_repo(self, folder_path: str) -> bool:
         """
         Delete the cloned repository folder for cleanup after processing.
@@ -130,7 +277,8 @@ class Helper:
         try:
             if os.path.exists(folder_path):
                 # Use shutil.rmtree to remove the entire directory tree
-                shutil.rmtree(folder_path)
+                with tracing.span("repo.delete"):
+                    shutil.rmtree(folder_path)
                 print(f"✅ Successfully deleted folder: {folder_path}")
                 return True
             else:
@@ -1,10 +1,23 @@
 from .request_models import ReadmeRequest
 from .request_models import ReadmeResponse
 from .request_models import CustomCredentials
+from .request_models import UsageSummary
+from .request_models import Degradation
+from .request_models import PeriodUsage
+from .job_models import JobSubmitResponse, JobStatusResponse
+from .history_models import HistoryEntry, HistoryEntryDetail, HistoryPage
 
 __all__ =[
     'ReadmeRequest',
     'ReadmeResponse',
-    'CustomCredentials'
+    'CustomCredentials',
+    'UsageSummary',
+    'Degradation',
+    'PeriodUsage',
+    'JobSubmitResponse',
+    'JobStatusResponse',
+    'HistoryEntry',
+    'HistoryEntryDetail',
+    'HistoryPage'
 ]
 
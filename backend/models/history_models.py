@@ -0,0 +1,29 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+from datetime import datetime
+
+class HistoryEntry(BaseModel):
+    """Model for a README in a user's generation history"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    repo_url: str
+    commit_sha: Optional[str] = None
+    model_name: str
+    generation_method: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latency_seconds: float = 0.0
+    readme_size: int
+    created_at: datetime
+
+class HistoryEntryDetail(HistoryEntry):
+    """Model for a history entry with its README"""
+    readme_content: str
+
+class HistoryPage(BaseModel):
+    """Model for one page of a user's generation history, newest first"""
+    items: List[HistoryEntry]
+    # Pass as ?cursor= for the next page, None on the last page
+    next_cursor: Optional[str] = None
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+from .request_models import ReadmeResponse
+
+class JobSubmitResponse(BaseModel):
+    """Model for an accepted README generation job"""
+    job_id: str
+    status: str
+    status_url: str
+
+class JobStatusResponse(BaseModel):
+    """Model for README generation job status, progress and result"""
+    job_id: str
+    status: str  # queued, running, succeeded, failed
+    stage: Optional[str] = None
+    progress: float = 0.0
+    result: Optional[ReadmeResponse] = None
+    error_message: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    # Registered user the job runs for, only they may read it. Never serialized
+    user_id: Optional[str] = Field(default=None, exclude=True)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
 
 class CustomCredentials(BaseModel):
     """User's own API credentials for AI services"""
@@ -22,11 +22,43 @@ class ReadmeRequest(BaseModel):
     provider: str = "azure_openai"
     max_tokens: int = 1000
     temperature: float = 0.3
+
+    # Tiered routing: chunk summaries go to a fast model, the final README to model_name
+    use_tiered_routing: bool = True
+    map_model_name: Optional[str] = None  # Overrides the provider's fast tier model
     
     # Configuration mode
     use_hosted_service: bool = True  # True = use our keys, False = use custom credentials
     custom_credentials: Optional[CustomCredentials] = None
 
+    # Seconds the generation may take, server default if unset. Near the deadline fewer files
+    # are read and reduce rounds are skipped rather than failing
+    time_budget_seconds: Optional[float] = Field(default=None, gt=0)
+
+class UsageSummary(BaseModel):
+    """LLM token usage and estimated cost of one generation"""
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latency_seconds: float = 0.0
+    estimated_cost: float = 0.0
+    stages: Dict[str, Dict[str, Any]] = {}  # map, re_reduce, final, embeddings
+
+class PeriodUsage(BaseModel):
+    """A requester's generations, tokens and estimated cost in one quota period"""
+    period: str  # UTC day, YYYY-MM-DD
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    estimated_cost: float = 0.0
+
+class Degradation(BaseModel):
+    """A shortcut taken to finish a generation within its time budget"""
+    kind: str  # reduced_file_coverage, map_calls_capped, reduce_calls_capped, skipped_reduce_rounds
+    detail: str = ""
+
 class ReadmeResponse(BaseModel):
     success: bool
     readme_content: str = ""
@@ -34,4 +66,6 @@ class ReadmeResponse(BaseModel):
     generation_timestamp: str
     repo_url: str
     generation_method: str
-    configuration_used: str = "hosted"  # "hosted" or "custom"
\ No newline at end of file
+    configuration_used: str = "hosted"  # "hosted" or "custom"
+    usage: Optional[UsageSummary] = None
+    degradations: List[Degradation] = []
\ No newline at end of file
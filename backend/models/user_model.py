@@ -44,4 +44,7 @@ class UserAuthResponse(BaseModel):
     is_new: bool
     email: str
     name: str
-    image: Optional[str] = None
\ No newline at end of file
+    image: Optional[str] = None
+    # Only for the login server, see services.auth_tokens
+    access_token: Optional[str] = None
+    access_token_expires_at: Optional[int] = None
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""Scheduling package - admission and ordering of generation work"""
+from .admission import AdmissionController, AdmissionRejected
+from .job_size import (
+    SizeAwareScheduler,
+    JobSchedule,
+    RepoSizeEstimate,
+    GitTreeSizeSource,
+    StaticSizeSource,
+    LARGE_LANE,
+)
+from .staged_pipeline import StagedPipeline
+from .fair_share import FairShareScheduler, Requester, acting_for, current_requester
+
+__all__ = [
+    "AdmissionController",
+    "AdmissionRejected",
+    "SizeAwareScheduler",
+    "JobSchedule",
+    "RepoSizeEstimate",
+    "GitTreeSizeSource",
+    "StaticSizeSource",
+    "LARGE_LANE",
+    "StagedPipeline",
+    "FairShareScheduler",
+    "Requester",
+    "acting_for",
+    "current_requester",
+]
@@ -0,0 +1,266 @@
+import asyncio
+import concurrent.futures
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_WAITING, _GRANTED, _ABANDONED = "waiting", "granted", "abandoned"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a generation can't be admitted, the API turns it into a 503 with Retry-After"""
+
+    def __init__(self, reason: str, retry_after_seconds: int):
+        super().__init__(f"Server is busy ({reason}), retry in {retry_after_seconds}s")
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+
+DEFAULT_LANE = "default"
+
+
+class _Waiter:
+    __slots__ = ("grant", "state", "enqueued_at", "lane", "owner")
+
+    def __init__(self, grant: Callable[[], None], lane: str = DEFAULT_LANE, owner: Any = None):
+        self.grant = grant
+        self.state = _WAITING
+        self.enqueued_at = time.monotonic()
+        self.lane = lane
+        self.owner = owner
+
+
+class AdmissionController:
+    """
+    Bounded admission queue in front of the generation worker pool.
+
+    At most max_concurrent generations hold a slot, which matches the pool size so the
+    executor never queues work invisibly. Up to max_queue_depth more wait for a slot in
+    priority order (arrival order by default) for at most max_wait_seconds; anything
+    beyond that is rejected right away with a Retry-After estimate.
+
+    Lanes cap how many slots one class of work may hold (e.g. large repositories), so
+    the remaining slots stay available to the other lanes.
+
+    Thread-safe: slots are released from worker threads, waiters live on the event loop.
+    wait_listener(owner, waited_seconds) is called for every admission, under the
+    controller's lock, so it must not call back into the controller.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue_depth: int, max_wait_seconds: float,
+                 lane_limits: Optional[Dict[str, int]] = None,
+                 wait_listener: Optional[Callable[[Any, float], None]] = None):
+        self.max_concurrent = max_concurrent
+        self.max_queue_depth = max_queue_depth
+        self.max_wait_seconds = max_wait_seconds
+        self.lane_limits = lane_limits or {}
+        self.wait_listener = wait_listener
+
+        self._lock = threading.Lock()
+        self._running = 0
+        self._lane_running: Dict[str, int] = {}
+        self._queued = 0
+        self._waiters: List[tuple] = []  # heap of (priority, sequence, waiter)
+        self._sequence = itertools.count()
+
+        # Service time estimate for Retry-After, exponentially weighted
+        self._average_hold_seconds = 30.0
+
+        self.admitted = 0
+        self.rejections: Dict[str, int] = {}
+        self.total_wait_seconds = 0.0
+        self.max_observed_wait_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, max_concurrent: int, lane_limits: Optional[Dict[str, int]] = None,
+                 wait_listener: Optional[Callable[[Any, float], None]] = None) -> "AdmissionController":
+        return cls(
+            max_concurrent=max_concurrent,
+            max_queue_depth=int(os.getenv("GITROT_ADMISSION_QUEUE_DEPTH", str(max_concurrent * 4))),
+            max_wait_seconds=float(os.getenv("GITROT_ADMISSION_MAX_WAIT_SECONDS", "30")),
+            lane_limits=lane_limits,
+            wait_listener=wait_listener,
+        )
+
+    def _has_capacity_locked(self, lane: str) -> bool:
+        lane_limit = self.lane_limits.get(lane)
+        return (self._running < self.max_concurrent and
+                (lane_limit is None or self._lane_running.get(lane, 0) < lane_limit))
+
+    def _occupy_locked(self, lane: str):
+        self._running += 1
+        self._lane_running[lane] = self._lane_running.get(lane, 0) + 1
+
+    def _try_admit_locked(self, lane: str, owner: Any = None) -> bool:
+        # Free capacity with waiters queued only happens when those waiters' lanes are full,
+        # so an arrival for a lane with room can go ahead of them
+        if self._has_capacity_locked(lane):
+            self._occupy_locked(lane)
+            self._record_admission_locked(0.0, owner)
+            return True
+        return False
+
+    def _record_admission_locked(self, waited_seconds: float, owner: Any = None):
+        self.admitted += 1
+        self.total_wait_seconds += waited_seconds
+        self.max_observed_wait_seconds = max(self.max_observed_wait_seconds, waited_seconds)
+        if self.wait_listener is not None:
+            try:
+                self.wait_listener(owner, waited_seconds)
+            except Exception as e:
+                logger.warning(f"Admission wait listener failed: {str(e)}")
+
+    def _enqueue_locked(self, waiter: _Waiter, priority: Optional[float]):
+        """Queue a waiter, lower priority values are granted first (arrival time by default)"""
+        if self._queued >= self.max_queue_depth:
+            raise self._reject_locked("queue_full")
+        key = waiter.enqueued_at if priority is None else priority
+        heapq.heappush(self._waiters, (key, next(self._sequence), waiter))
+        self._queued += 1
+
+    def _reject_locked(self, reason: str) -> AdmissionRejected:
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+        return AdmissionRejected(reason, self._retry_after_locked())
+
+    def _retry_after_locked(self) -> int:
+        # Time for the work ahead of a new arrival to drain through the pool
+        backlog = self._queued + 1
+        estimate = self._average_hold_seconds * backlog / max(self.max_concurrent, 1)
+        return int(min(max(math.ceil(estimate), 1), 300))
+
+    def raise_if_full(self):
+        """
+        Reject right away when there is neither a free slot nor room in the queue, so work done
+        before acquire() (sizing the repository) isn't spent on a request that would get a 503
+        """
+        with self._lock:
+            if self._running >= self.max_concurrent and self._queued >= self.max_queue_depth:
+                raise self._reject_locked("queue_full")
+
+    def record_rejection(self, reason: str) -> AdmissionRejected:
+        """Count a rejection decided outside the controller and build the matching error"""
+        with self._lock:
+            return self._reject_locked(reason)
+
+    async def acquire(self, priority: Optional[float] = None, lane: str = DEFAULT_LANE, owner: Any = None):
+        """
+        Wait for a generation slot, raises AdmissionRejected if the queue is full or the wait times out.
+        owner identifies who the slot is for in the wait_listener callbacks.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        with self._lock:
+            if self._try_admit_locked(lane, owner):
+                return
+            waiter = _Waiter(grant, lane, owner)
+            self._enqueue_locked(waiter, priority)
+
+        try:
+            await asyncio.wait_for(future, timeout=self.max_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if waiter.state == _WAITING:
+                    waiter.state = _ABANDONED
+                    self._queued -= 1
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise self._reject_locked("wait_timeout")
+                    raise
+            # The slot was granted as the wait ended, it is ours
+            if isinstance(e, asyncio.CancelledError):
+                self.release(lane=lane)
+                raise
+
+    def release(self, hold_seconds: Optional[float] = None, lane: str = DEFAULT_LANE):
+        """Free a slot and hand it to the best waiter whose lane has room, callable from any thread"""
+        with self._lock:
+            if hold_seconds is not None:
+                self._average_hold_seconds += 0.2 * (hold_seconds - self._average_hold_seconds)
+            self._running -= 1
+            self._lane_running[lane] = self._lane_running.get(lane, 1) - 1
+            next_waiter = None
+            blocked = []
+            while self._waiters:
+                entry = heapq.heappop(self._waiters)
+                waiter = entry[2]
+                if waiter.state != _WAITING:
+                    continue
+                if not self._has_capacity_locked(waiter.lane):
+                    blocked.append(entry)
+                    continue
+                waiter.state = _GRANTED
+                self._queued -= 1
+                self._occupy_locked(waiter.lane)
+                self._record_admission_locked(time.monotonic() - waiter.enqueued_at, waiter.owner)
+                next_waiter = waiter
+                break
+            for entry in blocked:
+                heapq.heappush(self._waiters, entry)
+        if next_waiter is not None:
+            next_waiter.grant()
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[float] = None, lane: str = DEFAULT_LANE, owner: Any = None):
+        """Hold a generation slot for the duration of the block"""
+        await self.acquire(priority, lane, owner)
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start_time, lane)
+
+    def submit(self,
+               executor: concurrent.futures.Executor,
+               fn: Callable[..., Any],
+               *args,
+               priority: Optional[float] = None,
+               lane: str = DEFAULT_LANE,
+               owner: Any = None):
+        """
+        Run fn on the executor once a slot is free, without blocking the caller.
+        Used for background jobs, which wait without a deadline but still count against the queue depth.
+        """
+        def run():
+            start_time = time.monotonic()
+            try:
+                fn(*args)
+            finally:
+                self.release(time.monotonic() - start_time, lane)
+
+        def grant():
+            executor.submit(run)
+
+        with self._lock:
+            if not self._try_admit_locked(lane, owner):
+                self._enqueue_locked(_Waiter(grant, lane, owner), priority)
+                return
+        grant()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._running,
+                "running_by_lane": {lane: count for lane, count in self._lane_running.items() if count},
+                "lane_limits": dict(self.lane_limits),
+                "queued": self._queued,
+                "max_concurrent": self.max_concurrent,
+                "max_queue_depth": self.max_queue_depth,
+                "max_wait_seconds": self.max_wait_seconds,
+                "admitted": self.admitted,
+                "rejected": sum(self.rejections.values()),
+                "rejections": dict(self.rejections),
+                "average_wait_seconds": round(self.total_wait_seconds / self.admitted, 3) if self.admitted else 0,
+                "max_observed_wait_seconds": round(self.max_observed_wait_seconds, 3),
+                "retry_after_seconds": self._retry_after_locked(),
+            }
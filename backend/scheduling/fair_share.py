@@ -0,0 +1,213 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from .job_size import JobSchedule
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS_TIER = "anonymous"
+USER_TIER = "user"
+
+
+@dataclass(frozen=True)
+class Requester:
+    """Who a generation is run for: a registered user, or an anonymous client by IP."""
+    key: str
+    tier: str
+
+    @classmethod
+    def for_user(cls, user_id: str, tier: str = USER_TIER) -> "Requester":
+        return cls(key=f"user:{user_id}", tier=tier)
+
+    @property
+    def user_id(self) -> Optional[str]:
+        """The registered user's id, None for anonymous clients"""
+        return self.key[len("user:"):] if self.key.startswith("user:") else None
+
+    @classmethod
+    def for_client(cls, client_host: str) -> "Requester":
+        # Hashed so client addresses don't show up in /metrics
+        digest = hashlib.sha256(client_host.encode("utf-8")).hexdigest()[:12]
+        return cls(key=f"ip:{digest}", tier=ANONYMOUS_TIER)
+
+
+# Requester of the generation running in the current thread or task, read by the LLM rate limiter
+current_requester: ContextVar[Optional[Requester]] = ContextVar("gitrot_requester", default=None)
+
+
+@contextmanager
+def acting_for(requester: Optional[Requester]):
+    """Attribute the LLM calls made inside the block to requester"""
+    token = current_requester.set(requester)
+    try:
+        yield
+    finally:
+        current_requester.reset(token)
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "tier=weight,tier=weight" into a dict, ignoring malformed entries"""
+    weights = {}
+    for item in spec.split(","):
+        tier, _, weight = item.partition("=")
+        try:
+            if tier.strip() and float(weight) > 0:
+                weights[tier.strip()] = float(weight)
+        except ValueError:
+            logger.warning(f"Ignoring malformed fair share weight: {item!r}")
+    return weights
+
+
+class _WaitStats:
+    __slots__ = ("tier", "count", "total_seconds", "max_seconds")
+
+    def __init__(self, tier: str):
+        self.tier = tier
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class FairShareScheduler:
+    """
+    Weighted fair queueing by requester, on a virtual clock.
+
+    Each requester has a clock that advances by cost / weight for every unit of work they
+    submit, starting from the arrival time when they have nothing outstanding:
+
+        tag = max(arrival, requester_clock) + cost / weight
+
+    Lower tags are served first. A requester with a batch of jobs gets tags further and
+    further in the future, so other requesters' work interleaves with theirs instead of
+    queueing behind it, and a requester with twice the weight gets twice the share.
+    Tags are comparable with plain arrival times, so unattributed work stays FIFO among them.
+
+    A clock runs at most max_lead_seconds ahead of real time, which bounds how long a
+    heavy requester waits once the others go quiet.
+    """
+
+    # Requesters tracked for clocks and wait statistics, least recently seen are dropped first
+    MAX_TRACKED_REQUESTERS = 10_000
+
+    def __init__(self,
+                 weights: Optional[Dict[str, float]] = None,
+                 default_weight: float = 1.0,
+                 max_lead_seconds: float = 300.0,
+                 tier_overrides: Optional[Dict[str, str]] = None):
+        self.weights = weights or {ANONYMOUS_TIER: 1.0, USER_TIER: 2.0}
+        self.default_weight = default_weight
+        self.max_lead_seconds = max_lead_seconds
+        self.tier_overrides = tier_overrides or {}
+
+        self._lock = threading.Lock()
+        self._clocks: "OrderedDict[str, float]" = OrderedDict()
+        self._waits: "OrderedDict[str, _WaitStats]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "FairShareScheduler":
+        overrides = os.getenv("GITROT_FAIR_SHARE_USER_TIERS", "")
+        return cls(
+            weights=parse_weights(os.getenv("GITROT_FAIR_SHARE_WEIGHTS", "anonymous=1,user=2")),
+            max_lead_seconds=float(os.getenv("GITROT_FAIR_SHARE_MAX_LEAD_SECONDS", "300")),
+            tier_overrides={
+                user_id.strip(): tier.strip()
+                for user_id, _, tier in (item.partition("=") for item in overrides.split(","))
+                if user_id.strip() and tier.strip()
+            },
+        )
+
+    def tier_for_user(self, user_id: str) -> str:
+        return self.tier_overrides.get(user_id, USER_TIER)
+
+    def weight_for(self, requester: Optional[Requester]) -> float:
+        if requester is None:
+            return self.default_weight
+        return self.weights.get(requester.tier, self.default_weight)
+
+    def current_requester(self) -> Optional[Requester]:
+        """Requester of the work running in the caller's context"""
+        return current_requester.get()
+
+    def tag(self, requester: Optional[Requester], cost: float, arrival: Optional[float] = None) -> float:
+        """Virtual finish time of cost seconds of work for requester, lower is served first"""
+        arrival = time.monotonic() if arrival is None else arrival
+        if requester is None:
+            return arrival + cost / self.default_weight
+        with self._lock:
+            start = max(arrival, self._clocks.get(requester.key, arrival))
+            finish = min(start + cost / self.weight_for(requester), arrival + self.max_lead_seconds)
+            self._clocks[requester.key] = finish
+            self._clocks.move_to_end(requester.key)
+            if len(self._clocks) > self.MAX_TRACKED_REQUESTERS:
+                self._clocks.popitem(last=False)
+            return finish
+
+    def apply(self, schedule: "JobSchedule", requester: Optional[Requester], base_cost: float = 0.0) -> "JobSchedule":
+        """
+        Re-tag a shortest-job-first schedule for fairness: the size delay becomes the job's cost,
+        plus base_cost so that even small jobs advance their requester's clock.
+        """
+        arrival = schedule.priority if schedule.arrival is None else schedule.arrival
+        cost = base_cost + (schedule.priority - arrival)
+        return replace(schedule, priority=self.tag(requester, cost, arrival), requester=requester)
+
+    def record_wait(self, requester: Optional[Requester], waited_seconds: float):
+        """Queue time of one unit of work, for the per-requester statistics"""
+        if requester is None:
+            return
+        with self._lock:
+            stats = self._waits.get(requester.key)
+            if stats is None:
+                stats = self._waits[requester.key] = _WaitStats(requester.tier)
+                if len(self._waits) > self.MAX_TRACKED_REQUESTERS:
+                    self._waits.popitem(last=False)
+            self._waits.move_to_end(requester.key)
+            stats.count += 1
+            stats.total_seconds += waited_seconds
+            stats.max_seconds = max(stats.max_seconds, waited_seconds)
+
+    def stats(self, top: int = 10) -> dict:
+        """Queue times by tier, and for the requesters that waited longest on average"""
+        with self._lock:
+            entries = list(self._waits.items())
+        by_tier: Dict[str, dict] = {}
+        for _, stats in entries:
+            tier = by_tier.setdefault(stats.tier, {"requesters": 0, "count": 0, "total": 0.0, "max": 0.0})
+            tier["requesters"] += 1
+            tier["count"] += stats.count
+            tier["total"] += stats.total_seconds
+            tier["max"] = max(tier["max"], stats.max_seconds)
+
+        longest = sorted(entries, key=lambda entry: entry[1].total_seconds / entry[1].count, reverse=True)[:top]
+        return {
+            "weights": dict(self.weights),
+            "requesters": len(entries),
+            "by_tier": {
+                name: {
+                    "requesters": tier["requesters"],
+                    "count": tier["count"],
+                    "average_wait_seconds": round(tier["total"] / tier["count"], 3),
+                    "max_wait_seconds": round(tier["max"], 3),
+                }
+                for name, tier in by_tier.items()
+            },
+            "longest_waits": [
+                {
+                    "requester": key,
+                    "tier": stats.tier,
+                    "count": stats.count,
+                    "average_wait_seconds": round(stats.total_seconds / stats.count, 3),
+                    "max_wait_seconds": round(stats.max_seconds, 3),
+                }
+                for key, stats in longest
+            ],
+        }
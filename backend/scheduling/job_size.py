@@ -0,0 +1,193 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Protocol
+from cachetools import TTLCache
+from helpers import TEXT_EXTENSIONS
+from .admission import DEFAULT_LANE
+from .fair_share import Requester
+
+logger = logging.getLogger(__name__)
+
+LARGE_LANE = "large"
+SMALL_LANE = DEFAULT_LANE
+
+
+@dataclass
+class RepoSizeEstimate:
+    """Pre-clone size of a repository, in files that the extractor would read."""
+    text_files: int
+    total_files: int
+    estimated_bytes: int
+    source: str
+
+    @property
+    def estimated_tokens(self) -> int:
+        return self.estimated_bytes // 4
+
+
+class RepoMetadataSource(Protocol):
+    """Anything that can size a repository before it is cloned."""
+
+    def estimate(self, repo_url: str) -> Optional[RepoSizeEstimate]:
+        ...
+
+
+class StaticSizeSource:
+    """Fixed sizes by repository URL, for local runs, benchmarks and tests."""
+
+    def __init__(self, estimates: Dict[str, RepoSizeEstimate]):
+        self.estimates = estimates
+
+    def estimate(self, repo_url: str) -> Optional[RepoSizeEstimate]:
+        return self.estimates.get(repo_url)
+
+
+class GitTreeSizeSource:
+    """
+    Sizes a repository from git alone, without downloading file contents:
+    `git ls-remote` resolves HEAD (and fails fast for missing repos), then a depth-1,
+    blob-less, no-checkout clone lists the tree. Results are cached by HEAD commit.
+    """
+
+    # Blob sizes aren't available without fetching blobs, so bytes come from an average
+    AVERAGE_TEXT_FILE_BYTES = 6000
+
+    def __init__(self, timeout_seconds: float = 10.0):
+        self.timeout_seconds = timeout_seconds
+        self._cache = TTLCache(maxsize=1024, ttl=24 * 3600)
+        self._lock = threading.Lock()
+
+    def _git(self, *args: str, cwd: Optional[str] = None) -> str:
+        git_path = shutil.which("git")
+        if git_path is None:
+            raise RuntimeError("git executable not found")
+        # The ext:: transport runs arbitrary commands, never let a repository URL pick it
+        return subprocess.run(
+            [git_path, "-c", "protocol.ext.allow=never", *args],
+            cwd=cwd,
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=self.timeout_seconds,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+        ).stdout
+
+    def head_commit(self, repo_url: str) -> Optional[str]:
+        # "--" keeps a URL starting with "-" from being read as an option (--upload-pack=...)
+        output = self._git("ls-remote", "--", repo_url, "HEAD").split()
+        return output[0] if output else None
+
+    def estimate(self, repo_url: str) -> Optional[RepoSizeEstimate]:
+        head = self.head_commit(repo_url)
+        if head is None:
+            return None
+        with self._lock:
+            cached = self._cache.get(head)
+        if cached is not None:
+            return cached
+
+        with tempfile.TemporaryDirectory(prefix="gitrot-size-") as workdir:
+            self._git("clone", "--quiet", "--depth", "1", "--filter=blob:none", "--no-checkout",
+                      "--", repo_url, workdir)
+            paths = self._git("ls-tree", "-r", "--name-only", "HEAD", cwd=workdir).splitlines()
+
+        text_files = sum(1 for path in paths if os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS)
+        estimate = RepoSizeEstimate(
+            text_files=text_files,
+            total_files=len(paths),
+            estimated_bytes=text_files * self.AVERAGE_TEXT_FILE_BYTES,
+            source="git",
+        )
+        with self._lock:
+            self._cache[head] = estimate
+        return estimate
+
+
+@dataclass
+class JobSchedule:
+    """Where a generation sits in the admission queue."""
+    priority: float
+    lane: str
+    estimate: Optional[RepoSizeEstimate] = None
+    arrival: Optional[float] = None
+    requester: Optional[Requester] = None
+
+    @classmethod
+    def fifo(cls, arrival: Optional[float] = None) -> "JobSchedule":
+        """Arrival order in the default lane, for jobs of unknown size"""
+        arrival = time.monotonic() if arrival is None else arrival
+        return cls(priority=arrival, lane=SMALL_LANE, arrival=arrival)
+
+
+class SizeAwareScheduler:
+    """
+    Shortest-job-first ordering for the admission queue.
+
+    A job's priority is its arrival time plus a delay proportional to its estimated size,
+    so small repositories overtake large ones. The delay is capped at max_delay_seconds,
+    which bounds how long a large job can be overtaken (aging) and keeps the tail in check.
+    Jobs above large_job_tokens go to the throttled large lane.
+
+    At most max_concurrent_estimates repositories are sized at once; requests arriving while
+    they are all busy are scheduled FIFO rather than waiting on someone else's git I/O.
+    """
+
+    def __init__(self,
+                 source: Optional[RepoMetadataSource],
+                 large_job_tokens: int = 200_000,
+                 delay_seconds_per_1k_tokens: float = 0.05,
+                 max_delay_seconds: float = 20.0,
+                 max_concurrent_estimates: int = 2):
+        self.source = source
+        self.large_job_tokens = large_job_tokens
+        self.delay_seconds_per_1k_tokens = delay_seconds_per_1k_tokens
+        self.max_delay_seconds = max_delay_seconds
+        self._estimate_slots = threading.BoundedSemaphore(max(1, max_concurrent_estimates))
+
+    @classmethod
+    def from_env(cls) -> "SizeAwareScheduler":
+        source_name = os.getenv("GITROT_SIZE_ESTIMATE_SOURCE", "git").lower()
+        source = GitTreeSizeSource(
+            timeout_seconds=float(os.getenv("GITROT_SIZE_ESTIMATE_TIMEOUT_SECONDS", "10"))
+        ) if source_name == "git" else None
+        return cls(
+            source=source,
+            large_job_tokens=int(os.getenv("GITROT_LARGE_JOB_TOKENS", "200000")),
+            delay_seconds_per_1k_tokens=float(os.getenv("GITROT_SJF_DELAY_SECONDS_PER_1K_TOKENS", "0.05")),
+            max_delay_seconds=float(os.getenv("GITROT_SJF_MAX_DELAY_SECONDS", "20")),
+            max_concurrent_estimates=int(os.getenv("GITROT_SIZE_ESTIMATE_CONCURRENCY", "2")),
+        )
+
+    def estimate(self, repo_url: str) -> Optional[RepoSizeEstimate]:
+        """Size of the repository, None when it can't be estimated (the job is then scheduled FIFO)"""
+        if self.source is None:
+            return None
+        if not self._estimate_slots.acquire(blocking=False):
+            logger.info("All size estimates are busy, scheduling FIFO")
+            return None
+        try:
+            return self.source.estimate(repo_url)
+        except Exception as e:
+            logger.info(f"Could not estimate repository size, scheduling FIFO: {str(e)}")
+            return None
+        finally:
+            self._estimate_slots.release()
+
+    def schedule_for(self, estimate: Optional[RepoSizeEstimate], arrival: Optional[float] = None) -> JobSchedule:
+        arrival = time.monotonic() if arrival is None else arrival
+        if estimate is None:
+            return JobSchedule.fifo(arrival)
+        delay = min(estimate.estimated_tokens / 1000 * self.delay_seconds_per_1k_tokens, self.max_delay_seconds)
+        lane = LARGE_LANE if estimate.estimated_tokens >= self.large_job_tokens else SMALL_LANE
+        return JobSchedule(priority=arrival + delay, lane=lane, estimate=estimate, arrival=arrival)
+
+    def schedule(self, repo_url: str) -> JobSchedule:
+        """Estimate the repository and place the job, blocking (run it off the event loop)"""
+        arrival = time.monotonic()
+        return self.schedule_for(self.estimate(repo_url), arrival)
@@ -0,0 +1,191 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+from models.request_models import ReadmeRequest
+from utils.chunking import prepare_map_prompts
+from utils.stage_metrics import pipeline_metrics
+from utils import tracing
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PipelineJob:
+    """One generation moving through the pipeline stages."""
+    request: ReadmeRequest
+    app_factory: Callable[[], Any]
+    future: asyncio.Future
+    app: Any = None
+    local_path: Optional[str] = None
+    code_text: Optional[str] = None
+    prompts: List[str] = field(default_factory=list)
+    prompt_token_counts: List[int] = field(default_factory=list)
+
+
+class StagedPipeline:
+    """
+    Runs README generations as three stages with their own executors and limits:
+
+    - ingest: clone + file extraction on an I/O thread pool
+    - prepare: chunking and token counting on a process pool, off the GIL
+    - llm: map-reduce and the final README as coroutines, throttled by the shared rate limiter
+
+    Jobs move between stages through bounded queues, so a slow stage pushes back on the
+    one before it instead of piling up clones in memory.
+    """
+
+    def __init__(self,
+                 io_workers: int = 4,
+                 cpu_workers: int = 2,
+                 llm_concurrency: int = 8,
+                 queue_depth: int = 4):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.llm_concurrency = llm_concurrency
+        self.queue_depth = queue_depth
+
+        self._io_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[concurrent.futures.Executor] = None
+        self._ingest_queue: Optional[asyncio.Queue] = None
+        self._prepare_queue: Optional[asyncio.Queue] = None
+        self._llm_queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    @classmethod
+    def from_env(cls) -> "StagedPipeline":
+        return cls(
+            io_workers=int(os.getenv("GITROT_PIPELINE_IO_WORKERS", "4")),
+            cpu_workers=int(os.getenv("GITROT_PIPELINE_CPU_WORKERS", "2")),
+            llm_concurrency=int(os.getenv("GITROT_PIPELINE_LLM_CONCURRENCY", "8")),
+            queue_depth=int(os.getenv("GITROT_PIPELINE_QUEUE_DEPTH", "4")),
+        )
+
+    @property
+    def capacity(self) -> int:
+        """Generations that can be in flight at once, across workers and the queues between stages"""
+        return self.io_workers + max(self.cpu_workers, 1) + self.llm_concurrency + 3 * self.queue_depth
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        """Create the stage executors and worker coroutines on the running loop"""
+        self._io_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.io_workers, thread_name_prefix="gitrot-ingest"
+        )
+        # cpu_workers=0 keeps preparation in-process, e.g. where worker processes can't be spawned
+        self._cpu_pool = (
+            concurrent.futures.ProcessPoolExecutor(max_workers=self.cpu_workers) if self.cpu_workers > 0
+            else self._io_pool
+        )
+        self._ingest_queue = asyncio.Queue(maxsize=self.queue_depth)
+        self._prepare_queue = asyncio.Queue(maxsize=self.queue_depth)
+        self._llm_queue = asyncio.Queue(maxsize=self.queue_depth)
+
+        self._workers = (
+            [asyncio.ensure_future(self._ingest_worker()) for _ in range(self.io_workers)] +
+            [asyncio.ensure_future(self._prepare_worker()) for _ in range(max(self.cpu_workers, 1))] +
+            [asyncio.ensure_future(self._llm_worker()) for _ in range(self.llm_concurrency)]
+        )
+        logger.info(
+            f"Staged pipeline started: {self.io_workers} ingest, {self.cpu_workers} prepare processes, "
+            f"{self.llm_concurrency} concurrent LLM jobs, queue depth {self.queue_depth}"
+        )
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._cpu_pool is not None and self._cpu_pool is not self._io_pool:
+            self._cpu_pool.shutdown(wait=True)
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=True)
+        logger.info("Staged pipeline stopped")
+
+    async def run(self, request: ReadmeRequest, app_factory: Callable[[], Any]) -> str:
+        """
+        Generate a README through the pipeline.
+
+        Args:
+            app_factory: builds the ReadmeGeneratorApp for this request (called on the I/O pool)
+
+        Returns:
+            The README content
+        """
+        job = PipelineJob(request=request, app_factory=app_factory,
+                          future=asyncio.get_running_loop().create_future())
+        await self._ingest_queue.put(job)
+        return await job.future
+
+    def stats(self) -> dict:
+        queues = {"ingest": self._ingest_queue, "prepare": self._prepare_queue, "llm": self._llm_queue}
+        return {
+            "queued": {stage: queue.qsize() if queue else 0 for stage, queue in queues.items()},
+            "io_workers": self.io_workers,
+            "cpu_workers": self.cpu_workers,
+            "llm_concurrency": self.llm_concurrency,
+        }
+
+    async def _ingest_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._ingest_queue.get()
+            try:
+                job.app = await loop.run_in_executor(self._io_pool, job.app_factory)
+                job.local_path, job.code_text = await loop.run_in_executor(
+                    self._io_pool, functools.partial(job.app.ingest, job.request, concurrent_map=True)
+                )
+            except Exception as e:
+                await self._fail(job, e)
+                continue
+            await self._prepare_queue.put(job)
+
+    async def _prepare_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._prepare_queue.get()
+            try:
+                # Chunking and token counting, in the split histogram with the time spent queued for a process
+                with pipeline_metrics.timed_stage("split"), \
+                        tracing.span("prepare", parent=getattr(job.app, "trace_parent", None)):
+                    job.prompts, job.prompt_token_counts = await loop.run_in_executor(
+                        self._cpu_pool,
+                        prepare_map_prompts,
+                        job.code_text,
+                        job.app.generator.MAP_PROMPT,
+                        job.request.model_name
+                    )
+                pipeline_metrics.observe_count("chunks", len(job.prompts))
+                job.code_text = None  # Only the prompts are needed from here on
+            except Exception as e:
+                await self._fail(job, e)
+                continue
+            await self._llm_queue.put(job)
+
+    async def _llm_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._llm_queue.get()
+            try:
+                readme_content = await job.app.agenerate(job.request, job.prompts, job.prompt_token_counts)
+                await loop.run_in_executor(self._io_pool, job.app.finish, job.local_path, readme_content)
+            except Exception as e:
+                await self._fail(job, e)
+                continue
+            if not job.future.done():
+                job.future.set_result(readme_content)
+
+    async def _fail(self, job: PipelineJob, error: Exception):
+        if job.local_path and job.app is not None:
+            try:
+                await asyncio.get_running_loop().run_in_executor(self._io_pool, job.app.cleanup, job.local_path)
+            except Exception as e:
+                logger.warning(f"Cleanup after failed generation failed: {str(e)}")
+        if not job.future.done():
+            job.future.set_exception(error)
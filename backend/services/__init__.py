@@ -1,4 +1,9 @@
 """Service package - Business Logic Layer"""
 from .user_service import UserService
+from .job_service import JobService
+from .job_runner import JobRunner
+from .history_service import HistoryService
+from .usage_ledger import UsageLedger
+from .auth_tokens import AccessTokens, access_tokens
 
-__all__ = ["UserService"]
\ No newline at end of file
+__all__ = ["UserService", "JobService", "JobRunner", "HistoryService", "UsageLedger", "AccessTokens", "access_tokens"]
\ No newline at end of file
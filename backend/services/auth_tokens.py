@@ -0,0 +1,78 @@
+from typing import Optional, Tuple
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AccessTokens:
+    """
+    Signed access tokens for registered users: "<user_id>.<expiry>.<signature>", the signature
+    an HMAC-SHA256 of the rest with GITROT_SESSION_SECRET.
+
+    /auth/register-or-login trusts the email it is given, so tokens are only issued to the
+    login server (the frontend, after OAuth) presenting GITROT_AUTH_CLIENT_SECRET. Without
+    both secrets nothing is issued or accepted, and every request is anonymous.
+    """
+
+    def __init__(self, secret: Optional[str], client_secret: Optional[str], ttl_seconds: float = 7 * 24 * 3600):
+        self._secret = secret.encode("utf-8") if secret else None
+        self._client_secret = client_secret or None
+        self.ttl_seconds = ttl_seconds
+
+    @classmethod
+    def from_env(cls) -> "AccessTokens":
+        tokens = cls(
+            secret=os.getenv("GITROT_SESSION_SECRET"),
+            client_secret=os.getenv("GITROT_AUTH_CLIENT_SECRET"),
+            ttl_seconds=float(os.getenv("GITROT_ACCESS_TOKEN_TTL_SECONDS", str(7 * 24 * 3600))),
+        )
+        if not tokens.enabled:
+            logger.info("Access tokens are disabled (GITROT_SESSION_SECRET or GITROT_AUTH_CLIENT_SECRET unset), "
+                        "per-user history, usage and fair share are unavailable")
+        return tokens
+
+    @property
+    def enabled(self) -> bool:
+        return self._secret is not None and self._client_secret is not None
+
+    def _signature(self, payload: str) -> str:
+        digest = hmac.new(self._secret, payload.encode("utf-8"), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+    def is_trusted_client(self, presented: Optional[str]) -> bool:
+        """Whether presented is the login server's secret, compared in constant time"""
+        if not self.enabled or not presented:
+            return False
+        return hmac.compare_digest(presented.encode("utf-8"), self._client_secret.encode("utf-8"))
+
+    def issue(self, user_id: str, now: Optional[float] = None) -> Tuple[str, int]:
+        """A token for user_id and its expiry as a unix timestamp"""
+        if not self.enabled:
+            raise RuntimeError("Access tokens are disabled")
+        expires_at = int((time.time() if now is None else now) + self.ttl_seconds)
+        payload = f"{user_id}.{expires_at}"
+        return f"{payload}.{self._signature(payload)}", expires_at
+
+    def verify(self, token: Optional[str], now: Optional[float] = None) -> Optional[str]:
+        """The user id of a valid, unexpired token, None otherwise"""
+        if not self.enabled or not token:
+            return None
+        payload, _, signature = token.rpartition(".")
+        user_id, _, expires_at = payload.rpartition(".")
+        if not user_id or not hmac.compare_digest(signature.encode("utf-8"),
+                                                  self._signature(payload).encode("utf-8")):
+            return None
+        try:
+            if int(expires_at) < (time.time() if now is None else now):
+                return None
+        except ValueError:
+            return None
+        return user_id
+
+
+access_tokens = AccessTokens.from_env()
@@ -0,0 +1,136 @@
+from sqlalchemy import inspect, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer
+from database.models import GenerationHistory
+from models.request_models import ReadmeRequest
+from typing import List, Optional, Tuple
+import base64
+import datetime
+import hashlib
+import logging
+import zstandard
+
+logger = logging.getLogger(__name__)
+
+class HistoryService:
+    """Service for the per-user history of generated READMEs"""
+
+    MAX_PAGE_SIZE = 100
+    # READMEs are small and repetitive markdown, a low level already gets most of the ratio
+    ZSTD_LEVEL = 6
+
+    @staticmethod
+    def compress(readme_content: str) -> Tuple[bytes, str]:
+        """README bytes for storage and their content_encoding"""
+        return zstandard.ZstdCompressor(level=HistoryService.ZSTD_LEVEL).compress(readme_content.encode("utf-8")), "zstd"
+
+    @staticmethod
+    def readme_content(entry: GenerationHistory) -> str:
+        if entry.content_encoding != "zstd":
+            raise ValueError(f"Unknown README encoding: {entry.content_encoding}")
+        return zstandard.ZstdDecompressor().decompress(entry.readme_compressed).decode("utf-8")
+
+    @staticmethod
+    def content_sha256(entry: GenerationHistory) -> str:
+        """Hash of the README, computed from the stored content for entries from before it was kept"""
+        if entry.content_sha256 is None:
+            return hashlib.sha256(HistoryService.readme_content(entry).encode("utf-8")).hexdigest()
+        return entry.content_sha256
+
+    @staticmethod
+    def record(db: Session,
+               user_id: str,
+               request: ReadmeRequest,
+               readme_content: str,
+               usage: dict,
+               latency_seconds: float,
+               commit_sha: Optional[str] = None) -> GenerationHistory:
+        """Store a generated README for user_id"""
+        compressed, encoding = HistoryService.compress(readme_content)
+        readme_bytes = readme_content.encode("utf-8")
+        entry = GenerationHistory(
+            user_id=user_id,
+            repo_url=request.repo_url,
+            commit_sha=commit_sha,
+            model_name=request.model_name,
+            generation_method=request.generation_method,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            total_tokens=usage.get("total_tokens", 0),
+            latency_seconds=round(latency_seconds, 3),
+            content_encoding=encoding,
+            readme_compressed=compressed,
+            readme_size=len(readme_bytes),
+            content_sha256=hashlib.sha256(readme_bytes).hexdigest(),
+        )
+        db.add(entry)
+        db.commit()
+        logger.info(f"Stored generation history {entry.id} ({entry.readme_size} -> {len(compressed)} bytes)")
+        return entry
+
+    @staticmethod
+    def encode_cursor(entry: GenerationHistory) -> str:
+        """Opaque position after entry in the newest-first listing"""
+        raw = f"{entry.created_at.isoformat()}|{entry.id}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime.datetime, str]:
+        """Raises ValueError for cursors not made by encode_cursor"""
+        try:
+            created_at, _, entry_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").partition("|")
+            return datetime.datetime.fromisoformat(created_at), entry_id
+        except (UnicodeError, ValueError, TypeError) as e:
+            raise ValueError("Invalid history cursor") from e
+
+    @staticmethod
+    async def alist_for_user(db: AsyncSession,
+                             user_id: str,
+                             limit: int = 20,
+                             cursor: Optional[str] = None) -> Tuple[List[GenerationHistory], Optional[str]]:
+        """
+        One page of a user's history, newest first, without README contents.
+        Keyset pagination on (created_at, id) so every page is an index range scan, however deep.
+
+        Returns:
+            The entries and the cursor of the next page, None on the last page
+        """
+        limit = max(1, min(limit, HistoryService.MAX_PAGE_SIZE))
+        query = (
+            select(GenerationHistory)
+            .options(defer(GenerationHistory.readme_compressed))
+            .where(GenerationHistory.user_id == user_id)
+        )
+        if cursor:
+            created_at, entry_id = HistoryService.decode_cursor(cursor)
+            query = query.where(
+                tuple_(GenerationHistory.created_at, GenerationHistory.id) < tuple_(created_at, entry_id)
+            )
+        query = query.order_by(GenerationHistory.created_at.desc(), GenerationHistory.id.desc()).limit(limit + 1)
+
+        entries = list((await db.scalars(query)).all())
+        if len(entries) <= limit:
+            return entries, None
+        entries = entries[:limit]
+        return entries, HistoryService.encode_cursor(entries[-1])
+
+    @staticmethod
+    async def aget_entry(db: AsyncSession,
+                         user_id: str,
+                         entry_id: str,
+                         with_readme: bool = True) -> Optional[GenerationHistory]:
+        """
+        A user's history entry, None if it doesn't exist or belongs to someone else.
+        Without with_readme the compressed README isn't read, load it with aload_readme when needed
+        """
+        options = [] if with_readme else [defer(GenerationHistory.readme_compressed)]
+        entry = await db.get(GenerationHistory, entry_id, options=options)
+        if entry is None or entry.user_id != user_id:
+            return None
+        return entry
+
+    @staticmethod
+    async def aload_readme(db: AsyncSession, entry: GenerationHistory):
+        """Load the README of an entry read without it"""
+        if "readme_compressed" in inspect(entry).unloaded:
+            await db.refresh(entry, attribute_names=["readme_compressed"])
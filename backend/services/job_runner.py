@@ -0,0 +1,296 @@
+from cachetools import TTLCache
+from database.config import session_scope
+from database.models import GenerationJob
+from models.request_models import ReadmeRequest, ReadmeResponse
+from models.job_models import JobStatusResponse
+from services.job_service import JobService
+from scheduling import AdmissionController, AdmissionRejected, JobSchedule, Requester, acting_for
+from dataclasses import replace
+from typing import Callable, Dict, Optional
+from utils import ProgressCallback
+import concurrent.futures
+import datetime
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Runs one generation in a worker thread and returns the (success or failure) response
+GenerationFunction = Callable[[ReadmeRequest, Optional[ProgressCallback]], ReadmeResponse]
+# Re-tags a resumed job's schedule (e.g. for fair share), it starts out FIFO in its stored lane
+ResumeScheduler = Callable[[JobSchedule], JobSchedule]
+
+class JobRunner:
+    """
+    Runs README generation jobs on the worker pool and serves their status.
+
+    Jobs are persisted through JobService so status and results survive restarts.
+    Progress of running jobs is served from memory and flushed to the database at most
+    once per progress_flush_seconds; finished results are cached for cheap repeat polls.
+
+    Several processes may share the job store: each unfinished job is leased to the process
+    running it, which renews its leases every lease_seconds / 3 while it is up. Jobs whose
+    lease expired (their process died) are claimed and rerun by the others, for the same
+    requester and in the same lane they were submitted with.
+    """
+
+    def __init__(self,
+                 executor: concurrent.futures.Executor,
+                 run_generation: GenerationFunction,
+                 result_ttl_seconds: Optional[int] = None,
+                 progress_flush_seconds: float = 1.0,
+                 purge_interval_seconds: float = 60.0,
+                 admission: Optional[AdmissionController] = None,
+                 lease_seconds: Optional[float] = None,
+                 reschedule: Optional[ResumeScheduler] = None):
+        self.executor = executor
+        self.run_generation = run_generation
+        self.admission = admission
+        self.reschedule = reschedule
+        self.result_ttl_seconds = result_ttl_seconds or int(os.getenv("GITROT_JOB_RESULT_TTL_SECONDS", "86400"))
+        self.progress_flush_seconds = progress_flush_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+        self.lease_seconds = lease_seconds or float(os.getenv("GITROT_JOB_LEASE_SECONDS", "60"))
+        # Holder of this process's leases, unique even when a restart reuses the pid
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._lock = threading.Lock()
+        self._live: Dict[str, JobStatusResponse] = {}
+        self._finished = TTLCache(maxsize=512, ttl=min(self.result_ttl_seconds, 3600))
+        self._last_purge = 0.0
+        self._stopping = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+
+    def submit(self, request: ReadmeRequest, schedule: Optional[JobSchedule] = None) -> JobStatusResponse:
+        """
+        Persist a new job and schedule it on the worker pool.
+        Raises AdmissionRejected when the admission queue is full, the job is then recorded as failed.
+        """
+        self._purge_expired_if_due()
+        with session_scope() as db:
+            job = JobService.create_job(db, request, owner=self.owner, lease_seconds=self.lease_seconds,
+                                        schedule=schedule)
+            status = self._status_from_job(job)
+        try:
+            self._schedule(status, request, schedule)
+        except AdmissionRejected as e:
+            self._reject(status.job_id, e)
+            raise
+        return status
+
+    def get_status(self, job_id: str) -> Optional[JobStatusResponse]:
+        """Status of a job from memory when possible, otherwise from the database"""
+        with self._lock:
+            status = self._live.get(job_id) or self._finished.get(job_id)
+            if status is not None:
+                return status.model_copy()
+
+        with session_scope() as db:
+            job = JobService.get_job(db, job_id)
+            if job is None:
+                return None
+            status = self._status_from_job(job)
+
+        if status.status not in JobService.ACTIVE_STATUSES:
+            with self._lock:
+                self._finished[job_id] = status
+        return status
+
+    def start(self):
+        """Resume unclaimed jobs and start renewing this process's leases"""
+        self.resume_unfinished()
+        if self._heartbeat_thread is None:
+            self._stopping.clear()
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="job-leases", daemon=True)
+            self._heartbeat_thread.start()
+
+    def stop(self):
+        """Stop renewing leases and hand jobs that never ran over to other processes"""
+        self._stopping.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        try:
+            with session_scope() as db:
+                JobService.release_leases(db, self.owner)
+        except Exception as e:
+            logger.warning(f"Could not release job leases: {str(e)}")
+
+    def _heartbeat(self):
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                with session_scope() as db:
+                    JobService.renew_leases(db, self.owner, self.lease_seconds)
+                # Jobs of processes that died since are taken over
+                self.resume_unfinished()
+            except Exception as e:
+                logger.warning(f"Could not renew job leases: {str(e)}")
+
+    def resume_unfinished(self) -> int:
+        """
+        Claim and reschedule jobs left queued or running by a process that is gone (no live lease).
+        Jobs without a stored request (custom credentials) are failed instead.
+        """
+        resumed = 0
+        with session_scope() as db:
+            jobs = JobService.claim_unfinished_jobs(db, self.owner, self.lease_seconds)
+            with self._lock:
+                # Jobs this process is already running keep their lease and aren't started again
+                jobs = [job for job in jobs if job.id not in self._live]
+            pending = [(self._status_from_job(job), job.request_payload, self._resume_schedule(job)) for job in jobs]
+
+        for status, request_payload, schedule in pending:
+            if request_payload is None:
+                with session_scope() as db:
+                    JobService.finish_job(db, status.job_id, self.result_ttl_seconds,
+                                          error_message="Job was interrupted by a server restart, please resubmit")
+                continue
+            status.status, status.stage, status.progress = "queued", "queued", 0.0
+            try:
+                self._schedule(status, ReadmeRequest(**request_payload), schedule)
+            except AdmissionRejected as e:
+                self._reject(status.job_id, e)
+                continue
+            resumed += 1
+
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished generation jobs")
+        return resumed
+
+    def _resume_schedule(self, job: GenerationJob) -> JobSchedule:
+        """The schedule of a resumed job: its stored requester and lane, queued from now"""
+        requester = Requester(key=job.requester_key, tier=job.requester_tier) if job.requester_key else None
+        schedule = JobSchedule.fifo()
+        schedule = replace(schedule, lane=job.lane or schedule.lane, requester=requester)
+        return self.reschedule(schedule) if self.reschedule is not None else schedule
+
+    def _schedule(self, status: JobStatusResponse, request: ReadmeRequest, schedule: Optional[JobSchedule] = None):
+        with self._lock:
+            self._live[status.job_id] = status
+        requester = schedule.requester if schedule is not None else None
+        try:
+            if self.admission is not None and schedule is not None:
+                self.admission.submit(self.executor, self._run, status.job_id, request, requester,
+                                      priority=schedule.priority, lane=schedule.lane, owner=requester)
+            elif self.admission is not None:
+                self.admission.submit(self.executor, self._run, status.job_id, request)
+            else:
+                self.executor.submit(self._run, status.job_id, request, requester)
+        except Exception:
+            with self._lock:
+                self._live.pop(status.job_id, None)
+            raise
+
+    def _reject(self, job_id: str, error: AdmissionRejected):
+        with session_scope() as db:
+            JobService.finish_job(db, job_id, self.result_ttl_seconds, error_message=str(error))
+
+    def _run(self, job_id: str, request: ReadmeRequest, requester: Optional[Requester] = None):
+        last_flush = [0.0]
+
+        def on_progress(stage: str, details: dict):
+            with self._lock:
+                live = self._live.get(job_id)
+                if live is None:
+                    return
+                stage_changed = live.stage != stage
+                live.status, live.stage, live.progress = "running", stage, details.get("progress", live.progress)
+                live.updated_at = datetime.datetime.now(datetime.timezone.utc)
+            now = time.time()
+            if stage_changed or now - last_flush[0] >= self.progress_flush_seconds:
+                last_flush[0] = now
+                self._persist_progress(job_id, "running", stage, details.get("progress", 0.0))
+
+        self._persist_progress(job_id, "running", "starting", 0.0)
+        try:
+            # The generation's LLM calls are queued under the submitter's fair share
+            with acting_for(requester):
+                response = self.run_generation(request, on_progress)
+        except Exception as e:
+            logger.error(f"Generation job {job_id} crashed: {str(e)}")
+            response = ReadmeResponse(
+                success=False,
+                error_message=str(e),
+                generation_timestamp=datetime.datetime.now().isoformat(),
+                repo_url=request.repo_url,
+                generation_method=request.generation_method
+            )
+        self._finish(job_id, response)
+
+    def _persist_progress(self, job_id: str, status: str, stage: str, progress: float):
+        try:
+            with session_scope() as db:
+                JobService.update_progress(db, job_id, status, stage, progress)
+        except Exception as e:
+            # Progress is best effort, the in-memory status is still served
+            logger.warning(f"Could not persist progress of job {job_id}: {str(e)}")
+
+    def _finish(self, job_id: str, response: ReadmeResponse):
+        usage = response.usage.model_dump() if response.usage else None
+        try:
+            with session_scope() as db:
+                JobService.finish_job(
+                    db,
+                    job_id,
+                    self.result_ttl_seconds,
+                    readme_content=response.readme_content if response.success else None,
+                    usage=usage,
+                    error_message=None if response.success else (response.error_message or "Generation failed")
+                )
+                job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+                status = self._status_from_job(job) if job else None
+        except Exception as e:
+            logger.error(f"Could not persist result of job {job_id}: {str(e)}")
+            status = None
+
+        with self._lock:
+            live = self._live.pop(job_id, None)
+            if status is None and live is not None:
+                # Keep serving the result from memory even if the database write failed
+                live.status = "succeeded" if response.success else "failed"
+                live.stage, live.result = "completed" if response.success else "failed", response
+                live.error_message = None if response.success else response.error_message
+                status = live
+            if status is not None:
+                self._finished[job_id] = status
+
+    def _purge_expired_if_due(self):
+        now = time.time()
+        if now - self._last_purge < self.purge_interval_seconds:
+            return
+        self._last_purge = now
+        try:
+            with session_scope() as db:
+                JobService.purge_expired(db)
+        except Exception as e:
+            logger.warning(f"Could not purge expired jobs: {str(e)}")
+
+    @staticmethod
+    def _status_from_job(job: GenerationJob) -> JobStatusResponse:
+        result = None
+        if job.status in ("succeeded", "failed"):
+            result = ReadmeResponse(
+                success=job.status == "succeeded",
+                readme_content=job.readme_content or "",
+                error_message=job.error_message or "",
+                generation_timestamp=(job.finished_at or job.updated_at or datetime.datetime.now()).isoformat(),
+                repo_url=job.repo_url,
+                generation_method=job.generation_method,
+                usage=job.usage
+            )
+        return JobStatusResponse(
+            job_id=job.id,
+            status=job.status,
+            stage=job.stage,
+            progress=job.progress or 0.0,
+            result=result,
+            error_message=job.error_message,
+            created_at=job.created_at,
+            updated_at=job.updated_at,
+            expires_at=job.expires_at,
+            user_id=job.user_id
+        )
@@ -0,0 +1,153 @@
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from database.models import GenerationJob
+from models.request_models import ReadmeRequest
+from scheduling import JobSchedule
+from typing import Optional, List
+import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+class JobService:
+    """Service for README generation job persistence"""
+
+    ACTIVE_STATUSES = ("queued", "running")
+
+    @staticmethod
+    def _utcnow() -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc)
+
+    @staticmethod
+    def create_job(db: Session, request: ReadmeRequest, owner: Optional[str] = None,
+                   lease_seconds: float = 0, schedule: Optional[JobSchedule] = None) -> GenerationJob:
+        """Create a queued job for a README request, leased to owner when given, with its schedule's requester and lane"""
+        requester = schedule.requester if schedule is not None else None
+        # Never persist user API keys, jobs with custom credentials can't be resumed after a restart
+        request_payload = None if request.custom_credentials else request.model_dump(exclude={"custom_credentials"})
+        db_job = GenerationJob(
+            status="queued",
+            stage="queued",
+            progress=0.0,
+            repo_url=request.repo_url,
+            generation_method=request.generation_method,
+            model_name=request.model_name,
+            request_payload=request_payload,
+            owner=owner,
+            lease_expires_at=JobService._utcnow() + datetime.timedelta(seconds=lease_seconds) if owner else None,
+            requester_key=requester.key if requester is not None else None,
+            requester_tier=requester.tier if requester is not None else None,
+            user_id=requester.user_id if requester is not None else None,
+            lane=schedule.lane if schedule is not None else None
+        )
+        db.add(db_job)
+        db.commit()
+        db.refresh(db_job)
+        logger.info(f"Created generation job {db_job.id}")
+        return db_job
+
+    @staticmethod
+    def get_job(db: Session, job_id: str) -> Optional[GenerationJob]:
+        """Get a job by id, expired jobs are treated as missing"""
+        job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+        if job and job.expires_at and JobService._as_aware(job.expires_at) <= JobService._utcnow():
+            return None
+        return job
+
+    @staticmethod
+    def update_progress(db: Session, job_id: str, status: str, stage: str, progress: float):
+        """Record job status and progress"""
+        db.query(GenerationJob).filter(GenerationJob.id == job_id).update(
+            {"status": status, "stage": stage, "progress": progress},
+            synchronize_session=False
+        )
+        db.commit()
+
+    @staticmethod
+    def finish_job(db: Session,
+                   job_id: str,
+                   ttl_seconds: int,
+                   readme_content: Optional[str] = None,
+                   usage: Optional[dict] = None,
+                   error_message: Optional[str] = None):
+        """Store the job result (or error) and start its retention TTL"""
+        now = JobService._utcnow()
+        succeeded = error_message is None
+        db.query(GenerationJob).filter(GenerationJob.id == job_id).update(
+            {
+                "status": "succeeded" if succeeded else "failed",
+                "stage": "completed" if succeeded else "failed",
+                "progress": 1.0 if succeeded else GenerationJob.progress,
+                "readme_content": readme_content,
+                "usage": usage,
+                "error_message": error_message,
+                "finished_at": now,
+                "expires_at": now + datetime.timedelta(seconds=ttl_seconds),
+                # Drop the request payload, it is only needed to resume unfinished jobs
+                "request_payload": None,
+            },
+            synchronize_session=False
+        )
+        db.commit()
+
+    @staticmethod
+    def claim_unfinished_jobs(db: Session, owner: str, lease_seconds: float) -> List[GenerationJob]:
+        """
+        Lease queued or running jobs that no process holds a live lease on to owner, and return
+        every unfinished job owner now holds. One UPDATE, so when several processes claim at
+        once each job goes to exactly one of them
+        """
+        now = JobService._utcnow()
+        db.query(GenerationJob).filter(
+            GenerationJob.status.in_(JobService.ACTIVE_STATUSES),
+            or_(GenerationJob.owner.is_(None), GenerationJob.lease_expires_at.is_(None),
+                GenerationJob.lease_expires_at < now)
+        ).update(
+            {"owner": owner, "lease_expires_at": now + datetime.timedelta(seconds=lease_seconds)},
+            synchronize_session=False
+        )
+        db.commit()
+        return db.query(GenerationJob).filter(
+            GenerationJob.status.in_(JobService.ACTIVE_STATUSES),
+            GenerationJob.owner == owner
+        ).all()
+
+    @staticmethod
+    def renew_leases(db: Session, owner: str, lease_seconds: float) -> int:
+        """Extend the leases of owner's unfinished jobs, its heartbeat"""
+        renewed = db.query(GenerationJob).filter(
+            GenerationJob.status.in_(JobService.ACTIVE_STATUSES),
+            GenerationJob.owner == owner
+        ).update(
+            {"lease_expires_at": JobService._utcnow() + datetime.timedelta(seconds=lease_seconds)},
+            synchronize_session=False
+        )
+        db.commit()
+        return renewed
+
+    @staticmethod
+    def release_leases(db: Session, owner: str) -> int:
+        """Give owner's unfinished jobs up, another process may claim them right away"""
+        released = db.query(GenerationJob).filter(
+            GenerationJob.status.in_(JobService.ACTIVE_STATUSES),
+            GenerationJob.owner == owner
+        ).update({"owner": None, "lease_expires_at": None}, synchronize_session=False)
+        db.commit()
+        return released
+
+    @staticmethod
+    def purge_expired(db: Session) -> int:
+        """Delete jobs whose result retention has expired"""
+        deleted = db.query(GenerationJob).filter(
+            GenerationJob.expires_at.isnot(None),
+            GenerationJob.expires_at <= JobService._utcnow()
+        ).delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            logger.info(f"Purged {deleted} expired generation jobs")
+        return deleted
+
+    @staticmethod
+    def _as_aware(value: datetime.datetime) -> datetime.datetime:
+        # SQLite returns naive datetimes even for timezone-aware columns
+        return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
@@ -0,0 +1,269 @@
+from cachetools import TTLCache
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from database.config import session_scope
+from database.models import UsageEvent, UsageTotal
+from models.request_models import ReadmeRequest
+from scheduling.fair_share import Requester
+from services.user_service import UPSERT_INSERTS
+from typing import Callable, ContextManager, Dict, List, Optional
+import datetime
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Counters kept per requester and UTC day, in usage_totals and in memory
+USAGE_COUNTERS = ("requests", "prompt_tokens", "completion_tokens", "total_tokens", "estimated_cost")
+
+
+def _empty_counters() -> Dict[str, float]:
+    return {counter: 0 for counter in USAGE_COUNTERS}
+
+
+def usage_period(moment: Optional[datetime.datetime] = None) -> str:
+    """Quota period of a moment, its UTC day"""
+    return (moment or datetime.datetime.now(datetime.timezone.utc)).astimezone(datetime.timezone.utc).date().isoformat()
+
+
+class _PeriodUsage:
+    """A requester's usage in one period: flushed (from the database, once loaded) plus still buffered"""
+    __slots__ = ("flushed", "pending")
+
+    def __init__(self):
+        self.flushed: Optional[Dict[str, float]] = None
+        self.pending = _empty_counters()
+
+
+class UsageLedger:
+    """
+    Write-behind ledger of what each generation cost its requester.
+
+    record() only appends to an in-memory buffer; a background thread writes the buffer in
+    batches, one executemany INSERT into usage_events plus one upsert of the per-day
+    usage_totals per flush, once max_batch events are waiting or every flush_interval_seconds.
+    stop() flushes what is left on shutdown. A failed flush keeps its events buffered for the
+    next one, beyond max_buffered the oldest are dropped.
+
+    Per-requester totals for the current day are served from memory: the flushed part is read
+    from usage_totals the first time a requester is asked about, buffered events are added on top.
+    Totals written by other processes after that first read are not seen.
+    """
+
+    # Requester-days with totals in memory, least recently used are dropped first
+    MAX_TRACKED_PERIODS = 10_000
+
+    def __init__(self,
+                 session_factory: Callable[[], ContextManager[Session]] = session_scope,
+                 max_batch: int = 200,
+                 flush_interval_seconds: float = 2.0,
+                 max_buffered: int = 10_000):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_buffered = max(max_buffered, max_batch)
+
+        self._lock = threading.Lock()
+        # Held for a whole flush, so totals are never loaded while a batch is half written
+        self._flush_lock = threading.Lock()
+        self._buffer: List[dict] = []
+        self._periods = TTLCache(maxsize=self.MAX_TRACKED_PERIODS, ttl=2 * 86400)
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.flushed_events = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped_events = 0
+
+    @classmethod
+    def from_env(cls) -> "UsageLedger":
+        return cls(
+            max_batch=int(os.getenv("GITROT_USAGE_LEDGER_BATCH_SIZE", "200")),
+            flush_interval_seconds=float(os.getenv("GITROT_USAGE_LEDGER_FLUSH_SECONDS", "2")),
+            max_buffered=int(os.getenv("GITROT_USAGE_LEDGER_MAX_BUFFERED", "10000")),
+        )
+
+    def start(self):
+        """Start the background flusher"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-ledger", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background flusher and write everything still buffered"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def record(self,
+               requester: Requester,
+               request: ReadmeRequest,
+               usage: dict,
+               succeeded: bool,
+               latency_seconds: float):
+        """Buffer one finished generation's usage, never touches the database"""
+        created_at = datetime.datetime.now(datetime.timezone.utc)
+        event = {
+            "requester_key": requester.key,
+            "user_id": requester.user_id,
+            "tier": requester.tier,
+            "repo_url": request.repo_url,
+            "model_name": request.model_name,
+            "generation_method": request.generation_method,
+            "succeeded": succeeded,
+            "llm_calls": usage.get("llm_calls", 0),
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+            "estimated_cost": usage.get("estimated_cost", 0.0),
+            "latency_seconds": round(latency_seconds, 3),
+            "created_at": created_at,
+        }
+        with self._lock:
+            self._buffer.append(event)
+            self._drop_overflow()
+            period = self._periods.get((requester.key, usage_period(created_at)))
+            if period is None:
+                period = self._periods[(requester.key, usage_period(created_at))] = _PeriodUsage()
+            self._add(period.pending, event, 1)
+            full = len(self._buffer) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write the buffered events in one transaction, returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+            try:
+                with self.session_factory() as db:
+                    db.execute(insert(UsageEvent.__table__), batch)
+                    self._add_to_totals(db, self._totals_rows(batch))
+            except Exception as e:
+                with self._lock:
+                    self._buffer[:0] = batch
+                    self._drop_overflow()
+                    self.failed_flushes += 1
+                logger.warning(f"Could not write {len(batch)} usage events, keeping them for the next flush: {str(e)}")
+                return 0
+
+            with self._lock:
+                for event in batch:
+                    period = self._periods.get((event["requester_key"], usage_period(event["created_at"])))
+                    if period is None:
+                        continue
+                    self._add(period.pending, event, -1)
+                    if period.flushed is not None:
+                        self._add(period.flushed, event, 1)
+                self.flushed_events += len(batch)
+                self.flushes += 1
+            return len(batch)
+
+    def usage_for(self, requester_key: str, period: Optional[str] = None) -> Dict[str, float]:
+        """
+        A requester's usage in a period (today by default), including events not written yet.
+        Reads the database the first time a requester-day is asked about, memory afterwards.
+        """
+        period = period or usage_period()
+        with self._lock:
+            usage = self._periods.get((requester_key, period))
+            loaded = usage is not None and usage.flushed is not None
+        if not loaded:
+            with self._flush_lock:
+                flushed = self._load_totals(requester_key, period)
+                with self._lock:
+                    usage = self._periods.get((requester_key, period))
+                    if usage is None:
+                        usage = self._periods[(requester_key, period)] = _PeriodUsage()
+                    if usage.flushed is None:
+                        usage.flushed = flushed
+        with self._lock:
+            return {counter: usage.flushed[counter] + usage.pending[counter] for counter in USAGE_COUNTERS}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "buffered_events": len(self._buffer),
+                "flushed_events": self.flushed_events,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+                "dropped_events": self.dropped_events,
+            }
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Usage ledger flush failed: {str(e)}")
+
+    def _drop_overflow(self):
+        """Called with _lock held"""
+        overflow = len(self._buffer) - self.max_buffered
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.dropped_events += overflow
+            logger.warning(f"Usage ledger buffer full, dropped the {overflow} oldest events")
+
+    @staticmethod
+    def _add(counters: Dict[str, float], event: dict, sign: int):
+        counters["requests"] += sign
+        for counter in USAGE_COUNTERS[1:]:
+            counters[counter] += sign * event[counter]
+
+    @staticmethod
+    def _totals_rows(batch: List[dict]) -> List[dict]:
+        """The batch summed per requester and day, one usage_totals row each"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        rows: Dict[tuple, dict] = {}
+        for event in batch:
+            key = (event["requester_key"], usage_period(event["created_at"]))
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = {"requester_key": key[0], "period": key[1], "updated_at": now, **_empty_counters()}
+            UsageLedger._add(row, event, 1)
+        return list(rows.values())
+
+    @staticmethod
+    def _add_to_totals(db: Session, rows: List[dict]):
+        dialect_insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+        if dialect_insert is not None:
+            statement = dialect_insert(UsageTotal.__table__)
+            table = UsageTotal.__table__.c
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.requester_key, table.period],
+                set_={
+                    **{counter: table[counter] + statement.excluded[counter] for counter in USAGE_COUNTERS},
+                    "updated_at": statement.excluded.updated_at,
+                },
+            )
+            db.execute(statement, rows)
+            return
+
+        for row in rows:
+            total = db.get(UsageTotal, (row["requester_key"], row["period"]), with_for_update=True)
+            if total is None:
+                db.add(UsageTotal(**row))
+                continue
+            for counter in USAGE_COUNTERS:
+                setattr(total, counter, getattr(total, counter) + row[counter])
+            total.updated_at = row["updated_at"]
+
+    def _load_totals(self, requester_key: str, period: str) -> Dict[str, float]:
+        with self.session_factory() as db:
+            total = db.get(UsageTotal, (requester_key, period))
+            if total is None:
+                return _empty_counters()
+            return {counter: getattr(total, counter) for counter in USAGE_COUNTERS}
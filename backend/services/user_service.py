@@ -1,11 +1,86 @@
+from cachetools import TTLCache
+from sqlalchemy import case, event, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from database.models import User
 from models.user_model import UserCreate, UserUpdate, UserAuthRequest
 from typing import Optional
 import logging
+import os
+import threading
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Dialects with INSERT ... ON CONFLICT DO UPDATE, logins on others fall back to select-then-write
+UPSERT_INSERTS = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+class RecentLoginCache:
+    """
+    Users of recent logins by email, as detached read-only copies. The frontend repeats the same
+    login on every session refresh; while the login would change nothing it is answered from here.
+    Updates forget the user, and so does deleting one; inactive users are never answered from here.
+    Thread-safe, a TTL of 0 disables it.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl_seconds) if ttl_seconds > 0 else None
+        self._lock = threading.Lock()
+
+    def match(self, auth_data: UserAuthRequest) -> Optional[User]:
+        """The cached user when the login would not change its profile, None otherwise"""
+        if self._users is None:
+            return None
+        with self._lock:
+            user = self._users.get(auth_data.email)
+        if user is None or not user.is_active:
+            return None
+        if ((auth_data.name and auth_data.name != user.name) or (auth_data.image and auth_data.image != user.image)
+                or (auth_data.provider and auth_data.provider != user.provider)):
+            return None
+        return user
+
+    def remember(self, user: User):
+        if self._users is None:
+            return
+        # A transient copy, the caller's instance may still be attached to a session
+        snapshot = User(id=user.id, email=user.email, name=user.name, image=user.image, provider=user.provider,
+                        provider_id=user.provider_id, is_active=user.is_active, created_at=user.created_at,
+                        updated_at=user.updated_at)
+        with self._lock:
+            self._users[user.email] = snapshot
+
+    def forget(self, *emails: str):
+        if self._users is None:
+            return
+        with self._lock:
+            for email in emails:
+                self._users.pop(email, None)
+
+    def clear(self):
+        if self._users is None:
+            return
+        with self._lock:
+            self._users.clear()
+
+
+recent_logins = RecentLoginCache(
+    maxsize=int(os.getenv("GITROT_USER_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("GITROT_USER_CACHE_TTL_SECONDS", "60")),
+)
+
+
+@event.listens_for(User, "after_delete")
+def _forget_deleted_user(mapper, connection, user: User):
+    recent_logins.forget(user.email)
+
+
 class UserService:
     """Service for user-related operations"""
 
@@ -21,9 +96,8 @@ class UserService:
     
 
     @staticmethod
-    def create_user(db: Session, user_data: UserCreate) -> User:
-        """Create a new user"""
-        db_user = User(
+    def _new_user(user_data: UserCreate) -> User:
+        return User(
             email = user_data.email,
             name = user_data.name,
             image = user_data.image,
@@ -32,6 +106,11 @@ class UserService:
             is_active = True
         )
 
+    @staticmethod
+    def create_user(db: Session, user_data: UserCreate) -> User:
+        """Create a new user"""
+        db_user = UserService._new_user(user_data)
+
         db.add(db_user)
         db.commit()
         db.refresh(db_user)
@@ -47,52 +126,218 @@ class UserService:
         
         update_data = user_data.model_dump(exclude_unset=True)
 
+        previous_email = db_user.email
         for field, value in update_data.items():
             setattr(db_user, field, value)
 
         db.commit()
         db.refresh(db_user)
+        recent_logins.forget(previous_email, db_user.email)
         logger.info(f"Updated user: {db_user.email}")
         return db_user
     
+    @staticmethod
+    def _apply_login(existing_user: User, auth_data: UserAuthRequest) -> bool:
+        """
+        Refresh an existing user's profile from a login, returns whether anything changed.
+        Raises ValueError when the email is registered with another provider.
+        """
+        needs_update = False
+        if auth_data.name and existing_user.name != auth_data.name:
+            existing_user.name = auth_data.name
+            needs_update = True
+        if auth_data.image and existing_user.image != auth_data.image:
+            existing_user.image = auth_data.image
+            needs_update = True
+
+        # if the same user is with another provider ex github etc
+        if auth_data.provider and auth_data.provider!= existing_user.provider:
+            raise UserService._provider_conflict(existing_user, auth_data)
+        return needs_update
+
+    @staticmethod
+    def _provider_conflict(existing_user: User, auth_data: UserAuthRequest) -> ValueError:
+        logger.warning(
+        f"Account conflict: {auth_data.email} exists with {existing_user.provider}, "
+        f"but trying to sign in with {auth_data.provider}"
+        )
+        return ValueError(
+            f"An account with this email already exists using {existing_user.provider}. "
+            f"Please sign in with {existing_user.provider} instead."
+        )
+
+    @staticmethod
+    def _login_upsert(dialect, auth_data: UserAuthRequest, new_user_id: str):
+        """
+        INSERT ... ON CONFLICT (email) DO UPDATE ... RETURNING for a login, one round trip
+        whether the user is new or not. None when the database can't do it.
+
+        The returned row has new_user_id only if it was inserted. An account of another
+        provider is left untouched and no row comes back.
+        """
+        insert = UPSERT_INSERTS.get(dialect.name)
+        if insert is None or not dialect.insert_returning:
+            return None
+        statement = insert(User).values(
+            id=new_user_id,
+            email=auth_data.email,
+            name=auth_data.name,
+            image=auth_data.image,
+            provider=auth_data.provider,
+            provider_id=auth_data.provider_id,
+            is_active=True,
+        )
+        excluded = statement.excluded
+        # Same rules as _apply_login: empty names and missing images keep the stored values
+        name = case((excluded.name != "", excluded.name), else_=User.name)
+        image = func.coalesce(excluded.image, User.image)
+        changed = or_(name != User.name, image.is_distinct_from(User.image))
+        statement = statement.on_conflict_do_update(
+            index_elements=[User.email],
+            set_={"name": name, "image": image, "updated_at": case((changed, func.now()), else_=User.updated_at)},
+            where=User.provider == excluded.provider,
+        )
+        return statement.returning(User)
+
+    @staticmethod
+    def _log_login(user: User, is_new: bool):
+        if is_new:
+            logger.info(f"Created new user: {user.email} via {user.provider}")
+
+    @staticmethod
+    def _user_create(auth_data: UserAuthRequest) -> UserCreate:
+        return UserCreate(
+            email=auth_data.email,
+            name=auth_data.name,
+            image=auth_data.image,
+            provider=auth_data.provider,
+            provider_id=auth_data.provider_id
+        )
+
     @staticmethod
     def register_or_login(db: Session, auth_data: UserAuthRequest) -> tuple[User,bool]:
+        """
+        Create the user or refresh their profile in one upsert, repeated logins are served
+        from recent_logins. The returned user is detached from the session.
+        """
+        cached = recent_logins.match(auth_data)
+        if cached is not None:
+            return cached, False
+
+        new_user_id = str(uuid.uuid4())
+        upsert = UserService._login_upsert(db.get_bind().dialect, auth_data, new_user_id)
+        if upsert is None:
+            user, is_new = UserService._register_or_login_by_select(db, auth_data)
+        else:
+            user = db.scalars(upsert, execution_options={"populate_existing": True}).first()
+            if user is None:
+                db.rollback()
+                existing_user = UserService.get_user_by_email(db, auth_data.email)
+                if existing_user is None:
+                    # Deleted in between, nothing to conflict with anymore
+                    return UserService.register_or_login(db, auth_data)
+                raise UserService._provider_conflict(existing_user, auth_data)
+            # Detached before the commit, so reading it doesn't go back to the database
+            db.expunge(user)
+            db.commit()
+            is_new = user.id == new_user_id
+            UserService._log_login(user, is_new)
+        recent_logins.remember(user)
+        return user, is_new
+
+    @staticmethod
+    def _register_or_login_by_select(db: Session, auth_data: UserAuthRequest) -> tuple[User,bool]:
         existing_user = UserService.get_user_by_email(db, auth_data.email)
 
         if existing_user:
             # User exists - update profile info if changed
-            needs_update = False
-            if auth_data.name and existing_user.name != auth_data.name:
-                existing_user.name = auth_data.name
-                needs_update = True
-            if auth_data.image and existing_user.image != auth_data.image:
-                existing_user.image = auth_data.image
-                needs_update = True
-            
-            # if the same user is with another provider ex github etc
-            if auth_data.provider and auth_data.provider!= existing_user.provider:
-                logger.warning(
-                f"Account conflict: {auth_data.email} exists with {existing_user.provider}, "
-                f"but trying to sign in with {auth_data.provider}"
-                )
-                raise ValueError(
-                    f"An account with this email already exists using {existing_user.provider}. "
-                    f"Please sign in with {existing_user.provider} instead."
-                )            
-            if needs_update:
+            if UserService._apply_login(existing_user, auth_data):
                 db.commit()
                 db.refresh(existing_user)
                 logger.info(f"Updated existing user profile: {existing_user.email}")
             
             return existing_user, False
-            
-        user_create = UserCreate(
-            email=auth_data.email,
-            name=auth_data.name,
-            image=auth_data.image,
-            provider=auth_data.provider,
-            provider_id=auth_data.provider_id
-        )
 
-        new_user = UserService.create_user(db, user_create)
-        return new_user, True
\ No newline at end of file
+        new_user = UserService.create_user(db, UserService._user_create(auth_data))
+        return new_user, True
+
+    # Async counterparts for request handlers, they don't block the event loop on database round trips
+
+    @staticmethod
+    async def aget_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+        """Async counterpart of get_user_by_email"""
+        result = await db.execute(select(User).where(User.email == email).limit(1))
+        return result.scalars().first()
+
+    @staticmethod
+    async def aget_user_by_id(db: AsyncSession, user_id: str) -> Optional[User]:
+        """Async counterpart of get_user_by_id"""
+        return await db.get(User, user_id)
+
+    @staticmethod
+    async def acreate_user(db: AsyncSession, user_data: UserCreate) -> User:
+        """Async counterpart of create_user"""
+        db_user = UserService._new_user(user_data)
+
+        db.add(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        logger.info(f"Created new user: {db_user.email} via {db_user.provider}")
+        return db_user
+
+    @staticmethod
+    async def aupdate_user(db: AsyncSession, user_id: str, user_data: UserUpdate) -> Optional[User]:
+        """Async counterpart of update_user"""
+        db_user = await UserService.aget_user_by_id(db, user_id)
+        if not db_user:
+            return None
+
+        previous_email = db_user.email
+        for field, value in user_data.model_dump(exclude_unset=True).items():
+            setattr(db_user, field, value)
+
+        await db.commit()
+        await db.refresh(db_user)
+        recent_logins.forget(previous_email, db_user.email)
+        logger.info(f"Updated user: {db_user.email}")
+        return db_user
+
+    @staticmethod
+    async def aregister_or_login(db: AsyncSession, auth_data: UserAuthRequest) -> tuple[User, bool]:
+        """Async counterpart of register_or_login"""
+        cached = recent_logins.match(auth_data)
+        if cached is not None:
+            return cached, False
+
+        new_user_id = str(uuid.uuid4())
+        upsert = UserService._login_upsert(db.get_bind().dialect, auth_data, new_user_id)
+        if upsert is None:
+            user, is_new = await UserService._aregister_or_login_by_select(db, auth_data)
+        else:
+            user = (await db.scalars(upsert, execution_options={"populate_existing": True})).first()
+            if user is None:
+                await db.rollback()
+                existing_user = await UserService.aget_user_by_email(db, auth_data.email)
+                if existing_user is None:
+                    return await UserService.aregister_or_login(db, auth_data)
+                raise UserService._provider_conflict(existing_user, auth_data)
+            db.expunge(user)
+            await db.commit()
+            is_new = user.id == new_user_id
+            UserService._log_login(user, is_new)
+        recent_logins.remember(user)
+        return user, is_new
+
+    @staticmethod
+    async def _aregister_or_login_by_select(db: AsyncSession, auth_data: UserAuthRequest) -> tuple[User, bool]:
+        existing_user = await UserService.aget_user_by_email(db, auth_data.email)
+
+        if existing_user:
+            if UserService._apply_login(existing_user, auth_data):
+                await db.commit()
+                await db.refresh(existing_user)
+                logger.info(f"Updated existing user profile: {existing_user.email}")
+            return existing_user, False
+
+        new_user = await UserService.acreate_user(db, UserService._user_create(auth_data))
+        return new_user, True
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from scheduling import AdmissionController, AdmissionRejected
+
+
+class InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class TestAdmissionController:
+    """Test suite for the bounded admission queue."""
+
+    def test_queue_full_is_rejected_with_retry_after(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrent=1, max_queue_depth=1, max_wait_seconds=5)
+            await controller.acquire()
+            waiter = asyncio.ensure_future(controller.acquire())
+            await asyncio.sleep(0)
+
+            with pytest.raises(AdmissionRejected) as rejected:
+                await controller.acquire()
+            assert rejected.value.reason == "queue_full"
+            assert rejected.value.retry_after_seconds >= 1
+
+            controller.release(1.0)
+            await asyncio.wait_for(waiter, timeout=1)
+            return controller.stats()
+
+        stats = asyncio.run(scenario())
+        assert stats["running"] == 1
+        assert stats["queued"] == 0
+        assert stats["admitted"] == 2
+        assert stats["rejections"] == {"queue_full": 1}
+
+    def test_wait_timeout_is_rejected(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrent=1, max_queue_depth=5, max_wait_seconds=0.05)
+            await controller.acquire()
+            with pytest.raises(AdmissionRejected) as rejected:
+                await controller.acquire()
+            assert rejected.value.reason == "wait_timeout"
+            return controller.stats()
+
+        stats = asyncio.run(scenario())
+        assert stats["queued"] == 0
+        assert stats["running"] == 1
+
+    def test_slots_are_granted_in_priority_order(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrent=1, max_queue_depth=5, max_wait_seconds=5)
+            order = []
+
+            async def wait_for_slot(name, priority):
+                await controller.acquire(priority)
+                order.append(name)
+
+            await controller.acquire()
+            waiters = [asyncio.ensure_future(wait_for_slot(name, priority))
+                       for name, priority in (("late", 2.0), ("early", 1.0))]
+            await asyncio.sleep(0)
+            for _ in waiters:
+                controller.release()
+                await asyncio.sleep(0.01)
+            await asyncio.gather(*waiters)
+            return order
+
+        assert asyncio.run(scenario()) == ["early", "late"]
+
+    def test_background_submit_waits_for_a_slot(self):
+        controller = AdmissionController(max_concurrent=1, max_queue_depth=1, max_wait_seconds=5)
+        ran = []
+
+        controller.submit(InlineExecutor(), ran.append, "first")
+        assert ran == ["first"] and controller.stats()["running"] == 0
+
+        asyncio.run(controller.acquire())
+        controller.submit(InlineExecutor(), ran.append, "second")
+        assert ran == ["first"] and controller.stats()["queued"] == 1
+        with pytest.raises(AdmissionRejected):
+            controller.submit(InlineExecutor(), ran.append, "third")
+
+        controller.release()
+        assert ran == ["first", "second"]
+        assert controller.stats()["running"] == 0
+
+
+class TestAdmissionEndpoint:
+    """Saturated servers answer with a fast 503 and Retry-After."""
+
+    def test_generate_readme_returns_503(self):
+        import fastapi_app
+
+        saturated = AdmissionController(max_concurrent=0, max_queue_depth=0, max_wait_seconds=1)
+        size_scheduler = Mock()
+        with patch.object(fastapi_app, "admission", saturated), \
+                patch.object(fastapi_app, "size_scheduler", size_scheduler):
+            client = TestClient(fastapi_app.app)
+            response = client.post("/generate-readme", json={"repo_url": "https://github.com/octocat/Hello-World"})
+            metrics = client.get("/metrics").json()
+
+        assert response.status_code == 503
+        # Rejected before the repository was sized
+        size_scheduler.schedule.assert_not_called()
+        assert int(response.headers["Retry-After"]) >= 1
+        assert metrics["admission"]["rejections"] == {"queue_full": 1}
+
+
+class TestAdmissionLanes:
+    """Lanes cap the slots one class of work may hold."""
+
+    def test_large_lane_is_capped(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrent=2, max_queue_depth=5, max_wait_seconds=5,
+                                             lane_limits={"large": 1})
+            await controller.acquire(lane="large")
+            second_large = asyncio.ensure_future(controller.acquire(lane="large"))
+            await asyncio.sleep(0)
+            assert controller.stats()["queued"] == 1
+
+            # A small job takes the free slot even though a large one queued first
+            await asyncio.wait_for(controller.acquire(), timeout=1)
+            controller.release(lane="large")
+            await asyncio.wait_for(second_large, timeout=1)
+            return controller.stats()
+
+        stats = asyncio.run(scenario())
+        assert stats["running_by_lane"] == {"large": 1, "default": 1}
+        assert stats["queued"] == 0
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.requests import Request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from database.config import Base
+from models.job_models import JobStatusResponse
+from models.request_models import ReadmeRequest
+from services.auth_tokens import AccessTokens
+from services.user_service import recent_logins
+
+LOGIN = {"email": "octo@example.com", "name": "Octo", "provider": "google", "provider_id": "g-1"}
+
+
+@pytest.fixture
+def tokens():
+    import fastapi_app
+
+    tokens = AccessTokens(secret="session-secret", client_secret="client-secret")
+    with patch.object(fastapi_app, "access_tokens", tokens):
+        yield tokens
+
+
+def http_request(headers: dict) -> Request:
+    return Request({"type": "http", "method": "POST", "path": "/generate-readme", "client": ("10.0.0.1", 1234),
+                    "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()]})
+
+
+class TestAccessTokens:
+    """Test suite for signed access tokens."""
+
+    def test_round_trip_tampering_and_expiry(self):
+        tokens = AccessTokens(secret="session-secret", client_secret="client-secret", ttl_seconds=60)
+        token, expires_at = tokens.issue("user-1", now=1000)
+
+        assert expires_at == 1060
+        assert tokens.verify(token, now=1030) == "user-1"
+        assert tokens.verify(token, now=1061) is None
+        assert tokens.verify(token.replace("user-1", "user-2"), now=1030) is None
+        assert tokens.verify("user-1.9999999999.forged", now=1030) is None
+        assert AccessTokens(secret="other", client_secret="client-secret").verify(token, now=1030) is None
+
+    def test_disabled_without_secrets(self):
+        tokens = AccessTokens(secret=None, client_secret="client-secret")
+
+        assert not tokens.enabled
+        assert not tokens.is_trusted_client("client-secret")
+        assert tokens.verify("user-1.9999999999.anything") is None
+
+
+class TestAuthenticatedIdentity:
+    """Only the login server gets tokens, and only tokens identify users."""
+
+    def test_login_issues_tokens_to_the_login_server_only(self, tmp_path, tokens):
+        import fastapi_app
+        from database.config import get_async_db
+
+        url = f"sqlite+aiosqlite:///{tmp_path / 'users.db'}"
+        engine = create_engine(url.replace("+aiosqlite", ""))
+        Base.metadata.create_all(bind=engine)
+        async_engine = create_async_engine(url)
+        Session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+        async def override_db():
+            async with Session() as db:
+                yield db
+
+        recent_logins.clear()
+        fastapi_app.app.dependency_overrides[get_async_db] = override_db
+        try:
+            client = TestClient(fastapi_app.app)
+            anonymous = client.post("/auth/register-or-login", json=LOGIN).json()
+            trusted = client.post("/auth/register-or-login", json=LOGIN,
+                                  headers={"X-GitRot-Client-Secret": "client-secret"}).json()
+        finally:
+            fastapi_app.app.dependency_overrides.pop(get_async_db)
+            recent_logins.clear()
+            asyncio.run(async_engine.dispose())
+            engine.dispose()
+
+        assert anonymous["access_token"] is None
+        assert tokens.verify(trusted["access_token"]) == trusted["user_id"] == anonymous["user_id"]
+
+    def test_requester_comes_from_the_token(self, tokens):
+        import fastapi_app
+
+        request = ReadmeRequest(repo_url="https://github.com/octocat/Hello-World")
+        with patch.object(fastapi_app, "is_active_user", AsyncMock(return_value=True)):
+            claimed = asyncio.run(fastapi_app.identify_requester(request, http_request({"X-GitRot-User-Id": "user-1"})))
+            authenticated = asyncio.run(fastapi_app.identify_requester(
+                request, http_request({"Authorization": f"Bearer {tokens.issue('user-1')[0]}"})))
+
+        assert claimed.user_id is None
+        assert authenticated.user_id == "user-1"
+
+    def test_users_jobs_are_served_to_their_owner_only(self, tokens):
+        import fastapi_app
+
+        statuses = {"mine": JobStatusResponse(job_id="mine", status="queued", user_id="user-1"),
+                    "anonymous": JobStatusResponse(job_id="anonymous", status="queued")}
+        job_runner = Mock(get_status=statuses.get)
+        with patch.object(fastapi_app, "job_runner", job_runner):
+            client = TestClient(fastapi_app.app)
+            owner = {"Authorization": f"Bearer {tokens.issue('user-1')[0]}"}
+            other = {"Authorization": f"Bearer {tokens.issue('user-2')[0]}"}
+            responses = {
+                "none": client.get("/jobs/mine"),
+                "other": client.get("/jobs/mine", headers=other),
+                "owner": client.get("/jobs/mine", headers=owner),
+                "anonymous": client.get("/jobs/anonymous"),
+            }
+
+        assert responses["none"].status_code == 401
+        assert responses["other"].status_code == 403
+        assert responses["owner"].status_code == 200 and "user_id" not in responses["owner"].json()
+        assert responses["anonymous"].status_code == 200
@@ -0,0 +1,55 @@
+import copy
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from benchmarks import bench_hot_paths
+
+
+@pytest.fixture(scope="module")
+def suite():
+    return bench_hot_paths.run_suite([0.02, 0.08], min_repeats=1, min_seconds=0.0, paths=["extract", "split"])
+
+
+class TestHotPathsBenchmark:
+    """Test suite for the hot path microbenchmarks and their regression gate."""
+
+    def test_measures_every_size_on_fixed_corpora(self, suite):
+        assert set(suite["results"]) == {"extract", "split"}
+        for result in suite["results"].values():
+            assert [entry["size_mb"] for entry in result["sizes"]] == [0.02, 0.08]
+            assert result["scaling_exponent"] is not None
+            for entry in result["sizes"]:
+                assert entry["mb_per_second"] > 0 and entry["normalized"] > 0
+                assert entry["peak_alloc_mb"] >= entry["retained_mb"] > 0
+        extract = suite["results"]["extract"]["sizes"]
+        assert 0.015 < extract[0]["input_mb"] < 0.025
+        # The same seeds generate the same corpus wherever the benchmark runs
+        rerun = bench_hot_paths.run_suite([0.02], min_repeats=1, min_seconds=0.0, paths=["extract"])
+        assert rerun["results"]["extract"]["sizes"][0]["corpus"] == extract[0]["corpus"]
+
+    def test_gate_flags_slowdowns_and_allocation_growth(self, suite):
+        current = copy.deepcopy(suite)
+        assert bench_hot_paths.compare(suite, current, threshold=0.25)[0] == []
+
+        split = current["results"]["split"]["sizes"][1]
+        split["normalized"] *= 1.5
+        extract = current["results"]["extract"]["sizes"][0]
+        extract["peak_alloc_mb"] += 2 * bench_hot_paths.ALLOCATION_NOISE_MB
+        current["results"]["extract"]["sizes"][1]["corpus"] = "changed"
+
+        regressions, notes = bench_hot_paths.compare(suite, current, threshold=0.25)
+        assert [(path, size_mb) for path, size_mb, _ in regressions] == [("extract", 0.02), ("split", 0.08)]
+        assert any("corpus changed" in line for line in notes)
+
+        # A faster measurement of the flagged path clears it
+        bench_hot_paths.keep_fastest(current, {"results": {"split": {"sizes": [suite["results"]["split"]["sizes"][1]]}}})
+        assert current["results"]["split"]["sizes"][1]["normalized"] == suite["results"]["split"]["sizes"][1]["normalized"]
+
+    def test_scaling_exponent(self):
+        assert bench_hot_paths.scaling_exponent([1, 2, 4], [3, 6, 12]) == pytest.approx(1.0)
+        assert bench_hot_paths.scaling_exponent([1, 2, 4], [1, 4, 16]) == pytest.approx(2.0)
+        assert bench_hot_paths.scaling_exponent([1], [1]) is None
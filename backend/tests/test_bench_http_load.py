@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from benchmarks.bench_http_load import parse_args, run_load_test
+
+
+class TestHttpLoadHarness:
+    """The load test runs offline against the app in a child process."""
+
+    def test_mixed_traffic_is_measured_per_endpoint(self):
+        args = parse_args([
+            "--clients", "4", "--duration", "1.5", "--mix", "generate=1,auth=1,health=2",
+            "--repos", "2", "--repo-files", "3", "--llm-latency", "0.005", "--limiter-delay", "0",
+            # Two generations per client, later ones are turned away
+            "--env", "GITROT_RATE_LIMIT_MAX_REQUESTS=2",
+        ])
+
+        [result] = run_load_test(args)
+
+        assert result["clients"] == 4
+        assert set(result["endpoints"]) == {"generate", "auth", "health"}
+        assert result["endpoints"]["generate"]["statuses"].get("200", 0) > 0
+        assert result["endpoints"]["generate"]["statuses"].get("429", 0) > 0
+        assert result["rate_429"] > 0
+        assert set(result["endpoints"]["auth"]["statuses"]) == {"200"}
+        assert set(result["endpoints"]["health"]["statuses"]) == {"200"}
+        assert result["error_rate"] == 0
+        assert result["loop_lag_p50_ms"] is not None
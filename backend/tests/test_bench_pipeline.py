@@ -0,0 +1,41 @@
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from benchmarks import bench_pipeline
+from benchmarks.stubs import StubChatModel
+
+
+class TestPipelineBenchmark:
+    """Test suite for the offline end-to-end pipeline benchmark."""
+
+    def test_stub_latency_distributions_keep_the_mean(self):
+        for distribution in StubChatModel.LATENCY_DISTRIBUTIONS:
+            llm = StubChatModel(mean_latency=0.2, latency_jitter=0.1, latency_distribution=distribution, seed=3)
+            latencies = [llm._draw_latency() for _ in range(4000)]
+            assert abs(statistics.mean(latencies) - 0.2) < 0.02, distribution
+            assert min(latencies) >= 0
+
+    def test_generates_from_local_git_repositories(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setitem(bench_pipeline.REPO_SIZES, "tiny", (4, 40))
+        args = argparse.Namespace(
+            runs=2, seed=0, languages={"python": 1, "go": 1, "markdown": 1}, model="gpt-4", time_budget=300,
+            llm_latency=0.0, latency_cv=0.0, latency_distribution="fixed", output_words=20, rate_limit_rate=0.3,
+            limiter_delay=0.0, concurrency=2,
+        )
+
+        result = bench_pipeline.benchmark_size("tiny", str(tmp_path), args)
+
+        assert result["runs"] == 2
+        assert result["llm_calls"] > 0 and result["total_tokens"] > 0
+        # Every 429 was retried, the provider saw them on top of the pipeline's calls
+        assert result["provider_requests"] == result["llm_calls"] + result["rate_limited_calls"]
+        assert {"clone", "extract", "map_call", "final", "cleanup"} <= set(result["stages"])
+        assert result["stages"]["clone"]["count"] == 2
+        assert result["peak_rss_mb"] >= result["start_rss_mb"]
+        # The clones were cleaned up
+        assert os.listdir(tmp_path / "projects") == []
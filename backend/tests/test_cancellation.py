@@ -0,0 +1,132 @@
+import asyncio
+import os
+import stat
+import sys
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.messages import AIMessage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from helpers import Helper
+from utils import CancellationToken, OperationCancelled
+
+
+class TestCancellationToken:
+    """Test suite for the cooperative cancellation token."""
+
+    def test_callbacks_run_once_and_late_registrations_fire_immediately(self):
+        token = CancellationToken()
+        calls = []
+        unregister = token.on_cancel(lambda: calls.append("registered"))
+        token.on_cancel(lambda: calls.append("removed"))()
+
+        token.cancel("client disconnected")
+        token.cancel("again")
+        token.on_cancel(lambda: calls.append("late"))
+        unregister()
+
+        assert calls == ["registered", "late"]
+        assert token.reason == "client disconnected"
+        with pytest.raises(OperationCancelled):
+            token.raise_if_cancelled()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses a shell script as the git executable")
+class TestHelperCancellation:
+    """The clone subprocess is killed and extraction stops once cancelled."""
+
+    def test_clone_is_killed_and_partial_clone_removed(self, tmp_path, monkeypatch):
+        slow_git = tmp_path / "slow-git"
+        slow_git.write_text('#!/bin/sh\nfor target; do :; done\nmkdir -p "$target"\nexec sleep 30\n')
+        slow_git.chmod(slow_git.stat().st_mode | stat.S_IEXEC)
+        monkeypatch.setenv("GIT_PYTHON_GIT_EXECUTABLE", str(slow_git))
+        monkeypatch.chdir(tmp_path)
+
+        token = CancellationToken()
+        threading.Timer(0.2, token.cancel, args=("client disconnected",)).start()
+        start_time = time.monotonic()
+        with patch("helpers.configure_git_for_azure"), pytest.raises(OperationCancelled):
+            Helper().clone_repo("https://github.com/octocat/Hello-World", "Hello-World", cancellation=token)
+
+        assert time.monotonic() - start_time < 5
+        assert os.listdir(tmp_path / "projects") == []
+
+    def test_clone_times_out_and_url_is_never_an_option(self, tmp_path, monkeypatch):
+        slow_git = tmp_path / "slow-git"
+        slow_git.write_text(f'#!/bin/sh\necho "$@" > {tmp_path / "args"}\nexec sleep 30\n')
+        slow_git.chmod(slow_git.stat().st_mode | stat.S_IEXEC)
+        monkeypatch.setenv("GIT_PYTHON_GIT_EXECUTABLE", str(slow_git))
+        monkeypatch.chdir(tmp_path)
+
+        start_time = time.monotonic()
+        with patch("helpers.configure_git_for_azure"), patch.object(Helper, "CLONE_TIMEOUT_SECONDS", 0.2), \
+                pytest.raises(RuntimeError, match="timed out"):
+            Helper().clone_repo("--upload-pack=touch pwned", "Hello-World")
+
+        assert time.monotonic() - start_time < 5
+        args = (tmp_path / "args").read_text().split()
+        assert args[:4] == ["-c", "protocol.ext.allow=never", "clone", "--quiet"]
+        assert args[4] == "--" and args[5] == "--upload-pack=touch"
+
+    def test_extraction_stops_when_cancelled(self, tmp_path):
+        for index in range(3):
+            (tmp_path / f"module_{index}.py").write_text("print('hi')")
+        token = CancellationToken()
+        token.cancel()
+        with pytest.raises(OperationCancelled):
+            Helper().extract_code_from_repo(str(tmp_path), cancellation=token)
+
+
+class TestGeneratorCancellation:
+    """No further LLM calls go out after cancellation."""
+
+    @patch("backend.generators.llm_rate_limiter")
+    def test_map_reduce_stops_between_chunks(self, mock_limiter):
+        from backend.generators import Generators
+
+        token = CancellationToken()
+
+        def invoke(llm, prompt, **kwargs):
+            token.cancel("client disconnected")
+            return AIMessage(content="summary")
+
+        mock_limiter.invoke.side_effect = invoke
+        generator = Generators("gpt-4o", cancellation=token)
+        code_text = "\n\n".join(f"File: m{index}.py\n" + "x = 1\n" * 800 for index in range(4))
+
+        with pytest.raises(OperationCancelled):
+            generator.summarize_code(Mock(), code_text)
+        assert mock_limiter.invoke.call_count == 1
+
+
+class TestDisconnectDetection:
+    """The API cancels generations whose client went away."""
+
+    def test_disconnect_cancels_and_waits_for_the_worker(self):
+        import fastapi_app
+
+        class DisconnectedRequest:
+            async def is_disconnected(self):
+                return True
+
+        async def scenario():
+            token = CancellationToken()
+
+            async def generation():
+                while not token.is_cancelled:
+                    await asyncio.sleep(0.01)
+                return "stopped"
+
+            with patch.object(fastapi_app, "DISCONNECT_POLL_SECONDS", 0.02):
+                result = await fastapi_app.await_unless_disconnected(
+                    asyncio.ensure_future(generation()), DisconnectedRequest(), token
+                )
+            return result, token
+
+        result, token = asyncio.run(scenario())
+        assert result == "stopped"
+        assert token.reason == "client disconnected"
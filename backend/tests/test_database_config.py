@@ -0,0 +1,29 @@
+import os
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool, StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from database.config import create_database_engine, engine_options, get_async_database_url
+
+
+class TestDatabaseConfig:
+    """Test suite for engine pooling and SQLite tuning."""
+
+    def test_sqlite_files_are_pooled_with_wal(self, tmp_path):
+        engine = create_database_engine(f"sqlite:///{tmp_path / 'gitrot.db'}")
+        try:
+            assert isinstance(engine.pool, QueuePool)
+            with engine.connect() as connection:
+                assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+                assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+                assert connection.execute(text("PRAGMA busy_timeout")).scalar() > 0
+        finally:
+            engine.dispose()
+
+    def test_memory_databases_keep_one_connection(self):
+        assert engine_options("sqlite://")["poolclass"] is StaticPool
+        assert engine_options(get_async_database_url("sqlite:///:memory:"))["poolclass"] is StaticPool
+        assert engine_options("postgresql://u:p@db/gitrot")["pool_pre_ping"] is True
@@ -0,0 +1,108 @@
+import os
+import sys
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from backend.utils.example_index import ExampleIndex, compute_examples_hash
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Fake embedding model that records how many documents it embedded."""
+    document_calls: int = 0
+    query_calls: int = 0
+
+    def embed_documents(self, texts):
+        self.document_calls += len(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return super().embed_query(text)
+
+
+class OtherEmbeddings(CountingEmbeddings):
+    """A second embedding model, indexed separately."""
+
+
+@pytest.fixture
+def examples_dir(tmp_path):
+    directory = tmp_path / "examples"
+    directory.mkdir()
+    (directory / "flask.md").write_text("# Flask App\n\nA small web service.", encoding="utf-8")
+    (directory / "cli.md").write_text("# CLI Tool\n\nA command line utility.", encoding="utf-8")
+    return str(directory)
+
+
+class TestExampleIndex:
+    """Test suite for the persisted example index."""
+
+    def test_index_is_built_once_and_reused_across_instances(self, examples_dir, tmp_path):
+        """A second process should load the persisted index instead of re-embedding examples."""
+        index_dir = str(tmp_path / "index")
+        embeddings = CountingEmbeddings(size=16)
+
+        first = ExampleIndex(examples_dir=examples_dir, index_dir=index_dir)
+        first.similarity_search(embeddings, "web service", k=1)
+        first.similarity_search(embeddings, "command line", k=1)
+        assert embeddings.document_calls == 2
+
+        restarted = ExampleIndex(examples_dir=examples_dir, index_dir=index_dir)
+        results = restarted.similarity_search(embeddings, "web service", k=2)
+
+        assert embeddings.document_calls == 2
+        assert embeddings.query_calls == 3
+        assert {doc.metadata["source"] for doc in results} == {
+            os.path.join(examples_dir, "cli.md"),
+            os.path.join(examples_dir, "flask.md"),
+        }
+
+    def test_changed_examples_invalidate_index(self, examples_dir, tmp_path):
+        """Editing an example should produce a new hash and trigger a rebuild."""
+        index_dir = str(tmp_path / "index")
+        embeddings = CountingEmbeddings(size=16)
+        index = ExampleIndex(examples_dir=examples_dir, index_dir=index_dir)
+
+        first_hash = index.build(embeddings)
+        assert index.build(embeddings) == first_hash
+        assert embeddings.document_calls == 2
+
+        with open(os.path.join(examples_dir, "go.md"), "w", encoding="utf-8") as f:
+            f.write("# Go Service\n\nA gRPC server.")
+
+        second_hash = index.build(embeddings)
+        assert second_hash != first_hash
+        assert embeddings.document_calls == 5
+        assert os.listdir(os.path.join(index_dir, "CountingEmbeddings")) == [second_hash]
+
+    def test_each_embedding_model_keeps_its_index(self, examples_dir, tmp_path):
+        """Building for one embedding model must not delete another model's index."""
+        index_dir = str(tmp_path / "index")
+        azure, google = CountingEmbeddings(size=16), OtherEmbeddings(size=16)
+        index = ExampleIndex(examples_dir=examples_dir, index_dir=index_dir)
+
+        azure_hash = index.build(azure)
+        google_hash = index.build(google)
+        for _ in range(2):
+            index.similarity_search(azure, "web service", k=1)
+            index.similarity_search(google, "web service", k=1)
+        restarted = ExampleIndex(examples_dir=examples_dir, index_dir=index_dir)
+        restarted.similarity_search(azure, "command line", k=1)
+        restarted.similarity_search(google, "command line", k=1)
+
+        assert (azure.document_calls, google.document_calls) == (2, 2)
+        assert os.listdir(os.path.join(index_dir, "CountingEmbeddings")) == [azure_hash]
+        assert os.listdir(os.path.join(index_dir, "OtherEmbeddings")) == [google_hash]
+
+    def test_hash_depends_on_embedding_model(self, examples_dir):
+        """Indexes built with different embedding models must not be shared."""
+        assert compute_examples_hash(examples_dir, "model-a") != compute_examples_hash(examples_dir, "model-b")
+
+    def test_missing_examples_return_no_results(self, tmp_path):
+        """No examples means no index and an empty search result."""
+        index = ExampleIndex(examples_dir=str(tmp_path / "absent"), index_dir=str(tmp_path / "index"))
+
+        assert not index.has_examples()
+        assert index.similarity_search(CountingEmbeddings(size=16), "anything") == []
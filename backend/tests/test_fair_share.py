@@ -0,0 +1,149 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from scheduling import AdmissionController, FairShareScheduler, JobSchedule, Requester, acting_for
+from scheduling.fair_share import parse_weights
+from utils.cancellation import CancellationToken, OperationCancelled
+from wrappers.rate_limitter import llm_rate_limiter
+
+HEAVY = Requester.for_user("heavy")
+LIGHT = Requester.for_user("light")
+
+
+class TestFairShareScheduler:
+    """Test suite for virtual clock tags."""
+
+    def test_batches_interleave_with_other_requesters(self):
+        scheduler = FairShareScheduler()
+        batch = [scheduler.tag(HEAVY, cost=10.0, arrival=100.0) for _ in range(3)]
+        single = scheduler.tag(LIGHT, cost=10.0, arrival=101.0)
+
+        assert batch == sorted(batch)
+        assert batch[0] < single < batch[1]
+
+    def test_weights_scale_the_share(self):
+        scheduler = FairShareScheduler(weights={"anonymous": 1.0, "user": 2.0})
+        anonymous = Requester.for_client("203.0.113.9")
+
+        assert scheduler.tag(HEAVY, cost=10.0, arrival=0.0) == 5.0
+        assert scheduler.tag(anonymous, cost=10.0, arrival=0.0) == 10.0
+        assert anonymous.key.startswith("ip:") and "203.0.113.9" not in anonymous.key
+
+    def test_clock_lead_is_capped(self):
+        scheduler = FairShareScheduler(max_lead_seconds=30.0)
+        for _ in range(10):
+            tag = scheduler.tag(HEAVY, cost=20.0, arrival=0.0)
+        assert tag == 30.0
+
+    def test_apply_uses_size_delay_as_cost(self):
+        scheduler = FairShareScheduler(weights={"user": 1.0})
+        schedule = JobSchedule(priority=104.0, lane="large", arrival=100.0)
+
+        tagged = scheduler.apply(schedule, HEAVY, base_cost=1.0)
+
+        assert tagged.priority == 105.0
+        assert tagged.lane == "large"
+        assert tagged.requester == HEAVY
+
+    def test_parse_weights_skips_malformed_entries(self):
+        assert parse_weights("anonymous=1, pro=4,broken,free=abc,zero=0") == {"anonymous": 1.0, "pro": 4.0}
+
+
+class TestFairAdmission:
+    """Fair tags in the admission queue."""
+
+    def test_light_user_is_not_starved_by_a_batch(self):
+        async def scenario():
+            scheduler = FairShareScheduler()
+            controller = AdmissionController(max_concurrent=1, max_queue_depth=10, max_wait_seconds=5,
+                                             wait_listener=scheduler.record_wait)
+            order = []
+
+            async def job(requester, name):
+                schedule = scheduler.apply(JobSchedule.fifo(), requester, base_cost=5.0)
+                async with controller.slot(schedule.priority, schedule.lane, owner=requester):
+                    order.append(name)
+
+            await controller.acquire()
+            tasks = [asyncio.ensure_future(job(HEAVY, f"heavy-{index}")) for index in range(3)]
+            await asyncio.sleep(0.01)
+            tasks.append(asyncio.ensure_future(job(LIGHT, "light")))
+            await asyncio.sleep(0.01)
+            controller.release(0.1)
+            await asyncio.gather(*tasks)
+            return order, scheduler.stats()
+
+        order, stats = asyncio.run(scenario())
+        assert order == ["heavy-0", "light", "heavy-1", "heavy-2"]
+        assert stats["requesters"] == 2
+        assert stats["by_tier"]["user"]["count"] == 4
+        assert {entry["requester"] for entry in stats["longest_waits"]} == {HEAVY.key, LIGHT.key}
+
+
+class TestFairRateLimiter:
+    """Fair dispatch of LLM call slots."""
+
+    def test_call_slots_interleave_requesters(self):
+        order = []
+
+        async def record(llm, prompt):
+            order.append(prompt)
+            return prompt
+
+        async def call(requester, prompt):
+            with acting_for(requester):
+                return await llm_rate_limiter.ainvoke(None, prompt, ainvoke_fn=record)
+
+        async def scenario():
+            calls = [asyncio.ensure_future(call(HEAVY, f"heavy-{index}")) for index in range(4)]
+            await asyncio.sleep(0.005)
+            calls.append(asyncio.ensure_future(call(LIGHT, "light")))
+            await asyncio.gather(*calls)
+
+        previous = (llm_rate_limiter.fair_share, llm_rate_limiter.base_delay, llm_rate_limiter._current_delay)
+        llm_rate_limiter.fair_share = FairShareScheduler()
+        llm_rate_limiter.base_delay = llm_rate_limiter._current_delay = 0.05
+        try:
+            asyncio.run(scenario())
+            stats = llm_rate_limiter.fair_share_stats()
+        finally:
+            llm_rate_limiter.fair_share, llm_rate_limiter.base_delay, llm_rate_limiter._current_delay = previous
+
+        assert order.index("light") < order.index("heavy-3")
+        assert stats["waiting_calls"] == 0
+        assert stats["by_tier"]["user"]["count"] == 5
+
+    def test_cancelled_sync_call_leaves_the_queue(self):
+        calls = []
+        token = CancellationToken()
+        previous = (llm_rate_limiter.fair_share, llm_rate_limiter.base_delay, llm_rate_limiter._current_delay,
+                    llm_rate_limiter._last_call_time)
+        llm_rate_limiter.fair_share = FairShareScheduler()
+        llm_rate_limiter.base_delay = llm_rate_limiter._current_delay = 30.0
+        llm_rate_limiter._last_call_time = time.time()
+        try:
+            threading.Timer(0.05, token.cancel).start()
+            started = time.monotonic()
+            with acting_for(HEAVY), pytest.raises(OperationCancelled):
+                llm_rate_limiter.invoke(None, "prompt", invoke_fn=lambda llm, prompt: calls.append(prompt),
+                                        cancellation=token)
+            elapsed = time.monotonic() - started
+            stats = llm_rate_limiter.fair_share_stats()
+        finally:
+            with llm_rate_limiter._state_lock:
+                if llm_rate_limiter._dispatch_timer is not None:
+                    llm_rate_limiter._dispatch_timer.cancel()
+                    llm_rate_limiter._dispatch_timer = None
+                llm_rate_limiter._fair_waiters.clear()
+            (llm_rate_limiter.fair_share, llm_rate_limiter.base_delay, llm_rate_limiter._current_delay,
+             llm_rate_limiter._last_call_time) = previous
+
+        assert elapsed < 5 and calls == []
+        assert stats["waiting_calls"] == 0
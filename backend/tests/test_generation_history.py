@@ -0,0 +1,169 @@
+import asyncio
+import datetime
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Same module objects fastapi_app uses
+from database.config import Base
+from database.models import GenerationHistory
+from models.request_models import ReadmeRequest
+from services.auth_tokens import AccessTokens
+from services.history_service import HistoryService
+
+USAGE = {"prompt_tokens": 1200, "completion_tokens": 300, "total_tokens": 1500}
+
+
+@pytest.fixture
+def database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'history.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    yield sessionmaker(bind=engine), async_sessionmaker(async_engine, expire_on_commit=False)
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+def record(Session, user_id: str, index: int, created_at: datetime.datetime = None) -> str:
+    request = ReadmeRequest(repo_url=f"https://github.com/octocat/repo-{index}")
+    with Session() as db:
+        entry = HistoryService.record(db, user_id, request, f"# Repo {index}\n" + "Some text. " * 200,
+                                      usage=USAGE, latency_seconds=12.5, commit_sha="a" * 40)
+        if created_at is not None:
+            entry.created_at = created_at
+            db.commit()
+        return entry.id
+
+
+class TestHistoryService:
+    """Test suite for stored READMEs and their keyset-paginated listing."""
+
+    def test_readme_is_stored_compressed(self, database):
+        Session, _ = database
+        entry_id = record(Session, "user-1", 0)
+        with Session() as db:
+            entry = db.get(GenerationHistory, entry_id)
+            assert len(entry.readme_compressed) < entry.readme_size / 4
+            assert HistoryService.readme_content(entry).startswith("# Repo 0")
+
+    def test_pages_cover_every_entry_once(self, database):
+        Session, AsyncSession = database
+        # Several entries share a timestamp, the id breaks the tie
+        base = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        expected = [record(Session, "user-1", index, base + datetime.timedelta(seconds=index // 3))
+                    for index in range(10)]
+        record(Session, "user-2", 99)
+
+        async def all_pages():
+            pages, cursor = [], None
+            async with AsyncSession() as db:
+                while True:
+                    entries, cursor = await HistoryService.alist_for_user(db, "user-1", limit=4, cursor=cursor)
+                    pages.append([entry.id for entry in entries])
+                    if cursor is None:
+                        return pages
+
+        pages = asyncio.run(all_pages())
+        assert [len(page) for page in pages] == [4, 4, 2]
+        listed = [entry_id for page in pages for entry_id in page]
+        assert sorted(listed) == sorted(expected)
+        # Newest first, the last entry is the only one in the latest second
+        assert listed[0] == expected[9]
+
+    def test_malformed_cursor_is_rejected(self):
+        with pytest.raises(ValueError):
+            HistoryService.decode_cursor("not a cursor")
+
+
+@pytest.fixture
+def tokens():
+    import fastapi_app
+
+    tokens = AccessTokens(secret="session-secret", client_secret="client-secret")
+    with patch.object(fastapi_app, "access_tokens", tokens):
+        yield tokens
+
+
+def bearer(tokens: AccessTokens, user_id: str) -> dict:
+    return {"Authorization": f"Bearer {tokens.issue(user_id)[0]}"}
+
+
+class TestHistoryEndpoints:
+    """History is served to its owner only."""
+
+    def test_owner_lists_and_fetches(self, database, tokens):
+        import fastapi_app
+        from database.config import get_async_db
+
+        Session, AsyncSession = database
+        entry_id = record(Session, "user-1", 0)
+
+        async def override_db():
+            async with AsyncSession() as db:
+                yield db
+
+        fastapi_app.app.dependency_overrides[get_async_db] = override_db
+        try:
+            client = TestClient(fastapi_app.app)
+            owner = bearer(tokens, "user-1")
+            page = client.get("/users/user-1/history", headers=owner).json()
+            detail = client.get(f"/users/user-1/history/{entry_id}", headers=owner).json()
+            forbidden = client.get("/users/user-1/history", headers=bearer(tokens, "user-2"))
+            # A user id alone, or a token signed with another secret, is not an identity
+            spoofed = client.get("/users/user-1/history", headers={"X-GitRot-User-Id": "user-1"})
+            forged = client.get("/users/user-1/history",
+                                headers=bearer(AccessTokens(secret="guess", client_secret="guess"), "user-1"))
+        finally:
+            fastapi_app.app.dependency_overrides.pop(get_async_db)
+
+        assert [item["id"] for item in page["items"]] == [entry_id] and page["next_cursor"] is None
+        assert "readme_content" not in page["items"][0]
+        assert detail["readme_content"].startswith("# Repo 0") and detail["total_tokens"] == 1500
+        assert forbidden.status_code == 403
+        assert spoofed.status_code == 401 and forged.status_code == 401
+
+    def test_readme_is_revalidated_and_served_compressed(self, database, tokens):
+        import fastapi_app
+        from database.config import get_async_db
+
+        Session, AsyncSession = database
+        entry_id = record(Session, "user-1", 0)
+        with Session() as db:
+            stored = db.get(GenerationHistory, entry_id).readme_compressed
+
+        async def override_db():
+            async with AsyncSession() as db:
+                yield db
+
+        fastapi_app.app.dependency_overrides[get_async_db] = override_db
+        try:
+            client = TestClient(fastapi_app.app)
+            owner = bearer(tokens, "user-1")
+            url = f"/users/user-1/history/{entry_id}/readme"
+            zstd = client.get(url, headers={**owner, "Accept-Encoding": "zstd"})
+            raw_zstd = client.stream("GET", url, headers={**owner, "Accept-Encoding": "zstd"})
+            with raw_zstd as response:
+                sent = b"".join(response.iter_raw())
+            gzipped = client.get(url, headers={**owner, "Accept-Encoding": "gzip, zstd;q=0.5"})
+            revalidated = client.get(url, headers={**owner, "If-None-Match": zstd.headers["etag"]})
+            detail = client.get(f"/users/user-1/history/{entry_id}",
+                                headers={**owner, "If-None-Match": f'W/{zstd.headers["etag"]}'})
+        finally:
+            fastapi_app.app.dependency_overrides.pop(get_async_db)
+
+        assert zstd.headers["content-encoding"] == "zstd" and zstd.text.startswith("# Repo 0")
+        # The stored bytes are sent without compressing again
+        assert sent == stored
+        assert gzipped.headers["content-encoding"] == "gzip" and gzipped.text == zstd.text
+        assert gzipped.headers["etag"] != zstd.headers["etag"]
+        assert revalidated.status_code == 304 and revalidated.content == b""
+        assert detail.status_code == 304
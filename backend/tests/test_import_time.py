@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import budget for fastapi_app in milliseconds. Tune with GITROT_IMPORT_BUDGET_MS
+# when tracking cold-start regressions on slower CI runners.
+IMPORT_BUDGET_MS = float(os.getenv("GITROT_IMPORT_BUDGET_MS", "2500"))
+
+# Modules that must only be loaded on first use, never at application start-up
+LAZY_MODULES = [
+    "langchain_openai",
+    "langchain_google_genai",
+    "langchain_community.vectorstores",
+    "langchain.chains.summarize",
+    "faiss",
+    "git",
+]
+
+
+def profile_import(module_name: str) -> dict:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        Mapping of module name to cumulative import time in microseconds
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert completed.returncode == 0, completed.stderr[-2000:]
+
+    timings = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        _, cumulative_us, name = line.split("|")
+        timings[name.strip()] = int(cumulative_us.strip())
+    return timings
+
+
+@pytest.fixture(scope="module")
+def app_import_profile():
+    return profile_import("fastapi_app")
+
+
+class TestImportTime:
+    """Cold-start guards for the FastAPI backend."""
+
+    @pytest.mark.parametrize("module_name", LAZY_MODULES)
+    def test_heavy_modules_are_not_imported_at_startup(self, app_import_profile, module_name):
+        """Provider SDKs, FAISS, chains and GitPython load on first use only."""
+        assert module_name not in app_import_profile
+
+    def test_app_import_within_budget(self, app_import_profile):
+        """Total import time of fastapi_app stays within the tracked budget."""
+        total_ms = app_import_profile["fastapi_app"] / 1000
+        slowest = sorted(app_import_profile.items(), key=lambda item: item[1], reverse=True)[:10]
+        print(f"fastapi_app import: {total_ms:.0f}ms (budget {IMPORT_BUDGET_MS:.0f}ms)")
+        assert total_ms < IMPORT_BUDGET_MS, f"Slowest imports (us): {slowest}"
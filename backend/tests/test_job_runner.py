@@ -0,0 +1,244 @@
+import datetime
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Same module objects fastapi_app uses
+from database.config import Base
+from database.models import GenerationJob
+from models.request_models import ReadmeRequest, ReadmeResponse, CustomCredentials
+from services.job_runner import JobRunner
+from services.job_service import JobService
+from scheduling import AdmissionController, JobSchedule, LARGE_LANE, Requester, current_requester
+
+
+class InlineExecutor:
+    """Runs submitted jobs immediately so tests don't need to wait on threads."""
+
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    @contextmanager
+    def session_scope():
+        db = Session()
+        try:
+            yield db
+            db.commit()
+        finally:
+            db.close()
+
+    with patch("services.job_runner.session_scope", session_scope):
+        yield Session
+
+
+def make_request(**kwargs):
+    return ReadmeRequest(repo_url="https://github.com/octocat/Hello-World", **kwargs)
+
+
+def successful_generation(request, progress_callback):
+    progress_callback("cloning", {"progress": 0.05})
+    progress_callback("summarizing", {"progress": 0.5, "done": 1, "total": 2})
+    return ReadmeResponse(
+        success=True,
+        readme_content="# Hello World",
+        generation_timestamp="2024-01-01T00:00:00",
+        repo_url=request.repo_url,
+        generation_method=request.generation_method
+    )
+
+
+class TestJobRunner:
+    """Test suite for asynchronous README generation jobs."""
+
+    def test_successful_job_is_persisted(self, session_factory):
+        runner = JobRunner(InlineExecutor(), successful_generation)
+        job = runner.submit(make_request())
+
+        status = runner.get_status(job.job_id)
+        assert status.status == "succeeded"
+        assert status.progress == 1.0
+        assert status.result.readme_content == "# Hello World"
+
+        # A fresh runner (e.g. after a restart) serves the result from the database
+        stored = JobRunner(InlineExecutor(), successful_generation).get_status(job.job_id)
+        assert stored.status == "succeeded"
+        assert stored.result.readme_content == "# Hello World"
+        assert stored.expires_at is not None
+
+    def test_failed_generation_records_error(self, session_factory):
+        def crash(request, progress_callback):
+            raise RuntimeError("clone failed")
+
+        runner = JobRunner(InlineExecutor(), crash)
+        job = runner.submit(make_request())
+
+        status = JobRunner(InlineExecutor(), crash).get_status(job.job_id)
+        assert status.status == "failed"
+        assert status.error_message == "clone failed"
+        assert status.result.success is False
+
+    def test_unknown_and_expired_jobs_are_missing(self, session_factory):
+        runner = JobRunner(InlineExecutor(), successful_generation, result_ttl_seconds=1)
+        job = runner.submit(make_request())
+
+        db = session_factory()
+        db.query(GenerationJob).update({"expires_at": JobService._utcnow().replace(year=2000)})
+        db.commit()
+        assert JobService.purge_expired(db) == 1
+        db.close()
+
+        assert JobRunner(InlineExecutor(), successful_generation).get_status(job.job_id) is None
+        assert runner.get_status("missing") is None
+
+    def test_resume_unfinished_jobs(self, session_factory):
+        db = session_factory()
+        resumable = JobService.create_job(db, make_request())
+        with_credentials = JobService.create_job(db, make_request(
+            use_hosted_service=False,
+            custom_credentials=CustomCredentials(azure_api_key="secret")
+        ))
+        assert with_credentials.request_payload is None
+        resumable_id, credentials_id = resumable.id, with_credentials.id
+        db.close()
+
+        runner = JobRunner(InlineExecutor(), successful_generation)
+        assert runner.resume_unfinished() == 1
+        assert runner.get_status(resumable_id).status == "succeeded"
+        assert runner.get_status(credentials_id).status == "failed"
+
+    def test_live_leases_are_not_taken_over(self, session_factory):
+        held = []
+
+        class HoldingExecutor:
+            def submit(self, fn, *args, **kwargs):
+                held.append((fn, args))
+
+        first = JobRunner(HoldingExecutor(), successful_generation, lease_seconds=60)
+        job = first.submit(make_request())
+        second = JobRunner(InlineExecutor(), successful_generation, lease_seconds=60)
+
+        # The first process is still running the job, neither it nor a second process starts it again
+        assert second.resume_unfinished() == 0
+        assert first.resume_unfinished() == 0
+        assert len(held) == 1
+
+        # Once its lease runs out (the first process died), the second one takes the job over
+        db = session_factory()
+        db.query(GenerationJob).filter(GenerationJob.id == job.job_id).update(
+            {"lease_expires_at": datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1)})
+        db.commit()
+        db.close()
+        assert second.resume_unfinished() == 1
+        assert second.get_status(job.job_id).status == "succeeded"
+        assert first.resume_unfinished() == 0
+
+    def test_resumed_jobs_keep_their_requester_and_lane(self, session_factory):
+        requester = Requester.for_user("user-1")
+        submitted = JobRunner(type("NoExecutor", (), {"submit": lambda self, fn, *args: None})(), successful_generation)
+        job = submitted.submit(make_request(), JobSchedule(priority=1.0, lane=LARGE_LANE, arrival=1.0,
+                                                           requester=requester))
+        submitted.stop()
+
+        ran_for, rescheduled = [], []
+
+        def generation(request, progress_callback):
+            ran_for.append(current_requester.get())
+            return successful_generation(request, progress_callback)
+
+        def reschedule(schedule):
+            rescheduled.append(schedule)
+            return schedule
+
+        admission = AdmissionController(max_concurrent=1, max_queue_depth=1, max_wait_seconds=5,
+                                        lane_limits={LARGE_LANE: 1})
+        resumed = JobRunner(InlineExecutor(), generation, admission=admission, reschedule=reschedule)
+        assert resumed.resume_unfinished() == 1
+
+        assert [(schedule.requester, schedule.lane) for schedule in rescheduled] == [(requester, LARGE_LANE)]
+        assert ran_for == [requester]
+        status = resumed.get_status(job.job_id)
+        assert status.status == "succeeded" and status.user_id == "user-1"
+
+    def test_stop_releases_jobs_that_never_ran(self, session_factory):
+        runner = JobRunner(type("NoExecutor", (), {"submit": lambda self, fn, *args: None})(), successful_generation)
+        job = runner.submit(make_request())
+        runner.stop()
+
+        db = session_factory()
+        assert db.get(GenerationJob, job.job_id).owner is None
+        db.close()
+        assert JobRunner(InlineExecutor(), successful_generation).resume_unfinished() == 1
+
+
+class TestStagedPipelineJobs:
+    """With the staged pipeline every admitted job has a thread, none wait inside the executor."""
+
+    @pytest.fixture
+    def file_session_factory(self, tmp_path):
+        # Jobs run on several threads at once, which a single shared in-memory connection can't take
+        engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        @contextmanager
+        def session_scope():
+            db = Session()
+            try:
+                yield db
+                db.commit()
+            finally:
+                db.close()
+
+        with patch("services.job_runner.session_scope", session_scope):
+            yield Session
+        engine.dispose()
+
+    def test_admitted_jobs_are_running(self, file_session_factory):
+        import fastapi_app
+
+        release = threading.Event()
+        running = []
+
+        def relayed_generation(request, progress_callback):
+            running.append(request.repo_url)
+            release.wait(5)
+            return successful_generation(request, progress_callback)
+
+        admission = AdmissionController(max_concurrent=6, max_queue_depth=4, max_wait_seconds=5)
+        with patch.object(fastapi_app, "staged_pipeline", object()), patch.object(fastapi_app, "ADMISSION_SLOTS", 6):
+            executor = fastapi_app.create_job_executor()
+        runner = JobRunner(executor, relayed_generation, admission=admission)
+        deadline = time.monotonic() + 5
+        try:
+            jobs = [runner.submit(make_request()) for _ in range(8)]
+            while len(running) < 6 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.05)
+
+            stats = admission.stats()
+            assert stats["running"] == len(running) == 6
+            assert stats["queued"] == 2
+        finally:
+            release.set()
+            # Queued jobs are handed to the executor as the first ones finish
+            while admission.stats()["running"] and time.monotonic() < deadline + 5:
+                time.sleep(0.01)
+            executor.shutdown(wait=True)
+        assert all(runner.get_status(job.job_id).status == "succeeded" for job in jobs)
@@ -0,0 +1,109 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api_helper import validate_github_url
+from scheduling import GitTreeSizeSource, LARGE_LANE, RepoSizeEstimate, SizeAwareScheduler, StaticSizeSource
+
+
+def estimate(tokens: int) -> RepoSizeEstimate:
+    return RepoSizeEstimate(text_files=tokens // 1500, total_files=tokens // 1500, estimated_bytes=tokens * 4,
+                            source="static")
+
+
+class TestSizeAwareScheduler:
+    """Test suite for shortest-job-first priorities."""
+
+    def test_small_jobs_overtake_large_ones(self):
+        scheduler = SizeAwareScheduler(StaticSizeSource({
+            "https://github.com/a/large": estimate(500_000),
+            "https://github.com/a/small": estimate(5_000),
+        }), large_job_tokens=200_000, delay_seconds_per_1k_tokens=0.05, max_delay_seconds=20)
+
+        large = scheduler.schedule_for(scheduler.estimate("https://github.com/a/large"), arrival=100.0)
+        small = scheduler.schedule_for(scheduler.estimate("https://github.com/a/small"), arrival=105.0)
+
+        assert small.priority < large.priority
+        assert large.lane == LARGE_LANE
+        assert small.lane == "default"
+
+    def test_delay_is_capped_for_aging(self):
+        scheduler = SizeAwareScheduler(None, max_delay_seconds=20)
+        huge = scheduler.schedule_for(estimate(50_000_000), arrival=100.0)
+        later = scheduler.schedule_for(None, arrival=121.0)
+
+        assert huge.priority == 120.0
+        assert huge.priority < later.priority
+
+    def test_unknown_size_is_fifo(self):
+        class FailingSource:
+            def estimate(self, repo_url):
+                raise RuntimeError("network down")
+
+        schedule = SizeAwareScheduler(FailingSource()).schedule("https://github.com/a/b")
+        assert schedule.estimate is None
+        assert schedule.lane == "default"
+
+    def test_estimates_are_bounded(self):
+        scheduler = SizeAwareScheduler(StaticSizeSource({"https://github.com/a/b": estimate(5_000)}),
+                                       max_concurrent_estimates=1)
+        scheduler._estimate_slots.acquire()
+
+        # Busy estimators don't hold the request up, it is scheduled FIFO
+        assert scheduler.estimate("https://github.com/a/b") is None
+        scheduler._estimate_slots.release()
+        assert scheduler.estimate("https://github.com/a/b") is not None
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+class TestGitTreeSizeSource:
+    """Sizing from the tree listing of a (local) git repository."""
+
+    def test_counts_text_files_without_checkout(self, tmp_path):
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        for name in ("app.py", "README.md", "logo.png", "src/util.ts"):
+            path = repo / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("content")
+        git = ["git", "-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run(git + ["init", "-q"], cwd=repo, check=True)
+        subprocess.run(git + ["add", "."], cwd=repo, check=True)
+        subprocess.run(git + ["commit", "-q", "-m", "init"], cwd=repo, check=True)
+
+        source = GitTreeSizeSource()
+        result = source.estimate(f"file://{repo}")
+
+        assert (result.text_files, result.total_files) == (3, 4)
+        assert result.estimated_bytes == 3 * GitTreeSizeSource.AVERAGE_TEXT_FILE_BYTES
+        # Second lookup at the same HEAD is served from the cache
+        assert source.estimate(f"file://{repo}") is result
+
+    def test_repository_url_is_never_an_option(self, tmp_path):
+        marker = tmp_path / "marker"
+
+        with pytest.raises(subprocess.CalledProcessError):
+            GitTreeSizeSource().estimate(f"--upload-pack=touch {marker};github.com/a/b")
+
+        assert not marker.exists()
+
+
+class TestRepositoryUrlValidation:
+    """Only plain https://github.com/<owner>/<repo> URLs reach git."""
+
+    def test_accepts_repository_urls(self):
+        for url in ("https://github.com/octocat/Hello-World", "https://github.com/octocat/repo.git",
+                    "https://github.com/octocat/repo/"):
+            assert validate_github_url(url), url
+
+    def test_rejects_everything_else(self):
+        for url in ("--upload-pack=touch /tmp/x;github.com/a/b", "github.com/a/b", "http://github.com/a/b",
+                    "https://github.com.evil.example/a/b", "https://user@github.com/a/b",
+                    "https://github.com/a/b/tree/main", "https://github.com/-a/b", "https://github.com/a/b?x=1",
+                    "ext::sh -c touch% /tmp/x github.com/a/b", ""):
+            assert not validate_github_url(url), url
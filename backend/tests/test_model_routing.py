@@ -0,0 +1,85 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from backend.config.model_config import get_fast_tier_model
+from backend.config.model_routing import ModelRoutingPolicy, PipelineStage
+from backend.utils.usage_tracker import UsageTracker
+
+
+class TestFastTier:
+    """Test suite for fast tier model selection."""
+
+    @pytest.mark.parametrize("model_name,expected", [
+        ("gpt-4o", "gpt-4o-mini"),
+        ("gpt-4-turbo", "gpt-4o-mini"),
+        ("gemini-1.5-pro", "gemini-1.5-flash"),
+        ("gpt-4o-mini", "gpt-4o-mini"),
+        ("gemini-1.5-flash", "gemini-1.5-flash"),
+        ("unknown-model", "unknown-model"),
+    ])
+    def test_fast_tier_model(self, model_name, expected):
+        """The fast tier is the cheaper model of the same provider, never a more expensive one."""
+        assert get_fast_tier_model(model_name) == expected
+
+
+class TestModelRoutingPolicy:
+    """Test suite for ModelRoutingPolicy."""
+
+    def test_routes_map_and_reduce_to_fast_tier(self):
+        """Map and re-reduce go to the fast tier, the final README to the requested model."""
+        policy = ModelRoutingPolicy.for_model("gpt-4o")
+
+        assert policy.is_tiered
+        assert policy.model_for(PipelineStage.MAP) == "gpt-4o-mini"
+        assert policy.model_for(PipelineStage.RE_REDUCE) == "gpt-4o-mini"
+        assert policy.model_for(PipelineStage.FINAL) == "gpt-4o"
+
+    def test_disabled_routing_uses_requested_model(self):
+        """With routing disabled every stage uses the requested model."""
+        policy = ModelRoutingPolicy.for_model("gpt-4o", enabled=False)
+
+        assert not policy.is_tiered
+        assert policy.model_for(PipelineStage.MAP) == "gpt-4o"
+
+    def test_explicit_map_model_across_providers_is_ignored(self):
+        """Routing never crosses providers since only one set of credentials is available."""
+        policy = ModelRoutingPolicy.for_model("gpt-4o", map_model="gemini-1.5-flash")
+
+        assert not policy.is_tiered
+
+    def test_explicit_map_model_same_provider(self):
+        """An explicit map model of the same provider overrides the fast tier."""
+        policy = ModelRoutingPolicy.for_model("gpt-4", map_model="gpt-35-turbo")
+
+        assert policy.model_for(PipelineStage.MAP) == "gpt-35-turbo"
+
+
+class TestUsageTracker:
+    """Test suite for per-stage usage accounting."""
+
+    def test_cost_and_latency_per_stage(self):
+        """Costs are computed from ModelConfig pricing for the model serving each stage."""
+        tracker = UsageTracker()
+        tracker.record("map", "gpt-4o-mini", prompt_tokens=1000, completion_tokens=1000, latency_seconds=0.5)
+        tracker.record("map", "gpt-4o-mini", prompt_tokens=1000, completion_tokens=1000, latency_seconds=0.5)
+        tracker.record("final", "gpt-4o", prompt_tokens=2000, completion_tokens=1000, latency_seconds=3.0)
+
+        summary = tracker.summary()
+
+        assert summary["llm_calls"] == 3
+        assert summary["stages"]["map"]["calls"] == 2
+        assert summary["stages"]["map"]["latency_seconds"] == pytest.approx(1.0)
+        assert summary["stages"]["map"]["estimated_cost"] == pytest.approx(2 * (0.00015 + 0.0006))
+        assert summary["stages"]["final"]["estimated_cost"] == pytest.approx(2 * 0.005 + 0.015)
+        assert summary["stages"]["final"]["models"] == {"gpt-4o": 1}
+        assert summary["prompt_tokens"] == 4000
+
+    def test_unknown_model_has_no_cost(self):
+        """Unknown models are still counted but contribute no cost."""
+        tracker = UsageTracker()
+        assert tracker.record("map", "custom-deployment", 10, 10, 0.1) is None
+        assert tracker.summary()["estimated_cost"] == 0
@@ -0,0 +1,122 @@
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import api_helper
+from api_helper import MemoryRateLimitStore, RateLimiter
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(api_helper.time, "time", fake)
+    return fake
+
+
+class TestRateLimiter:
+    """Test suite for the GCRA request limiter."""
+
+    def test_burst_then_steady_rate(self, clock):
+        limiter = RateLimiter(max_requests=3, window_minutes=1)
+
+        assert [limiter.is_allowed("a") for _ in range(4)] == [True, True, True, False]
+        rejected = limiter.check("a")
+        assert rejected.retry_after_seconds == pytest.approx(20.0)
+
+        # One request per window / max_requests after the burst
+        clock.now += 20
+        assert limiter.is_allowed("a")
+        assert not limiter.is_allowed("a")
+        # Other clients have their own budget
+        assert limiter.is_allowed("b")
+
+    def test_long_run_rate_is_max_requests_per_window(self, clock):
+        limiter = RateLimiter(max_requests=5, window_minutes=1)
+        allowed = 0
+        for _ in range(600):
+            allowed += limiter.is_allowed("a")
+            clock.now += 0.5
+        # One request per 12s over five windows, plus the burst allowance beyond the steady rate
+        assert allowed == 5 * 5 + (5 - 1)
+
+    def test_expired_keys_are_dropped(self, clock):
+        store = MemoryRateLimitStore()
+        limiter = RateLimiter(max_requests=10, window_minutes=1, store=store)
+        for index in range(100):
+            limiter.is_allowed(f"client-{index}")
+        assert len(store) == 100
+
+        clock.now += 61
+        limiter.is_allowed("late")
+        assert len(store) == 1
+
+    def test_store_failure_allows_the_request(self):
+        class BrokenStore:
+            def check(self, key, emission_interval, tolerance):
+                raise ConnectionError("redis down")
+
+        assert RateLimiter(max_requests=1, window_minutes=1, store=BrokenStore()).is_allowed("a")
+
+
+class TestClientAddress:
+    """Client IP behind trusted proxies."""
+
+    class FakeRequest:
+        def __init__(self, forwarded_for=None, host="10.0.0.1"):
+            self.headers = {"x-forwarded-for": forwarded_for} if forwarded_for else {}
+            self.client = type("Client", (), {"host": host})()
+
+    def test_forwarded_for_ignored_without_trusted_proxies(self):
+        with patch.object(api_helper, "TRUSTED_PROXY_HOPS", 0):
+            assert api_helper.get_client_address(self.FakeRequest("1.2.3.4")) == "10.0.0.1"
+
+    def test_rightmost_trusted_hop_is_used(self):
+        with patch.object(api_helper, "TRUSTED_PROXY_HOPS", 1):
+            # The client may spoof entries on the left, the proxy appends the real address
+            request = self.FakeRequest("6.6.6.6, 198.51.100.7")
+            assert api_helper.get_client_address(request) == "198.51.100.7"
+            assert api_helper.get_client_address(self.FakeRequest()) == "10.0.0.1"
+
+
+class TestRequestBuckets:
+    """Every request spends from its IP's bucket, authenticated users' from their own too."""
+
+    def test_accounts_do_not_multiply_an_addresses_requests(self):
+        request = TestClientAddress.FakeRequest(host="10.0.0.1")
+        with patch.object(api_helper, "rate_limiter", RateLimiter(max_requests=2, window_minutes=1)):
+            allowed = [api_helper.check_rate_limit(request, "ip:a", f"user:{index}").allowed for index in range(3)]
+        assert allowed == [True, True, False]
+
+    def test_user_bucket_follows_the_user_across_addresses(self):
+        request = TestClientAddress.FakeRequest(host="10.0.0.1")
+        with patch.object(api_helper, "rate_limiter", RateLimiter(max_requests=2, window_minutes=1)):
+            allowed = [api_helper.check_rate_limit(request, f"ip:{index}", "user:ada").allowed for index in range(3)]
+        assert allowed == [True, True, False]
+
+
+class TestRateLimitedEndpoint:
+    """429 responses from the API."""
+
+    def test_rejection_carries_retry_after(self):
+        import fastapi_app
+
+        with patch.object(api_helper, "rate_limiter", RateLimiter(max_requests=1, window_minutes=1)):
+            client = TestClient(fastapi_app.app)
+            api_helper.rate_limiter.is_allowed(fastapi_app.Requester.for_client("testclient").key)
+            response = client.post("/jobs", json={"repo_url": "https://github.com/octocat/Hello-World"})
+
+        assert response.status_code == 429
+        assert 1 <= int(response.headers["retry-after"]) <= 60
@@ -83,8 +83,10 @@ class TestReadmeGeneratorE2E:
         # Set up mocks for GitrotBrain
         mock_brain_instance = Mock()
         mock_llm = Mock()
+        mock_map_llm = Mock()
         mock_embeddings = Mock()
         mock_brain_instance.get_llm.return_value = mock_llm
+        mock_brain_instance.get_llm_for_model.return_value = mock_map_llm
         mock_brain_instance.getEmbeddingModel.return_value = mock_embeddings
         mock_gitrot_brain.return_value = mock_brain_instance
         
@@ -93,12 +95,15 @@ class TestReadmeGeneratorE2E:
         mock_helper_instance.clone_repo.return_value = mock_local_path
         mock_helper_instance.extract_code_from_repo.return_value = mock_code_content
         mock_helper_instance.delete_cloned_repo.return_value = True
+        mock_helper_instance.skipped_file_count = 0
+        mock_helper_instance.extracted_file_count = 3
         mock_helper.return_value = mock_helper_instance
         
         # Set up mocks for Generators
         mock_generator_instance = Mock()
         mock_generator_instance.summarize_code.return_value = mock_code_summary
         mock_generator_instance.generate_readme.return_value = mock_readme_content
+        mock_generator_instance.affordable_calls.return_value = 10
         mock_generators.return_value = mock_generator_instance
         
         # Create the request object
@@ -130,14 +135,18 @@ class TestReadmeGeneratorE2E:
         # 1. Brain initialization with correct model
         mock_gitrot_brain.assert_called_once_with("gpt-35-turbo-instruct")
         mock_brain_instance.get_llm.assert_called_once()
+        mock_brain_instance.get_llm_for_model.assert_called_once_with("gpt-4o-mini")
         mock_brain_instance.getEmbeddingModel.assert_called_once()
         
         # 2. Helper operations
-        mock_helper_instance.clone_repo.assert_called_once_with(mock_github_url, mock_repo_name)
-        mock_helper_instance.extract_code_from_repo.assert_called_once_with(mock_local_path)
-        
-        # 3. Generator operations
-        mock_generator_instance.summarize_code.assert_called_once_with(mock_llm, mock_code_content)
+        mock_helper_instance.clone_repo.assert_called_once_with(mock_github_url, mock_repo_name,
+                                                                cancellation=app.cancellation)
+        mock_helper_instance.extract_code_from_repo.assert_called_once_with(mock_local_path,
+                                                                            cancellation=app.cancellation,
+                                                                            max_chars=10 * 2800)
+        
+        # 3. Generator operations: chunk summaries use the fast tier, the README uses the requested model
+        mock_generator_instance.summarize_code.assert_called_once_with(mock_map_llm, mock_code_content)
         mock_generator_instance.generate_readme.assert_called_once_with(mock_llm, mock_code_summary)
         
         # 4. File operations
@@ -0,0 +1,101 @@
+import concurrent.futures
+import os
+import sys
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from api_helper import APIMetrics
+from scheduling import AdmissionController
+from utils.usage_tracker import UsageTracker
+from utils.stage_metrics import Histogram, HistogramFamily, PipelineMetrics
+
+
+class TestHistograms:
+    """Test suite for the fixed-bucket latency histograms."""
+
+    def test_quantiles_are_interpolated_within_buckets(self):
+        histogram = Histogram((1, 2, 4))
+        for value in [0.5] * 50 + [3] * 49 + [100]:
+            histogram.observe(value)
+        assert histogram.quantile(0.5) == 1.0
+        assert 2 < histogram.quantile(0.9) < 4
+        # Past the last bound the estimate is the last bound
+        assert histogram.quantile(1.0) == 4.0
+
+    def test_label_values_are_bounded(self):
+        family = HistogramFamily("gitrot_test_seconds", "Test.", "stage", (1,), max_series=2)
+        for stage in ["a", "b", "c", "d"]:
+            family.observe(stage, 0.5)
+        assert sorted(family.summary()) == ["a", "b", "other"]
+        assert family.summary()["other"]["count"] == 2
+
+    def test_concurrent_updates_are_not_lost(self):
+        metrics = APIMetrics(pipeline=PipelineMetrics())
+
+        def work(_):
+            for _ in range(1000):
+                metrics.increment_requests()
+                metrics.add_response_time(0.01, "generate_readme")
+                metrics.pipeline.observe_stage("map_call", 1.5)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(work, range(8)))
+
+        result = metrics.get_metrics()
+        assert result["total_requests"] == 8000
+        assert result["latency"]["endpoints"]["generate_readme"]["count"] == 8000
+        assert result["latency"]["stages"]["map_call"]["count"] == 8000
+
+
+class TestPrometheusExposition:
+    """/metrics serves the Prometheus text format to scrapers."""
+
+    def test_text_format(self):
+        metrics = APIMetrics(pipeline=PipelineMetrics())
+        metrics.pipeline.observe_stage("clone", 0.3)
+        metrics.pipeline.observe_count("chunks", 40)
+        lines = metrics.prometheus_text().splitlines()
+
+        assert "# TYPE gitrot_stage_duration_seconds histogram" in lines
+        assert 'gitrot_stage_duration_seconds_bucket{stage="clone",le="0.25"} 0' in lines
+        assert 'gitrot_stage_duration_seconds_bucket{stage="clone",le="0.5"} 1' in lines
+        assert 'gitrot_stage_duration_seconds_bucket{stage="clone",le="+Inf"} 1' in lines
+        assert 'gitrot_stage_duration_seconds_count{stage="final"} 0' in lines
+        assert 'gitrot_generation_items_bucket{item="chunks",le="50"} 1' in lines
+        assert "gitrot_requests_total 0" in lines
+
+    def test_endpoint_negotiates_the_format(self):
+        import fastapi_app
+
+        client = TestClient(fastapi_app.app)
+        scraped = client.get("/metrics", headers={"Accept": "text/plain;version=0.0.4"})
+        forced = client.get("/metrics?format=prometheus")
+        default = client.get("/metrics")
+
+        assert scraped.headers["content-type"].startswith("text/plain")
+        assert "# TYPE gitrot_stage_duration_seconds histogram" in scraped.text
+        assert forced.headers["content-type"].startswith("text/plain")
+        assert "latency" in default.json()
+
+    def test_one_generation_is_counted_once(self):
+        import fastapi_app
+
+        with patch.object(fastapi_app, "ReadmeGeneratorApp") as generator_app_class, \
+                patch.object(fastapi_app, "thread_pool", concurrent.futures.ThreadPoolExecutor(max_workers=1)), \
+                patch.object(fastapi_app, "admission", AdmissionController(1, 1, 5)), \
+                patch.object(fastapi_app, "staged_pipeline", None), patch.object(fastapi_app, "usage_ledger", None):
+            generator_app = generator_app_class.return_value
+            generator_app.generate_readme_from_repo_url.return_value = "# Hello"
+            generator_app.get_usage_summary.return_value = UsageTracker().summary()
+            generator_app.get_degradations.return_value = []
+            generator_app.requester = None
+            client = TestClient(fastapi_app.app)
+            before = client.get("/metrics").json()["total_generations"]
+            response = client.post("/generate-readme", json={"repo_url": "https://github.com/octocat/Hello-World"})
+            after = client.get("/metrics").json()["total_generations"]
+
+        assert response.status_code == 200 and response.json()["success"]
+        assert after - before == 1
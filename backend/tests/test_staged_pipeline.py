@@ -0,0 +1,91 @@
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import ReadmeGeneratorApp
+from benchmarks.stubs import StubChatModel, make_synthetic_repo, offline_pipeline
+from models.request_models import ReadmeRequest
+from scheduling import StagedPipeline
+from wrappers.rate_limitter import LLMRateLimiter
+
+
+@pytest.fixture
+def repositories(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return {
+        f"https://github.com/bench/repo-{index}": make_synthetic_repo(str(tmp_path / f"repo-{index}"), files=3, seed=index)
+        for index in range(3)
+    }
+
+
+async def run_pipeline(requests):
+    pipeline = StagedPipeline(io_workers=2, cpu_workers=0, llm_concurrency=2, queue_depth=1)
+    await pipeline.start()
+    try:
+        return await asyncio.gather(
+            *[pipeline.run(request, lambda request=request: ReadmeGeneratorApp(request)) for request in requests],
+            return_exceptions=True
+        )
+    finally:
+        await pipeline.stop()
+
+
+class TestStagedPipeline:
+    """Test suite for the ingest -> prepare -> llm pipeline."""
+
+    def test_generates_readmes_through_all_stages(self, repositories):
+        llm = StubChatModel(mean_latency=0.01, latency_jitter=0)
+        requests = [ReadmeRequest(repo_url=url, model_name="gpt-4") for url in repositories]
+
+        with offline_pipeline(llm, repositories), contextlib.redirect_stdout(io.StringIO()):
+            results = asyncio.run(run_pipeline(requests))
+
+        assert all(result.startswith("summary") for result in results)
+        # One map call per chunk and one final call per repository at least
+        assert llm.stats()["calls"] >= 2 * len(requests)
+        # Clones are cleaned up after the README is written
+        assert os.listdir("projects") == []
+
+    def test_failures_are_reported_per_request(self, repositories):
+        llm = StubChatModel(mean_latency=0.01, latency_jitter=0)
+        requests = [
+            ReadmeRequest(repo_url="https://github.com/bench/repo-0", model_name="gpt-4"),
+            ReadmeRequest(repo_url="https://github.com/bench/repo-0", model_name="gpt-4",
+                          generation_method="Unknown method"),
+        ]
+
+        with offline_pipeline(llm, repositories), contextlib.redirect_stdout(io.StringIO()):
+            ok, failed = asyncio.run(run_pipeline(requests))
+
+        assert isinstance(ok, str)
+        assert isinstance(failed, ValueError)
+        assert os.listdir("projects") == []
+
+
+class TestAsyncRateLimiter:
+    """ainvoke shares the spacing of the sync limiter across concurrent coroutines."""
+
+    def test_concurrent_calls_are_spaced(self):
+        limiter = LLMRateLimiter.get_instance()
+        previous = (limiter.base_delay, limiter._current_delay)
+        limiter.base_delay = limiter._current_delay = 0.05
+        llm = StubChatModel(mean_latency=0, latency_jitter=0)
+
+        async def scenario():
+            start_time = time.perf_counter()
+            await asyncio.gather(*[limiter.ainvoke(llm, "prompt") for _ in range(4)])
+            return time.perf_counter() - start_time
+
+        try:
+            elapsed = asyncio.run(scenario())
+        finally:
+            limiter.base_delay, limiter._current_delay = previous
+        assert elapsed >= 0.14
+        assert llm.stats()["calls"] == 4
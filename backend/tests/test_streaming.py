@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+from unittest.mock import Mock, patch
+
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import fastapi_app
+from models.request_models import ReadmeResponse
+
+
+def passthrough_limiter():
+    limiter = Mock()
+    limiter.invoke.side_effect = lambda llm, prompt, invoke_fn=None, **kwargs: (
+        invoke_fn(llm, prompt) if invoke_fn else llm.invoke(prompt)
+    )
+    return limiter
+
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestFinalReadmeStreaming:
+    """The final README call streams tokens when a listener is attached."""
+
+    def test_tokens_are_streamed_and_aggregated(self):
+        from generators import Generators
+
+        tokens = []
+        llm = GenericFakeChatModel(messages=iter([AIMessage(content="# Title\n\nSome readme text")]))
+        generator = Generators("gpt-4o", on_token=tokens.append)
+
+        with patch("generators.llm_rate_limiter", passthrough_limiter()):
+            readme = generator.generate_readme(llm, "short summary")
+
+        assert len(tokens) > 1
+        assert "".join(tokens) == readme == "# Title\n\nSome readme text"
+        assert generator.usage_tracker.summary()["stages"]["final"]["calls"] == 1
+
+    def test_no_streaming_without_listener(self):
+        from generators import Generators
+
+        llm = Mock()
+        llm.invoke.return_value = AIMessage(content="readme")
+        generator = Generators("gpt-4o")
+
+        with patch("generators.llm_rate_limiter", passthrough_limiter()):
+            assert generator.generate_readme(llm, "short summary") == "readme"
+        llm.stream.assert_not_called()
+
+
+class TestStreamEndpoint:
+    """Test suite for the server-sent events endpoint."""
+
+    def test_events_are_sent_in_order(self):
+        def fake_generation(request, progress_callback=None, token_callback=None, requester=None, cancellation=None,
+                            time_budget=None):
+            progress_callback("cloned", {"progress": 0.1})
+            progress_callback("summarizing", {"progress": 0.45, "done": 1, "total": 2})
+            token_callback("# Hello")
+            token_callback(" World")
+            return ReadmeResponse(
+                success=True,
+                readme_content="# Hello World",
+                generation_timestamp="2024-01-01T00:00:00",
+                repo_url=request.repo_url,
+                generation_method=request.generation_method
+            )
+
+        with patch.object(fastapi_app, "run_readme_generation", fake_generation), \
+             patch.object(fastapi_app, "size_scheduler", None):
+            response = TestClient(fastapi_app.app).post(
+                "/generate-readme/stream",
+                json={"repo_url": "https://github.com/octocat/Hello-World"}
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.text)
+        assert [event for event, _ in events] == ["progress", "progress", "token", "token", "result"]
+        assert events[1][1] == {"stage": "summarizing", "progress": 0.45, "done": 1, "total": 2}
+        assert events[-1][1]["readme_content"] == "# Hello World"
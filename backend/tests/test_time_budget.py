@@ -0,0 +1,124 @@
+import os
+import sys
+from unittest.mock import patch
+
+from langchain_core.messages import AIMessage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from helpers import Helper
+from utils.time_budget import CallLatencyEstimator, TimeBudget, MAX_TIME_BUDGET_SECONDS
+
+
+def make_budget(seconds: float, map_seconds: float = 10.0, final_seconds: float = 0.0) -> TimeBudget:
+    latency = CallLatencyEstimator({"map": map_seconds, "re_reduce": map_seconds, "final": final_seconds})
+    return TimeBudget(seconds, latency=latency)
+
+
+class TestTimeBudget:
+    """Test suite for the per-request deadline."""
+
+    def test_final_call_is_reserved(self):
+        budget = make_budget(101, map_seconds=10, final_seconds=20)
+        # 76s left once 25s are held back for the final call
+        assert budget.affordable_calls(budget.seconds_per_call("map")) == 7
+        assert budget.affordable_calls(budget.seconds_per_call("map", concurrency=4)) == 30
+        # The rate limiter spacing bounds concurrent calls
+        assert budget.affordable_calls(budget.seconds_per_call("map", concurrency=4, min_spacing=5)) == 15
+
+    def test_request_budget_is_capped(self):
+        assert TimeBudget.for_request(10 ** 6).budget_seconds == MAX_TIME_BUDGET_SECONDS
+        assert TimeBudget.for_request(30).budget_seconds == 30
+
+    def test_latency_estimate_follows_observed_calls(self):
+        latency = CallLatencyEstimator({"map": 5.0}, smoothing=0.5)
+        assert latency.estimate("re_reduce") == 5.0
+        latency.observe("map", 1.0)
+        latency.observe("map", 3.0)
+        assert latency.estimate("map") == 2.0
+
+
+class TestPrioritizedExtraction:
+    """Files are read in priority order until the character budget is spent."""
+
+    def test_manifests_and_entry_points_come_first(self, tmp_path):
+        (tmp_path / "tests").mkdir()
+        (tmp_path / "tests" / "test_app.py").write_text("assert True\n" * 50)
+        (tmp_path / "pkg" / "deep").mkdir(parents=True)
+        (tmp_path / "pkg" / "deep" / "module.py").write_text("x = 1\n" * 50)
+        (tmp_path / "main.py").write_text("run()\n" * 50)
+        (tmp_path / "README.md").write_text("# Project\n" * 30)
+
+        helper = Helper()
+        code_text = helper.extract_code_from_repo(str(tmp_path), max_chars=1000)
+
+        assert code_text.index("README.md") < code_text.index("main.py")
+        assert "module.py" not in code_text and "test_app.py" not in code_text
+        assert (helper.extracted_file_count, helper.skipped_file_count) == (2, 2)
+
+    def test_files_past_the_budget_are_never_opened(self, tmp_path):
+        for index in range(5):
+            (tmp_path / f"module_{index}.py").write_text("x = 1\n" * 100)
+        opened = []
+        real_open = open
+
+        def recording_open(path, *args, **kwargs):
+            opened.append(os.path.basename(path))
+            return real_open(path, *args, **kwargs)
+
+        helper = Helper()
+        with patch("builtins.open", recording_open):
+            helper.extract_code_from_repo(str(tmp_path), max_chars=1000)
+
+        assert (helper.extracted_file_count, helper.skipped_file_count) == (1, 4)
+        assert len(opened) == 1
+
+    def test_no_limit_reads_everything(self, tmp_path):
+        for index in range(3):
+            (tmp_path / f"module_{index}.py").write_text("x = 1\n")
+        helper = Helper()
+        helper.extract_code_from_repo(str(tmp_path))
+        assert (helper.extracted_file_count, helper.skipped_file_count) == (3, 0)
+
+
+class TestDegradedGeneration:
+    """Map calls and reduce rounds are trimmed to leave time for the final call."""
+
+    @patch("backend.generators.llm_rate_limiter")
+    def test_map_calls_stop_when_the_budget_runs_out(self, mock_limiter):
+        from backend.generators import Generators
+
+        budget = make_budget(25, map_seconds=10)
+
+        def invoke(llm, prompt, **kwargs):
+            budget.start -= 10  # every call takes 10s
+            return AIMessage(content="summary")
+
+        mock_limiter.current_delay = 0.0
+        mock_limiter.invoke.side_effect = invoke
+        generator = Generators("gpt-4o", time_budget=budget)
+        code_text = "\n\n".join(f"File: m{index}.py\n" + "x = 1\n" * 800 for index in range(4))
+
+        summary = generator.summarize_code(None, code_text)
+
+        assert summary == "summary\n\nsummary"
+        assert mock_limiter.invoke.call_count == 2
+        assert budget.degradations[0]["kind"] == "map_calls_capped"
+
+    @patch("backend.generators.llm_rate_limiter")
+    def test_condense_round_is_skipped_but_the_readme_is_written(self, mock_limiter):
+        from backend.generators import Generators
+
+        mock_limiter.current_delay = 0.0
+        mock_limiter.invoke.return_value = AIMessage(content="readme")
+        budget = make_budget(0, final_seconds=30)
+        generator = Generators("gpt-4o", time_budget=budget)
+        max_tokens = generator.tokenizer.get_max_input_tokens_for_readme()
+
+        readme = generator.generate_readme(None, "word " * (max_tokens + 1000))
+
+        assert readme == "readme"
+        assert mock_limiter.invoke.call_count == 1
+        prompt = mock_limiter.invoke.call_args[0][1]
+        assert generator.tokenizer.count_token(prompt) < max_tokens + 500
+        assert [d["kind"] for d in budget.degradations] == ["skipped_reduce_rounds"]
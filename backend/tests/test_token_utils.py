@@ -0,0 +1,86 @@
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from backend.utils.token_utils import TokenCalculator, get_encoding_for_model
+
+if get_encoding_for_model("gpt-4") is None:
+    pytest.skip("tiktoken encodings cannot be downloaded in this environment", allow_module_level=True)
+
+SAMPLE_SUMMARIES = [
+    "This module implements a Flask web server with a single route.",
+    "The helpers clone repositories and extract source files for analysis.",
+    "Configuration is loaded from environment variables using python-dotenv.",
+]
+
+
+class TestTokenCalculator:
+    """Test suite for TokenCalculator."""
+
+    def test_encodings_are_cached_process_wide(self):
+        """Constructing a calculator per request must not rebuild the encoding."""
+        first = TokenCalculator("gpt-4")
+        with patch("backend.utils.token_utils.tiktoken.encoding_for_model") as mock_encoding_for_model:
+            second = TokenCalculator("gpt-4")
+
+        mock_encoding_for_model.assert_not_called()
+        assert first.tokenizer is second.tokenizer
+
+    def test_unknown_model_falls_back_to_default_encoding(self):
+        """Unknown models use cl100k_base."""
+        assert get_encoding_for_model("not-a-real-model").name == "cl100k_base"
+
+    def test_batch_counts_match_single_counts(self):
+        """Batched counting gives the same result as counting each text."""
+        calculator = TokenCalculator("gpt-4")
+
+        assert calculator.count_tokens_batch(SAMPLE_SUMMARIES) == [
+            calculator.count_token(text) for text in SAMPLE_SUMMARIES
+        ]
+        assert calculator.count_tokens_batch([]) == []
+
+    def test_joined_count_tracks_exact_count(self):
+        """Summing per-summary counts is within a token per join of re-encoding the joined text."""
+        calculator = TokenCalculator("gpt-4")
+        counts = calculator.count_tokens_batch(SAMPLE_SUMMARIES)
+
+        exact = calculator.count_token("\n\n".join(SAMPLE_SUMMARIES))
+        assert abs(calculator.count_joined_tokens(counts) - exact) <= len(SAMPLE_SUMMARIES) - 1
+
+    def test_special_token_text_is_counted(self):
+        """Text containing special token markers is counted rather than falling back to estimation."""
+        calculator = TokenCalculator("gpt-4")
+        assert calculator.count_token("<|endoftext|>") > 13 // 4
+
+    @pytest.mark.parametrize("size,expected", [(100, True), (2_000_000, False)])
+    def test_quick_budget_check_skips_encoding_for_clear_cases(self, size, expected):
+        """Inputs far below or above the budget are decided without a full encode."""
+        calculator = TokenCalculator("gpt-4")
+        text = "def handler(event):\n    return event\n" * (size // 36 + 1)
+
+        with patch.object(calculator, "count_token") as mock_count:
+            assert calculator.is_summary_within_size(text) is expected
+        mock_count.assert_not_called()
+
+    def test_borderline_input_uses_exact_count(self):
+        """Inputs near the budget fall through to an exact count."""
+        calculator = TokenCalculator("gpt-4")
+        max_tokens = calculator.get_max_input_tokens_for_readme()
+        text = "word " * max_tokens
+
+        assert calculator.quick_budget_check(text, max_tokens) is None
+        assert calculator.is_summary_within_size(text) == (calculator.count_token(text) < max_tokens)
+
+    def test_estimate_never_decides_that_text_fits(self):
+        """A low estimate (e.g. a stale calibration) still falls through to an exact count."""
+        calculator = TokenCalculator("gpt-4")
+        max_tokens = calculator.get_max_input_tokens_for_readme()
+        text = "word " * (max_tokens + 100)
+
+        with patch.object(calculator, "estimate_tokens", return_value=max_tokens // 10):
+            assert calculator.quick_budget_check(text, max_tokens) is None
+            assert calculator.is_summary_within_size(text) is False
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from benchmarks.stubs import StubChatModel
+from utils import tracing
+from wrappers.rate_limitter import LLMRateLimiter
+
+
+def spans_by_name(trace: tracing.Trace) -> dict:
+    return {span.name: span for span in trace.spans}
+
+
+class TestSpans:
+    """Test suite for trace spans and their propagation."""
+
+    def test_untraced_code_records_nothing(self):
+        with tracing.span("extract") as span:
+            assert span is None
+        assert tracing.current_span() is None
+
+    def test_spans_nest_and_continue_in_other_threads(self):
+        trace = tracing.Trace("generate_readme")
+        with tracing.recording(trace):
+            with tracing.span("ingest", repo_url="https://github.com/octocat/hello-world"):
+                parent = tracing.current_span()
+
+                def worker():
+                    with tracing.within(parent), tracing.span("repo.read") as read_span:
+                        read_span.set(files=3)
+
+                thread = threading.Thread(target=worker)
+                thread.start()
+                thread.join()
+            try:
+                with tracing.span("llm.final"):
+                    raise RuntimeError("provider down")
+            except RuntimeError:
+                pass
+
+        spans = spans_by_name(trace)
+        assert spans["repo.read"].parent_id == spans["ingest"].span_id
+        assert spans["ingest"].parent_id == trace.root.span_id
+        assert spans["repo.read"].attributes == {"files": 3}
+        assert spans["llm.final"].error == "RuntimeError: provider down"
+
+        otlp_spans = trace.to_otlp()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert {span["traceId"] for span in otlp_spans} == {trace.trace_id}
+        assert [span["status"]["code"] for span in otlp_spans if span["name"] == "llm.final"] == [2]
+
+    def test_rate_limiter_waits_are_spans(self):
+        limiter = LLMRateLimiter.get_instance()
+        previous = (limiter.base_delay, limiter._current_delay)
+        limiter.base_delay = limiter._current_delay = 0.05
+        trace = tracing.Trace("generate_readme")
+
+        async def scenario():
+            with tracing.recording(trace):
+                await asyncio.gather(*[limiter.ainvoke(StubChatModel(mean_latency=0, latency_jitter=0), "prompt")
+                                       for _ in range(3)])
+
+        try:
+            asyncio.run(scenario())
+        finally:
+            limiter.base_delay, limiter._current_delay = previous
+
+        waits = [span for span in trace.spans if span.name == "rate_limiter.wait"]
+        assert len(waits) == 3
+        # The last call waited for two spacing intervals
+        assert max(span.duration_seconds for span in waits) >= 0.09
+
+
+class TestProfiles:
+    """Requests can ask for a profile, which is written next to the spans."""
+
+    def test_header_decides_once_enabled(self, monkeypatch):
+        assert tracing.trace_decision("profile") == (False, False)
+
+        monkeypatch.setattr(tracing, "TRACE_HEADER_ENABLED", True)
+        assert tracing.trace_decision("profile") == (True, True)
+        assert tracing.trace_decision("1") == (True, False)
+        assert tracing.trace_decision(None) == (False, False)
+
+    def test_profile_is_written_with_the_trace(self, tmp_path):
+        trace = tracing.Trace("generate_readme", profile=True)
+        with tracing.recording(trace), tracing.profiled():
+            sorted(str(number) for number in range(20000))
+
+        tracing.write_to_directory(trace, str(tmp_path))
+        with open(tmp_path / f"{trace.trace_id}.json", encoding="utf-8") as f:
+            assert json.load(f)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] == "generate_readme"
+        assert (tmp_path / f"{trace.trace_id}.prof").exists()
+        assert "function calls" in (tmp_path / f"{trace.trace_id}.txt").read_text(encoding="utf-8")
+
+    def test_directory_keeps_the_newest_traces(self, tmp_path):
+        (tmp_path / "notes.md").write_text("kept")
+        traces = []
+        for index in range(3):
+            trace = tracing.Trace("generate_readme")
+            with tracing.recording(trace):
+                pass
+            tracing.write_to_directory(trace, str(tmp_path), max_traces=2)
+            # Written a second apart
+            os.utime(tmp_path / f"{trace.trace_id}.json", (index, index))
+            traces.append(trace)
+
+        assert sorted(os.listdir(tmp_path)) == sorted(["notes.md", f"{traces[1].trace_id}.json",
+                                                       f"{traces[2].trace_id}.json"])
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import sys
+import time
+from contextlib import contextmanager
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Same module objects fastapi_app uses
+from database.config import Base
+from database.models import UsageEvent, UsageTotal
+from models.request_models import ReadmeRequest
+from scheduling.fair_share import Requester
+from services.auth_tokens import AccessTokens
+from services.usage_ledger import UsageLedger, usage_period
+
+USAGE = {"llm_calls": 3, "prompt_tokens": 1000, "completion_tokens": 200, "total_tokens": 1200, "estimated_cost": 0.01}
+REQUEST = ReadmeRequest(repo_url="https://github.com/octocat/hello-world")
+ADA = Requester.for_user("ada")
+
+
+@pytest.fixture
+def database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'usage.db'}")
+    Base.metadata.create_all(bind=engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    Session = sessionmaker(bind=engine)
+
+    @contextmanager
+    def session_scope():
+        with Session() as db:
+            yield db
+            db.commit()
+
+    yield session_scope, statements
+    engine.dispose()
+
+
+class TestUsageLedger:
+    """Test suite for the write-behind usage ledger."""
+
+    def test_flush_writes_a_batch_with_one_insert(self, database):
+        session_scope, statements = database
+        ledger = UsageLedger(session_factory=session_scope, max_batch=100)
+        for index in range(5):
+            ledger.record(ADA if index < 4 else Requester.for_client("10.0.0.1"), REQUEST, USAGE,
+                          succeeded=index != 0, latency_seconds=4.0)
+        assert statements == []
+
+        assert ledger.flush() == 5
+        assert len([statement for statement in statements if "INSERT INTO usage_events" in statement]) == 1
+        with session_scope() as db:
+            assert db.scalar(select(func.count()).select_from(UsageEvent)) == 5
+            total = db.get(UsageTotal, (ADA.key, usage_period()))
+            assert (total.requests, total.total_tokens) == (4, 4800)
+        assert ledger.stats()["buffered_events"] == 0
+
+    def test_totals_include_buffered_and_earlier_flushes(self, database):
+        session_scope, _ = database
+        earlier = UsageLedger(session_factory=session_scope)
+        earlier.record(ADA, REQUEST, USAGE, succeeded=True, latency_seconds=1.0)
+        earlier.flush()
+
+        # A restarted process reads the flushed totals once, then counts in memory
+        ledger = UsageLedger(session_factory=session_scope)
+        ledger.record(ADA, REQUEST, USAGE, succeeded=True, latency_seconds=1.0)
+        assert ledger.usage_for(ADA.key)["total_tokens"] == 2400
+        ledger.flush()
+        ledger.record(ADA, REQUEST, USAGE, succeeded=True, latency_seconds=1.0)
+        assert ledger.usage_for(ADA.key)["requests"] == 3
+        assert ledger.usage_for(Requester.for_user("grace").key)["requests"] == 0
+
+    def test_failed_flush_keeps_events(self, database):
+        session_scope, _ = database
+        attempts = []
+
+        @contextmanager
+        def flaky_scope():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("database is locked")
+            with session_scope() as db:
+                yield db
+
+        ledger = UsageLedger(session_factory=flaky_scope)
+        ledger.record(ADA, REQUEST, USAGE, succeeded=True, latency_seconds=1.0)
+        assert ledger.flush() == 0
+        assert ledger.flush() == 1
+        assert ledger.stats()["failed_flushes"] == 1
+
+    def test_full_batch_is_flushed_in_the_background_and_rest_on_stop(self, database):
+        session_scope, _ = database
+        ledger = UsageLedger(session_factory=session_scope, max_batch=3, flush_interval_seconds=60)
+        ledger.start()
+        try:
+            for _ in range(4):
+                ledger.record(ADA, REQUEST, USAGE, succeeded=True, latency_seconds=1.0)
+            deadline = time.time() + 5
+            while ledger.stats()["flushed_events"] < 3 and time.time() < deadline:
+                time.sleep(0.01)
+            assert ledger.stats()["flushed_events"] >= 3
+        finally:
+            ledger.stop()
+        assert ledger.stats()["flushed_events"] == 4
+
+
+class TestUsageEndpoint:
+    """Usage is read and charged under the authenticated user only."""
+
+    def test_usage_needs_the_owners_token_and_claims_charge_nobody(self, database):
+        import fastapi_app
+
+        session_scope, _ = database
+        ledger = UsageLedger(session_factory=session_scope)
+        tokens = AccessTokens(secret="session-secret", client_secret="client-secret")
+        ada_token = {"Authorization": f"Bearer {tokens.issue('ada')[0]}"}
+
+        # A generation claiming to be ada is charged to its client address
+        claimed = Request({"type": "http", "method": "POST", "path": "/generate-readme", "client": ("10.0.0.1", 1),
+                           "headers": [(b"x-gitrot-user-id", b"ada")]})
+        with patch.object(fastapi_app, "access_tokens", tokens), \
+                patch.object(fastapi_app, "is_active_user", AsyncMock(return_value=True)):
+            requester = asyncio.run(fastapi_app.identify_requester(REQUEST, claimed))
+        ledger.record(requester, REQUEST, USAGE, succeeded=True, latency_seconds=1.0)
+        ledger.record(ADA, REQUEST, USAGE, succeeded=True, latency_seconds=1.0)
+
+        with patch.object(fastapi_app, "access_tokens", tokens), patch.object(fastapi_app, "usage_ledger", ledger):
+            client = TestClient(fastapi_app.app)
+            spoofed = client.get("/users/ada/usage", headers={"X-GitRot-User-Id": "ada"})
+            other = client.get("/users/grace/usage", headers=ada_token)
+            own = client.get("/users/ada/usage", headers=ada_token)
+
+        assert requester.user_id is None
+        assert spoofed.status_code == 401 and other.status_code == 403
+        assert own.json()["requests"] == 1 and own.json()["total_tokens"] == 1200
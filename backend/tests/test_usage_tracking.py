@@ -0,0 +1,105 @@
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.messages import AIMessage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from backend.api_helper import APIMetrics
+from backend.utils.usage_tracker import extract_token_usage, UsageTracker
+
+
+class TestExtractTokenUsage:
+    """Test suite for reading provider usage metadata."""
+
+    def test_usage_metadata(self):
+        """LangChain's normalized usage_metadata is preferred."""
+        message = AIMessage(content="ok", usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150})
+        assert extract_token_usage(message) == (120, 30)
+
+    def test_openai_token_usage(self):
+        """OpenAI-style token_usage in response_metadata is supported."""
+        message = AIMessage(content="ok", response_metadata={"token_usage": {"prompt_tokens": 50, "completion_tokens": 5}})
+        assert extract_token_usage(message) == (50, 5)
+
+    def test_missing_usage(self):
+        """Plain strings and messages without metadata report no usage."""
+        assert extract_token_usage("plain text") is None
+        assert extract_token_usage(AIMessage(content="ok")) is None
+
+
+class TestGeneratorsUsage:
+    """Every LLM call made by Generators is recorded by stage."""
+
+    @patch("backend.generators.llm_rate_limiter")
+    def test_map_and_final_calls_are_recorded(self, mock_limiter):
+        from backend.generators import Generators
+        from config.model_routing import ModelRoutingPolicy  # same module object generators uses
+
+        mock_limiter.invoke.side_effect = lambda llm, prompt, **kwargs: AIMessage(
+            content="summary",
+            usage_metadata={"input_tokens": 100, "output_tokens": 10, "total_tokens": 110}
+        )
+        generator = Generators("gpt-4o", routing_policy=ModelRoutingPolicy.for_model("gpt-4o"))
+
+        summary = generator.summarize_code(Mock(), "File: a.py\nprint('a')\n\nFile: b.py\nprint('b')\n")
+        generator.generate_readme(Mock(), summary)
+        usage = generator.usage_tracker.summary()
+
+        assert usage["stages"]["map"]["models"] == {"gpt-4o-mini": usage["stages"]["map"]["calls"]}
+        final = usage["stages"]["final"]
+        assert final["calls"] == 1
+        assert (final["prompt_tokens"], final["completion_tokens"]) == (100, 10)
+        assert final["estimated_cost"] == pytest.approx((100 / 1000) * 0.005 + (10 / 1000) * 0.015)
+        assert final["estimated_calls"] == 0
+        assert final["models"] == {"gpt-4o": 1}
+
+    @patch("backend.generators.llm_rate_limiter")
+    def test_condense_pass_is_priced_as_the_final_model(self, mock_limiter):
+        """generate_readme condenses with the final model's llm, so its calls are charged at that model's price."""
+        from backend.generators import Generators
+        from config.model_routing import ModelRoutingPolicy
+
+        mock_limiter.invoke.return_value = AIMessage(
+            content="summary", usage_metadata={"input_tokens": 100, "output_tokens": 10, "total_tokens": 110})
+        generator = Generators("gpt-4o", routing_policy=ModelRoutingPolicy.for_model("gpt-4o"))
+        max_tokens = generator.tokenizer.get_max_input_tokens_for_readme()
+        generator.generate_readme(Mock(), "word " * (max_tokens + 1000))
+        re_reduce = generator.usage_tracker.summary()["stages"]["re_reduce"]
+
+        assert re_reduce["models"] == {"gpt-4o": re_reduce["calls"]}
+        assert re_reduce["estimated_cost"] == pytest.approx(re_reduce["calls"] * ((100 / 1000) * 0.005 + (10 / 1000) * 0.015))
+
+    @patch("backend.generators.llm_rate_limiter")
+    def test_falls_back_to_token_estimate(self, mock_limiter):
+        """Providers without usage metadata are counted with TokenCalculator."""
+        from backend.generators import Generators
+
+        mock_limiter.invoke.return_value = "a plain string response"
+        generator = Generators("gpt-4o")
+        generator.generate_readme(Mock(), "short summary")
+        final = generator.usage_tracker.summary()["stages"]["final"]
+
+        assert final["estimated_calls"] == 1
+        assert final["prompt_tokens"] > 0
+        assert final["completion_tokens"] > 0
+
+
+class TestMetricsUsageAggregation:
+    """Test suite for usage aggregation in /metrics."""
+
+    def test_aggregates_and_keeps_most_expensive(self):
+        metrics = APIMetrics()
+        for index in range(APIMetrics.TOP_GENERATIONS + 5):
+            tracker = UsageTracker()
+            tracker.record("map", "gpt-4o-mini", 1000 * (index + 1), 100, 0.1)
+            metrics.record_generation_usage(f"repo{index}", "gpt-4o", tracker.summary())
+
+        usage = metrics.get_usage_metrics()
+
+        assert usage["llm_calls"] == APIMetrics.TOP_GENERATIONS + 5
+        assert usage["stages"]["map"]["calls"] == APIMetrics.TOP_GENERATIONS + 5
+        assert len(usage["most_expensive_generations"]) == APIMetrics.TOP_GENERATIONS
+        assert usage["most_expensive_generations"][0]["repo"] == f"repo{APIMetrics.TOP_GENERATIONS + 4}"
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Same module objects fastapi_app uses
+from database.config import Base, get_async_database_url
+from models.user_model import UserAuthRequest, UserUpdate
+from services.user_service import UserService, recent_logins
+
+
+@pytest.fixture(autouse=True)
+def empty_login_cache():
+    recent_logins.clear()
+    yield
+    recent_logins.clear()
+
+
+@pytest.fixture
+def async_session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    yield async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+def login(**kwargs) -> UserAuthRequest:
+    return UserAuthRequest(**{"email": "ada@example.com", "name": "Ada", "provider_id": "g-1", **kwargs})
+
+
+class TestAsyncUserService:
+    """Test suite for the async UserService methods."""
+
+    def test_register_then_login_updates_profile(self, async_session_factory):
+        async def scenario():
+            async with async_session_factory() as db:
+                user, is_new = await UserService.aregister_or_login(db, login())
+            async with async_session_factory() as db:
+                again, again_is_new = await UserService.aregister_or_login(db, login(name="Ada L."))
+            async with async_session_factory() as db:
+                stored = await UserService.aget_user_by_id(db, user.id)
+            return is_new, again_is_new, again.id == user.id, stored.name
+
+        assert asyncio.run(scenario()) == (True, False, True, "Ada L.")
+
+    def test_other_provider_is_a_conflict(self, async_session_factory):
+        async def scenario():
+            async with async_session_factory() as db:
+                await UserService.aregister_or_login(db, login())
+            async with async_session_factory() as db:
+                await UserService.aregister_or_login(db, login(provider="github"))
+
+        with pytest.raises(ValueError, match="already exists using google"):
+            asyncio.run(scenario())
+
+    def test_concurrent_first_logins_create_one_user(self, async_session_factory):
+        async def one_login():
+            async with async_session_factory() as db:
+                return await UserService.aregister_or_login(db, login())
+
+        async def scenario():
+            return await asyncio.gather(*[one_login() for _ in range(5)])
+
+        results = asyncio.run(scenario())
+        assert len({user.id for user, _ in results}) == 1
+        assert [is_new for _, is_new in results].count(True) == 1
+
+    def test_async_url_swaps_the_driver(self):
+        assert get_async_database_url("sqlite:///./gitrot_dev.db") == "sqlite+aiosqlite:///./gitrot_dev.db"
+        assert get_async_database_url("postgresql://u:p@db:5432/gitrot") == "postgresql+asyncpg://u:p@db:5432/gitrot"
+
+
+class TestAuthEndpoint:
+    """The login endpoint runs on the async session."""
+
+    def test_register_or_login(self, async_session_factory):
+        import fastapi_app
+        from database.config import get_async_db
+
+        async def override_db():
+            async with async_session_factory() as db:
+                yield db
+
+        fastapi_app.app.dependency_overrides[get_async_db] = override_db
+        try:
+            client = TestClient(fastapi_app.app)
+            payload = {"email": "ada@example.com", "name": "Ada", "provider_id": "g-1"}
+            first = client.post("/auth/register-or-login", json=payload).json()
+            second = client.post("/auth/register-or-login", json={**payload, "provider": "github"})
+        finally:
+            fastapi_app.app.dependency_overrides.pop(get_async_db)
+
+        assert first["is_new"] is True and first["email"] == "ada@example.com"
+        assert second.status_code == 409
+
+
+class TestLoginUpsert:
+    """Logins take one statement, repeated ones none."""
+
+    @pytest.fixture
+    def session_factory(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        statements = []
+        event.listen(engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        yield sessionmaker(autocommit=False, autoflush=False, bind=engine), statements
+
+    def test_one_statement_per_login_and_cached_repeats(self, session_factory):
+        Session, statements = session_factory
+        with Session() as db:
+            user, is_new = UserService.register_or_login(db, login())
+        assert is_new and len(statements) == 1
+
+        with Session() as db:
+            again, again_is_new = UserService.register_or_login(db, login())
+        assert (again.id, again_is_new, len(statements)) == (user.id, False, 1)
+
+        # A changed profile goes to the database again and keeps the account
+        with Session() as db:
+            renamed, renamed_is_new = UserService.register_or_login(db, login(name="Ada L.", image="a.png"))
+        assert (renamed.id, renamed.name, renamed.image, renamed_is_new) == (user.id, "Ada L.", "a.png", False)
+        assert len(statements) == 2
+
+    def test_conflicting_provider_is_not_overwritten(self, session_factory):
+        Session, _ = session_factory
+        with Session() as db:
+            UserService.register_or_login(db, login())
+        recent_logins.clear()
+        with Session() as db, pytest.raises(ValueError, match="already exists using google"):
+            UserService.register_or_login(db, login(name="Mallory", provider="github"))
+        with Session() as db:
+            assert UserService.get_user_by_email(db, "ada@example.com").name == "Ada"
+
+    def test_deactivated_and_deleted_users_are_not_served_from_cache(self, session_factory):
+        Session, _ = session_factory
+        with Session() as db:
+            user, _ = UserService.register_or_login(db, login())
+        with Session() as db:
+            UserService.update_user(db, user.id, UserUpdate(is_active=False))
+        assert recent_logins.match(login()) is None
+
+        # Even a snapshot remembered after the deactivation isn't used
+        with Session() as db:
+            deactivated = UserService.get_user_by_id(db, user.id)
+            recent_logins.remember(deactivated)
+        assert recent_logins.match(login()) is None
+
+        with Session() as db:
+            UserService.update_user(db, user.id, UserUpdate(is_active=True))
+            UserService.register_or_login(db, login())
+        assert recent_logins.match(login()).id == user.id
+        with Session() as db:
+            db.delete(UserService.get_user_by_id(db, user.id))
+            db.commit()
+        assert recent_logins.match(login()) is None
@@ -1,7 +1,18 @@
 from .token_utils import TokenCalculator
+from .progress import ProgressReporter, ProgressCallback
+from .usage_tracker import UsageTracker, StageUsage, UsageCallbackHandler, extract_token_usage
+from .cancellation import CancellationToken, OperationCancelled
 
 __all__ = [
     "TokenCalculator",
+    "UsageTracker",
+    "StageUsage",
+    "UsageCallbackHandler",
+    "extract_token_usage",
+    "ProgressReporter",
+    "ProgressCallback",
+    "CancellationToken",
+    "OperationCancelled",
 ]
 
 # Package metadata
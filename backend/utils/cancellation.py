@@ -0,0 +1,74 @@
+import logging
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OperationCancelled(Exception):
+    """Raised inside a generation once its cancellation token is cancelled"""
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation shared between the API and a running generation.
+
+    The API cancels the token (e.g. when the client disconnects); the pipeline checks it
+    between units of work - files, chunks, LLM calls - and raises OperationCancelled.
+    Blocking work that can't poll, like a git subprocess, registers an on_cancel callback
+    to stop it. Thread-safe.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancel once, later calls are ignored. Runs the registered callbacks in the caller's thread"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancellation callback failed: {str(e)}")
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OperationCancelled(f"Generation cancelled: {self.reason}")
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Call callback when the token is cancelled, right away if it already is.
+
+        Returns:
+            A function that unregisters the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                registered = True
+            else:
+                registered = False
+        if not registered:
+            callback()
+
+        def unregister():
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+        return unregister
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until cancelled or timeout, True if cancelled"""
+        return self._event.wait(timeout)
@@ -0,0 +1,34 @@
+from typing import List, Tuple
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Chunking of extracted code for the map step, shared by Generators and the staged pipeline
+CODE_CHUNK_SIZE = 3000
+CODE_CHUNK_OVERLAP = 200
+CODE_SEPARATORS = ["\nFile:", "\n\n", "\n", " ", ""]
+
+
+def make_code_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CODE_CHUNK_SIZE,
+        chunk_overlap=CODE_CHUNK_OVERLAP,
+        separators=CODE_SEPARATORS
+    )
+
+
+def build_map_prompts(documents: List[Document], map_prompt: str) -> List[str]:
+    return [map_prompt.replace('{text}', str(document)) for document in documents]
+
+
+def prepare_map_prompts(code_text: str, map_prompt: str, model_name: str) -> Tuple[List[str], List[int]]:
+    """
+    Split extracted code into map prompts and count their tokens.
+
+    This is the CPU-bound part of summarization. It is a top-level function taking and
+    returning plain data so it can run in a process pool, off the GIL.
+    """
+    from utils.token_utils import TokenCalculator
+
+    chunks = make_code_splitter().split_text(code_text)
+    prompts = build_map_prompts([Document(page_content=chunk) for chunk in chunks], map_prompt)
+    return prompts, TokenCalculator(model_name=model_name).count_tokens_batch(prompts)
@@ -0,0 +1,239 @@
+"""
+Persistent FAISS index over the example READMEs used as style references.
+
+The index is built once (at startup or offline via ``python -m utils.example_index``),
+saved with ``FAISS.save_local`` under ``<embedding model>/<content hash of the examples>``,
+and memory-mapped back in lazily on first use. Each embedding model keeps its own index,
+so a deployment serving several providers never rebuilds one for the other. Requests only
+pay for one query embedding and a similarity search.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import re
+import shutil
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXAMPLES_DIR = "examples"
+DEFAULT_INDEX_DIR = os.getenv("GITROT_EXAMPLE_INDEX_DIR", ".example_index")
+EXAMPLE_FILE_EXTENSIONS = (".md",)
+
+
+def _iter_example_files(examples_dir: str) -> List[str]:
+    """Return example file paths in a stable order."""
+    paths = []
+    for root, dirs, files in os.walk(examples_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(EXAMPLE_FILE_EXTENSIONS):
+                paths.append(os.path.join(root, file))
+    return paths
+
+
+def compute_examples_hash(examples_dir: str, embedding_key: str = "") -> str:
+    """
+    Hash the examples directory contents together with the embedding model identity.
+
+    Any added, removed or edited example (or a different embedding model) yields a new
+    hash, which invalidates the persisted index.
+    """
+    digest = hashlib.sha256(embedding_key.encode("utf-8"))
+    for file_path in _iter_example_files(examples_dir):
+        digest.update(os.path.relpath(file_path, examples_dir).encode("utf-8"))
+        digest.update(b"\0")
+        with open(file_path, "rb") as f:
+            digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def load_example_documents(examples_dir: str) -> List[Document]:
+    """Read the example files into documents."""
+    example_docs = []
+    for file_path in _iter_example_files(examples_dir):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                example_docs.append(Document(
+                    page_content=f.read(),
+                    metadata={"source": file_path, "type": "example"}
+                ))
+        except Exception as e:
+            logger.warning(f"Error reading example file {file_path}: {e}")
+    return example_docs
+
+
+def _embedding_key(embeddings) -> str:
+    """Identify the embedding model so indexes built by different models never mix."""
+    for attr in ("deployment", "model", "model_name"):
+        value = getattr(embeddings, attr, None)
+        if isinstance(value, str) and value:
+            return f"{type(embeddings).__name__}:{value}"
+    return type(embeddings).__name__
+
+
+def _key_directory(embedding_key: str) -> str:
+    """Directory name for an embedding key, which may contain characters paths can't"""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", embedding_key)
+
+
+class ExampleIndex:
+    """Lazily loaded, content-addressed FAISS index of README examples, one per embedding model."""
+
+    def __init__(self, examples_dir: str = DEFAULT_EXAMPLES_DIR, index_dir: str = DEFAULT_INDEX_DIR):
+        self.examples_dir = examples_dir
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        # By embedding key: (content hash, vectorstore) loaded, and (stat signature, content hash) computed
+        self._vectorstores: Dict[str, Tuple[str, object]] = {}
+        self._hashes: Dict[str, Tuple[Tuple, str]] = {}
+
+    def has_examples(self) -> bool:
+        return bool(_iter_example_files(self.examples_dir))
+
+    def _stat_signature(self, embedding_key: str) -> Tuple:
+        """Cheap (path, size, mtime) fingerprint used to avoid re-hashing on every request."""
+        entries = []
+        for file_path in _iter_example_files(self.examples_dir):
+            stat = os.stat(file_path)
+            entries.append((file_path, stat.st_size, stat.st_mtime_ns))
+        return (embedding_key, tuple(entries))
+
+    def _current_hash(self, embedding_key: str) -> str:
+        signature = self._stat_signature(embedding_key)
+        known = self._hashes.get(embedding_key)
+        if known is None or known[0] != signature:
+            known = (signature, compute_examples_hash(self.examples_dir, embedding_key))
+            self._hashes[embedding_key] = known
+        return known[1]
+
+    def _key_path(self, embedding_key: str) -> str:
+        return os.path.join(self.index_dir, _key_directory(embedding_key))
+
+    def _index_path(self, embedding_key: str, content_hash: str) -> str:
+        return os.path.join(self._key_path(embedding_key), content_hash)
+
+    def _build_locked(self, embeddings, embedding_key: str, content_hash: str):
+        from langchain_community.vectorstores import FAISS
+
+        example_docs = load_example_documents(self.examples_dir)
+        if not example_docs:
+            return None
+
+        logger.info(f"Building example index {content_hash} from {len(example_docs)} examples")
+        vectorstore = FAISS.from_documents(example_docs, embeddings)
+
+        # Write to a scratch directory first so concurrent readers never see a partial index
+        key_path = self._key_path(embedding_key)
+        os.makedirs(key_path, exist_ok=True)
+        scratch_path = os.path.join(key_path, f".tmp-{uuid.uuid4().hex[:8]}")
+        vectorstore.save_local(scratch_path)
+        target_path = self._index_path(embedding_key, content_hash)
+        if os.path.isdir(target_path):
+            shutil.rmtree(target_path, ignore_errors=True)
+        try:
+            os.replace(scratch_path, target_path)
+        except OSError:
+            # Another process won the race; keep its copy
+            shutil.rmtree(scratch_path, ignore_errors=True)
+        self._prune_stale(key_path, content_hash)
+        return vectorstore
+
+    def _prune_stale(self, key_path: str, keep_hash: str):
+        """Delete the embedding model's indexes of older examples, other models' indexes are kept"""
+        for entry in os.listdir(key_path):
+            if entry != keep_hash and not entry.startswith(".tmp-"):
+                shutil.rmtree(os.path.join(key_path, entry), ignore_errors=True)
+
+    def _load_locked(self, embeddings, embedding_key: str, content_hash: str):
+        from langchain_community.vectorstores import FAISS
+
+        index_path = self._index_path(embedding_key, content_hash)
+        if not os.path.isdir(index_path):
+            return None
+        try:
+            import faiss
+            index = faiss.read_index(
+                os.path.join(index_path, "index.faiss"),
+                faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+            )
+            with open(os.path.join(index_path, "index.pkl"), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+            return FAISS(
+                embedding_function=embeddings,
+                index=index,
+                docstore=docstore,
+                index_to_docstore_id=index_to_docstore_id
+            )
+        except Exception as e:
+            logger.warning(f"Memory-mapped load of example index failed ({e}), falling back to load_local")
+            return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+
+    def build(self, embeddings, force: bool = False) -> Optional[str]:
+        """
+        Build and persist the index if it is missing or stale.
+
+        Returns:
+            The content hash of the index, or None when there are no examples
+        """
+        embedding_key = _embedding_key(embeddings)
+        with self._lock:
+            content_hash = self._current_hash(embedding_key)
+            if not force and os.path.isdir(self._index_path(embedding_key, content_hash)):
+                return content_hash
+            vectorstore = self._build_locked(embeddings, embedding_key, content_hash)
+            if vectorstore is None:
+                return None
+            self._vectorstores[embedding_key] = (content_hash, vectorstore)
+            return content_hash
+
+    def get_vectorstore(self, embeddings):
+        """Return the index for the current examples, loading or building it on first use."""
+        embedding_key = _embedding_key(embeddings)
+        with self._lock:
+            content_hash = self._current_hash(embedding_key)
+            loaded = self._vectorstores.get(embedding_key)
+            if loaded is not None and loaded[0] == content_hash:
+                return loaded[1]
+
+            vectorstore = self._load_locked(embeddings, embedding_key, content_hash)
+            if vectorstore is None:
+                vectorstore = self._build_locked(embeddings, embedding_key, content_hash)
+            if vectorstore is None:
+                self._vectorstores.pop(embedding_key, None)
+            else:
+                self._vectorstores[embedding_key] = (content_hash, vectorstore)
+            return vectorstore
+
+    def similarity_search(self, embeddings, query: str, k: int = 2) -> List[Document]:
+        """Embed the query and return the k closest examples."""
+        vectorstore = self.get_vectorstore(embeddings)
+        if vectorstore is None:
+            return []
+        return vectorstore.similarity_search(query, k=k)
+
+
+# Process-wide index shared by all requests
+example_index = ExampleIndex()
+
+
+if __name__ == "__main__":
+    # Offline build: python -m utils.example_index [model_name]
+    import sys
+    from gitrot_brain import GitrotBrain
+
+    logging.basicConfig(level=logging.INFO)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    model_name = args[0] if args else "gpt-4o"
+    embeddings = GitrotBrain(model_name).getEmbeddingModel()
+    if embeddings is None:
+        sys.exit("No embedding model available for the hosted service")
+    built_hash = example_index.build(embeddings, force="--force" in sys.argv)
+    print(f"Example index ready: {built_hash}")
@@ -0,0 +1,39 @@
+import logging
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[str, dict], None]
+
+
+class ProgressReporter:
+    """
+    Forwards pipeline progress events (stage name + details) to an optional callback.
+    Adds an overall "progress" fraction and never lets a failing listener break the pipeline.
+    """
+
+    # Overall progress at the start of each stage, summarizing/reducing interpolate within their span
+    STAGE_PROGRESS = {
+        "cloning": (0.0, 0.1),
+        "cloned": (0.1, 0.1),
+        "extracted": (0.15, 0.15),
+        "summarizing": (0.15, 0.75),
+        "reducing": (0.75, 0.8),
+        "generating": (0.8, 0.8),
+        "completed": (1.0, 1.0),
+    }
+
+    def __init__(self, callback: Optional[ProgressCallback] = None):
+        self.callback = callback
+
+    def report(self, stage: str, **details):
+        if self.callback is None:
+            return
+        start, end = self.STAGE_PROGRESS.get(stage, (0.0, 0.0))
+        done, total = details.get("done"), details.get("total")
+        fraction = start + (end - start) * done / total if done is not None and total else start
+        details["progress"] = round(fraction, 3)
+        try:
+            self.callback(stage, details)
+        except Exception as e:
+            logger.warning(f"Progress listener failed on {stage}: {e}")
@@ -0,0 +1,180 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds of the latency buckets in seconds, from a fast extract to a slow final README call
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60, 120, 300)
+# Upper bounds of the buckets for files, chunks and LLM calls per generation
+COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Pipeline stages timed in every generation. map_call, reduce_call and final are single LLM calls,
+# reduce_round is one round of re-reduce calls
+PIPELINE_STAGES = ("clone", "extract", "split", "map_call", "reduce_round", "reduce_call", "final", "cleanup")
+# What is counted per generation
+REQUEST_ITEMS = ("files", "chunks", "llm_calls")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """
+    Observations counted into fixed buckets, so memory stays the same however many there are.
+    Quantiles are estimated by interpolating within a bucket, like Prometheus' histogram_quantile.
+    Thread-safe.
+    """
+    __slots__ = ("bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(sorted(bounds))
+        self._counts = [0] * (len(self.bounds) + 1)  # The last one is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """Per-bucket (not cumulative) counts and the sum of all observations"""
+        with self._lock:
+            return list(self._counts), self._sum
+
+    @staticmethod
+    def quantile_from(bounds: Sequence[float], counts: List[int], q: float) -> Optional[float]:
+        total = sum(counts)
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if index == len(bounds):
+                    # Beyond the last bound, the best we can say is "more than" it
+                    return float(bounds[-1])
+                lower = bounds[index - 1] if index > 0 else 0.0
+                return lower + (bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return float(bounds[-1])
+
+    def quantile(self, q: float) -> Optional[float]:
+        counts, _ = self.snapshot()
+        return self.quantile_from(self.bounds, counts, q)
+
+
+class HistogramFamily:
+    """
+    One histogram per value of a label, e.g. per pipeline stage.
+    At most max_series label values get their own histogram, the rest share "other".
+    """
+
+    OTHER = "other"
+
+    def __init__(self, name: str, description: str, label: str, bounds: Sequence[float],
+                 known_values: Sequence[str] = (), max_series: int = 64):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.bounds = tuple(sorted(bounds))
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        # Known values are listed even before their first observation
+        self._series: Dict[str, Histogram] = {value: Histogram(self.bounds) for value in known_values}
+
+    def _histogram(self, value: str) -> Histogram:
+        histogram = self._series.get(value)
+        if histogram is not None:
+            return histogram
+        with self._lock:
+            if value not in self._series and len(self._series) >= self.max_series:
+                value = self.OTHER
+            return self._series.setdefault(value, Histogram(self.bounds))
+
+    def observe(self, value: str, amount: float):
+        self._histogram(value).observe(amount)
+
+    @contextmanager
+    def time(self, value: str):
+        """Observe the duration of the block in seconds, also when it raises"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(value, time.perf_counter() - start_time)
+
+    def totals(self) -> Dict[str, Tuple[int, float]]:
+        """Observation count and sum per label value, exact where the percentiles are estimates"""
+        result = {}
+        for value, histogram in list(self._series.items()):
+            counts, total = histogram.snapshot()
+            result[value] = (sum(counts), total)
+        return result
+
+    def summary(self) -> Dict[str, dict]:
+        """Count, mean and estimated percentiles per label value, for the JSON metrics"""
+        result = {}
+        for value, histogram in list(self._series.items()):
+            counts, total = histogram.snapshot()
+            count = sum(counts)
+            result[value] = {"count": count, "mean": round(total / count, 4) if count else None}
+            for q in (0.5, 0.9, 0.99):
+                estimate = Histogram.quantile_from(self.bounds, counts, q)
+                result[value][f"p{int(q * 100)}"] = round(estimate, 4) if estimate is not None else None
+        return result
+
+    def prometheus_lines(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for value, histogram in sorted(self._series.items()):
+            counts, total = histogram.snapshot()
+            label = f'{self.label}="{_escape_label(value)}"'
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class PipelineMetrics:
+    """Latency of every pipeline stage and the size of every generation, across all requests"""
+
+    def __init__(self):
+        self.stage_seconds = HistogramFamily(
+            "gitrot_stage_duration_seconds", "Time spent in each README pipeline stage.",
+            "stage", DURATION_BUCKETS, known_values=PIPELINE_STAGES
+        )
+        self.request_items = HistogramFamily(
+            "gitrot_generation_items", "Files read, chunks and LLM calls per README generation.",
+            "item", COUNT_BUCKETS, known_values=REQUEST_ITEMS
+        )
+
+    def observe_stage(self, stage: str, seconds: float):
+        self.stage_seconds.observe(stage, seconds)
+
+    def timed_stage(self, stage: str):
+        return self.stage_seconds.time(stage)
+
+    def observe_count(self, item: str, count: int):
+        self.request_items.observe(item, count)
+
+    def summary(self) -> dict:
+        return {"stages": self.stage_seconds.summary(), "per_generation": self.request_items.summary()}
+
+    def prometheus_lines(self) -> List[str]:
+        return self.stage_seconds.prometheus_lines() + self.request_items.prometheus_lines()
+
+
+# Shared by every generation in the process, read by /metrics
+pipeline_metrics = PipelineMetrics()
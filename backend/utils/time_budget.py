@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Server-side default and ceiling for a request's time budget
+DEFAULT_TIME_BUDGET_SECONDS = float(os.getenv("GITROT_DEFAULT_TIME_BUDGET_SECONDS", "300"))
+MAX_TIME_BUDGET_SECONDS = float(os.getenv("GITROT_MAX_TIME_BUDGET_SECONDS", "900"))
+
+
+class CallLatencyEstimator:
+    """
+    Exponentially weighted LLM call latency by pipeline stage, shared by all generations.
+    Seeded with configured guesses until real calls have been observed.
+    """
+
+    def __init__(self, initial_seconds: Dict[str, float], smoothing: float = 0.2):
+        self._lock = threading.Lock()
+        self._initial_seconds = dict(initial_seconds)
+        self._smoothing = smoothing
+        self._seconds: Dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            current = self._seconds.get(stage)
+            self._seconds[stage] = seconds if current is None else current + self._smoothing * (seconds - current)
+
+    def estimate(self, stage: str) -> float:
+        with self._lock:
+            return self._seconds.get(stage, self._initial_seconds.get(stage, self._initial_seconds.get("map", 5.0)))
+
+
+call_latency = CallLatencyEstimator({
+    "map": float(os.getenv("GITROT_ESTIMATED_MAP_CALL_SECONDS", "5")),
+    "re_reduce": float(os.getenv("GITROT_ESTIMATED_MAP_CALL_SECONDS", "5")),
+    "final": float(os.getenv("GITROT_ESTIMATED_FINAL_CALL_SECONDS", "30")),
+})
+
+
+class TimeBudget:
+    """
+    Deadline of one generation and the degradations applied to meet it.
+
+    Time for the final README call is always held back (final_reserve_seconds), so the
+    pipeline trims the work before it - files read, map calls, reduce rounds - rather than
+    running out of time with nothing to show.
+    """
+
+    # Safety margin on the estimated final call latency
+    FINAL_RESERVE_FACTOR = 1.25
+
+    def __init__(self, budget_seconds: float, start: Optional[float] = None,
+                 latency: Optional[CallLatencyEstimator] = None):
+        self.budget_seconds = budget_seconds
+        self.start = time.monotonic() if start is None else start
+        self.latency = latency or call_latency
+        self._lock = threading.Lock()
+        self._degradations: Dict[str, str] = {}
+
+    @classmethod
+    def for_request(cls, time_budget_seconds: Optional[float] = None, start: Optional[float] = None) -> "TimeBudget":
+        """Budget from the request, or the server default, capped at GITROT_MAX_TIME_BUDGET_SECONDS"""
+        seconds = time_budget_seconds if time_budget_seconds else DEFAULT_TIME_BUDGET_SECONDS
+        return cls(min(seconds, MAX_TIME_BUDGET_SECONDS), start=start)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def remaining(self) -> float:
+        return self.budget_seconds - self.elapsed()
+
+    @property
+    def final_reserve_seconds(self) -> float:
+        return self.latency.estimate("final") * self.FINAL_RESERVE_FACTOR
+
+    def seconds_per_call(self, stage: str, concurrency: int = 1, min_spacing: float = 0.0) -> float:
+        """Expected wall time per LLM call with concurrency calls in flight and min_spacing between starts"""
+        return max(self.latency.estimate(stage) / max(concurrency, 1), min_spacing, 0.001)
+
+    def affordable_calls(self, seconds_per_call: float) -> int:
+        """LLM calls that still fit before the final README call has to start"""
+        return max(int((self.remaining() - self.final_reserve_seconds) / seconds_per_call), 0)
+
+    def can_afford(self, calls: int, seconds_per_call: float) -> bool:
+        return self.affordable_calls(seconds_per_call) >= calls
+
+    def degrade(self, kind: str, detail: str):
+        """Record a degradation, a later record of the same kind replaces the detail"""
+        with self._lock:
+            self._degradations[kind] = detail
+
+    @property
+    def degradations(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [{"kind": kind, "detail": detail} for kind, detail in self._degradations.items()]
@@ -1,39 +1,155 @@
+import logging
+import threading
 import tiktoken
 from config.model_config import ModelConfig, get_model_config
-from typing import Optional
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = 'cl100k_base'
+
+_encoding_cache: Dict[str, tiktoken.Encoding] = {}
+_encoding_cache_lock = threading.Lock()
+
+
+def get_encoding_for_model(model_name: str) -> Optional[tiktoken.Encoding]:
+    """
+    Process-wide tokenizer cache, encodings are built once per model name.
+    Returns None if the encoding cannot be loaded (e.g. BPE files not downloadable),
+    failures are not cached so the next call retries.
+    """
+    encoding = _encoding_cache.get(model_name)
+    if encoding is not None:
+        return encoding
+
+    with _encoding_cache_lock:
+        if model_name not in _encoding_cache:
+            try:
+                try:
+                    encoding = tiktoken.encoding_for_model(model_name)
+                except KeyError:
+                    #TODO:  Check what default value should be added instead of this.
+                    encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+            except Exception as e:
+                logger.warning(f"Tokenizer for {model_name} unavailable, using estimates: {e}")
+                return None
+            _encoding_cache[model_name] = encoding
+        return _encoding_cache[model_name]
+
+
+class CharsPerTokenCalibration:
+    """
+    Running chars-per-token ratio per encoding, learned from exact counts.
+    Used by the cheap estimator so quick budget checks track the real tokenizer.
+    """
+
+    def __init__(self, initial_ratio: float = 4.0, smoothing: float = 0.1):
+        self._lock = threading.Lock()
+        self._initial_ratio = initial_ratio
+        self._smoothing = smoothing
+        self._ratios = {}
+
+    def ratio(self, encoding_name: str) -> float:
+        return self._ratios.get(encoding_name, self._initial_ratio)
+
+    def observe(self, encoding_name: str, chars: int, tokens: int):
+        # Tiny samples are dominated by boundary effects, they would skew the ratio
+        if tokens < 32:
+            return
+        observed = chars / tokens
+        with self._lock:
+            current = self._ratios.get(encoding_name)
+            self._ratios[encoding_name] = observed if current is None else (
+                current + self._smoothing * (observed - current)
+            )
+
+
+calibration = CharsPerTokenCalibration()
+
 
 class TokenCalculator:
     """Utility class for token calculations and validation."""
     def __init__(self, model_name):
         self.model_name = model_name
         self.model_config = get_model_config(model_name)
-        try:
-            self.tokenizer = tiktoken.encoding_for_model(self.model_name)
-        except:
-            #TODO:  Check what default value should be added instead of this.
-            self.tokenizer = tiktoken.get_encoding('cl100k_base')
+        self.tokenizer = get_encoding_for_model(model_name)
+        self.encoding_name = self.tokenizer.name if self.tokenizer else DEFAULT_ENCODING
 
-    def count_token(self, text: str) -> str:
+    def count_token(self, text: str) -> int:
         """Count exact tokens in text"""
         try:
-            return len(self.tokenizer.encode(text))
+            count = len(self.tokenizer.encode_ordinary(text))
         except Exception:
             return len(text)//4 # Fallback estimation
-        
+        calibration.observe(self.encoding_name, len(text), count)
+        return count
+
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count exact tokens for a list of texts in one batched (multi-threaded) encode"""
+        if not texts:
+            return []
+        try:
+            counts = [len(tokens) for tokens in self.tokenizer.encode_ordinary_batch(texts)]
+        except Exception:
+            return [len(text)//4 for text in texts]
+        calibration.observe(self.encoding_name, sum(len(text) for text in texts), sum(counts))
+        return counts
+
+    def count_joined_tokens(self, counts: List[int], separator: str = "\n\n") -> int:
+        """
+        Token count of separator.join(texts) from the per-text counts, without re-encoding.
+        BPE merges across the join boundaries shift the total by at most a token per join.
+        """
+        if not counts:
+            return 0
+        return sum(counts) + self.count_token(separator) * (len(counts) - 1)
+
+    def estimate_tokens(self, text: str) -> int:
+        """Cheap token estimate from the calibrated chars-per-token ratio, no encoding"""
+        return int(len(text) / calibration.ratio(self.encoding_name))
+
+    def quick_budget_check(self, text: str, max_tokens: int, margin: float = 0.5) -> Optional[bool]:
+        """
+        Decide whether text fits max_tokens without encoding it.
+
+        The estimate can be off (code, non-English text), so it only decides the clearly
+        over budget case, where a wrong answer costs a condense round. Fitting is decided
+        on a worst case instead: every token covers at least one byte of UTF-8.
+
+        Returns:
+            True when even one token per byte fits, False when the estimate is over budget
+            by the margin, None when an exact count is needed
+        """
+        if len(text) < max_tokens and len(text.encode("utf-8")) < max_tokens:
+            return True
+        if self.estimate_tokens(text) * (1 - margin) > max_tokens:
+            return False
+        return None
+
+    def truncate_to_tokens(self, text: str, max_tokens: int) -> str:
+        """First max_tokens tokens of text, cut on the character estimate if encoding fails"""
+        try:
+            tokens = self.tokenizer.encode_ordinary(text)
+        except Exception:
+            return text[:max_tokens * 4]
+        if len(tokens) <= max_tokens:
+            return text
+        return self.tokenizer.decode(tokens[:max_tokens])
+
     def get_max_input_tokens_for_readme(self, buffer_percentage: float = 0.10) -> int:
         """
         Get maximum input tokens for README generation with safety buffer.
-        
+
         Args:
             buffer_percentage: Percentage of context window to reserve as safety buffer
                               (default 10% = 0.10)
-        
+
         Returns:
             Maximum safe input tokens for README generation
         """
         if not self.model_config:
             return 2000
-        
+
         context_window = self.model_config.context_window
         max_output_tokens = 700 # Keeping 700 as output token buffer as do not need readme more than this
 
@@ -43,8 +159,16 @@ class TokenCalculator:
 
         min_input_tokens = 500
         max_input_tokens = max(max_input_tokens, min_input_tokens)
-        
+
         return max_input_tokens
-    
+
+    def is_token_count_within_size(self, token_count: int, buffer_percentage: float = 0.10) -> bool:
+        return token_count < self.get_max_input_tokens_for_readme(buffer_percentage)
+
     def is_summary_within_size(self, text: str, buffer_percentage: float = 0.10) -> bool:
-        return self.count_token(text) < self.get_max_input_tokens_for_readme(buffer_percentage)
\ No newline at end of file
+        max_tokens = self.get_max_input_tokens_for_readme(buffer_percentage)
+        # Huge inputs are usually far from the limit either way, skip the full encode then
+        within_size = self.quick_budget_check(text, max_tokens)
+        if within_size is not None:
+            return within_size
+        return self.count_token(text) < max_tokens
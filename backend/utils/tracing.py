@@ -0,0 +1,321 @@
+import concurrent.futures
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Requests carrying this header are traced: "1" records spans, "profile" also takes a cProfile profile.
+# Off by default, any client could otherwise make generations slower and fill TRACE_DIR
+TRACE_HEADER = "x-gitrot-trace"
+TRACE_HEADER_ENABLED = os.getenv("GITROT_TRACE_HEADER", "false").lower() == "true"
+# Fractions of all generations traced, and traced with a profile, without the header
+TRACE_SAMPLE_RATE = float(os.getenv("GITROT_TRACE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_RATE = float(os.getenv("GITROT_PROFILE_SAMPLE_RATE", "0"))
+# Finished traces are written here as <trace_id>.json (OTLP/JSON), .prof (pstats) and .txt (top functions)
+TRACE_DIR = os.getenv("GITROT_TRACE_DIR", os.path.join(tempfile.gettempdir(), "gitrot-traces"))
+# Traces kept in TRACE_DIR, the oldest are deleted once there are more
+TRACE_DIR_MAX_TRACES = int(os.getenv("GITROT_TRACE_DIR_MAX_TRACES", "200"))
+# OTLP/HTTP traces endpoint of a collector, e.g. http://localhost:4318/v1/traces
+OTLP_TRACES_ENDPOINT = os.getenv("GITROT_OTLP_TRACES_ENDPOINT", "")
+
+SERVICE_NAME = "gitrot-backend"
+
+
+class Span:
+    """A timed operation within a trace, with attributes and the error it ended with"""
+    __slots__ = ("name", "trace", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace: "Trace", parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e9
+
+
+class Trace:
+    """
+    Spans of one traced generation, and its profile when one was taken.
+    Spans are added from whichever thread or task finishes them.
+    """
+
+    # Spans kept per trace, a repository with thousands of chunks doesn't grow a trace without bound
+    MAX_SPANS = 5000
+
+    def __init__(self, name: str, profile: bool = False, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.profile = profile
+        self.profile_stats: Optional[pstats.Stats] = None
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+        self._spans: List[Span] = []
+        self.root = Span(name, self, None, attributes)
+
+    def add(self, span: Span):
+        with self._lock:
+            if len(self._spans) < self.MAX_SPANS:
+                self._spans.append(span)
+            else:
+                self.dropped_spans += 1
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return [self.root] + list(self._spans)
+
+    def to_otlp(self) -> dict:
+        """The trace as an OTLP/JSON ExportTraceServiceRequest"""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{
+                    "scope": {"name": "gitrot"},
+                    "spans": [_otlp_span(span) for span in self.spans if span.end_ns is not None],
+                }],
+            }]
+        }
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def _otlp_span(span: Span) -> dict:
+    otlp = {
+        "traceId": span.trace.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        otlp["parentSpanId"] = span.parent_id
+    return otlp
+
+
+# Innermost open span of the current thread or task, None when it isn't traced
+_current_span: ContextVar[Optional[Span]] = ContextVar("gitrot_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, parent: Optional[Span] = None, **attributes):
+    """
+    Time the block as a child of parent, the current span by default.
+    Yields the span (None outside a trace, where this costs one context variable lookup).
+    """
+    parent = parent or _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current_span.reset(token)
+        parent.trace.add(child)
+
+
+@contextmanager
+def within(parent: Optional[Span]):
+    """Continue a trace in another thread or task: spans opened in the block become children of parent"""
+    if parent is None:
+        yield
+        return
+    token = _current_span.set(parent)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+
+# cProfile can't profile two generations at once reliably, later ones go without a profile
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def profiled():
+    """
+    cProfile the block when the current trace asked for a profile. Profiles the calling thread only,
+    so it covers generations running on a worker thread, not the staged pipeline's event loop.
+    """
+    current = _current_span.get()
+    if current is None or not current.trace.profile:
+        yield
+        return
+    if not _profile_lock.acquire(blocking=False):
+        current.set(profile_skipped="another profile is running")
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profile_lock.release()
+        current.trace.profile_stats = pstats.Stats(profiler)
+
+
+def trace_decision(header_value: Optional[str]) -> Tuple[bool, bool]:
+    """(trace, profile) for a request, from its X-GitRot-Trace header and the sample rates"""
+    if header_value and TRACE_HEADER_ENABLED:
+        value = header_value.strip().lower()
+        if value == "profile":
+            return True, True
+        if value in ("1", "true", "yes"):
+            return True, False
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return True, True
+    return TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE, False
+
+
+def trace_for_request(header_value: Optional[str], name: str, **attributes) -> Optional[Trace]:
+    """A new trace if the request should be traced, None otherwise"""
+    traced, profile = trace_decision(header_value)
+    return Trace(name, profile=profile, **attributes) if traced else None
+
+
+@contextmanager
+def recording(trace: Optional[Trace]):
+    """Run the block under the trace's root span, then end the trace and export it in the background"""
+    if trace is None:
+        yield
+        return
+    token = _current_span.set(trace.root)
+    try:
+        yield trace.root
+    except BaseException as e:
+        trace.root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.root.end_ns = time.time_ns()
+        _current_span.reset(token)
+        export(trace)
+
+
+# Called with every finished trace, on the export thread
+Exporter = Callable[[Trace], None]
+exporters: List[Exporter] = []
+_export_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_export_pool_lock = threading.Lock()
+
+
+def register_exporter(exporter: Exporter):
+    exporters.append(exporter)
+
+
+def export(trace: Trace):
+    """Hand a finished trace to the exporters, off the caller's thread"""
+    global _export_pool
+    with _export_pool_lock:
+        if _export_pool is None:
+            _export_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export")
+    _export_pool.submit(_run_exporters, trace)
+
+
+def _run_exporters(trace: Trace):
+    for exporter in list(exporters):
+        try:
+            exporter(trace)
+        except Exception as e:
+            logger.warning(f"Trace exporter {getattr(exporter, '__name__', exporter)} failed: {str(e)}")
+
+
+def write_to_directory(trace: Trace, directory: Optional[str] = None, max_traces: Optional[int] = None):
+    """
+    Write the spans as OTLP/JSON, and the profile as pstats data plus the top functions as text.
+    Then delete the oldest traces beyond max_traces (TRACE_DIR_MAX_TRACES by default).
+    """
+    directory = directory or TRACE_DIR
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, trace.trace_id)
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump(trace.to_otlp(), f, indent=2)
+    if trace.profile_stats is not None:
+        trace.profile_stats.dump_stats(f"{base}.prof")
+        report = io.StringIO()
+        pstats.Stats(f"{base}.prof", stream=report).sort_stats("cumulative").print_stats(40)
+        with open(f"{base}.txt", "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+    logger.info(f"Trace {trace.trace_id} ({trace.root.name}, {trace.root.duration_seconds:.2f}s) written to {base}.*")
+    _prune_directory(directory, TRACE_DIR_MAX_TRACES if max_traces is None else max_traces)
+
+
+TRACE_FILE_EXTENSIONS = (".json", ".prof", ".txt")
+
+
+def _prune_directory(directory: str, max_traces: int):
+    """Delete the files of all but the newest max_traces traces. Runs on the single export thread"""
+    written: Dict[str, float] = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            trace_id, extension = os.path.splitext(entry.name)
+            if extension in TRACE_FILE_EXTENSIONS and entry.is_file():
+                written[trace_id] = max(written.get(trace_id, 0.0), entry.stat().st_mtime)
+    oldest_first = sorted(written, key=written.get)
+    for trace_id in oldest_first[:max(len(oldest_first) - max_traces, 0)]:
+        for extension in TRACE_FILE_EXTENSIONS:
+            try:
+                os.remove(os.path.join(directory, trace_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+def otlp_http_exporter(endpoint: str, timeout_seconds: float = 5.0) -> Exporter:
+    """Exporter posting traces to an OTLP/HTTP collector endpoint as JSON"""
+    def export_to_collector(trace: Trace):
+        request = urllib.request.Request(endpoint, data=json.dumps(trace.to_otlp()).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=timeout_seconds) as response:
+            response.read()
+    return export_to_collector
+
+
+register_exporter(write_to_directory)
+if OTLP_TRACES_ENDPOINT:
+    register_exporter(otlp_http_exporter(OTLP_TRACES_ENDPOINT))
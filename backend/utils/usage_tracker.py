@@ -0,0 +1,148 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+from langchain_core.callbacks import BaseCallbackHandler
+from config.model_config import EMBEDDING_COST_PER_1K
+from config.model_credential_factory import model_credential_factory
+
+
+def _usage_from_metadata(metadata: Optional[dict]) -> Optional[Tuple[int, int]]:
+    """Read OpenAI-style token_usage from response metadata or a chain's llm_output."""
+    token_usage = (metadata or {}).get("token_usage") or (metadata or {}).get("usage")
+    if isinstance(token_usage, dict) and "prompt_tokens" in token_usage:
+        return int(token_usage["prompt_tokens"]), int(token_usage.get("completion_tokens", 0))
+    return None
+
+
+def extract_token_usage(raw: Any) -> Optional[Tuple[int, int]]:
+    """
+    Read (prompt_tokens, completion_tokens) from provider usage metadata on an LLM result.
+    Returns None when the provider did not report usage.
+    """
+    usage = getattr(raw, "usage_metadata", None)
+    if isinstance(usage, dict) and "input_tokens" in usage:
+        return int(usage["input_tokens"]), int(usage.get("output_tokens", 0))
+    return _usage_from_metadata(getattr(raw, "response_metadata", None))
+
+
+def estimate_cost(model_name: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Estimated cost from ModelConfig pricing (or embedding pricing), None for unknown models."""
+    cost = model_credential_factory.calculate_estimated_cost(model_name, prompt_tokens, completion_tokens)
+    if cost is None and model_name in EMBEDDING_COST_PER_1K:
+        cost = (prompt_tokens / 1000) * EMBEDDING_COST_PER_1K[model_name]
+    return cost
+
+
+@dataclass
+class StageUsage:
+    """Accumulated LLM usage for one pipeline stage."""
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_seconds: float = 0.0
+    estimated_cost: float = 0.0
+    estimated_calls: int = 0  # Calls without provider usage metadata, counted with TokenCalculator
+    models: Dict[str, int] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_seconds": round(self.latency_seconds, 3),
+            "estimated_cost": round(self.estimated_cost, 6),
+            "estimated_calls": self.estimated_calls,
+            "models": dict(self.models),
+        }
+
+
+class UsageTracker:
+    """Thread-safe per-request record of LLM calls, tokens, latency and cost by stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageUsage] = {}
+
+    def record(self,
+               stage: str,
+               model_name: str,
+               prompt_tokens: int,
+               completion_tokens: int,
+               latency_seconds: float,
+               from_provider: bool = False) -> Optional[float]:
+        """
+        Record one LLM call.
+
+        Args:
+            from_provider: True if the token counts came from provider usage metadata
+
+        Returns:
+            Estimated cost of the call from ModelConfig pricing, None for unknown models
+        """
+        cost = estimate_cost(model_name, prompt_tokens, completion_tokens)
+        with self._lock:
+            usage = self._stages.setdefault(stage, StageUsage())
+            usage.calls += 1
+            usage.prompt_tokens += prompt_tokens
+            usage.completion_tokens += completion_tokens
+            usage.latency_seconds += latency_seconds
+            usage.estimated_cost += cost or 0.0
+            usage.estimated_calls += 0 if from_provider else 1
+            usage.models[model_name] = usage.models.get(model_name, 0) + 1
+        return cost
+
+    def stage_breakdown(self) -> Dict[str, dict]:
+        with self._lock:
+            return {stage: usage.to_dict() for stage, usage in self._stages.items()}
+
+    def summary(self) -> dict:
+        """Per-request totals plus the per-stage breakdown."""
+        breakdown = self.stage_breakdown()
+        prompt_tokens = sum(stage["prompt_tokens"] for stage in breakdown.values())
+        completion_tokens = sum(stage["completion_tokens"] for stage in breakdown.values())
+        return {
+            "llm_calls": sum(stage["calls"] for stage in breakdown.values()),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "latency_seconds": round(sum(stage["latency_seconds"] for stage in breakdown.values()), 3),
+            "estimated_cost": round(sum(stage["estimated_cost"] for stage in breakdown.values()), 6),
+            "stages": breakdown,
+        }
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback that records usage for LLM calls made inside chains,
+    where the pipeline does not see the raw responses.
+    """
+
+    def __init__(self, tracker: UsageTracker, stage: str, model_name: str, estimate_tokens=None):
+        self.tracker = tracker
+        self.stage = stage
+        self.model_name = model_name
+        self.estimate_tokens = estimate_tokens or (lambda text: len(text) // 4)
+        self._started: Dict[Any, Tuple[float, int]] = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = (time.time(), sum(self.estimate_tokens(prompt) for prompt in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt_text = "".join(str(message.content) for batch in messages for message in batch)
+        self._started[run_id] = (time.time(), self.estimate_tokens(prompt_text))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start_time, estimated_prompt_tokens = self._started.pop(run_id, (time.time(), 0))
+        for generations in response.generations:
+            for generation in generations:
+                usage = extract_token_usage(getattr(generation, "message", None))
+                if usage is None:
+                    usage = _usage_from_metadata(response.llm_output)
+                if usage is None:
+                    usage = (estimated_prompt_tokens, self.estimate_tokens(generation.text))
+                    from_provider = False
+                else:
+                    from_provider = True
+                self.tracker.record(self.stage, self.model_name, usage[0], usage[1],
+                                    time.time() - start_time, from_provider=from_provider)
@@ -1,8 +1,12 @@
+import asyncio
+import heapq
+import itertools
 import threading
 import time
 import random
 import logging
-from typing import Any, Dict,Optional, Callable
+from typing import Any, Awaitable, Dict, List, Optional, Callable
+from utils import tracing
 #TODO: Understand what callable is
 
 #TODO: understnad what the threading.lock is 
@@ -19,6 +23,8 @@ class LLMRateLimiter:
     - Exponential backoff on detected rate limiting up to max_delay.
     - Jitter to avoid thundering herd.
     - Shared across all threads (singleton).
+    - Optional fair share: with a FairShareScheduler set, call slots go to waiting callers
+      in weighted fair order by requester instead of first come, first served.
     """
 
     _instance = None
@@ -51,6 +57,12 @@ class LLMRateLimiter:
         self._last_success_time: float = 0.0
         self._consecutive_rate_limits = 0
 
+        # Fair share dispatch: heap of (tag, sequence, waiter), granted one per call slot
+        self.fair_share = None
+        self._fair_waiters: List[tuple] = []
+        self._fair_sequence = itertools.count()
+        self._dispatch_timer: Optional[threading.Timer] = None
+
     @classmethod
     def get_instance(cls) -> "LLMRateLimiter":
         return cls()
@@ -61,30 +73,128 @@ class LLMRateLimiter:
                 "too many requests" in msg or
                 "429" in msg)
 
-    def _pre_call_wait(self):
+    def _cooldown_locked(self, now: float):
+        # Reset delay if we've been quiet long enough
+        if (self._last_success_time and
+            now - self._last_success_time >= self.success_reset_seconds and
+            self._current_delay > self.base_delay):
+            self._current_delay = self.base_delay
+            self._consecutive_rate_limits = 0
+            logger.info("LLMRateLimiter: cooldown reached, reset delay to base")
+
+    def _reserve_call_slot(self) -> float:
+        """
+        Reserve the next call start time and return how long to wait for it.
+        Reserving under the lock keeps concurrent callers (threads or coroutines) spaced apart.
+        """
         with self._state_lock:
             now = time.time()
+            self._cooldown_locked(now)
+            start_at = max(now, self._last_call_time + self._current_delay)
+            self._last_call_time = start_at
+            return start_at - now
 
-            # Reset delay if we've been quiet long enough
-            if (self._last_success_time and
-                now - self._last_success_time >= self.success_reset_seconds and
-                self._current_delay > self.base_delay):
-                self._current_delay = self.base_delay
-                self._consecutive_rate_limits = 0
-                logger.info("LLMRateLimiter: cooldown reached, reset delay to base")
+    def _enqueue_fair_call(self, grant: Callable[[], None]) -> "_FairWaiter":
+        """
+        Queue a caller for the next call slot, tagged by its requester's fair share clock.
+        Unlike reservations, slots are handed out only when they come up, so a later caller
+        with an earlier tag still goes first.
+        """
+        requester = self.fair_share.current_requester()
+        waiter = _FairWaiter(grant, requester)
+        with self._state_lock:
+            self._cooldown_locked(time.time())
+            # One call costs one spacing interval of the shared budget
+            tag = self.fair_share.tag(requester, max(self._current_delay, 0.001), waiter.enqueued_at)
+            heapq.heappush(self._fair_waiters, (tag, next(self._fair_sequence), waiter))
+            grants = self._dispatch_locked()
+        for granted in grants:
+            granted()
+        return waiter
+
+    def _dispatch_locked(self) -> List[Callable[[], None]]:
+        """Grant every call slot that is due, and arm a timer for the next one"""
+        grants = []
+        while self._fair_waiters and self._dispatch_timer is None:
+            now = time.time()
+            start_at = self._last_call_time + self._current_delay
+            if start_at > now:
+                self._dispatch_timer = threading.Timer(start_at - now, self._on_dispatch_timer)
+                self._dispatch_timer.daemon = True
+                self._dispatch_timer.start()
+                break
+            waiter = heapq.heappop(self._fair_waiters)[2]
+            if waiter.abandoned:
+                continue
+            waiter.granted = True
+            self._last_call_time = now
+            self.fair_share.record_wait(waiter.requester, time.monotonic() - waiter.enqueued_at)
+            grants.append(waiter.grant)
+        return grants
+
+    def _on_dispatch_timer(self):
+        with self._state_lock:
+            self._dispatch_timer = None
+            grants = self._dispatch_locked()
+        for granted in grants:
+            granted()
 
-            wait_for = 0.0
-            elapsed_since_last = now - self._last_call_time
-            if elapsed_since_last < self._current_delay:
-                wait_for = self._current_delay - elapsed_since_last
+    def _pre_call_wait(self, cancellation: Optional[Any] = None):
+        """Wait for a call slot, a cancelled token ends the wait (and gives up the queued slot) right away"""
+        if self.fair_share is not None:
+            granted = threading.Event()
+            waiter = self._enqueue_fair_call(granted.set)
+            unregister = cancellation.on_cancel(granted.set) if cancellation is not None else None
+            try:
+                granted.wait()
+            finally:
+                if unregister is not None:
+                    unregister()
+            with self._state_lock:
+                waiter.abandoned = not waiter.granted
+            if waiter.abandoned:
+                cancellation.raise_if_cancelled()
+            return
+        wait_for = self._reserve_call_slot()
+        if wait_for > 0:
+            if cancellation is not None:
+                cancellation.wait(wait_for)
+            else:
+                time.sleep(wait_for)
 
+    async def _apre_call_wait(self):
+        if self.fair_share is not None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            waiter = self._enqueue_fair_call(
+                lambda: loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+            )
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._state_lock:
+                    waiter.abandoned = not waiter.granted
+                raise
+            return
+        wait_for = self._reserve_call_slot()
         if wait_for > 0:
-            time.sleep(wait_for)
+            await asyncio.sleep(wait_for)
+
+    @property
+    def current_delay(self) -> float:
+        """Spacing between call starts right now, grows while the provider is rate limiting"""
+        with self._state_lock:
+            return self._current_delay
 
+    def fair_share_stats(self) -> Optional[dict]:
+        """Per-requester queue times of LLM calls, None when fair share is off"""
+        if self.fair_share is None:
+            return None
         with self._state_lock:
-            self._last_call_time = time.time()
+            waiting = sum(1 for _, _, waiter in self._fair_waiters if not waiter.abandoned)
+        return {"waiting_calls": waiting, **self.fair_share.stats()}
 
-    def _handle_rate_limit(self):
+    def _register_rate_limit(self) -> float:
         with self._state_lock:
             self._consecutive_rate_limits += 1
             self._current_delay = min(self._current_delay * 2, self.max_delay)
@@ -95,7 +205,17 @@ class LLMRateLimiter:
                 f"LLMRateLimiter: rate limited (#{self._consecutive_rate_limits}), "
                 f"next delay={self._current_delay:.1f}s, sleeping {backoff:.1f}s"
             )
-        time.sleep(backoff)
+        return backoff
+
+    def _handle_rate_limit(self, cancellation: Optional[Any] = None):
+        backoff = self._register_rate_limit()
+        if cancellation is not None:
+            cancellation.wait(backoff)
+        else:
+            time.sleep(backoff)
+
+    async def _ahandle_rate_limit(self):
+        await asyncio.sleep(self._register_rate_limit())
 
     def _handle_success(self):
         with self._state_lock:
@@ -112,7 +232,8 @@ class LLMRateLimiter:
                *,
                is_chain: bool = False,
                max_attempts: Optional[int] = 8,
-               invoke_fn: Optional[Callable[[Any, Any], Any]] = None) -> Any:
+               invoke_fn: Optional[Callable[[Any, Any], Any]] = None,
+               cancellation: Optional[Any] = None) -> Any:
         """
         Unified invoke wrapper.
 
@@ -121,11 +242,16 @@ class LLMRateLimiter:
         is_chain: True if invoking a chain (expects dict input).
         max_attempts: retry attempts on rate limit.
         invoke_fn: optional custom callable(llm, prompt_or_input) -> result
+        cancellation: optional CancellationToken, which ends waits and backoffs early and is
+            checked after every one, so a cancelled generation sends no further calls
         """
         attempt = 0
         while True:
             attempt += 1
-            self._pre_call_wait()
+            with tracing.span("rate_limiter.wait", attempt=attempt, fair_share=self.fair_share is not None):
+                self._pre_call_wait(cancellation)
+            if cancellation is not None:
+                cancellation.raise_if_cancelled()
             try:
                 if invoke_fn:
                     result = invoke_fn(llm, prompt_or_input)
@@ -138,9 +264,54 @@ class LLMRateLimiter:
                 return result
             except Exception as e:
                 if self._should_treat_as_rate_limit(e) and (max_attempts is None or attempt < max_attempts):
-                    self._handle_rate_limit()
+                    with tracing.span("rate_limiter.backoff", attempt=attempt):
+                        self._handle_rate_limit(cancellation)
                     continue
                 raise
 
+    async def ainvoke(self,
+                      llm: Any,
+                      prompt_or_input: Any,
+                      *,
+                      max_attempts: Optional[int] = 8,
+                      ainvoke_fn: Optional[Callable[[Any, Any], Awaitable[Any]]] = None,
+                      cancellation: Optional[Any] = None) -> Any:
+        """
+        Async counterpart of invoke, sharing the same delay and backoff state.
+        Waits with asyncio.sleep so throttled calls don't hold a thread.
+
+        ainvoke_fn: optional custom coroutine function(llm, prompt_or_input) -> result
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            with tracing.span("rate_limiter.wait", attempt=attempt, fair_share=self.fair_share is not None):
+                await self._apre_call_wait()
+            if cancellation is not None:
+                cancellation.raise_if_cancelled()
+            try:
+                if ainvoke_fn:
+                    result = await ainvoke_fn(llm, prompt_or_input)
+                else:
+                    result = await llm.ainvoke(prompt_or_input)
+                self._handle_success()
+                return result
+            except Exception as e:
+                if self._should_treat_as_rate_limit(e) and (max_attempts is None or attempt < max_attempts):
+                    with tracing.span("rate_limiter.backoff", attempt=attempt):
+                        await self._ahandle_rate_limit()
+                    continue
+                raise
+
+class _FairWaiter:
+    __slots__ = ("grant", "requester", "enqueued_at", "granted", "abandoned")
+
+    def __init__(self, grant: Callable[[], None], requester: Any):
+        self.grant = grant
+        self.requester = requester
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.abandoned = False
+
 # Convenience module-level accessor
 llm_rate_limiter = LLMRateLimiter.get_instance()
\ No newline at end of file